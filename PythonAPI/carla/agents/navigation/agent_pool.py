@@ -0,0 +1,160 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides AgentPool, which steps many agents on every tick of a
+synchronous simulation and sends all their controls to the server at once.
+"""
+
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import carla
+
+from agents.navigation.world_state import WorldState
+
+# Stages of a tick of the pool, in order
+STAGES = ('snapshot', 'decide', 'apply')
+
+
+def _step_agent(agent):
+    """Runs one step of an agent, measuring its duration"""
+    start = time.time()
+    control = agent.run_step()
+    return control, time.time() - start
+
+
+class AgentPool(object):
+    """
+    Owns a set of agents and steps all of them on every tick:
+
+        - snapshot: the shared WorldState is updated once, for all the agents
+        - decide: the run_step of every agent, in order or spread over an executor
+        - apply: a single client.apply_batch_sync with the controls of all the vehicles
+
+    A thread executor can be given, which overlaps the parts of the agents that release
+    the GIL, like the calls to the server. Process executors are not supported: the agents
+    share the WorldState of the pool and hold carla objects, neither of which can be pickled.
+    """
+
+    def __init__(self, client, world, world_state=None, executor=None):
+        """
+        :param client (carla.Client): client used to send the controls
+        :param world (carla.World): world of the agents
+        :param world_state (WorldState): snapshot shared by the agents, a new one by default
+        :param executor (concurrent.futures.ThreadPoolExecutor): runs the steps of the
+            agents, None to run them in order in the calling thread
+        """
+        if isinstance(executor, ProcessPoolExecutor):
+            raise ValueError('AgentPool needs a thread executor, agents cannot be stepped in other processes')
+        self._client = client
+        self._world = world
+        self._executor = executor
+        self.world_state = world_state if world_state is not None else WorldState(world)
+        self._agents = []
+        self._vehicle_ids = []
+        self._lock = threading.Lock()
+
+        self.ticks = 0
+        self.stage_times = dict.fromkeys(STAGES, 0.0)
+        self.total_stage_times = dict.fromkeys(STAGES, 0.0)
+        self.agent_times = []
+        self.errors = []
+
+    def __len__(self):
+        return len(self._agents)
+
+    @property
+    def agents(self):
+        """Agents of the pool, in the order of their controls"""
+        return list(self._agents)
+
+    def add(self, agent, vehicle=None):
+        """
+        Adds an agent to the pool, sharing the WorldState of the pool with it
+
+            :param agent: agent with a run_step method returning a carla.VehicleControl
+            :param vehicle (carla.Vehicle): vehicle controlled by the agent, by default
+                the one the agent was created for
+        """
+        if vehicle is None:
+            vehicle = agent._vehicle
+        if hasattr(agent, 'set_world_state'):
+            agent.set_world_state(self.world_state)
+        with self._lock:
+            self._agents.append(agent)
+            self._vehicle_ids.append(vehicle.id)
+            self.agent_times.append(0.0)
+
+    def remove(self, agent):
+        """
+        Removes an agent from the pool
+
+            :param agent: agent to remove
+        """
+        with self._lock:
+            index = self._agents.index(agent)
+            del self._agents[index]
+            del self._vehicle_ids[index]
+            del self.agent_times[index]
+
+    def tick(self, snapshot=None, do_tick=False):
+        """
+        Steps every agent of the pool and applies their controls
+
+            :param snapshot (carla.WorldSnapshot): snapshot of the current frame,
+                taken from the world if not given
+            :param do_tick (bool): whether apply_batch_sync also ticks the world
+            :return: list with the control of each agent
+        """
+        with self._lock:
+            start = time.time()
+            self.world_state.update(snapshot)
+            decide_start = time.time()
+
+            if self._executor is None:
+                results = [_step_agent(agent) for agent in self._agents]
+            else:
+                results = list(self._executor.map(_step_agent, self._agents))
+            controls = []
+            for index, (control, elapsed) in enumerate(results):
+                self.agent_times[index] = elapsed
+                controls.append(control)
+            apply_start = time.time()
+
+            commands = [carla.command.ApplyVehicleControl(actor_id, control)
+                        for actor_id, control in zip(self._vehicle_ids, controls)]
+            responses = self._client.apply_batch_sync(commands, do_tick)
+            self.errors = [(actor_id, response.error) for actor_id, response in zip(self._vehicle_ids, responses)
+                           if response.error]
+            end = time.time()
+
+            self.stage_times = {
+                'snapshot': decide_start - start,
+                'decide': apply_start - decide_start,
+                'apply': end - apply_start
+            }
+            for stage in STAGES:
+                self.total_stage_times[stage] += self.stage_times[stage]
+            self.ticks += 1
+        return controls
+
+    def stats(self):
+        """
+        Returns a dictionary with the timings, in seconds, of the last tick and the
+        mean of every tick so far
+        """
+        agent_times = self.agent_times
+        return {
+            'ticks': self.ticks,
+            'agents': len(self._agents),
+            'last': dict(self.stage_times),
+            'mean': {stage: self.total_stage_times[stage] / self.ticks if self.ticks else 0.0 for stage in STAGES},
+            'agent_mean': sum(agent_times) / len(agent_times) if agent_times else 0.0,
+            'agent_max': max(agent_times) if agent_times else 0.0,
+            'errors': len(self.errors)
+        }
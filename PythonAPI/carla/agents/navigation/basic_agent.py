@@ -12,16 +12,19 @@ It can also make use of the global route planner to follow a specified route
 # 导入CARLA库，用于与CARLA仿真环境进行交互
 import carla
  
-# 从shapely.geometry导入Polygon类，用于处理多边形几何形状
-from shapely.geometry import Polygon
+# 导入numpy，用于路线走廊和包围盒的向量化计算
+import numpy as np
  
 # 从agents.navigation模块导入LocalPlanner和RoadOption类，用于本地路径规划
 from agents.navigation.local_planner import LocalPlanner, RoadOption
 # 从agents.navigation模块导入GlobalRoutePlanner类，用于全局路径规划
 from agents.navigation.global_route_planner import GlobalRoutePlanner
+from agents.navigation.trigger_index import TriggerIndex
+from agents.navigation.world_state import ActorSet
 # 从agents.tools.misc模块导入一些实用函数
-from agents.tools.misc import (get_speed, is_within_distance,  # 获取速度，判断是否在距离范围内
-                               get_trafficlight_trigger_location)  # 获取交通灯触发位置
+from agents.tools.misc import get_speed, is_within_distance  # 获取速度，判断是否在距离范围内
+# 从agents.tools.corridor模块导入包围盒与路线走廊的相交检测
+from agents.tools.corridor import box_vertices, boxes_intersect_corridor
  
 # 从agents.tools.hints模块导入ObstacleDetectionResult和TrafficLightDetectionResult类型提示
 from agents.tools.hints import ObstacleDetectionResult, TrafficLightDetectionResult
@@ -51,6 +54,11 @@ class BasicAgent:
             :param map_inst: carla.Map instance to avoid the expensive call of getting it.
             :param grp_inst: GlobalRoutePlanner instance to avoid the expensive call of getting it.
 
+        The 'world_state' key of opt_dict sets a WorldState shared with other agents,
+        from which the obstacles and traffic lights are read instead of the live actors.
+        The 'trigger_index' key sets the TriggerIndex of the traffic lights, by default the
+        one shared by the process for the world, and 'trigger_cache_dir' the folder where
+        it is cached.
         """
         #将vehicle赋值给自身的_vehicle属性
         self._vehicle = vehicle
@@ -92,6 +100,7 @@ class BasicAgent:
         self._max_brake = 0.5
         #自身的_offset被设置为0
         self._offset = 0
+        self._world_state = None
 
         # Change parameters according to the dictionary
         opt_dict['target_speed'] = target_speed# 将目标速度（target_speed）赋值给字典（opt_dict）中的'target_speed'键对应的元素。
@@ -126,6 +135,8 @@ class BasicAgent:
         if 'offset' in opt_dict:
             self._offset = opt_dict['offset']# 检查字典opt_dict中是否存在键'offset'，如果存在，则将对应的值赋给实例变量self._offset。
 # 具体含义取决于上下文，可能是位置偏移、时间偏移等相关的设置，从配置字典获取相应值并赋给对象属性。
+        if 'world_state' in opt_dict:
+            self._world_state = opt_dict['world_state']
 
         # Initialize the planners
         self._local_planner = LocalPlanner(self._vehicle, opt_dict=opt_dict, map_inst=self._map)
@@ -140,7 +151,9 @@ class BasicAgent:
 
         # Get the static elements of the scene
         self._lights_list = self._world.get_actors().filter("*traffic_light*")
-        self._lights_map = {}  # Dictionary mapping a traffic light to a wp corresponding to its trigger volume location
+        # Trigger waypoints of the traffic lights, shared by the agents of the world
+        self._trigger_index = opt_dict.get('trigger_index')
+        self._trigger_cache_dir = opt_dict.get('trigger_cache_dir')
 
     def add_emergency_stop(self, control):
         """
@@ -162,7 +175,7 @@ class BasicAgent:
         """
         Changes the target speed of the agent
             :param speed (float): target speed in Km/h
-        ""
+        """
         #将传入的目标速度speed赋值给对象的_target_speed属性
         self._target_speed = speed
         #调用它的set_speed方法并传入speed参数
@@ -189,6 +202,86 @@ class BasicAgent:
         """Get method for protected member local planner"""
         return self._global_planner
 
+    def set_world_state(self, world_state):
+        """
+        Sets the WorldState the agent reads the other actors from.
+
+            :param world_state (WorldState): shared snapshot of the world, or None to
+                query the live actors again
+        """
+        self._world_state = world_state
+
+    def _get_actors(self, wildcard_pattern):
+        """
+        Returns the actors whose type id matches a pattern, from the WorldState if the
+        agent has one, or from the world otherwise.
+
+            :param wildcard_pattern (str): pattern such as "*vehicle*"
+        """
+        if self._world_state is not None:
+            self._world_state.update()
+            return self._world_state.filter(wildcard_pattern)
+        return self._world.get_actors().filter(wildcard_pattern)
+
+    def _traffic_light_state(self, traffic_light):
+        """Returns the state of a traffic light, once per frame if the agent has a WorldState"""
+        if self._world_state is not None:
+            return self._world_state.traffic_light_state(traffic_light)
+        return traffic_light.state
+
+    def _get_trigger_index(self):
+        """
+        Returns the TriggerIndex of the world, shared by all the agents of the process
+        """
+        if self._trigger_index is None:
+            self._trigger_index = TriggerIndex.for_world(self._world, self._map, self._trigger_cache_dir)
+        return self._trigger_index
+
+    def _roads_ahead(self, ego_waypoint, max_distance):
+        """
+        Returns the (road_id, forward vector) of the road of the vehicle and of the roads of
+        its plan within max_distance, in the order they are driven. The forward vector is
+        the one of the first waypoint of the road.
+
+            :param ego_waypoint (carla.Waypoint): waypoint of the vehicle
+            :param max_distance (float): distance to the vehicle of the waypoints looked at
+        """
+        roads = [(ego_waypoint.road_id, ego_waypoint.transform.get_forward_vector())]
+        seen = set([ego_waypoint.road_id])
+        location = self._vehicle.get_location()
+        plan = self._local_planner.get_plan()
+        count = self._local_planner.get_corridor().reach((location.x, location.y, location.z), max_distance)
+        for i in range(count):
+            waypoint = plan[i][0]
+            if waypoint.road_id not in seen:
+                seen.add(waypoint.road_id)
+                roads.append((waypoint.road_id, waypoint.transform.get_forward_vector()))
+        return roads
+
+    def _nearby_actors(self, actor_list, location, max_distance):
+        """
+        Yields the (actor, transform, bounding box) of the actors of a list, other than the
+        ego vehicle, that are at most max_distance away from a location.
+
+            :param actor_list (list of carla.Actor or ActorSet): candidate actors
+            :param location (carla.Location): reference location
+            :param max_distance (float): maximum distance to the location
+        """
+        if isinstance(actor_list, ActorSet):
+            nearby = actor_list.within(location, max_distance)
+            nearby = nearby.subset(nearby.ids != self._vehicle.id)
+            for i, actor in enumerate(nearby):
+                yield actor, nearby.transform(i), nearby.bounding_box(i)
+            return
+
+        for actor in actor_list:
+            if actor.id == self._vehicle.id:
+                continue
+            transform = actor.get_transform()
+            if transform.location.distance(location) > max_distance:
+                continue
+            yield actor, transform, actor.bounding_box
+
     def set_destination(self, end_location, start_location=None, clean_queue=True):
         # type: (carla.Location, carla.Location | None, bool) -> None：#这是一个类型提示，表明函数接受的参数类型和返回类型。这里carla.Location是一个位置对象， 
         """
@@ -214,6 +307,7 @@ class BasicAgent:
                 # no target_waypoint or _waypoints_queue empty, use vehicle location#这是一条注释，说明如果没有目标路径点或路径点队列为空，将使用车辆的当前位置作为起点
                 start_location = self._vehicle.get_location()#这行代码将起点位置设置为车辆的当前位置。
         start_waypoint = self._map.get_waypoint(start_location)#这行代码获取起点位置对应的路径点（  waypoint  ），这通常用于自动驾驶模拟中，以便规划从起点到终点的路线。
+        end_waypoint = self._map.get_waypoint(end_location)
         route_trace = self.trace_route(start_waypoint, end_waypoint)
         self._local_planner.set_global_plan(route_trace, clean_queue=clean_queue)
 
@@ -247,7 +341,7 @@ class BasicAgent:
         hazard_detected = False#用于标记在导航过程中是否检测到危险。
 
         # Retrieve all relevant actors
-        vehicle_list = self._world.get_actors().filter("*vehicle*")
+        vehicle_list = self._get_actors("*vehicle*")
 
         vehicle_speed = get_speed(self._vehicle) / 3.6#这行代码调用get_speed函数来获取当前车辆的速度
 
@@ -324,13 +418,13 @@ class BasicAgent:
             return TrafficLightDetectionResult(False, None)
 
         if not lights_list:
-            lights_list = self._world.get_actors().filter("*traffic_light*")
+            lights_list = self._get_actors("*traffic_light*")
 
         if not max_distance:
             max_distance = self._base_tlight_threshold
 
         if self._last_traffic_light:
-            if self._last_traffic_light.state != carla.TrafficLightState.Red:
+            if self._traffic_light_state(self._last_traffic_light) != carla.TrafficLightState.Red:
                 self._last_traffic_light = None
             else:
                 return TrafficLightDetectionResult(True, self._last_traffic_light)
@@ -340,43 +434,30 @@ class BasicAgent:
         #根据自行车位置获取对应的路点，借助地图对象的相关方法
         ego_vehicle_waypoint = self._map.get_waypoint(ego_vehicle_location)
 
-        #开始遍历交通信号灯列表
-        for traffic_light in lights_list:
-            #如果交通信号灯的id在self.light_map中
-            if traffic_light.id in self._lights_map:
-                #将trigger_wp设置为self.lights_map中对应交通信号灯id的值
-                trigger_wp = self._lights_map[traffic_light.id]
-            #否则
-            else:
-                #获取交通信号灯的trigger_location
-                trigger_location = get_trafficlight_trigger_location(traffic_light)
-                #根据出发位置获取waypoint并赋值给trigger_wap
-                trigger_wp = self._map.get_waypoint(trigger_location)
-                #将self.lights_map中对应交通信号灯id的值设置为trigger_wp
-                self._lights_map[traffic_light.id] = trigger_wp
-            #如果触发trigger_wp转换后的位置与自车位置(ego_vehicle_location)的距离大于最大距离
-            if trigger_wp.transform.location.distance(ego_vehicle_location) > max_distance:
-                #跳过当前循环
-                continue
-            #如果触发trigger_wp转换后的位置与自车位置(ego_vehicle_location)的距离大于最大距离
-            if trigger_wp.road_id != ego_vehicle_waypoint.road_id:
-                #跳过当前循环
-                continue
-            #获取ego_vehicle_waypoint变换后的forward vector并赋值给ve_dir
-            ve_dir = ego_vehicle_waypoint.transform.get_forward_vector()
-            #获取trgger_wp变换后的forward vector并赋值给wp_dir
-            wp_dir = trigger_wp.transform.get_forward_vector()
-            #计算ve_dir和wp_dir的点积并赋值给dot_ve_wp
-            dot_ve_wp = ve_dir.x * wp_dir.x + ve_dir.y * wp_dir.y + ve_dir.z * wp_dir.z
-            #如果点积小于0
-            if dot_ve_wp < 0:
-                #跳过当前循环
+        #只检查自车所在道路及规划路线前方道路上、距离足够近且与路线方向相同的触发路点
+        trigger_index = self._get_trigger_index()
+        rows = [trigger_index.query(road_id, ego_vehicle_location, forward, max_distance)
+                for road_id, forward in self._roads_ahead(ego_vehicle_waypoint, max_distance)]
+        rows = np.unique(np.concatenate(rows))
+        if len(rows) == 0:
+            return TrafficLightDetectionResult(False, None)
+
+        #只考虑传入列表中的交通信号灯
+        if isinstance(lights_list, ActorSet):
+            allowed_ids = set(lights_list.ids.tolist())
+        else:
+            allowed_ids = set(traffic_light.id for traffic_light in lights_list)
+
+        for row in rows.tolist():
+            traffic_light = trigger_index.actors[row]
+            if traffic_light.id not in allowed_ids:
                 continue
             #如果traffic_light的状态不等于红色
-            if traffic_light.state != carla.TrafficLightState.Red:
+            if self._traffic_light_state(traffic_light) != carla.TrafficLightState.Red:
                 #跳过当前循环
                 continue
             #如果触发路点变换后的位置与自车变换后的位置在最大距离内且角度在[90]度范围内
+            trigger_wp = trigger_index.waypoint(row)
             if is_within_distance(trigger_wp.transform, self._vehicle.get_transform(), max_distance, [0, 90]):
                 #将当前交通信号灯设置为最后检测到的交通信号灯
                 self._last_traffic_light = traffic_light
@@ -394,11 +475,10 @@ class BasicAgent:
             :param max_distance: max freespace to check for obstacles.
                 If None, the base threshold value is used
         """
-        def get_route_polygon():
+        def get_route_corridor():
             """
-    此函数用于构建表示车辆行驶路线的多边形（Polygon），该多边形基于车辆自身以及规划路径中的路点（waypoint）来确定边界点。
+    此函数用于构建表示车辆行驶路线的走廊，该走廊基于车辆自身以及规划路径中的路点（waypoint）来确定左右边界点。
     """
-            route_bb = [] # 用于存储构成多边形的边界点列表，初始为空列表
             # 获取车辆包围盒（bounding box）在y轴方向上的范围（extent），包围盒用于表示物体在空间中的大致范围
             extent_y = self._vehicle.bounding_box.extent.y
             # 根据车辆包围盒的y轴范围和一个偏移量（_offset）计算右侧扩展后的距离
@@ -411,35 +491,23 @@ class BasicAgent:
             p1 = ego_location + carla.Location(r_ext * r_vec.x, r_ext * r_vec.y)
             # 根据车辆当前位置（ego_location）和左侧扩展距离（l_ext）以及右方向向量（r_vec）计算多边形的另一个边界点p2
             p2 = ego_location + carla.Location(l_ext * r_vec.x, l_ext * r_vec.y)
-            # 将计算得到的两个边界点（以坐标列表形式）添加到route_bb列表中，作为多边形的初始边界点
-            route_bb.extend([[p1.x, p1.y, p1.z], [p2.x, p2.y, p2.z]])
-
-            # 遍历局部规划器（_local_planner）中的规划路径（plan），每个元素包含路点（wp）和相关信息（这里忽略了后者）
-            for wp, _ in self._local_planner.get_plan():
-                # 如果当前车辆位置与路点位置的距离大于最大距离（max_distance，此处未定义，应该是外部传入或在更外层定义的变量），则停止遍历
-                if ego_location.distance(wp.transform.location) > max_distance:
-                    break
-
-                # 获取路点坐标系下的右方向向量，用于计算基于该路点的多边形边界点位置
-                r_vec = wp.transform.get_right_vector()
-                # 根据路点位置（wp.transform.location）和右侧扩展距离（r_ext）以及右方向向量（r_vec）计算基于该路点的多边形的一个边界点p1
-                p1 = wp.transform.location + carla.Location(r_ext * r_vec.x, r_ext * r_vec.y)
-                # 根据路点位置（wp.transform.location）和左侧扩展距离（l_ext）以及右方向向量（r_vec）计算基于该路点的多边形的另一个边界点p2
-                p2 = wp.transform.location + carla.Location(l_ext * r_vec.x, l_ext * r_vec.y)
-                # 将基于该路点计算得到的两个边界点（以坐标列表形式）添加到route_bb列表中，逐步构建多边形的边界点集合
-                route_bb.extend([[p1.x, p1.y, p1.z], [p2.x, p2.y, p2.z]])
-
-            # Two points don't create a polygon, nothing to check
-            if len(route_bb) < 3:
+            # 规划路径中距离自车不超过最大距离的路点的左右边界点，由局部规划器维护的路线走廊直接切片得到
+            route_corridor = self._local_planner.get_corridor()
+            count = route_corridor.reach((ego_location.x, ego_location.y, ego_location.z), max_distance)
+
+            # Two points don't create a corridor, nothing to check
+            if count == 0:
                 return None
 
-            return Polygon(route_bb)
+            right_points, left_points = route_corridor.boundaries(count, r_ext, l_ext)
+            return (np.vstack([[[p1.x, p1.y, p1.z]], right_points]),
+                    np.vstack([[[p2.x, p2.y, p2.z]], left_points]))
 
         if self._ignore_vehicles:
             return ObstacleDetectionResult(False, None, -1)
 
         if vehicle_list is None:
-            vehicle_list = self._world.get_actors().filter("*vehicle*")
+            vehicle_list = self._get_actors("*vehicle*")
         if len(vehicle_list) == 0:
             return ObstacleDetectionResult(False, None, -1)
 
@@ -463,29 +531,26 @@ class BasicAgent:
         use_bbs = self._use_bbs_detection or opposite_invasion or ego_wpt.is_junction
 
         # Get the route bounding box
-        route_polygon = get_route_polygon()
-#循环遍历车辆列表
-        for target_vehicle in vehicle_list:
-            if target_vehicle.id == self._vehicle.id:
-                continue
-#获取目标车辆的位置信息
-            target_transform = target_vehicle.get_transform()
-            #距离检查
-            if target_transform.location.distance(ego_location) > max_distance:
-                continue
-
+        route_corridor = get_route_corridor()
+        #获取目标车辆的位置信息，并进行距离检查
+        candidates = list(self._nearby_actors(vehicle_list, ego_location, max_distance))
+        if route_corridor is not None and candidates:
+            # The boxes are read before the loop, as the simplified approach moves the transforms
+            candidate_vertices = self._box_vertices(candidates)
+        corridor_hits = None
+
+        for index, (target_vehicle, target_transform, target_bb) in enumerate(candidates):
             target_wpt = self._map.get_waypoint(target_transform.location, lane_type=carla.LaneType.Any)
 
             # General approach for junctions and vehicles invading other lanes due to the offset
-            if (use_bbs or target_wpt.is_junction) and route_polygon:
+            if (use_bbs or target_wpt.is_junction) and route_corridor is not None:
 
-                target_bb = target_vehicle.bounding_box
-                target_vertices = target_bb.get_world_vertices(target_vehicle.get_transform())
-                target_list = [[v.x, v.y, v.z] for v in target_vertices]
-                target_polygon = Polygon(target_list)
+                if corridor_hits is None:
+                    # All the candidate boxes are checked against the corridor at once
+                    corridor_hits = boxes_intersect_corridor(candidate_vertices, *route_corridor)
 
-                if route_polygon.intersects(target_polygon):
-                    return ObstacleDetectionResult(True, target_vehicle, target_vehicle.get_location().distance(ego_location))
+                if corridor_hits[index]:
+                    return ObstacleDetectionResult(True, target_vehicle, target_transform.location.distance(ego_location))
 
             # Simplified approach, using only the plan waypoints (similar to TM)
             else:
@@ -498,7 +563,7 @@ class BasicAgent:
                         continue
 
                 target_forward_vector = target_transform.get_forward_vector()
-                target_extent = target_vehicle.bounding_box.extent.x
+                target_extent = target_bb.extent.x
                 target_rear_transform = target_transform
                 target_rear_transform.location -= carla.Location(
                     x=target_extent * target_forward_vector.x,
@@ -510,6 +575,23 @@ class BasicAgent:
 
         return ObstacleDetectionResult(False, None, -1)
 
+    @staticmethod
+    def _box_vertices(candidates):
+        """
+        World vertices of the bounding boxes of the candidates of _nearby_actors, as an (N, 8, 3) array
+
+            :param candidates (list): (actor, transform, bounding box) tuples
+        """
+        poses, boxes = [], []
+        for _, transform, bounding_box in candidates:
+            location, rotation = transform.location, transform.rotation
+            poses.append((location.x, location.y, location.z, rotation.pitch, rotation.yaw, rotation.roll))
+            boxes.append((bounding_box.extent.x, bounding_box.extent.y, bounding_box.extent.z,
+                          bounding_box.location.x, bounding_box.location.y, bounding_box.location.z,
+                          bounding_box.rotation.pitch, bounding_box.rotation.yaw, bounding_box.rotation.roll))
+        poses, boxes = np.array(poses), np.array(boxes)
+        return box_vertices(poses[:, :3], poses[:, 3:], boxes[:, :3], boxes[:, 3:6], boxes[:, 6:])
+
     @staticmethod
     def _generate_lane_change_path(waypoint, direction='left', distance_same_lane=10,
                                 distance_other_lane=25, lane_change_distance=25,
@@ -267,3 +267,272 @@ class PIDLateralController:
         self._k_i = K_I
         self._k_d = K_D
         self._dt = dt
+
+
+class BatchPIDController(object):
+    """
+    BatchPIDController实现N个PID控制器的向量化计算。
+    每一行的结果与PIDLongitudinalController和PIDLateralController的_pid_control逐元素相同，
+    误差保存在(N, K)的环形缓冲区中，代替每个控制器各自的deque。
+    """
+
+    def __init__(self, size, K_P=1.0, K_I=0.0, K_D=0.0, dt=0.03, buffer_size=10):
+        """
+        构造方法。
+
+            :param size (int): 控制器的数量
+            :param K_P: 比例项，标量或长度为size的数组
+            :param K_D: 微分项，标量或长度为size的数组
+            :param K_I: 积分项，标量或长度为size的数组
+            :param dt: 时间微分，以秒为单位，标量或长度为size的数组
+            :param buffer_size (int): 每个控制器保存的误差数量
+        """
+        self._size = size
+        self._k_p = np.zeros(size)
+        self._k_i = np.zeros(size)
+        self._k_d = np.zeros(size)
+        self._dt = np.zeros(size)
+        self.change_parameters(K_P, K_I, K_D, dt)
+        self._buffer = np.zeros((size, buffer_size))
+        # 每一行下一个误差的写入位置和已保存的误差数量
+        self._head = np.zeros(size, dtype=np.int64)
+        self._count = np.zeros(size, dtype=np.int64)
+
+    def __len__(self):
+        return self._size
+
+    def change_parameters(self, K_P, K_I, K_D, dt, index=None):
+        """
+        更改PID参数
+
+            :param index: 要更改的行，None表示全部
+        """
+        index = slice(None) if index is None else index
+        self._k_p[index] = K_P
+        self._k_i[index] = K_I
+        self._k_d[index] = K_D
+        self._dt[index] = dt
+
+    def reset(self, index=None):
+        """
+        清空误差缓冲区
+
+            :param index: 要清空的行，None表示全部
+        """
+        index = slice(None) if index is None else index
+        self._head[index] = 0
+        self._count[index] = 0
+
+    def step(self, errors, rows=None):
+        """
+        将误差加入缓冲区，并基于PID方程计算控制量
+
+            :param errors: 长度为len(rows)的误差数组
+            :param rows: 参与计算的行索引数组，None表示全部
+            :return: 在[-1, 1]范围内的控制量数组
+        """
+        rows = np.arange(self._size) if rows is None else np.asarray(rows, dtype=np.int64)
+        errors = np.asarray(errors, dtype=np.float64)
+        capacity = self._buffer.shape[1]
+        head = self._head[rows]
+        self._buffer[rows, head] = errors
+        previous = self._buffer[rows, (head - 1) % capacity]
+        self._head[rows] = (head + 1) % capacity
+        count = np.minimum(self._count[rows] + 1, capacity)
+        self._count[rows] = count
+
+        # 与sum(deque)相同，从最旧的误差开始依次累加，保证舍入结果一致
+        total = np.zeros(len(rows))
+        for age in range(capacity - 1, -1, -1):
+            values = self._buffer[rows, (head - age) % capacity]
+            total += np.where(age < count, values, 0.0)
+
+        dt = self._dt[rows]
+        ready = count >= 2
+        _de = np.where(ready, (errors - previous) / dt, 0.0)
+        _ie = np.where(ready, total * dt, 0.0)
+        return np.clip((self._k_p[rows] * errors) + (self._k_d[rows] * _de) + (self._k_i[rows] * _ie), -1.0, 1.0)
+
+
+def _broadcast(value, size):
+    """将标量或序列转换为长度为size的float64数组"""
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (size,)).copy()
+
+
+class BatchVehicleController(object):
+    """
+    BatchVehicleController以向量化的方式对N辆车执行VehiclePIDController的控制逻辑。
+
+    增益、偏移量、上一次的转向和误差缓冲区都保存在数组中，一次计算就得到所有车辆的
+    油门、刹车和转向，并通过一次client.apply_batch下发。给定相同的输入，
+    每辆车的输出与对应的VehiclePIDController相同（仅在末位浮点舍入上可能不同）。
+    """
+
+    def __init__(self, vehicles, args_lateral, args_longitudinal, offset=0, max_throttle=0.75, max_brake=0.3,
+                 max_steering=0.8, world_state=None):
+        """
+        构造方法。
+
+        :param vehicles: 被控制的车辆列表
+        :param args_lateral: 横向PID控制器的参数字典（K_P、K_I、K_D、dt），
+            每个值可以是标量或每辆车一个值的序列
+        :param args_longitudinal: 纵向PID控制器的参数字典，语义同上
+        :param offset: 与中心线的偏移量，标量或每辆车一个值的序列
+        :param max_throttle: 最大油门，标量或序列
+        :param max_brake: 最大刹车，标量或序列
+        :param max_steering: 最大转向，标量或序列
+        :param world_state (WorldState): 可选，从中读取车辆的速度和变换，
+            代替逐车调用get_velocity和get_transform
+        """
+        self._vehicles = list(vehicles)
+        self._ids = [vehicle.id for vehicle in self._vehicles]
+        size = len(self._vehicles)
+        self._world_state = world_state
+
+        self.max_throt = _broadcast(max_throttle, size)
+        self.max_brake = _broadcast(max_brake, size)
+        self.max_steer = _broadcast(max_steering, size)
+        self._offset = _broadcast(offset, size)
+        self.past_steering = np.array([vehicle.get_control().steer for vehicle in self._vehicles], dtype=np.float64)
+        self._lon_controller = BatchPIDController(size, **args_longitudinal)
+        self._lat_controller = BatchPIDController(size, **args_lateral)
+
+    def __len__(self):
+        return len(self._vehicles)
+
+    @property
+    def vehicles(self):
+        """被控制的车辆列表"""
+        return self._vehicles
+
+    def change_longitudinal_PID(self, args_longitudinal, index=None):
+        """更改纵向PID的参数，index为None时更改全部车辆"""
+        self._lon_controller.change_parameters(index=index, **args_longitudinal)
+
+    def change_lateral_PID(self, args_lateral, index=None):
+        """更改横向PID的参数，index为None时更改全部车辆"""
+        self._lat_controller.change_parameters(index=index, **args_lateral)
+
+    def set_offset(self, offset, index=None):
+        """更改偏移量，index为None时更改全部车辆"""
+        self._offset[slice(None) if index is None else index] = offset
+
+    def compute(self, target_speeds, speeds, locations, forwards, targets, target_rights=None, mask=None):
+        """
+        对所有车辆执行一步控制，只使用数组
+
+            :param target_speeds: (N,) 目标速度，单位为Km/h
+            :param speeds: (N,) 车辆当前速度，单位为Km/h
+            :param locations: (N, 2) 或 (N, 3) 车辆的位置
+            :param forwards: (N, 2) 或 (N, 3) 车辆的前向向量
+            :param targets: (N, 2) 或 (N, 3) 目标路点的位置
+            :param target_rights: (N, 2) 或 (N, 3) 目标路点的右向量，偏移量不为零时需要
+            :param mask: (N,) 布尔数组，只有为True的车辆参与计算并更新状态，None表示全部
+            :return: (throttle, brake, steer) 三个(N,)数组，未参与计算的车辆为零
+        """
+        size = len(self._vehicles)
+        rows = np.arange(size) if mask is None else np.nonzero(mask)[0]
+        throttle, brake, steer = np.zeros(size), np.zeros(size), np.zeros(size)
+        if len(rows) == 0:
+            return throttle, brake, steer
+
+        speeds = np.asarray(speeds, dtype=np.float64)[rows]
+        acceleration = self._lon_controller.step(np.asarray(target_speeds, dtype=np.float64)[rows] - speeds, rows)
+        current_steering = self._lat_controller.step(
+            self._steering_errors(rows, locations, forwards, targets, target_rights), rows)
+
+        accelerating = acceleration >= 0.0
+        throttle[rows] = np.where(accelerating, np.minimum(acceleration, self.max_throt[rows]), 0.0)
+        brake[rows] = np.where(accelerating, 0.0, np.minimum(np.abs(acceleration), self.max_brake[rows]))
+
+        # 方向盘调节：不能突然变化，不能转得太多。
+        past_steering = self.past_steering[rows]
+        current_steering = np.clip(current_steering, past_steering - 0.1, past_steering + 0.1)
+        max_steer = self.max_steer[rows]
+        steering = np.clip(current_steering, -max_steer, max_steer)
+        steer[rows] = steering
+        self.past_steering[rows] = steering
+        return throttle, brake, steer
+
+    def _steering_errors(self, rows, locations, forwards, targets, target_rights):
+        """与PIDLateralController._pid_control相同的带符号夹角，逐行计算"""
+        ego = np.asarray(locations, dtype=np.float64)[rows, :2]
+        v_vec = np.asarray(forwards, dtype=np.float64)[rows, :2]
+        targets = np.asarray(targets, dtype=np.float64)[rows, :2]
+        offset = self._offset[rows]
+        shifted = offset != 0
+        if np.any(shifted):
+            # 与carla.Location的加法一样以单精度计算侧移后的位置
+            r_vec = np.asarray(target_rights, dtype=np.float64)[rows[shifted], :2]
+            targets = targets.copy()
+            targets[shifted] = (targets[shifted].astype(np.float32) +
+                                (offset[shifted, np.newaxis] * r_vec).astype(np.float32))
+
+        w_vec = targets - ego
+        wv_linalg = (np.sqrt(w_vec[:, 0] * w_vec[:, 0] + w_vec[:, 1] * w_vec[:, 1]) *
+                     np.sqrt(v_vec[:, 0] * v_vec[:, 0] + v_vec[:, 1] * v_vec[:, 1]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cosine = (w_vec[:, 0] * v_vec[:, 0] + w_vec[:, 1] * v_vec[:, 1]) / wv_linalg
+        _dot = np.where(wv_linalg == 0, 1.0, np.arccos(np.clip(np.nan_to_num(cosine), -1.0, 1.0)))
+        _cross = v_vec[:, 0] * w_vec[:, 1] - v_vec[:, 1] * w_vec[:, 0]
+        return np.where(_cross < 0, -_dot, _dot)
+
+    def _vehicle_arrays(self):
+        """读取所有车辆的速度（Km/h）、位置和前向向量"""
+        if self._world_state is not None:
+            rows = np.array([self._world_state.row(actor_id) for actor_id in self._ids], dtype=np.int64)
+            if np.all(rows >= 0):
+                velocities = self._world_state.velocities[rows].astype(np.float64)
+                locations = self._world_state.locations[rows]
+                # carla.Transform.get_forward_vector
+                pitch, yaw = np.radians(self._world_state.rotations[rows, 0:2].astype(np.float64)).T
+                forwards = np.stack([np.cos(pitch) * np.cos(yaw), np.cos(pitch) * np.sin(yaw)], axis=1)
+                speeds = 3.6 * np.sqrt(velocities[:, 0] ** 2 + velocities[:, 1] ** 2 + velocities[:, 2] ** 2)
+                return speeds, locations, forwards
+
+        speeds, locations, forwards = [], [], []
+        for vehicle in self._vehicles:
+            transform = vehicle.get_transform()
+            forward = transform.get_forward_vector()
+            speeds.append(get_speed(vehicle))
+            locations.append((transform.location.x, transform.location.y))
+            forwards.append((forward.x, forward.y))
+        return np.array(speeds), np.array(locations), np.array(forwards)
+
+    def run_step(self, target_speeds, waypoints):
+        """
+        对所有车辆执行一步控制，调用横向和纵向PID控制器
+        以达到给定目标速度的目标路点。
+
+            :param target_speeds: 每辆车的目标速度，标量或序列
+            :param waypoints: 每辆车的目标路点，为None的车辆不参与计算
+            :return: carla.VehicleControl列表，未参与计算的车辆为None
+        """
+        size = len(self._vehicles)
+        mask = np.array([waypoint is not None for waypoint in waypoints], dtype=bool)
+        targets, rights = np.zeros((size, 2)), np.zeros((size, 2))
+        for i in np.nonzero(mask)[0]:
+            w_tran = waypoints[i].transform
+            targets[i] = (w_tran.location.x, w_tran.location.y)
+            if self._offset[i] != 0:
+                r_vec = w_tran.get_right_vector()
+                rights[i] = (r_vec.x, r_vec.y)
+
+        speeds, locations, forwards = self._vehicle_arrays()
+        throttle, brake, steer = self.compute(_broadcast(target_speeds, size), speeds, locations, forwards,
+                                              targets, rights, mask)
+        controls = [None] * size
+        for i in np.nonzero(mask)[0]:
+            controls[i] = carla.VehicleControl(throttle=float(throttle[i]), steer=float(steer[i]),
+                                               brake=float(brake[i]), hand_brake=False, manual_gear_shift=False)
+        return controls
+
+    def apply(self, client, controls):
+        """
+        通过一次client.apply_batch下发所有车辆的控制
+
+            :param client (carla.Client): 客户端
+            :param controls: run_step返回的控制列表，为None的车辆被跳过
+        """
+        client.apply_batch([carla.command.ApplyVehicleControl(actor_id, control)
+                            for actor_id, control in zip(self._ids, controls) if control is not None])
@@ -8,12 +8,21 @@
 This module provides GlobalRoutePlanner implementation.
 """
 
+import itertools
 import math
+import os
+import weakref
 import numpy as np
 import networkx as nx
 
 import carla
+from agents.navigation import graph_cache
 from agents.navigation.local_planner import RoadOption
+from agents.navigation.localization_index import LocalizationIndex
+from agents.navigation.route_graph import CSRGraph, ContractionHierarchy, IncrementalSearch
+from agents.navigation.route_trace import RouteTrace
+from agents.navigation.turn_classifier import TurnClassifier
+from agents.tools.topology_sampler import TopologySampler
 
 # Python 2 compatibility
 # 用于类型检查相关的标记，后续根据Python版本来决定如何导入特定的类型相关模块
@@ -63,7 +72,7 @@ if TYPE_CHECKING:
     # 'type': 类型为RoadOption，可能表示边对应的道路选项类型（比如直行、转弯等不同道路行为类型）
     # 'change_waypoint': 类型为carla.Waypoint，不过是可选的（NotRequired），可能在某些路径变化的场景下用到的路点信息
     # 定义EdgeDict类型字典，用于描述边相关的各种属性类型
-   EdgeDict = TypedDict('EdgeDict',
+    EdgeDict = TypedDict('EdgeDict',
         {
             'length': int,
             'path': list[carla.Waypoint],
@@ -77,14 +86,42 @@ if TYPE_CHECKING:
             'change_waypoint': NotRequired[carla.Waypoint]
         })
 
+# Versions of the edge costs set by set_lane_cost, unique across the planners of the process
+# so that the route cache keys of planners with different costs never collide
+_cost_versions = itertools.count(1)
+
 # 定义GlobalRoutePlanner类，用于提供高层次的路线规划功能
 class GlobalRoutePlanner:
     """
     This class provides a very high level route plan.
     """
     # 类的初始化方法，接收地图对象和采样分辨率作为参数
-    def __init__(self, wmap, sampling_resolution):
-        # type: (carla.Map, float) -> None
+    def __init__(self, wmap, sampling_resolution, cache_dir=None, backend='networkx', localization='map',
+                 route_cache=None):
+        # type: (carla.Map, float, str | None, str, str, RouteCache | None) -> None
+        """
+        :param wmap: carla.Map to plan the routes on
+        :param sampling_resolution: distance between the waypoints of the routes
+        :param cache_dir: if given, folder where the graph of the map is cached, keyed by the
+            hash of its OpenDRIVE content and the sampling resolution. Later planners of the
+            same map load the graph from it instead of querying the map topology again.
+        :param backend: engine used by the path searches. 'networkx' runs networkx.astar_path
+            over the graph, 'csr' compiles the graph into arrays and runs an equivalent A* on them,
+            'ch' preprocesses a contraction hierarchy of the graph (stored next to the graph
+            cache) and answers each query with two small upward searches.
+            WARNING: 'ch' is NOT route-identical to 'networkx' and 'csr'. The hierarchy returns
+            exact shortest paths, while the A* search of the other backends isn't exact: its
+            heuristic is in meters, the edge lengths count waypoints and lane changes cost
+            nothing. On real maps 'ch' may drive other, never longer, routes.
+        :param localization: how locations are matched to the graph. 'map' asks the map for the
+            waypoint of each location, 'index' matches them against a client-side index of the
+            waypoints of the graph edges, without any map query.
+        :param route_cache: if given, RouteCache where trace_route stores its results. Later calls
+            between locations of the same edges and quantized positions along them reuse the
+            stored trace instead of searching again. A cache can be shared by several planners:
+            the keys include the search backend and, while set_lane_cost has modified some
+            edges, the version of the costs of the planner.
+        """
         # 保存采样分辨率，可能用于后续路径规划中距离相关的计算等操作
         self._sampling_resolution = sampling_resolution
         # 保存传入的地图对象，后续会基于此地图进行拓扑结构构建、路径搜索等操作
@@ -102,15 +139,75 @@ class GlobalRoutePlanner:
         self._intersection_end_node = -1
         # 用于记录上一次的决策（类型为RoadOption，可能是不同道路行驶选择如直行、转弯等），初始化为RoadOption.VOID
         self._previous_decision = RoadOption.VOID
+        # Whole-route version of _turn_decision, built on first use
+        self._turn_classifier = None  # type: TurnClassifier | None
+
+        if backend not in ('networkx', 'csr', 'ch'):
+            raise ValueError("Unknown route search backend '{}'".format(backend))
+        self._backend = backend
+        if backend == 'ch':
+            print("WARNING: The 'ch' route search backend returns exact shortest paths, "
+                  "which may differ from the routes of the default A* search")
+        # Array-backed copy of the graph used by the 'csr' search backend, compiled on demand
+        self._csr_graph = None  # type: CSRGraph | None
+        self._contraction_hierarchy = None  # type: ContractionHierarchy | None
+
+        if localization not in ('map', 'index'):
+            raise ValueError("Unknown localization mode '{}'".format(localization))
+        self._localization = localization
+        # Client-side index of the edge waypoints, built on first use
+        self._localization_index = None  # type: LocalizationIndex | None
 
-        # 构建拓扑结构，这是初始化过程中进行的一系列准备工作之一
-        self._build_topology()
-        # 基于拓扑结构构建图，用于后续的路径搜索等操作
-        self._build_graph()
-        # 查找图中松散的端点（可能是孤立的节点等情况）并进行相应处理
-        self._find_loose_ends()
-        # 处理车道变更相关的连接情况
-        self._lane_change_link()
+        self._route_cache = route_cache
+
+        # Lengths of the CSR edges before any call to set_lane_cost, None while unmodified
+        self._base_lengths = None  # type: np.ndarray | None
+        # Version of the edge costs, changed by every call to set_lane_cost
+        self._cost_version = 0
+        # Incremental searches of the DynamicRoutes, repaired when edge costs change
+        self._searches = weakref.WeakSet()
+
+        self._cache_dir = cache_dir
+        if not self._load_graph_cache():
+            # 构建拓扑结构，这是初始化过程中进行的一系列准备工作之一
+            self._build_topology()
+            # 基于拓扑结构构建图，用于后续的路径搜索等操作
+            self._build_graph()
+            # 查找图中松散的端点（可能是孤立的节点等情况）并进行相应处理
+            self._find_loose_ends()
+            # 处理车道变更相关的连接情况
+            self._lane_change_link()
+
+            self._save_graph_cache()
+
+    def _load_graph_cache(self):
+        # type: () -> bool
+        """
+        Loads the graph, id_map and road_id_to_edge tables from the cache folder, if any.
+        On success the topology isn't built, and the waypoints of the edges are only
+        requested to the map when a route needs them.
+        """
+        if self._cache_dir is None:
+            return False
+        path = graph_cache.graph_cache_path(self._cache_dir, self._wmap, self._sampling_resolution)
+        cached = graph_cache.load_graph(path, self._wmap, self._sampling_resolution)
+        if cached is None:
+            return False
+        self._graph, self._id_map, self._road_id_to_edge = cached
+        return True
+
+    def _save_graph_cache(self):
+        """
+        Stores the graph in the cache folder, if any
+        """
+        if self._cache_dir is None:
+            return
+        path = graph_cache.graph_cache_path(self._cache_dir, self._wmap, self._sampling_resolution)
+        try:
+            graph_cache.save_graph(
+                path, self._graph, self._id_map, self._road_id_to_edge, self._sampling_resolution)
+        except (IOError, OSError) as error:
+            print("WARNING: Couldn't save the route planner graph cache: {}".format(error))
 
     # 用于追踪从起点到终点的路线，返回包含路点和道路选项的元组列表
     def trace_route(self, origin, destination):
@@ -119,19 +216,162 @@ class GlobalRoutePlanner:
         This method returns list of (carla.Waypoint, RoadOption)
         from origin to destination
         """
-        # 用于存储最终的路线追踪结果，初始为空列表，元素类型为包含路点和道路选项的元组
-        route_trace = []  # type: list[tuple[carla.Waypoint, RoadOption]]
+        key = None
+        if self._route_cache is not None:
+            key = self._route_cache_key(origin, destination)
+            if key is not None:
+                route_trace = self._route_cache.get(key)
+                if route_trace is not None:
+                    return route_trace
+
         # 通过路径搜索方法获取从起点到终点的路径（以节点编号等形式表示的序列）
         route = self._path_search(origin, destination)
+        route_trace = self._route_to_trace(route, origin, destination)
+        if key is not None:
+            self._route_cache.put(key, route_trace)
+        return route_trace
+
+    def trace_route_compact(self, origin, destination):
+        # type: (carla.Location, carla.Location) -> RouteTrace
+        """
+        Same route as trace_route, returned as a RouteTrace. It keeps the route in a few
+        arrays instead of one waypoint per point, and can be given to
+        LocalPlanner.set_global_plan or sent to other processes.
+        """
+        return RouteTrace.from_list(self.trace_route(origin, destination), self._wmap)
+
+    def _route_cache_key(self, origin, destination):
+        # type: (carla.Location, carla.Location) -> tuple | None
+        """
+        Key of the route between two locations in the route cache: the map, the search
+        backend, the version of the edge costs if they are modified, the edges the locations
+        are on, and their quantized positions along those edges.
+        Returns None if a location isn't on the graph.
+        """
+        cost_version = self._cost_version if self._costs_modified() else 0
+        key = [self._wmap.name, self._sampling_resolution, self._backend, cost_version]
+        step = max(self._route_cache.quantization / self._sampling_resolution, 1.0)
+        for location in (origin, destination):
+            edge, vertex = self._localize_on_edge(location)
+            if edge is None:
+                return None
+            key.extend((edge, int(vertex // step)))
+        return tuple(key)
+
+    def _localize_on_edge(self, location):
+        # type: (carla.Location) -> tuple[tuple[int, int] | None, int]
+        """
+        Returns the edge a location is on, and the index of its closest waypoint among
+        the entry, path and exit waypoints of the edge
+        """
+        xyz = (location.x, location.y, location.z)
+        if self._localization == 'index':
+            index = self.get_localization_index()
+            edges, vertices, _ = index.query([xyz])
+            if edges[0] < 0:
+                return None, -1
+            return index.edges[edges[0]], int(vertices[0])
+        edge = self._localize(location)
+        if edge is None or not self._graph.has_edge(*edge):
+            return None, -1
+        coordinates = np.array(graph_cache.edge_polyline(self._graph.edges[edge]))
+        return edge, LocalizationIndex.closest_vertex(coordinates, xyz)
+
+    def get_route_cache(self):
+        # type: () -> RouteCache | None
+        """
+        Returns the route cache of the planner, if any, to read its counters
+        """
+        return self._route_cache
+
+    def trace_routes(self, origins, destinations, processes=None):
+        # type: (list[carla.Location], list[carla.Location], int | None) -> RouteBatch
+        """
+        Computes the routes between every origin and every destination. Each location is
+        localized once and a single one-to-many search is run per origin, over the
+        array-backed graph. Only node paths and lengths are computed, the waypoint traces
+        are built by the returned RouteBatch when asked for.
+
+        Routes are shortest paths of the graph, which may differ from the ones of
+        trace_route when its A* heuristic overestimates the remaining length.
+
+            :param origins (list of carla.Location): start locations
+            :param destinations (list of carla.Location): end locations
+            :param processes (int): number of worker processes to spread the searches over
+            :return: RouteBatch
+        """
+        origin_edges = self._localize_many(origins)
+        destination_edges = self._localize_many(destinations)
+
+        sources = sorted(set(edge[0] for edge in origin_edges if edge is not None))
+        targets = sorted(set(edge[0] for edge in destination_edges if edge is not None))
+        lengths = np.full((len(origins), len(destinations)), np.inf)
+        routes = [[None] * len(destinations) for _ in origins]
+        if not sources or not targets:
+            return RouteBatch(self, origins, destinations, lengths, routes)
+
+        node_lengths, node_paths = self.get_csr_graph().many_to_many(sources, targets, processes)
+        source_row = {node: i for i, node in enumerate(sources)}
+        target_column = {node: j for j, node in enumerate(targets)}
+
+        for i, start in enumerate(origin_edges):
+            if start is None:
+                continue
+            for j, end in enumerate(destination_edges):
+                if end is None:
+                    continue
+                row, column = source_row[start[0]], target_column[end[0]]
+                path = node_paths[row][column]
+                if path is None:
+                    continue
+                # As in _path_search, the route ends with the exit node of the destination edge
+                end_length = self._destination_length(end)
+                if end_length == float('inf'):
+                    continue
+                lengths[i, j] = node_lengths[row, column] + end_length
+                routes[i][j] = path + [end[1]]
+
+        return RouteBatch(self, origins, destinations, lengths, routes)
+
+    def distance_matrix(self, origins, destinations, processes=None):
+        # type: (list[carla.Location], list[carla.Location], int | None) -> np.ndarray
+        """
+        Returns the (len(origins), len(destinations)) matrix of route lengths, in units
+        of the 'length' edge attribute, with infinity for unreachable pairs.
+        See trace_routes for the parameters.
+
+        The length of a route is the one of its node path, which ends with the exit node of
+        the destination edge: it goes from the entry of the origin edge to the exit of the
+        destination edge. A blocked destination edge can't be reached.
+        """
+        return self.trace_routes(origins, destinations, processes).lengths
+
+    def _destination_length(self, end):
+        # type: (tuple[int, int]) -> float
+        """
+        Length of the destination edge, added to the routes as they end with its exit node
+        """
+        return self._graph.edges[end]['length'] if self._graph.has_edge(*end) else 0
+
+    def _route_to_trace(self, route, origin, destination):
+        # type: (list[int], carla.Location, carla.Location) -> list[tuple[carla.Waypoint, RoadOption]]
+        """
+        Converts a route given as graph nodes into a list of (carla.Waypoint, RoadOption)
+        from origin to destination
+        """
+        # 用于存储最终的路线追踪结果，初始为空列表，元素类型为包含路点和道路选项的元组
+        route_trace = []  # type: list[tuple[carla.Waypoint, RoadOption]]
         # 获取起点对应的路点信息
-        current_waypoint = self._wmap.get_waypoint(origin)
+        current_waypoint = self._waypoint_at(origin)
         # 获取终点对应的路点信息
-        destination_waypoint = self._wmap.get_waypoint(destination)
+        destination_waypoint = self._waypoint_at(destination)
+        # 一次性计算整条路线每个索引的转向决策，与逐个调用_turn_decision的结果相同
+        decisions = self._turn_decisions(route)
 
         # 遍历路径中的每一段（除了最后一段，因为是到终点了）
         for i in range(len(route) - 1):
             # 根据当前路径段的索引等信息确定道路选项（比如该转弯还是直行等决策）
-            road_option = self._turn_decision(i, route)
+            road_option = decisions[i]
             # 获取当前路径段对应的边信息（类型为EdgeDict，包含边的各种属性）
             edge = self._graph.edges[route[i], route[i + 1]]  # type: EdgeDict
             path = []  # type: list[carla.Waypoint]
@@ -149,7 +389,7 @@ class GlobalRoutePlanner:
                 # 如果下一段边的路径列表不为空（即存在路点路径）
                 if next_edge['path']:
                     # 在该路径列表中查找与当前路点距离最近的路点索引
-                    closest_index = self._find_closest_in_list(current_waypoint, next_edge['path'])
+                    closest_index = self._find_closest_in_edge(current_waypoint, (n1, n2), next_edge['path'])
                     # 对索引进行调整，限制最大索引值（防止越界等情况），这里加5可能是适当扩展范围等考虑
                     closest_index = min(len(next_edge['path']) - 1, closest_index + 5)
                     # 更新当前路点为下一段边路径中调整后的最近路点
@@ -164,7 +404,7 @@ class GlobalRoutePlanner:
                 # 如果边的类型是车道跟随或者无效类型，则进行以下操作
                 path = path + [edge['entry_waypoint']] + edge['path'] + [edge['exit_waypoint']]
                 # 在完整的路径中查找与当前路点距离最近的路点索引
-                closest_index = self._find_closest_in_list(current_waypoint, path)
+                closest_index = self._find_closest_in_edge(current_waypoint, (route[i], route[i + 1]), path)
                 # 遍历从最近路点开始的后续路点
                 for waypoint in path[closest_index:]:
                     # 更新当前路点为遍历到的路点
@@ -180,7 +420,8 @@ class GlobalRoutePlanner:
                     elif len(
                             route) - i <= 2 and current_waypoint.road_id == destination_waypoint.road_id and current_waypoint.section_id == destination_waypoint.section_id and current_waypoint.lane_id == destination_waypoint.lane_id:
                         # 查找终点路点在当前路径中的最近索引
-                        destination_index = self._find_closest_in_list(destination_waypoint, path)
+                        destination_index = self._find_closest_in_edge(
+                            destination_waypoint, (route[i], route[i + 1]), path)
                         if closest_index > destination_index:
                             break
 
@@ -201,9 +442,11 @@ class GlobalRoutePlanner:
         #创建一个空列表 用于存储最终构建的拓扑结构信息
         self._topology = []
         # Retrieving waypoints to construct a detailed topology
+        # The paths of all the segments come from one bulk sampling of the map,
+        # instead of a chain of Waypoint.next() calls per segment
+        sampler = TopologySampler(self._wmap, self._sampling_resolution)
         #从地图中获取拓扑信息
-        for segment in self._wmap.get_topology():
-            wp1, wp2 = segment[0], segment[1]
+        for wp1, wp2, path in sampler.segments():
             #获取路点的位置并进行舍入（舍入的目的是为了后续避免点数精度问题，减少一定的误差）
             l1, l2 = wp1.transform.location, wp2.transform.location
             # 舍入以避免浮点不精确
@@ -215,33 +458,9 @@ class GlobalRoutePlanner:
             seg_dict['entry'], seg_dict['exit'] = wp1, wp2
             #将入口和出口路点的坐标以元组坐标形式添加到字典中
             seg_dict['entryxyz'], seg_dict['exitxyz'] = (x1, y1, z1), (x2, y2, z2)
-            #创建一个空的路径列表 用于存储道路段中入口到出口的路点列表
-            seg_dict['path'] = []
-            #关于endloc以及路径构建逻辑
-            endloc = wp2.transform.location
-            #计算两地之间的距离进行比较
-            if wp1.transform.location.distance(endloc) > self._sampling_resolution:
-                #如果满足上述距离条件 获取wp1的下一点
-                w = wp1.next(self._sampling_resolution)[0]
-                #只要w.transform.location 和endloc两地间距离大于self._sampling_resolution就会进入该while循环
-                while w.transform.location.distance(endloc) > self._sampling_resolution:
-                    #不断构建路径
-                    seg_dict['path'].append(w)
-                    #获取w的下一个点序列
-                    next_ws = w.next(self._sampling_resolution)
-                    #如果next_ws的长度为0则跳出该while循环
-                    if len(next_ws) == 0:
-                        break
-                    w = next_ws[0]
-            else:
-                #如果最初距离不大于self._sampling_resolution则进入else部分 首先获取wp1的下一个点序列next_wps
-                next_wps = wp1.next(self._sampling_resolution)
-                #若next_wps的长度为0则跳过当前循环
-                if len(next_wps) == 0:
-                    continue
-                    #如果next_wps不为空 就next_wps[0]将添加到seg_dict['path']字典中
-                seg_dict['path'].append(next_wps[0])
-                #将字典添加到拓扑函数中
+            #入口到出口之间的路点列表，间隔为采样分辨率
+            seg_dict['path'] = path
+            #将字典添加到拓扑函数中
             self._topology.append(seg_dict)
 
     #定义一个_build_graph函数 函数功能是构建一个network有向图来表示拓扑结构同时还构建了两个字典用于映射相关信息
@@ -451,6 +670,8 @@ class GlobalRoutePlanner:
         This function finds the road segment that a given location
         is part of, returning the edge it belongs to
         """
+        if self._localization == 'index':
+            return self._localize_many([location])[0]
         #使用self._wmap（可能是地图对象）的get_waypoint方法获取给定位置的路点（waypoint）
         waypoint = self._wmap.get_waypoint(location)
         #初始化edge变量为None，它可能最终存储一个包含两个整数的元组
@@ -466,6 +687,199 @@ class GlobalRoutePlanner:
             pass
         return edge
 
+    def _localize_many(self, locations):
+        # type: (list[carla.Location]) -> list[None | tuple[int, int]]
+        """
+        Localizes a list of locations, querying the map only once per distinct location.
+        With the 'index' localization all of them are matched with a single index query.
+        """
+        if self._localization == 'index':
+            index = self.get_localization_index()
+            edges, _, _ = index.query([[l.x, l.y, l.z] for l in locations])
+            return [index.edges[i] if i >= 0 else None for i in edges]
+
+        edges = {}
+        result = []
+        for location in locations:
+            key = (location.x, location.y, location.z)
+            if key not in edges:
+                edges[key] = self._localize(location)
+            result.append(edges[key])
+        return result
+
+    def get_localization_index(self):
+        # type: () -> LocalizationIndex
+        """
+        Returns the client-side localization index of the lanes of the graph, building it
+        on first use from the waypoints of the edges referenced by road_id_to_edge
+        """
+        if self._localization_index is None:
+            edges, lane_keys, polylines = [], [], []
+            for road_id, sections in self._road_id_to_edge.items():
+                for section_id, lanes in sections.items():
+                    for lane_id, edge in lanes.items():
+                        if self._graph.has_edge(*edge):
+                            edges.append(edge)
+                            lane_keys.append((road_id, section_id, lane_id))
+                            polylines.append(graph_cache.edge_polyline(self._graph.edges[edge]))
+            self._localization_index = LocalizationIndex(edges, lane_keys, polylines)
+        return self._localization_index
+
+    def _waypoint_at(self, location):
+        # type: (carla.Location) -> carla.Waypoint
+        """
+        Returns the waypoint of a location. With the 'index' localization, this is the
+        closest waypoint of the lane the location is matched to.
+        """
+        if self._localization != 'index':
+            return self._wmap.get_waypoint(location)
+        index = self.get_localization_index()
+        edges, vertices, _ = index.query([[location.x, location.y, location.z]])
+        edge = self._graph.edges[index.edges[edges[0]]]
+        polyline = [edge['entry_waypoint']] + edge['path'] + [edge['exit_waypoint']]
+        return polyline[vertices[0]]
+
+    def get_csr_graph(self):
+        # type: () -> CSRGraph
+        """
+        Returns the array-backed version of the graph, compiling it on first use
+        """
+        if self._csr_graph is None:
+            self._csr_graph = CSRGraph.from_networkx(self._graph)
+        return self._csr_graph
+
+    def get_contraction_hierarchy(self):
+        # type: () -> ContractionHierarchy
+        """
+        Returns the contraction hierarchy of the graph. It is loaded from the cache folder
+        if a hierarchy of the same graph is stored there, and preprocessed (and stored) otherwise.
+        """
+        if self._contraction_hierarchy is not None:
+            return self._contraction_hierarchy
+
+        csr_graph = self.get_csr_graph()
+        path = None
+        if self._cache_dir is not None:
+            path = graph_cache.graph_cache_path(
+                self._cache_dir, self._wmap, self._sampling_resolution, suffix='ch.npz')
+            if os.path.isfile(path):
+                hierarchy = ContractionHierarchy.load(path)
+                if hierarchy.matches(csr_graph):
+                    self._contraction_hierarchy = hierarchy
+                    return hierarchy
+
+        self._contraction_hierarchy = ContractionHierarchy.build(csr_graph)
+        if path is not None:
+            try:
+                self._contraction_hierarchy.save(path)
+            except (IOError, OSError) as error:
+                print("WARNING: Couldn't save the contraction hierarchy: {}".format(error))
+        return self._contraction_hierarchy
+
+    def set_lane_cost(self, road_id, section_id=None, lane_id=None, factor=1.0):
+        # type: (int, int | None, int | None, float) -> list[tuple[int, int]]
+        """
+        Scales the length of the graph edges of a road, of one of its sections or of a single
+        lane, found through road_id_to_edge. A factor of 1 restores the original length and an
+        infinite factor blocks the edges. Routes traced afterwards take the new costs into
+        account and the DynamicRoutes of the planner are repaired on their next request. The
+        routes stored in the route cache before the change aren't returned, as the cache keys
+        include the version of the costs. While costs are modified, the 'ch' backend falls back
+        to the CSR search, as the hierarchy is built for the original lengths.
+
+            :param road_id (int): road of the edges
+            :param section_id (int): section of the edges, None for all of them
+            :param lane_id (int): lane of the edges, None for all of them
+            :param factor (float): scale applied to the original length
+            :return: list of the modified (n1, n2) edges
+        """
+        csr_graph = self.get_csr_graph()
+        if self._base_lengths is None:
+            self._base_lengths = csr_graph.lengths.copy()
+
+        edges, changed = [], []
+        for section, lanes in self._road_id_to_edge.get(road_id, {}).items():
+            if section_id is not None and section != section_id:
+                continue
+            for lane, (n1, n2) in lanes.items():
+                if lane_id is not None and lane != lane_id:
+                    continue
+                e = csr_graph.edge_index(n1, n2) if self._graph.has_edge(n1, n2) else -1
+                if e < 0:
+                    continue
+                length = float('inf') if factor == float('inf') else self._base_lengths[e] * factor
+                csr_graph.lengths[e] = length
+                self._graph.edges[n1, n2]['length'] = length
+                edges.append((n1, n2))
+                changed.append(e)
+
+        self._edge_costs_changed(changed)
+        return edges
+
+    def block_lane(self, road_id, section_id=None, lane_id=None):
+        # type: (int, int | None, int | None) -> list[tuple[int, int]]
+        """
+        Removes a road, section or lane from the routes, see set_lane_cost
+        """
+        return self.set_lane_cost(road_id, section_id, lane_id, float('inf'))
+
+    def reset_lane_costs(self):
+        """
+        Restores the original length of every edge modified by set_lane_cost
+        """
+        if self._base_lengths is None:
+            return
+        csr_graph = self.get_csr_graph()
+        changed = np.nonzero(csr_graph.lengths != self._base_lengths)[0].tolist()
+        node_ids = csr_graph.node_ids.tolist()
+        _, _, sources = csr_graph.edge_lists()
+        for e in changed:
+            csr_graph.lengths[e] = self._base_lengths[e]
+            n1, n2 = node_ids[sources[e]], node_ids[csr_graph.indices[e]]
+            self._graph.edges[n1, n2]['length'] = self._base_lengths[e]
+        self._base_lengths = None
+        self._edge_costs_changed(changed)
+
+    def _edge_costs_changed(self, changed):
+        # type: (list[int]) -> None
+        """
+        Propagates a change of the CSR edge lengths to the derived tables and searches
+        """
+        if not changed:
+            return
+        self._csr_graph.invalidate()
+        for search in list(self._searches):
+            search.update_edges(changed)
+        self._cost_version = next(_cost_versions)
+
+    def _costs_modified(self):
+        # type: () -> bool
+        """Whether some edges don't have their original length"""
+        return self._base_lengths is not None and \
+            not np.array_equal(self._csr_graph.lengths, self._base_lengths)
+
+    def _edge_weight(self, n1, n2, data):
+        """networkx weight function that hides the blocked edges"""
+        length = data['length']
+        return None if length == float('inf') else length
+
+    def plan_route(self, origin, destination):
+        # type: (carla.Location, carla.Location) -> DynamicRoute
+        """
+        Returns a DynamicRoute towards destination. Its search state is kept, so that the
+        route can be asked again from later positions of the vehicle and after edge cost
+        changes, repairing only the part of the search affected by the changes.
+
+            :param origin (carla.Location): start location, to run the first search
+            :param destination (carla.Location): end location
+        """
+        end = self._localize(destination)
+        search = IncrementalSearch(self.get_csr_graph(), self._csr_graph.index(end[0]))
+        self._searches.add(search)
+        route = DynamicRoute(self, destination, end, search)
+        route.route(origin)
+        return route
+
     def _distance_heuristic(self, n1, n2):
         """
         Distance heuristic calculator for path searching
@@ -490,9 +904,16 @@ class GlobalRoutePlanner:
         #使用networkx的astar_path函数来寻找最短路径
         #图是self._graph，起点是start[0]，终点是end[0]
         #使用self._distance_heuristic作为启发式函数，边的权重是'length'
-        route = nx.astar_path(
-            self._graph, source=start[0], target=end[0],
-            heuristic=self._distance_heuristic, weight='length')
+        modified = self._costs_modified()
+        if self._backend == 'csr' or (self._backend == 'ch' and modified):
+            route = self.get_csr_graph().astar(start[0], end[0])
+        elif self._backend == 'ch':
+            route = self.get_contraction_hierarchy().query(start[0], end[0])
+        else:
+            route = nx.astar_path(
+                self._graph, source=start[0], target=end[0],
+                heuristic=self._distance_heuristic,
+                weight=self._edge_weight if modified else 'length')
         #将终点的第二个元素添加到路径中（可能是终点的另一个属性）
         route.append(end[1])
         #返回找到的路径
@@ -533,7 +954,7 @@ class GlobalRoutePlanner:
         return last_node, last_intersection_edge
 
     def _turn_decision(self, index, route, threshold=math.radians(35)):
-         """
+        """
         函数功能：
         该方法用于返回路线列表（route）中当前索引（index）位置前后两条边对应的转向决策（RoadOption类型）。
 
@@ -633,8 +1054,21 @@ class GlobalRoutePlanner:
         self._previous_decision = decision
         return decision
 
+    def _turn_decisions(self, route):
+        # type: (list[int]) -> list[RoadOption | None]
+        """
+        Returns the turn decision of every index of the route, as successive calls to
+        _turn_decision would, computing the turns of all the junctions at once
+        """
+        if self._turn_classifier is None:
+            self._turn_classifier = TurnClassifier(self._graph)
+        decisions, previous_decision, self._intersection_end_node = self._turn_classifier.classify(
+            route, self._previous_decision, self._intersection_end_node)
+        self._previous_decision = None if previous_decision is None else RoadOption(previous_decision)
+        return [None if decision is None else RoadOption(decision) for decision in decisions]
+
     def _find_closest_in_list(self, current_waypoint, waypoint_list):
-         """
+        """
         函数功能：
         在给定的路点列表（waypoint_list）中，查找距离当前路点（current_waypoint）最近的路点的索引。
 
@@ -657,3 +1091,98 @@ class GlobalRoutePlanner:
                 closest_index = i
 
         return closest_index
+
+    def _find_closest_in_edge(self, current_waypoint, edge, waypoint_list):
+        # type: (carla.Waypoint, tuple[int, int], list[carla.Waypoint]) -> int
+        """
+        Same as _find_closest_in_list, for the 'path' of an edge or its entry, path
+        and exit waypoints. With the 'index' localization, the distances are computed
+        at once over the coordinates stored by the index.
+        """
+        coordinates = None
+        if self._localization == 'index':
+            coordinates = self.get_localization_index().edge_coordinates(edge)
+        if coordinates is None:
+            return self._find_closest_in_list(current_waypoint, waypoint_list)
+        if len(waypoint_list) == len(coordinates) - 2:
+            # Only the path, without the entry and exit waypoints
+            coordinates = coordinates[1:-1]
+        location = current_waypoint.transform.location
+        return LocalizationIndex.closest_vertex(coordinates, (location.x, location.y, location.z))
+
+
+class RouteBatch(object):
+    """
+    Result of GlobalRoutePlanner.trace_routes. It keeps the routes as graph node paths
+    and builds the (carla.Waypoint, RoadOption) traces only when requested.
+    """
+
+    def __init__(self, planner, origins, destinations, lengths, routes):
+        self._planner = planner
+        self.origins = origins
+        self.destinations = destinations
+        # (len(origins), len(destinations)) array with the length of each route
+        self.lengths = lengths
+        # routes[i][j] is the list of graph nodes of the route, or None if unreachable
+        self.routes = routes
+
+    def route(self, i, j):
+        # type: (int, int) -> list[int] | None
+        """Node path from origin i to destination j, or None if unreachable"""
+        return self.routes[i][j]
+
+    def trace(self, i, j):
+        # type: (int, int) -> list[tuple[carla.Waypoint, RoadOption]]
+        """
+        Builds the list of (carla.Waypoint, RoadOption) from origin i to destination j,
+        as returned by GlobalRoutePlanner.trace_route
+        """
+        route = self.routes[i][j]
+        if route is None:
+            raise nx.NetworkXNoPath("Destination {} not reachable from origin {}".format(j, i))
+        return self._planner._route_to_trace(route, self.origins[i], self.destinations[j])  # pylint: disable=protected-access
+
+
+class DynamicRoute(object):
+    """
+    Route towards a fixed destination, returned by GlobalRoutePlanner.plan_route. It keeps
+    an incremental search that its planner updates when edge costs change, so asking the
+    route again after a change, or from a later position, only repairs the search.
+    """
+
+    def __init__(self, planner, destination, end, search):
+        self._planner = planner
+        self.destination = destination
+        self._end = end
+        self._search = search
+
+    @property
+    def expansions(self):
+        """Number of nodes expanded by the search so far"""
+        return self._search.expansions
+
+    def route(self, origin):
+        # type: (carla.Location) -> list[int]
+        """Node path from a location to the destination"""
+        if self._planner._destination_length(self._end) == float('inf'):  # pylint: disable=protected-access
+            raise nx.NetworkXNoPath("The destination edge {} is blocked".format(self._end))
+        start = self._planner._localize(origin)  # pylint: disable=protected-access
+        return self._search.path(start[0]) + [self._end[1]]
+
+    def distance(self, origin):
+        # type: (carla.Location) -> float
+        """
+        Length of the route from a location, infinity if the destination can't be reached.
+        As in GlobalRoutePlanner.distance_matrix, it includes the destination edge.
+        """
+        start = self._planner._localize(origin)  # pylint: disable=protected-access
+        end_length = self._planner._destination_length(self._end)  # pylint: disable=protected-access
+        return self._search.distance(self._search.graph.index(start[0])) + end_length
+
+    def trace(self, origin):
+        # type: (carla.Location) -> list[tuple[carla.Waypoint, RoadOption]]
+        """
+        Builds the list of (carla.Waypoint, RoadOption) from a location to the destination,
+        as returned by GlobalRoutePlanner.trace_route
+        """
+        return self._planner._route_to_trace(self.route(origin), origin, self.destination)  # pylint: disable=protected-access
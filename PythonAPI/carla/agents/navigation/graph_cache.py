@@ -0,0 +1,277 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides the on-disk cache used by the GlobalRoutePlanner to skip
+the topology and graph construction of a map it has already processed.
+
+Cache files are keyed by the hash of the OpenDRIVE content of the map plus the
+sampling resolution, the same idea used by the no_rendering_mode example to cache
+its rendered map. Waypoints can't be serialized, so they are stored as
+(road_id, section_id, lane_id, s, x, y, z) keys and only turned back into
+carla.Waypoint objects the first time an edge attribute holding them is read.
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+
+import networkx as nx
+
+import carla
+
+GRAPH_CACHE_VERSION = 3
+
+# Edge attributes holding a single carla.Waypoint. 'path' holds a list of them.
+_WAYPOINT_ATTRIBUTES = ('entry_waypoint', 'exit_waypoint', 'change_waypoint')
+
+# Distance along the road, in meters, that moves a waypoint off the boundary of its lane section
+_SECTION_NUDGE = 0.01
+
+
+def opendrive_hash(wmap):
+    """
+    Returns the sha1 hex digest of the OpenDRIVE content of the map
+
+        :param wmap (carla.Map): map to hash
+    """
+    hash_func = hashlib.sha1()
+    hash_func.update(wmap.to_opendrive().encode("UTF-8"))
+    return str(hash_func.hexdigest())
+
+
+def graph_cache_path(cache_dir, wmap, sampling_resolution, suffix='graph'):
+    """
+    Builds the path of the cache file of a map at a given sampling resolution.
+
+        :param cache_dir (str): folder where the cache files are stored
+        :param wmap (carla.Map): map the graph was built from
+        :param sampling_resolution (float): resolution used to build the graph
+        :param suffix (str): kind of data stored in the file
+    """
+    town = wmap.name.split('/')[-1]
+    filename = "{}_{}_{:g}.{}".format(town, opendrive_hash(wmap), sampling_resolution, suffix)
+    return str(os.path.join(cache_dir, filename))
+
+
+def waypoint_key(waypoint):
+    """
+    Returns the serializable key used to store a waypoint in the cache
+
+        :param waypoint (carla.Waypoint): waypoint to store
+    """
+    location = waypoint.transform.location
+    return (waypoint.road_id, waypoint.section_id, waypoint.lane_id, waypoint.s,
+            location.x, location.y, location.z)
+
+
+def key_location(key):
+    """
+    Returns the (x, y, z) stored in a waypoint key
+
+        :param key (tuple): key built by waypoint_key
+    """
+    return key[4:7]
+
+
+def resolve_waypoint(wmap, key):
+    """
+    Turns a waypoint key back into a carla.Waypoint.
+
+    Waypoints at the boundary of two lane sections, like the exits of the topology, may
+    be rebuilt from their s in the neighbouring section. The route planner looks edges up
+    by road, section and lane, so the rebuilt waypoint has to be in the stored section.
+    Otherwise the stored location is projected onto the map, and s is nudged into the
+    section as a last resort.
+
+        :param wmap (carla.Map): map of the waypoint
+        :param key (tuple): key built by waypoint_key
+    """
+    road_id, section_id, lane_id, s, x, y, z = key
+    candidates = (
+        lambda: wmap.get_waypoint_xodr(road_id, lane_id, s),
+        lambda: wmap.get_waypoint(carla.Location(x=x, y=y, z=z)),
+        lambda: wmap.get_waypoint_xodr(road_id, lane_id, s - _SECTION_NUDGE),
+        lambda: wmap.get_waypoint_xodr(road_id, lane_id, s + _SECTION_NUDGE))
+    first = None
+    for candidate in candidates:
+        waypoint = candidate()
+        if waypoint is None:
+            continue
+        if (waypoint.road_id, waypoint.section_id, waypoint.lane_id) == (road_id, section_id, lane_id):
+            return waypoint
+        if first is None:
+            first = waypoint
+    return first
+
+
+class WaypointResolver(object):
+    """
+    Turns cached waypoint keys back into carla.Waypoint objects with resolve_waypoint.
+    Resolved waypoints are memoized, so the waypoints shared by several edges are only
+    requested once.
+    """
+
+    def __init__(self, wmap):
+        self._wmap = wmap
+        self._waypoints = {}
+
+    def __call__(self, key):
+        waypoint = self._waypoints.get(key)
+        if waypoint is None:
+            waypoint = resolve_waypoint(self._wmap, key)
+            self._waypoints[key] = waypoint
+        return waypoint
+
+
+class LazyEdgeData(dict):
+    """
+    Edge attribute dictionary whose waypoint attributes are materialized on first access.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(LazyEdgeData, self).__init__(*args, **kwargs)
+        self._resolver = None
+        self._pending = {}
+
+    def defer(self, resolver, pending):
+        """
+        Registers the waypoint attributes that have to be resolved on first access
+
+            :param resolver (WaypointResolver): converter from keys to waypoints
+            :param pending (dict): attribute name to waypoint key (or list of keys for 'path')
+        """
+        self._resolver = resolver
+        self._pending = pending
+
+    def __missing__(self, key):
+        if key not in self._pending:
+            raise KeyError(key)
+        stored = self._pending.pop(key)
+        if key == 'path':
+            value = [self._resolver(k) for k in stored]
+        else:
+            value = self._resolver(stored)
+        self[key] = value
+        return value
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._pending
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+
+def edge_polyline(data):
+    """
+    Returns the (x, y, z) of the entry waypoint, the path and the exit waypoint of an edge.
+    Waypoints restored from the cache are read from their keys, without resolving them.
+
+        :param data (dict): attributes of the edge
+    """
+    pending = data._pending if isinstance(data, LazyEdgeData) else {}  # pylint: disable=protected-access
+
+    def locations(name):
+        if name in pending:
+            keys = pending[name] if name == 'path' else [pending[name]]
+            return [key_location(key) for key in keys]
+        waypoints = data[name] if name == 'path' else [data[name]]
+        return [(w.transform.location.x, w.transform.location.y, w.transform.location.z)
+                for w in waypoints]
+
+    return locations('entry_waypoint') + locations('path') + locations('exit_waypoint')
+
+
+class CachedRouteGraph(nx.DiGraph):
+    """
+    networkx.DiGraph restored from the graph cache
+    """
+    edge_attr_dict_factory = LazyEdgeData
+
+
+def save_graph(path, graph, id_map, road_id_to_edge, sampling_resolution):
+    """
+    Serializes the route planner tables to disk. The file is written under a temporary
+    name and then moved, so concurrent processes never read a partially written cache.
+
+        :param path (str): destination file
+        :param graph (networkx.DiGraph): topology graph of the route planner
+        :param id_map (dict): mapping from (x,y,z) to node id
+        :param road_id_to_edge (dict): map from road id to edge in the graph
+        :param sampling_resolution (float): resolution used to build the graph
+    """
+    nodes = [(node, data['vertex']) for node, data in graph.nodes(data=True)]
+    edges = []
+    for n1, n2, data in graph.edges(data=True):
+        attributes, waypoints = {}, {}
+        for name, value in data.items():
+            if name == 'path':
+                waypoints[name] = [waypoint_key(w) for w in value]
+            elif name in _WAYPOINT_ATTRIBUTES:
+                waypoints[name] = waypoint_key(value)
+            else:
+                attributes[name] = value
+        edges.append((n1, n2, attributes, waypoints))
+
+    content = {
+        'version': GRAPH_CACHE_VERSION,
+        'sampling_resolution': sampling_resolution,
+        'nodes': nodes,
+        'edges': edges,
+        'id_map': id_map,
+        'road_id_to_edge': road_id_to_edge
+    }
+
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    # Remove the files of previous versions of the same map and resolution
+    town, _, resolution_suffix = os.path.basename(path).rsplit('_', 2)
+    for old_path in glob.glob(os.path.join(dirname, town + '_*_' + resolution_suffix)):
+        if old_path != path and os.path.basename(old_path).rsplit('_', 2)[0] == town:
+            os.remove(old_path)
+
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, 'wb') as cache_file:
+        pickle.dump(content, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_graph(path, wmap, sampling_resolution):
+    """
+    Loads the route planner tables from disk, without querying the map.
+    Returns None if the file doesn't exist or can't be used.
+
+        :param path (str): cache file
+        :param wmap (carla.Map): map used to lazily rebuild the waypoints
+        :param sampling_resolution (float): resolution the graph must have been built with
+        :return: tuple of (graph, id_map, road_id_to_edge)
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as cache_file:
+            content = pickle.load(cache_file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+    if content.get('version') != GRAPH_CACHE_VERSION \
+            or content.get('sampling_resolution') != sampling_resolution:
+        return None
+
+    resolver = WaypointResolver(wmap)
+    graph = CachedRouteGraph()
+    for node, vertex in content['nodes']:
+        graph.add_node(node, vertex=vertex)
+    for n1, n2, attributes, waypoints in content['edges']:
+        graph.add_edge(n1, n2, **attributes)
+        graph.edges[n1, n2].defer(resolver, waypoints)
+
+    return graph, content['id_map'], content['road_id_to_edge']
@@ -6,11 +6,11 @@
 """ This module contains a local planner to perform low-level waypoint following based on PID controllers. """# 查看许可协议链接
 
 from enum import IntEnum
-from collections import deque
 import random
 
 import carla
 from agents.navigation.controller import VehiclePIDController
+from agents.navigation.route_corridor import WaypointQueue
 from agents.tools.misc import draw_waypoints, get_speed
 
 
@@ -59,6 +59,8 @@ class LocalPlanner:
             max_brake: maximum brake applied to the vehicle
             max_steering: maximum steering applied to the vehicle
             offset: distance between the route waypoints and the center of the lane
+            successor_cache: SuccessorCache, usually shared by several planners, serving
+                the successors of the random roaming waypoints from memory
         :param map_inst: carla.Map instance to avoid the expensive call of getting it.
         """
                
@@ -83,7 +85,9 @@ class LocalPlanner:
         self.target_waypoint = None
         self.target_road_option = None
 
-        self._waypoints_queue = deque(maxlen=10000)
+        self._waypoints_queue = WaypointQueue(maxlen=10000)
+        # Geometry of the queued waypoints, updated together with the queue 与路点队列同步更新的路线走廊
+        self._corridor = self._waypoints_queue.corridor
         self._min_waypoint_queue_length = 100
         self._stop_waypoint_creation = False
 
@@ -100,6 +104,7 @@ class LocalPlanner:
         self._base_min_distance = 3.0
         self._distance_ratio = 0.5
         self._follow_speed_limits = False
+        self._successor_cache = None
 
         # Overload parameters 根据传入字典重载参数
         if opt_dict:
@@ -127,6 +132,8 @@ class LocalPlanner:
                 self._distance_ratio = opt_dict['distance_ratio']
             if 'follow_speed_limits' in opt_dict:
                 self._follow_speed_limits = opt_dict['follow_speed_limits']
+            if 'successor_cache' in opt_dict:
+                self._successor_cache = opt_dict['successor_cache']
 
         # initializing controller 初始化控制器
         self._init_controller()
@@ -187,21 +194,22 @@ class LocalPlanner:
 
         for _ in range(k):
             last_waypoint = self._waypoints_queue[-1][0]
-            next_waypoints = list(last_waypoint.next(self._sampling_radius))
+            if self._successor_cache is None:
+                successors = _retrieve_successors(last_waypoint, self._sampling_radius)
+            else:
+                successors = self._successor_cache.successors(
+                    last_waypoint, self._sampling_radius, _retrieve_successors)
 
-            if len(next_waypoints) == 0:
+            if len(successors) == 0:
                 break
-            elif len(next_waypoints) == 1:
+            elif len(successors) == 1:
                 # only one option available ==> lanefollowing
-                next_waypoint = next_waypoints[0]
-                road_option = RoadOption.LANEFOLLOW
+                next_waypoint, road_option = successors[0]
             else:
                 # random choice between the possible options
-                road_options_list = _retrieve_options(
-                    next_waypoints, last_waypoint)
+                road_options_list = [option for _, option in successors]
                 road_option = random.choice(road_options_list)
-                next_waypoint = next_waypoints[road_options_list.index(
-                    road_option)]
+                next_waypoint = successors[road_options_list.index(road_option)][0]
 
             self._waypoints_queue.append((next_waypoint, road_option))
 
@@ -222,13 +230,10 @@ class LocalPlanner:
         if clean_queue:
             self._waypoints_queue.clear()
 
-        # Remake the waypoints queue if the new plan has a higher length than the queue
+        # Make room in the waypoints queue if the new plan has a higher length than the queue
         new_plan_length = len(current_plan) + len(self._waypoints_queue)
         if new_plan_length > self._waypoints_queue.maxlen:
-            new_waypoint_queue = deque(maxlen=new_plan_length)
-            for wp in self._waypoints_queue:
-                new_waypoint_queue.append(wp)
-            self._waypoints_queue = new_waypoint_queue
+            self._waypoints_queue.maxlen = new_plan_length
 
         for elem in current_plan:
             self._waypoints_queue.append(elem)
@@ -264,27 +269,10 @@ class LocalPlanner:
         #设置最小距离
         self._min_distance = self._base_min_distance + self._distance_ratio * vehicle_speed
 
-        num_waypoint_removed = 0
-        #遍历路点队列
-        for waypoint, _ in self._waypoints_queue:
-
-            #判断队列中的每一个路点
-            if len(self._waypoints_queue) - num_waypoint_removed == 1:
-                min_distance = 1  # Don't remove the last waypoint until very close by
-            else:
-                min_distance = self._min_distance
-
-            if veh_location.distance(waypoint.transform.location) < min_distance:
-                num_waypoint_removed += 1
-            else:
-                break
-
-        #条件判断
-        if num_waypoint_removed > 0:
-            #根据要移出的路点数量进行循环操作
-            for _ in range(num_waypoint_removed):
-                #每次循环都会移动一个队首元素
-                self._waypoints_queue.popleft()
+        #移除队首所有距离小于最小距离的路点，一次数组运算完成
+        # Don't remove the last waypoint until very close by
+        self._waypoints_queue.purge((veh_location.x, veh_location.y, veh_location.z),
+                                    self._min_distance, last_min_distance=1)
 
         #根据是否存在waypoint来决定车辆的控制方式
         # Get the target waypoint and move using the PID controllers. Stop if no target waypoint
@@ -328,6 +316,10 @@ class LocalPlanner:
         """Returns the current plan of the local planner  返回本地规划器当前的计划（路点队列）"""
         return self._waypoints_queue
 
+    def get_corridor(self):
+        """Returns the RouteCorridor of the current plan  返回与当前计划同步的路线走廊"""
+        return self._corridor
+
     def done(self):
         """
         Returns whether or not the planner has finished
@@ -338,6 +330,23 @@ class LocalPlanner:
         return len(self._waypoints_queue) == 0
 
 
+def _retrieve_successors(waypoint, distance):
+    """
+    Compute the waypoints at a distance ahead of a waypoint, with the type of connection to each of them.
+    A single successor is a lane follow, several ones are classified by _retrieve_options.
+
+    :param waypoint: current active waypoint
+    :param distance: distance to the successors, in meters
+    :return: list of (carla.Waypoint, RoadOption)
+    :param waypoint: 当前活动路点，计算其前方指定距离处的后继路点及连接类型
+    :param distance: 后继路点的距离（单位：米）
+    """
+    next_waypoints = list(waypoint.next(distance))
+    if len(next_waypoints) == 1:
+        return [(next_waypoints[0], RoadOption.LANEFOLLOW)]
+    return list(zip(next_waypoints, _retrieve_options(next_waypoints, waypoint)))
+
+
 def _retrieve_options(list_waypoints, current_waypoint):
     """
     Compute the type of connection between the current active waypoint and the multiple waypoints present in
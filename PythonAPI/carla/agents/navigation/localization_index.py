@@ -0,0 +1,134 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides the client-side localization index of the GlobalRoutePlanner.
+
+The dense waypoints of every lane segment of the route graph are stored as polylines
+in flat arrays, and their segments are hashed into a uniform grid. A location is then
+matched to the closest polyline segment, which gives the lane, the graph edge and the
+closest waypoint of the edge without querying the map.
+"""
+
+import numpy as np
+
+from agents.tools.spatial_index import UniformGrid
+
+
+class LocalizationIndex(object):
+    """
+    Maps locations to the lanes of the route graph.
+
+    Distances are measured in 3D, with the height difference scaled by z_weight, so that
+    a location under an overpass is matched to its own road and not to the one above.
+    """
+
+    def __init__(self, edges, lane_keys, polylines, z_weight=2.0, cell_size=10.0):
+        """
+        :param edges: list of the (n1, n2) graph edges of the lanes
+        :param lane_keys: list of the (road_id, section_id, lane_id) of each edge
+        :param polylines: list of (K, 3) arrays, the entry, path and exit locations of each edge
+        :param z_weight: scale of the height differences in the distances
+        :param cell_size: matches closer than this are found with a single grid lookup,
+            further ones fall back to a full scan
+        """
+        self.edges = list(edges)
+        self.lane_keys = list(lane_keys)
+        self.z_weight = float(z_weight)
+        self._edge_index = {edge: i for i, edge in enumerate(self.edges)}
+
+        polylines = [np.asarray(p, dtype=np.float64).reshape(-1, 3) for p in polylines]
+        sizes = np.array([len(p) for p in polylines], dtype=np.int64)
+        self._offsets = np.concatenate(([0], np.cumsum(sizes)))
+        self.points = np.concatenate(polylines) if polylines else np.zeros((0, 3))
+        self._point_edge = np.repeat(np.arange(len(polylines)), sizes)
+
+        # Segments join consecutive points of the same polyline
+        starts = np.arange(max(len(self.points) - 1, 0))
+        self._segments = starts[self._point_edge[starts] == self._point_edge[starts + 1]]
+        scale = np.array([1.0, 1.0, self.z_weight])
+        self._segment_a = self.points[self._segments] * scale
+        self._segment_ab = self.points[self._segments + 1] * scale - self._segment_a
+        self._segment_ab2 = np.maximum(np.einsum('ij,ij->i', self._segment_ab, self._segment_ab), 1e-12)
+
+        # A segment at distance d has its middle point at most d + half its length away
+        half_length = 0.5 * np.hypot(self._segment_ab[:, 0], self._segment_ab[:, 1])
+        self._exact_distance = float(cell_size)
+        self._grid = UniformGrid(
+            self._segment_a[:, :2] + 0.5 * self._segment_ab[:, :2],
+            cell_size + (half_length.max() if len(half_length) else 0.0))
+
+    def __len__(self):
+        return len(self.edges)
+
+    def edge_coordinates(self, edge):
+        # type: (tuple[int, int]) -> np.ndarray | None
+        """
+        Returns the (K, 3) entry, path and exit locations of an edge, or None if it isn't indexed
+        """
+        i = self._edge_index.get(edge)
+        if i is None:
+            return None
+        return self.points[self._offsets[i]:self._offsets[i + 1]]
+
+    @staticmethod
+    def closest_vertex(coordinates, location):
+        """
+        Index of the point closest to a location, the first one in case of ties,
+        as GlobalRoutePlanner._find_closest_in_list
+
+            :param coordinates: (K, 3) array of points
+            :param location: (x, y, z) position
+        """
+        difference = coordinates - np.asarray(location, dtype=np.float64)
+        return int(np.argmin(np.einsum('ij,ij->i', difference, difference)))
+
+    def query(self, locations):
+        """
+        Matches locations to their closest lane segment.
+
+            :param locations: (Q, 3) array of positions
+            :return: tuple of (Q,) arrays: index of the matched edge in self.edges, index of
+                the closest point in the coordinates of that edge and distance to the lane
+        """
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 3)
+        count = len(locations)
+        segment = np.full(count, -1, dtype=np.int64)
+        fraction = np.zeros(count)
+        distance = np.full(count, np.inf)
+        if count == 0 or len(self._segments) == 0:
+            return segment, segment.copy(), distance
+
+        scaled = locations * np.array([1.0, 1.0, self.z_weight])
+        query_ids, candidates = self._grid.candidates(scaled)
+        if len(candidates):
+            t, d2 = self._project(scaled[query_ids], candidates)
+            # Closest candidate of each query: sort by query, then by distance
+            order = np.lexsort((d2, query_ids))
+            first = order[np.r_[True, query_ids[order][1:] != query_ids[order][:-1]]]
+            matched = query_ids[first]
+            segment[matched] = candidates[first]
+            fraction[matched] = t[first]
+            distance[matched] = np.sqrt(d2[first])
+
+        # Matches beyond the grid guarantee may have missed a closer segment
+        for i in np.nonzero(distance > self._exact_distance)[0]:
+            everything = np.arange(len(self._segments))
+            t, d2 = self._project(np.broadcast_to(scaled[i], (len(everything), 3)), everything)
+            best = int(np.argmin(d2))
+            segment[i], fraction[i], distance[i] = best, t[best], np.sqrt(d2[best])
+
+        start = self._segments[segment]
+        edge = self._point_edge[start]
+        vertex = start - self._offsets[edge] + (fraction > 0.5)
+        return edge, vertex, distance
+
+    def _project(self, points, segments):
+        """Projection fraction and squared distance of each point to its paired segment"""
+        a, ab = self._segment_a[segments], self._segment_ab[segments]
+        t = np.clip(np.einsum('ij,ij->i', points - a, ab) / self._segment_ab2[segments], 0.0, 1.0)
+        difference = points - (a + t[:, None] * ab)
+        return t, np.einsum('ij,ij->i', difference, difference)
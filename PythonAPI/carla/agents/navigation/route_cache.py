@@ -0,0 +1,120 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides the route cache that the GlobalRoutePlanner can use to skip
+the search of routes it has already traced.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+def trace_size(trace):
+    """
+    Estimated memory held by a cached trace, in bytes. The waypoints are shared
+    with the graph of the planner, so only the containers are counted.
+
+        :param trace: sequence of (carla.Waypoint, RoadOption)
+    """
+    if not trace:
+        return sys.getsizeof(trace)
+    return sys.getsizeof(trace) + len(trace) * sys.getsizeof(trace[0])
+
+
+class RouteCache(object):
+    """
+    Bounded least recently used store of route traces.
+
+    Traces are stored as tuples and every lookup returns a new list, so the same
+    trace can be handed to several LocalPlanners, which may modify their copy,
+    without affecting each other or the cache. A single cache can be shared by
+    several planners and threads.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=None, quantization=2.0):
+        """
+        :param max_entries: maximum number of traces kept
+        :param max_bytes: if given, maximum estimated memory of the kept traces
+        :param quantization: size of the steps, in meters, along the origin and destination
+            edges that share a cached route. Use the sampling resolution of the planner
+            to only share routes between locations closest to the same waypoint.
+        """
+        if max_entries < 1:
+            raise ValueError("The route cache needs room for at least one entry")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.quantization = quantization
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def memory(self):
+        """Estimated memory of the kept traces, in bytes"""
+        return self._bytes
+
+    def get(self, key):
+        """
+        Returns a copy of the trace stored for a key, or None
+        """
+        with self._lock:
+            trace = self._entries.get(key)
+            if trace is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return list(trace)
+
+    def put(self, key, trace):
+        """
+        Stores a copy of a trace, evicting the least recently used ones if needed
+        """
+        trace = tuple(trace)
+        size = trace_size(trace)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= trace_size(previous)
+            self._entries[key] = trace
+            self._bytes += size
+            while len(self._entries) > self.max_entries or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= trace_size(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Removes every trace, keeping the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Returns a dictionary with the counters of the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'memory': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0
+        }
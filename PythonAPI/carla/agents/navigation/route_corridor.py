@@ -0,0 +1,293 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides RouteCorridor, the geometry of the waypoints queued in a
+LocalPlanner, and WaypointQueue, the queue itself, which keeps both up to date.
+
+The location, right vector and cumulative arc length of each waypoint are computed
+once, when the waypoint is queued. The obstacle detection of the agents then finds
+the part of the route within reach and its left and right boundaries with a few
+array operations, instead of walking the whole plan on every call, and the planner
+purges the waypoints it has already reached the same way.
+"""
+
+from itertools import islice
+
+import numpy as np
+
+
+def _float32_distances(points, origin):
+    """
+    Distances from an origin to some points, as carla.Location.distance computes them.
+    Differences of float32 coordinates are exact in float64, the rest follows carla in float32.
+    """
+    offsets = (points - origin).astype(np.float32)
+    return np.sqrt(np.sum(np.square(offsets), axis=1))
+
+
+class RouteCorridor(object):
+    """
+    Arrays following the appends and poplefts of the waypoint queue of a LocalPlanner:
+
+        - centers: (N, 3) array with the location of each waypoint
+        - rights: (N, 2) array with the (x, y) of the right vector of each waypoint
+        - arc_lengths: (N,) array with the distance along the route from the first waypoint
+
+    The live rows are a contiguous slice of buffers that are compacted or grown when
+    full, so that both operations are amortized O(1) and the properties are views.
+    """
+
+    def __init__(self, capacity=128):
+        """
+        :param capacity (int): initial number of rows of the buffers
+        """
+        self._centers = np.zeros((capacity, 3))
+        self._rights = np.zeros((capacity, 2))
+        self._arcs = np.zeros(capacity)
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def centers(self):
+        """Locations of the queued waypoints"""
+        return self._centers[self._head:self._head + self._size]
+
+    @property
+    def rights(self):
+        """(x, y) of the right vectors of the queued waypoints"""
+        return self._rights[self._head:self._head + self._size]
+
+    @property
+    def arc_lengths(self):
+        """Distance along the route from the first queued waypoint to each of them"""
+        arcs = self._arcs[self._head:self._head + self._size]
+        return arcs - arcs[0] if self._size else arcs
+
+    def append(self, center, right):
+        """
+        Adds a waypoint at the end of the corridor
+
+            :param center: (x, y, z) of the waypoint
+            :param right: (x, y) of the right vector of the waypoint
+        """
+        end = self._head + self._size
+        if end == len(self._arcs):
+            self._make_room()
+            end = self._head + self._size
+        self._centers[end] = center
+        self._rights[end] = right[:2]
+        if self._size:
+            step = self._centers[end] - self._centers[end - 1]
+            self._arcs[end] = self._arcs[end - 1] + np.sqrt(step.dot(step))
+        else:
+            self._arcs[end] = 0.0
+        self._size += 1
+
+    def append_waypoint(self, waypoint):
+        """
+        Adds a carla.Waypoint at the end of the corridor
+
+            :param waypoint (carla.Waypoint): queued waypoint
+        """
+        transform = waypoint.transform
+        location = transform.location
+        right = transform.get_right_vector()
+        self.append((location.x, location.y, location.z), (right.x, right.y))
+
+    def popleft(self, count=1):
+        """
+        Removes waypoints from the start of the corridor
+
+            :param count (int): number of waypoints to remove
+        """
+        count = min(count, self._size)
+        self._head += count
+        self._size -= count
+        if self._size == 0:
+            self._head = 0
+
+    def clear(self):
+        """Removes all the waypoints"""
+        self._head = 0
+        self._size = 0
+
+    def _make_room(self):
+        """Moves the live rows to the start of the buffers, growing them if more than half full"""
+        capacity = len(self._arcs)
+        if self._size > capacity // 2:
+            capacity *= 2
+        live = slice(self._head, self._head + self._size)
+        centers, rights, arcs = self._centers[live].copy(), self._rights[live].copy(), self._arcs[live].copy()
+        if capacity != len(self._arcs):
+            self._centers = np.zeros((capacity, 3))
+            self._rights = np.zeros((capacity, 2))
+            self._arcs = np.zeros(capacity)
+        self._centers[:self._size] = centers
+        self._rights[:self._size] = rights
+        self._arcs[:self._size] = arcs
+        self._head = 0
+
+    def reach(self, origin, max_distance):
+        """
+        Number of leading waypoints before the first one farther than max_distance from
+        a location, with the distances of carla.Location.distance.
+
+        The waypoints whose distance along the route is short enough can't be farther
+        than max_distance, so only the ones after them are measured, in growing chunks.
+
+            :param origin: (x, y, z) of the reference location
+            :param max_distance (float): maximum distance to the location
+        """
+        if self._size == 0:
+            return 0
+        centers = self.centers
+        origin = np.asarray(origin, dtype=np.float64)
+        first = centers[0] - origin
+        # The margin covers the float32 rounding of the measured distances
+        bound = max_distance - np.sqrt(first.dot(first)) - 1e-3
+        arcs = self._arcs[self._head:self._head + self._size]
+        start = int(np.searchsorted(arcs, arcs[0] + bound, side='right'))
+        chunk = 8
+        while start < self._size:
+            stop = min(self._size, start + chunk)
+            far = np.nonzero(_float32_distances(centers[start:stop], origin) > max_distance)[0]
+            if len(far):
+                return start + int(far[0])
+            start = stop
+            chunk *= 2
+        return self._size
+
+    def boundaries(self, count, right_extent, left_extent):
+        """
+        Boundary points of the leading waypoints, displaced along their right vectors
+
+            :param count (int): number of leading waypoints
+            :param right_extent (float): displacement of the right boundary
+            :param left_extent (float): displacement of the left boundary, usually negative
+            :return: tuple of two (count, 3) arrays, the right and left boundaries
+        """
+        centers = self.centers[:count]
+        rights = np.zeros((len(centers), 3))
+        rights[:, :2] = self.rights[:count]
+        return centers + right_extent * rights, centers + left_extent * rights
+
+
+class WaypointQueue(object):
+    """
+    Queue of (carla.Waypoint, RoadOption) pairs with the interface of the deque used by
+    the LocalPlanner, backed by a list with a moving head and by a RouteCorridor with
+    the coordinates of the waypoints.
+
+    Like a deque with a maxlen, appending to a full queue drops its first element. The
+    maxlen can be raised at any time without copying the queue.
+    """
+
+    def __init__(self, maxlen=None, capacity=128):
+        """
+        :param maxlen (int): maximum number of waypoints, None for no limit
+        :param capacity (int): initial number of rows of the corridor buffers
+        """
+        self.maxlen = maxlen
+        self.corridor = RouteCorridor(capacity)
+        self._items = []
+        self._head = 0
+
+    def __len__(self):
+        return len(self._items) - self._head
+
+    def __iter__(self):
+        return islice(self._items, self._head, None)
+
+    def __getitem__(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("waypoint queue index out of range")
+        return self._items[self._head + index]
+
+    def append(self, elem):
+        """
+        Adds a (carla.Waypoint, RoadOption) pair at the end of the queue
+
+            :param elem: pair to add
+        """
+        if self.maxlen is not None and len(self) >= self.maxlen:
+            self.drop(len(self) - self.maxlen + 1)
+        self._items.append(elem)
+        self.corridor.append_waypoint(elem[0])
+
+    def extend(self, elems):
+        """Adds several (carla.Waypoint, RoadOption) pairs at the end of the queue"""
+        for elem in elems:
+            self.append(elem)
+
+    def popleft(self):
+        """Removes and returns the first pair of the queue"""
+        if not len(self):
+            raise IndexError("pop from an empty waypoint queue")
+        elem = self._items[self._head]
+        self.drop(1)
+        return elem
+
+    def drop(self, count):
+        """
+        Removes the first pairs of the queue
+
+            :param count (int): number of pairs to remove
+        """
+        count = min(count, len(self))
+        if count <= 0:
+            return
+        self._head += count
+        self.corridor.popleft(count)
+        # Compact the list once most of it is behind the head
+        if self._head == len(self._items):
+            self._items = []
+            self._head = 0
+        elif self._head > 64 and self._head * 2 > len(self._items):
+            del self._items[:self._head]
+            self._head = 0
+
+    def clear(self):
+        """Removes all the pairs"""
+        self._items = []
+        self._head = 0
+        self.corridor.clear()
+
+    def purge(self, location, min_distance, last_min_distance=1.0):
+        """
+        Removes the leading waypoints closer than min_distance to a location, up to the
+        first one that isn't. The last waypoint of the queue is only removed when closer
+        than last_min_distance. The distances are the ones of carla.Location.distance,
+        measured in growing chunks from the head of the queue.
+
+            :param location: (x, y, z) of the vehicle
+            :param min_distance (float): distance under which a waypoint is reached
+            :param last_min_distance (float): the same distance for the last waypoint
+            :return: number of removed waypoints
+        """
+        size = len(self)
+        centers = self.corridor.centers
+        origin = np.asarray(location, dtype=np.float64)
+        removed, chunk = 0, 8
+        while removed < size:
+            stop = min(size, removed + chunk)
+            thresholds = np.full(stop - removed, min_distance, dtype=np.float64)
+            if stop == size:
+                thresholds[-1] = last_min_distance
+            kept = np.nonzero(~(_float32_distances(centers[removed:stop], origin) < thresholds))[0]
+            if len(kept):
+                removed += int(kept[0])
+                break
+            removed = stop
+            chunk *= 2
+        self.drop(removed)
+        return removed
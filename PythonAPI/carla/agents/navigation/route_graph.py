@@ -0,0 +1,749 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides an array-backed representation of the GlobalRoutePlanner graph,
+and the path searches that run over it.
+
+The networkx graph of the planner stays the reference implementation. This engine
+compiles it into compressed sparse row (CSR) arrays and runs the searches with a binary
+heap and plain integer node indices, avoiding the networkx dictionary lookups and the
+per-expansion numpy allocations of the heuristic.
+"""
+
+from collections import deque
+from heapq import heappush, heappop
+from itertools import count
+
+import numpy as np
+import networkx as nx
+
+
+class CSRGraph(object):
+    """
+    Directed graph stored as compressed sparse row arrays:
+
+        - node_ids: (N,) ids of the nodes in the original graph
+        - coordinates: (N, 3) float array with the (x, y, z) vertex of each node
+        - indptr: (N + 1,) the outgoing edges of node i are indptr[i]:indptr[i + 1]
+        - indices: (E,) index of the destination node of each edge
+        - lengths: (E,) float array with the weight of each edge
+        - edge_types: (E,) int array with the RoadOption value of each edge
+
+    Edges keep the order of the adjacency of the graph they were compiled from,
+    so the searches expand the nodes in the same order as networkx does.
+    """
+
+    def __init__(self, node_ids, coordinates, indptr, indices, lengths, edge_types):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.edge_types = np.asarray(edge_types, dtype=np.int64)
+        self._node_index = {int(node): i for i, node in enumerate(self.node_ids)}
+        self._adjacency = None
+        self._edge_lists = None
+
+    @classmethod
+    def from_networkx(cls, graph, weight='length', vertex='vertex', edge_type='type'):
+        """
+        Compiles a networkx.DiGraph into CSR arrays.
+
+            :param graph (networkx.DiGraph): graph to compile
+            :param weight (str): edge attribute used as edge length
+            :param vertex (str): node attribute holding the (x, y, z) position of the node
+            :param edge_type (str): edge attribute holding the RoadOption of the edge
+        """
+        node_ids = list(graph.nodes)
+        node_index = {node: i for i, node in enumerate(node_ids)}
+        coordinates = np.array([graph.nodes[node][vertex] for node in node_ids], dtype=np.float64)
+
+        indptr = [0]
+        indices, lengths, edge_types = [], [], []
+        for node in node_ids:
+            for neighbor, data in graph.adj[node].items():
+                indices.append(node_index[neighbor])
+                lengths.append(data.get(weight, 1))
+                edge_types.append(int(data.get(edge_type, -1)))
+            indptr.append(len(indices))
+
+        return cls(node_ids, coordinates, indptr, indices, lengths, edge_types)
+
+    @property
+    def num_nodes(self):
+        """Number of nodes of the graph"""
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        """Number of edges of the graph"""
+        return len(self.indices)
+
+    def index(self, node):
+        """
+        Returns the array index of a node id of the original graph
+
+            :param node (int): node id
+        """
+        try:
+            return self._node_index[node]
+        except KeyError:
+            raise nx.NodeNotFound("Node {} is not in the graph".format(node))
+
+    def edge_index(self, node1, node2):
+        """
+        Returns the position in the edge arrays of the edge between two node ids, or -1
+
+            :param node1 (int): origin node id
+            :param node2 (int): destination node id
+        """
+        i, j = self.index(node1), self.index(node2)
+        for e in range(self.indptr[i], self.indptr[i + 1]):
+            if self.indices[e] == j:
+                return e
+        return -1
+
+    def adjacency(self):
+        """
+        Returns, for each node index, the list of (neighbor index, length) of its outgoing edges.
+        Python lists are much faster than numpy scalars to iterate inside the search loops,
+        so they are built once and kept. Edges with an infinite length are blocked and left out.
+        """
+        if self._adjacency is None:
+            indptr = self.indptr.tolist()
+            indices = self.indices.tolist()
+            lengths = self.lengths.tolist()
+            infinity = float('inf')
+            self._adjacency = [
+                [(neighbor, length) for neighbor, length in zip(
+                    indices[indptr[i]:indptr[i + 1]], lengths[indptr[i]:indptr[i + 1]])
+                 if length != infinity]
+                for i in range(self.num_nodes)]
+        return self._adjacency
+
+    def edge_lists(self):
+        """
+        Returns the tuple (successors, predecessors, sources). successors[i] and predecessors[i]
+        are the lists of (node index, edge index) of the outgoing and incoming edges of node i,
+        and sources[e] is the origin node index of edge e. They only depend on the structure
+        of the graph, not on the edge lengths.
+        """
+        if self._edge_lists is None:
+            indptr = self.indptr.tolist()
+            indices = self.indices.tolist()
+            sources = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr)).tolist()
+            successors = [[(indices[e], e) for e in range(indptr[i], indptr[i + 1])]
+                          for i in range(self.num_nodes)]
+            predecessors = [[] for _ in range(self.num_nodes)]
+            for e, (source, target) in enumerate(zip(sources, indices)):
+                predecessors[target].append((source, e))
+            self._edge_lists = (successors, predecessors, sources)
+        return self._edge_lists
+
+    def invalidate(self):
+        """Drops the derived tables after the edge lengths have been modified in place"""
+        self._adjacency = None
+
+    def heuristic_to(self, target):
+        """
+        Euclidean distance from every node to the target node index, as a python list
+
+            :param target (int): target node index
+        """
+        delta = self.coordinates - self.coordinates[target]
+        return np.sqrt(np.einsum('ij,ij->i', delta, delta)).tolist()
+
+    def astar_indices(self, source, target, heuristic=None):
+        """
+        A* search between two node indices, following the same expansion rules as
+        networkx.astar_path so that both return the same path.
+
+            :param source (int): source node index
+            :param target (int): target node index
+            :param heuristic (list): optional heuristic of every node towards the target.
+                The euclidean distance between node vertices is used by default
+            :return: list of node indices from source to target
+        """
+        if heuristic is None:
+            heuristic = self.heuristic_to(target)
+        adjacency = self.adjacency()
+
+        counter = count()
+        queue = [(0.0, next(counter), source, 0.0, None)]
+        enqueued = {}
+        explored = {}
+
+        while queue:
+            _, __, current, dist, parent = heappop(queue)
+
+            if current == target:
+                path = [current]
+                node = parent
+                while node is not None:
+                    path.append(node)
+                    node = explored[node]
+                path.reverse()
+                return path
+
+            if current in explored:
+                # Do not override the parent of the starting node
+                if explored[current] is None:
+                    continue
+                # Skip bad paths that were enqueued before finding a better one
+                if enqueued[current] < dist:
+                    continue
+
+            explored[current] = parent
+
+            for neighbor, length in adjacency[current]:
+                new_cost = dist + length
+                if neighbor in enqueued:
+                    if enqueued[neighbor] <= new_cost:
+                        continue
+                enqueued[neighbor] = new_cost
+                heappush(queue, (new_cost + heuristic[neighbor], next(counter), neighbor, new_cost, current))
+
+        raise nx.NetworkXNoPath("Node {} not reachable from {}".format(
+            self.node_ids[target], self.node_ids[source]))
+
+    def astar(self, source, target):
+        """
+        A* search between two node ids of the original graph
+
+            :param source (int): source node id
+            :param target (int): target node id
+            :return: list of node ids from source to target
+        """
+        path = self.astar_indices(self.index(source), self.index(target))
+        return [int(self.node_ids[i]) for i in path]
+
+    def shortest_paths_indices(self, source, targets):
+        """
+        One-to-many Dijkstra search from a node index, stopped once every target is settled.
+
+            :param source (int): source node index
+            :param targets (list): target node indices
+            :return: tuple of (list of path lengths, list of paths as node index lists).
+                Unreachable targets get an infinite length and a None path
+        """
+        infinity = float('inf')
+        adjacency = self.adjacency()
+        dist = {source: 0.0}
+        parent = {source: None}
+        settled = set()
+        remaining = set(targets)
+        queue = [(0.0, source)]
+
+        while queue and remaining:
+            d, current = heappop(queue)
+            if current in settled:
+                continue
+            settled.add(current)
+            remaining.discard(current)
+            for neighbor, length in adjacency[current]:
+                new_dist = d + length
+                if new_dist < dist.get(neighbor, infinity):
+                    dist[neighbor] = new_dist
+                    parent[neighbor] = current
+                    heappush(queue, (new_dist, neighbor))
+
+        lengths, paths = [], []
+        for target in targets:
+            if target not in settled:
+                lengths.append(infinity)
+                paths.append(None)
+                continue
+            path = [target]
+            while parent[path[-1]] is not None:
+                path.append(parent[path[-1]])
+            path.reverse()
+            lengths.append(dist[target])
+            paths.append(path)
+        return lengths, paths
+
+    def many_to_many(self, sources, targets, processes=None):
+        """
+        Shortest paths between every source and every target node id, running one
+        one-to-many search per distinct source.
+
+            :param sources (list): source node ids
+            :param targets (list): target node ids
+            :param processes (int): if greater than 1, the searches are spread over a pool
+                of that many worker processes, each one receiving a copy of the graph once
+            :return: tuple of ((len(sources), len(targets)) array of path lengths,
+                nested list of paths as node id lists, None when unreachable)
+        """
+        target_indices = [self.index(target) for target in targets]
+        unique_sources = list(dict.fromkeys(sources))
+        tasks = [(self.index(source), target_indices) for source in unique_sources]
+
+        if processes is not None and processes > 1 and len(tasks) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self,)) as executor:
+                results = list(executor.map(_worker_shortest_paths, tasks))
+        else:
+            results = [self.shortest_paths_indices(source, indices) for source, indices in tasks]
+
+        by_source = dict(zip(unique_sources, results))
+        lengths = np.empty((len(sources), len(targets)), dtype=np.float64)
+        paths = []
+        node_ids = self.node_ids.tolist()
+        for i, source in enumerate(sources):
+            row_lengths, row_paths = by_source[source]
+            lengths[i] = row_lengths
+            paths.append([None if path is None else [node_ids[n] for n in path] for path in row_paths])
+        return lengths, paths
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Rebuilt on demand, and much larger than the arrays once pickled
+        state['_adjacency'] = None
+        state['_edge_lists'] = None
+        return state
+
+    def path_length(self, path):
+        """
+        Sum of the lengths of the edges of a path given as node ids
+
+            :param path (list): node ids of the path
+        """
+        return sum(self.lengths[self.edge_index(n1, n2)] for n1, n2 in zip(path[:-1], path[1:]))
+
+
+# Graph of the worker processes of CSRGraph.many_to_many
+_worker_graph = None
+
+
+def _init_worker(graph):
+    global _worker_graph  # pylint: disable=global-statement
+    _worker_graph = graph
+
+
+def _worker_shortest_paths(task):
+    source, targets = task
+    return _worker_graph.shortest_paths_indices(source, targets)
+
+
+class ContractionHierarchy(object):
+    """
+    Contraction hierarchy built over a CSRGraph, to answer many shortest path queries
+    on a static graph. The nodes are contracted one by one in order of importance,
+    adding shortcut edges that keep the distances between the remaining nodes. Queries
+    then run two small Dijkstra searches that only move upwards in the hierarchy.
+
+    Shortcuts remember the node they skip, so the returned paths are unpacked into
+    edges of the original graph, which keep their own edge type (lane changes included).
+
+    The hierarchy returns exact shortest paths. It only matches an A* path when that A*
+    search is exact and the shortest path is unique. The A* search of the GlobalRoutePlanner
+    is not exact, its euclidean heuristic overestimates the waypoint counts of the edges, so
+    the hierarchy may return other, never longer, routes.
+    """
+
+    def __init__(self, node_ids, rank, up_indptr, up_indices, up_lengths, up_middle,
+                 down_indptr, down_indices, down_lengths, down_middle):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.rank = np.asarray(rank, dtype=np.int64)
+        self.up_indptr = np.asarray(up_indptr, dtype=np.int64)
+        self.up_indices = np.asarray(up_indices, dtype=np.int64)
+        self.up_lengths = np.asarray(up_lengths, dtype=np.float64)
+        self.up_middle = np.asarray(up_middle, dtype=np.int64)
+        self.down_indptr = np.asarray(down_indptr, dtype=np.int64)
+        self.down_indices = np.asarray(down_indices, dtype=np.int64)
+        self.down_lengths = np.asarray(down_lengths, dtype=np.float64)
+        self.down_middle = np.asarray(down_middle, dtype=np.int64)
+        self._node_index = {int(node): i for i, node in enumerate(self.node_ids)}
+        self._build_tables()
+
+    def _build_tables(self):
+        """Builds the python lists used by the queries"""
+        def adjacency(indptr, indices, lengths):
+            indptr, indices, lengths = indptr.tolist(), indices.tolist(), lengths.tolist()
+            return [list(zip(indices[indptr[i]:indptr[i + 1]], lengths[indptr[i]:indptr[i + 1]]))
+                    for i in range(len(indptr) - 1)]
+
+        self._up = adjacency(self.up_indptr, self.up_indices, self.up_lengths)
+        self._down = adjacency(self.down_indptr, self.down_indices, self.down_lengths)
+
+        # Middle node of every shortcut, keyed by (from, to) in the original edge direction
+        self._middle = {}
+        for i in range(len(self.up_indptr) - 1):
+            for e in range(self.up_indptr[i], self.up_indptr[i + 1]):
+                if self.up_middle[e] >= 0:
+                    self._middle[(i, int(self.up_indices[e]))] = int(self.up_middle[e])
+            for e in range(self.down_indptr[i], self.down_indptr[i + 1]):
+                if self.down_middle[e] >= 0:
+                    self._middle[(int(self.down_indices[e]), i)] = int(self.down_middle[e])
+
+    @property
+    def num_shortcuts(self):
+        """Number of shortcut edges added by the contraction"""
+        return len(self._middle)
+
+    @classmethod
+    def build(cls, graph, witness_settle_limit=100):
+        """
+        Contracts all the nodes of a graph.
+
+            :param graph (CSRGraph): graph to preprocess
+            :param witness_settle_limit (int): maximum number of nodes settled by each witness
+                search. Lower values preprocess faster but add some unnecessary shortcuts
+        """
+        num_nodes = graph.num_nodes
+        infinity = float('inf')
+
+        # Current edges as {neighbor: (length, middle)}, keeping only the shortest parallel edge
+        out_edges = [dict() for _ in range(num_nodes)]
+        in_edges = [dict() for _ in range(num_nodes)]
+        for u, neighbors in enumerate(graph.adjacency()):
+            for v, length in neighbors:
+                if u != v and length < out_edges[u].get(v, (infinity, -1))[0]:
+                    out_edges[u][v] = (length, -1)
+                    in_edges[v][u] = (length, -1)
+
+        contracted = [False] * num_nodes
+        deleted_neighbors = [0] * num_nodes
+        level = [0] * num_nodes
+
+        def witness_search(source, excluded, max_length):
+            """Dijkstra from source, ignoring contracted nodes and the one being contracted"""
+            dist = {source: 0.0}
+            queue = [(0.0, source)]
+            settled = 0
+            while queue and settled < witness_settle_limit:
+                d, u = heappop(queue)
+                if d > dist[u]:
+                    continue
+                if d > max_length:
+                    break
+                settled += 1
+                for v, (length, _) in out_edges[u].items():
+                    if v == excluded or contracted[v]:
+                        continue
+                    new_dist = d + length
+                    if new_dist < dist.get(v, infinity):
+                        dist[v] = new_dist
+                        heappush(queue, (new_dist, v))
+            return dist
+
+        def shortcuts(node):
+            """Shortcuts needed to keep the distances if the node was contracted"""
+            result = []
+            incoming = [(u, w) for u, (w, _) in in_edges[node].items() if not contracted[u]]
+            outgoing = [(x, w) for x, (w, _) in out_edges[node].items() if not contracted[x]]
+            if not incoming or not outgoing:
+                return result
+            max_out = max(w for _, w in outgoing)
+            for u, w_in in incoming:
+                dist = witness_search(u, node, w_in + max_out)
+                for x, w_out in outgoing:
+                    if x == u:
+                        continue
+                    if dist.get(x, infinity) > w_in + w_out:
+                        result.append((u, x, w_in + w_out))
+            return result
+
+        def priority(node):
+            """Edge difference, contracted neighbors and depth in the hierarchy"""
+            edges = sum(1 for u in in_edges[node] if not contracted[u]) + \
+                sum(1 for x in out_edges[node] if not contracted[x])
+            return 2 * (len(shortcuts(node)) - edges) + deleted_neighbors[node] + level[node]
+
+        queue = [(priority(node), node) for node in range(num_nodes)]
+        queue.sort()
+        rank = [0] * num_nodes
+        current_rank = 0
+        while queue:
+            _, node = heappop(queue)
+            # Lazy update, contract the node only if it's still the least important one
+            new_priority = priority(node)
+            if queue and new_priority > queue[0][0]:
+                heappush(queue, (new_priority, node))
+                continue
+
+            for u, x, length in shortcuts(node):
+                if length < out_edges[u].get(x, (infinity, -1))[0]:
+                    out_edges[u][x] = (length, node)
+                    in_edges[x][u] = (length, node)
+
+            contracted[node] = True
+            rank[node] = current_rank
+            current_rank += 1
+            for neighbor in set(in_edges[node]) | set(out_edges[node]):
+                deleted_neighbors[neighbor] += 1
+                level[neighbor] = max(level[neighbor], level[node] + 1)
+
+        # Forward searches go up through the out edges, backward searches through the in edges
+        up_indptr, up_indices, up_lengths, up_middle = [0], [], [], []
+        down_indptr, down_indices, down_lengths, down_middle = [0], [], [], []
+        for u in range(num_nodes):
+            for x, (length, middle) in out_edges[u].items():
+                if rank[x] > rank[u]:
+                    up_indices.append(x)
+                    up_lengths.append(length)
+                    up_middle.append(middle)
+            up_indptr.append(len(up_indices))
+            for x, (length, middle) in in_edges[u].items():
+                if rank[x] > rank[u]:
+                    down_indices.append(x)
+                    down_lengths.append(length)
+                    down_middle.append(middle)
+            down_indptr.append(len(down_indices))
+
+        return cls(graph.node_ids, rank, up_indptr, up_indices, up_lengths, up_middle,
+                   down_indptr, down_indices, down_lengths, down_middle)
+
+    def save(self, path):
+        """
+        Stores the hierarchy in a .npz file
+
+            :param path (str): destination file
+        """
+        with open(path, 'wb') as ch_file:
+            np.savez(ch_file, node_ids=self.node_ids, rank=self.rank,
+                     up_indptr=self.up_indptr, up_indices=self.up_indices,
+                     up_lengths=self.up_lengths, up_middle=self.up_middle,
+                     down_indptr=self.down_indptr, down_indices=self.down_indices,
+                     down_lengths=self.down_lengths, down_middle=self.down_middle)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a hierarchy stored with save
+
+            :param path (str): file to read
+        """
+        with np.load(path) as data:
+            return cls(data['node_ids'], data['rank'],
+                       data['up_indptr'], data['up_indices'], data['up_lengths'], data['up_middle'],
+                       data['down_indptr'], data['down_indices'], data['down_lengths'], data['down_middle'])
+
+    def matches(self, graph):
+        """
+        Whether the hierarchy was built for the nodes of the given graph
+
+            :param graph (CSRGraph): graph to check
+        """
+        return np.array_equal(self.node_ids, graph.node_ids)
+
+    def _unpack(self, u, v, path):
+        """Appends to path the original nodes after u of the edge u -> v"""
+        stack = [(u, v)]
+        while stack:
+            a, b = stack.pop()
+            middle = self._middle.get((a, b))
+            if middle is None:
+                path.append(b)
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+
+    def query_indices(self, source, target):
+        """
+        Shortest path between two node indices
+
+            :param source (int): source node index
+            :param target (int): target node index
+            :return: tuple of (list of node indices from source to target, path length)
+        """
+        if source == target:
+            return [source], 0.0
+
+        infinity = float('inf')
+        dist = ({source: 0.0}, {target: 0.0})
+        parent = ({source: None}, {target: None})
+        queues = ([(0.0, source)], [(0.0, target)])
+        adjacency = (self._up, self._down)
+        best, meeting = infinity, None
+
+        # Alternate both directions, stopping each one when it can't improve the best path
+        while queues[0] or queues[1]:
+            for direction in (0, 1):
+                queue = queues[direction]
+                if not queue:
+                    continue
+                d, u = heappop(queue)
+                if d > dist[direction].get(u, infinity):
+                    continue
+                if d >= best:
+                    del queue[:]
+                    continue
+                other = dist[1 - direction].get(u)
+                if other is not None and d + other < best:
+                    best, meeting = d + other, u
+                for v, length in adjacency[direction][u]:
+                    new_dist = d + length
+                    if new_dist < dist[direction].get(v, infinity):
+                        dist[direction][v] = new_dist
+                        parent[direction][v] = u
+                        heappush(queue, (new_dist, v))
+
+        if meeting is None:
+            raise nx.NetworkXNoPath("Node {} not reachable from {}".format(
+                self.node_ids[target], self.node_ids[source]))
+
+        # Hierarchy path: source -> ... -> meeting <- ... <- target
+        forward = [meeting]
+        while parent[0][forward[-1]] is not None:
+            forward.append(parent[0][forward[-1]])
+        forward.reverse()
+        backward = [meeting]
+        while parent[1][backward[-1]] is not None:
+            backward.append(parent[1][backward[-1]])
+        hierarchy_path = forward + backward[1:]
+
+        path = [source]
+        for u, v in zip(hierarchy_path[:-1], hierarchy_path[1:]):
+            self._unpack(u, v, path)
+        return path, best
+
+    def query(self, source, target):
+        """
+        Shortest path between two node ids of the original graph
+
+            :param source (int): source node id
+            :param target (int): target node id
+            :return: list of node ids from source to target
+        """
+        try:
+            source_index, target_index = self._node_index[source], self._node_index[target]
+        except KeyError as error:
+            raise nx.NodeNotFound("Node {} is not in the graph".format(error.args[0]))
+        path, _ = self.query_indices(source_index, target_index)
+        return [int(self.node_ids[i]) for i in path]
+
+
+class IncrementalSearch(object):
+    """
+    D* Lite search towards a fixed target node, over the edge lengths of a CSRGraph.
+
+    The search runs backwards from the target, so its state holds the distance to the
+    target of every node it has settled and stays valid when the start moves along the
+    route. After edge lengths change, only the nodes whose distance is affected by the
+    change are expanded again, instead of searching the whole route from scratch.
+
+    No heuristic is used: the GlobalRoutePlanner edge lengths are waypoint counts, which
+    the euclidean distance between nodes doesn't bound.
+    """
+
+    def __init__(self, graph, target):
+        """
+        :param graph (CSRGraph): graph to search. Its lengths array may be modified later,
+            calling update_edges with the modified edges
+        :param target (int): target node index
+        """
+        self.graph = graph
+        self.target = target
+        self.expansions = 0
+        self._successors, self._predecessors, self._sources = graph.edge_lists()
+        self._lengths = graph.lengths.tolist()
+        infinity = float('inf')
+        self._g = [infinity] * graph.num_nodes
+        self._rhs = [infinity] * graph.num_nodes
+        self._rhs[target] = 0.0
+        # Key each node is queued with, None if it isn't in the queue
+        self._queued = [None] * graph.num_nodes
+        self._queue = []
+        self._push(target, 0.0)
+
+    def _push(self, node, key):
+        self._queued[node] = key
+        heappush(self._queue, (key, node))
+
+    def _update_node(self, node):
+        g, rhs = self._g, self._rhs
+        if node != self.target:
+            lengths = self._lengths
+            rhs[node] = min([lengths[e] + g[v] for v, e in self._successors[node]] or [float('inf')])
+        if g[node] != rhs[node]:
+            self._push(node, min(g[node], rhs[node]))
+        else:
+            self._queued[node] = None
+
+    def _compute(self, source):
+        g, rhs, queue, queued = self._g, self._rhs, self._queue, self._queued
+        while queue:
+            key, node = queue[0]
+            if queued[node] != key:
+                # Outdated entry, the node was queued again or became consistent
+                heappop(queue)
+                continue
+            # Nodes tied with the source are expanded too, so that the zero length
+            # edges towards the target are settled for path_indices
+            if key > min(g[source], rhs[source]) and g[source] == rhs[source]:
+                break
+            heappop(queue)
+            queued[node] = None
+            self.expansions += 1
+            if g[node] > rhs[node]:
+                g[node] = rhs[node]
+            else:
+                g[node] = float('inf')
+                self._update_node(node)
+            for predecessor, _ in self._predecessors[node]:
+                self._update_node(predecessor)
+
+    def update_edges(self, edges):
+        """
+        Takes into account the new lengths of some edges of the graph. The work is done
+        by the next distance or path request.
+
+            :param edges (list): indices of the modified edges
+        """
+        for e in edges:
+            self._lengths[e] = float(self.graph.lengths[e])
+            self._update_node(self._sources[e])
+
+    def distance(self, source):
+        """
+        Length of the shortest path from a node index to the target, infinity if unreachable
+
+            :param source (int): source node index
+        """
+        self._compute(source)
+        return self._g[source]
+
+    def path_indices(self, source):
+        """
+        Shortest path from a node index to the target
+
+            :param source (int): source node index
+            :return: list of node indices from source to target
+        """
+        if self.distance(source) == float('inf'):
+            raise nx.NetworkXNoPath("Node {} not reachable from {}".format(
+                self.graph.node_ids[self.target], self.graph.node_ids[source]))
+
+        # Breadth first walk over the edges that keep the distance to the target.
+        # A plain descent could loop over the zero length lane change edges.
+        g, lengths = self._g, self._lengths
+        parent = {source: None}
+        frontier = deque([source])
+        while frontier:
+            node = frontier.popleft()
+            if node == self.target:
+                break
+            for neighbor, e in self._successors[node]:
+                if neighbor not in parent and abs(lengths[e] + g[neighbor] - g[node]) <= 1e-9 * max(1.0, g[node]):
+                    parent[neighbor] = node
+                    frontier.append(neighbor)
+
+        path = [self.target]
+        while parent[path[-1]] is not None:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path
+
+    def path(self, source):
+        """
+        Shortest path from a node id of the original graph to the target
+
+            :param source (int): source node id
+            :return: list of node ids from source to target
+        """
+        path = self.path_indices(self.graph.index(source))
+        return [int(self.graph.node_ids[i]) for i in path]
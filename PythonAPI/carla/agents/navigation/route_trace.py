@@ -0,0 +1,118 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides RouteTrace, a compact form of the (carla.Waypoint, RoadOption)
+lists returned by the GlobalRoutePlanner.
+"""
+
+import numpy as np
+
+from agents.navigation import graph_cache
+from agents.navigation.local_planner import RoadOption
+
+
+class RouteTrace(object):
+    """
+    Route stored as contiguous arrays:
+
+        - positions: (N, 3) float array with the (x, y, z) of each waypoint
+        - yaws: (N,) float array with the yaw of each waypoint, in degrees
+        - lane_keys: (N, 3) int array with the (road_id, section_id, lane_id) of each waypoint
+        - s: (N,) float array with the OpenDRIVE s of each waypoint along its road
+        - options: (N,) int array with the RoadOption value of each waypoint
+
+    Indexing with an integer returns a (carla.Waypoint, RoadOption) pair, the waypoint
+    being requested to the map at that moment and not kept. Slices return RouteTraces
+    sharing the arrays, and iterating yields pairs, so a RouteTrace can be given to
+    LocalPlanner.set_global_plan in place of a list.
+
+    Pickling only stores the arrays. Unpickled traces have to be given a map with bind()
+    before their waypoints are accessed.
+    """
+
+    def __init__(self, positions, yaws, lane_keys, s, options, wmap=None):
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.yaws = np.asarray(yaws, dtype=np.float32)
+        self.lane_keys = np.asarray(lane_keys, dtype=np.int32).reshape(-1, 3)
+        self.s = np.asarray(s, dtype=np.float64)
+        self.options = np.asarray(options, dtype=np.int8)
+        self._map = wmap
+
+    @classmethod
+    def from_list(cls, trace, wmap=None):
+        """
+        Builds a RouteTrace from a list of (carla.Waypoint, RoadOption)
+
+            :param trace (list): route as returned by GlobalRoutePlanner.trace_route
+            :param wmap (carla.Map): map used to materialize the waypoints again
+        """
+        positions, yaws, lane_keys, s, options = [], [], [], [], []
+        for waypoint, road_option in trace:
+            transform = waypoint.transform
+            positions.append((transform.location.x, transform.location.y, transform.location.z))
+            yaws.append(transform.rotation.yaw)
+            lane_keys.append((waypoint.road_id, waypoint.section_id, waypoint.lane_id))
+            s.append(waypoint.s)
+            options.append(int(road_option))
+        return cls(positions, yaws, lane_keys, s, options, wmap)
+
+    def bind(self, wmap):
+        """
+        Sets the map the waypoints are materialized from, after unpickling
+
+            :param wmap (carla.Map): map of the route
+        """
+        self._map = wmap
+        return self
+
+    @property
+    def nbytes(self):
+        """Memory used by the arrays, in bytes"""
+        return sum(a.nbytes for a in (self.positions, self.yaws, self.lane_keys, self.s, self.options))
+
+    def __len__(self):
+        return len(self.options)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RouteTrace(self.positions[index], self.yaws[index], self.lane_keys[index],
+                              self.s[index], self.options[index], self._map)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RouteTrace index out of range")
+        return self.waypoint(index), RoadOption(int(self.options[index]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def waypoint(self, index):
+        """
+        Materializes the carla.Waypoint at a position of the route, in the lane section
+        it was stored with, as the graph cache does
+
+            :param index (int): position in the route
+        """
+        if self._map is None:
+            raise RuntimeError("RouteTrace has no map to materialize its waypoints, use bind()")
+        key = tuple(self.lane_keys[index].tolist()) + (float(self.s[index]),) + tuple(self.positions[index].tolist())
+        return graph_cache.resolve_waypoint(self._map, key)
+
+    def road_options(self):
+        """Returns the RoadOption of every waypoint, as a list"""
+        return [RoadOption(int(code)) for code in self.options]
+
+    def to_list(self):
+        """Materializes the whole route as a list of (carla.Waypoint, RoadOption)"""
+        return list(self)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # carla.Map can't be pickled, the receiver binds its own
+        state['_map'] = None
+        return state
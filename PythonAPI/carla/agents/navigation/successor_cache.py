@@ -0,0 +1,117 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides the successor cache that LocalPlanners can share to generate
+random roaming routes without querying the map for every new waypoint.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class SuccessorCache(object):
+    """
+    Bounded least recently used store of the successors of waypoints, with the
+    RoadOption of each one.
+
+    Waypoints are keyed by (road_id, section_id, lane_id, s bucket, distance), so all
+    the waypoints of a lane within the same 'quantization' meters share their successors,
+    those of the first one stored. A planner that follows cached successors ends up on
+    the same chain of waypoints as the other planners of the lane, which keeps the cache
+    warm. A single cache can be shared by several planners and threads.
+    """
+
+    def __init__(self, max_entries=20000, quantization=1.0):
+        """
+        :param max_entries: maximum number of waypoints whose successors are kept
+        :param quantization: size of the steps, in meters, along the lanes that share their
+            successors. The distance between consecutive waypoints of a route may be off
+            by up to this amount.
+        """
+        if max_entries < 1:
+            raise ValueError("The successor cache needs room for at least one entry")
+        self.max_entries = max_entries
+        self.quantization = quantization
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, waypoint, distance):
+        """
+        Returns the key of the successors of a waypoint at a given distance
+
+            :param waypoint (carla.Waypoint): waypoint whose successors are requested
+            :param distance (float): distance to the successors, in meters
+        """
+        return (waypoint.road_id, waypoint.section_id, waypoint.lane_id,
+                int(waypoint.s // self.quantization), distance)
+
+    def get(self, key):
+        """
+        Returns the tuple of (carla.Waypoint, RoadOption) stored for a key, or None
+        """
+        with self._lock:
+            successors = self._entries.get(key)
+            if successors is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return successors
+
+    def put(self, key, successors):
+        """
+        Stores the successors of a key, evicting the least recently used ones if needed
+        """
+        successors = tuple(successors)
+        with self._lock:
+            self._entries[key] = successors
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return successors
+
+    def successors(self, waypoint, distance, compute):
+        """
+        Returns the successors of a waypoint, computing and storing them on a miss
+
+            :param waypoint (carla.Waypoint): waypoint whose successors are requested
+            :param distance (float): distance to the successors, in meters
+            :param compute: function of (waypoint, distance) returning the list of
+                (carla.Waypoint, RoadOption) successors
+        """
+        key = self.key(waypoint, distance)
+        successors = self.get(key)
+        if successors is None:
+            successors = self.put(key, compute(waypoint, distance))
+        return successors
+
+    def clear(self):
+        """
+        Removes every entry, keeping the counters
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns a dictionary with the counters of the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,252 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides TriggerIndex, the waypoints of the trigger volumes of the
+traffic lights and stop signs of a map, grouped by road.
+
+The trigger waypoints only depend on the map, so a single index per world is
+shared by every agent of the process, and it can be stored on disk next to the
+route planner graph cache. Agents then only look at the triggers of the roads
+ahead on their route, instead of every traffic light of the world.
+"""
+
+import os
+import pickle
+import threading
+import weakref
+
+import numpy as np
+
+from agents.navigation import graph_cache
+from agents.tools.misc import get_trafficlight_trigger_location
+
+TRIGGER_CACHE_VERSION = 2
+
+# Kinds of triggers and the actors they are read from
+TRIGGER_KINDS = (('traffic_light', '*traffic_light*'), ('stop', '*stop*'))
+
+# Precision, in meters, of the actor locations matching the cached triggers to the actors
+_LOCATION_DECIMALS = 1
+
+# Indices shared by the agents, kept while some agent holds them. The actors of a
+# world that is reloaded aren't held past the agents that drive in it.
+_instances = weakref.WeakValueDictionary()
+_instances_lock = threading.Lock()
+
+
+def _location_key(location):
+    """Rounded (x, y, z) identifying a static actor across episodes"""
+    return (round(location.x, _LOCATION_DECIMALS), round(location.y, _LOCATION_DECIMALS),
+            round(location.z, _LOCATION_DECIMALS))
+
+
+def trigger_cache_path(cache_dir, wmap):
+    """
+    Builds the path of the trigger cache file of a map
+
+        :param cache_dir (str): folder where the cache files are stored
+        :param wmap (carla.Map): map of the triggers
+    """
+    town = wmap.name.split('/')[-1]
+    filename = "{}_{}.triggers".format(town, graph_cache.opendrive_hash(wmap))
+    return str(os.path.join(cache_dir, filename))
+
+
+class TriggerIndex(object):
+    """
+    Trigger waypoints of the traffic lights and stop signs of a world, with arrays of
+    their locations and forward vectors, and the rows of each (road_id, kind).
+    """
+
+    def __init__(self, wmap, actors, kinds, waypoint_keys, waypoints=None):
+        """
+        :param wmap (carla.Map): map of the triggers
+        :param actors (list): traffic light or stop sign of each trigger
+        :param kinds (list): kind of each trigger, 'traffic_light' or 'stop'
+        :param waypoint_keys (list): graph_cache.waypoint_key of each trigger waypoint
+        :param waypoints (list): trigger waypoints, resolved from the keys when needed if None
+        """
+        self.actors = list(actors)
+        self.kinds = list(kinds)
+        self._keys = list(waypoint_keys)
+        self._waypoints = list(waypoints) if waypoints is not None else [None] * len(self._keys)
+        self._resolver = graph_cache.WaypointResolver(wmap)
+
+        self.road_ids = np.array([key[0] for key in self._keys], dtype=np.int64)
+        self.lane_ids = np.array([key[2] for key in self._keys], dtype=np.int64)
+        self.locations = np.array([graph_cache.key_location(key) for key in self._keys],
+                                  dtype=np.float64).reshape(-1, 3)
+        self.forwards = np.zeros((len(self._keys), 3))
+        for row, waypoint in enumerate(self._waypoints):
+            if waypoint is not None:
+                self._store_forward(row, waypoint)
+
+        self._rows = {}
+        for row, (road_id, kind) in enumerate(zip(self.road_ids.tolist(), self.kinds)):
+            self._rows.setdefault((road_id, kind), []).append(row)
+        self._rows = {key: np.array(rows, dtype=np.int64) for key, rows in self._rows.items()}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _store_forward(self, row, waypoint):
+        forward = waypoint.transform.get_forward_vector()
+        self.forwards[row] = (forward.x, forward.y, forward.z)
+
+    @classmethod
+    def build(cls, world, wmap):
+        """
+        Computes the trigger waypoints of the traffic lights and stop signs of a world
+
+            :param world (carla.World): world with the traffic lights and stop signs
+            :param wmap (carla.Map): map of the world
+        """
+        actors, kinds, waypoints = [], [], []
+        all_actors = world.get_actors()
+        for kind, pattern in TRIGGER_KINDS:
+            for actor in all_actors.filter(pattern):
+                actors.append(actor)
+                kinds.append(kind)
+                waypoints.append(wmap.get_waypoint(get_trafficlight_trigger_location(actor)))
+        return cls(wmap, actors, kinds, [graph_cache.waypoint_key(w) for w in waypoints], waypoints)
+
+    @classmethod
+    def load(cls, path, world, wmap):
+        """
+        Builds the index from a cache file, matching the cached triggers with the actors
+        of the world by their location. Returns None if the file doesn't exist, can't be
+        used or doesn't match the actors of the world.
+
+            :param path (str): cache file
+            :param world (carla.World): world with the traffic lights and stop signs
+            :param wmap (carla.Map): map of the world
+        """
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'rb') as cache_file:
+                content = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if content.get('version') != TRIGGER_CACHE_VERSION:
+            return None
+
+        triggers = content['triggers']
+        actors, kinds, keys = [], [], []
+        all_actors = world.get_actors()
+        for kind, pattern in TRIGGER_KINDS:
+            for actor in all_actors.filter(pattern):
+                key = triggers.get((kind, _location_key(actor.get_location())))
+                if key is None:
+                    return None
+                actors.append(actor)
+                kinds.append(kind)
+                keys.append(key)
+        return cls(wmap, actors, kinds, keys)
+
+    @classmethod
+    def for_world(cls, world, wmap, cache_dir=None):
+        """
+        Returns the index shared by every agent of the process for a world, building
+        it, or loading it from the cache folder, the first time. The index is shared
+        for as long as some agent holds it.
+
+            :param world (carla.World): world with the traffic lights and stop signs
+            :param wmap (carla.Map): map of the world
+            :param cache_dir (str): if given, folder where the index of the map is cached
+        """
+        key = (world.id, wmap.name)
+        with _instances_lock:
+            index = _instances.get(key)
+            if index is not None:
+                return index
+            index = None
+            path = trigger_cache_path(cache_dir, wmap) if cache_dir is not None else None
+            if path is not None:
+                index = cls.load(path, world, wmap)
+            if index is None:
+                index = cls.build(world, wmap)
+                if path is not None:
+                    try:
+                        index.save(path)
+                    except (IOError, OSError) as error:
+                        print("WARNING: Couldn't save the trigger index cache: {}".format(error))
+            _instances[key] = index
+            return index
+
+    def save(self, path):
+        """
+        Stores the trigger waypoints, keyed by the location of their actors. The file is
+        written under a temporary name and then moved, as the route planner graph cache.
+
+            :param path (str): destination file
+        """
+        content = {
+            'version': TRIGGER_CACHE_VERSION,
+            'triggers': {(kind, _location_key(actor.get_location())): key
+                         for actor, kind, key in zip(self.actors, self.kinds, self._keys)}
+        }
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, 'wb') as cache_file:
+            pickle.dump(content, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def waypoint(self, row):
+        """
+        Returns the trigger waypoint of a row, resolving it the first time if it was cached
+
+            :param row (int): row of the trigger
+        """
+        waypoint = self._waypoints[row]
+        if waypoint is None:
+            with self._lock:
+                waypoint = self._waypoints[row]
+                if waypoint is None:
+                    waypoint = self._resolver(self._keys[row])
+                    self._store_forward(row, waypoint)
+                    self._waypoints[row] = waypoint
+        return waypoint
+
+    def rows(self, road_ids, kind='traffic_light'):
+        """
+        Rows of the triggers of a kind on some roads, in the order of the index
+
+            :param road_ids: road id, or sequence of road ids
+            :param kind (str): 'traffic_light' or 'stop'
+        """
+        if np.isscalar(road_ids):
+            return self._rows.get((int(road_ids), kind), np.zeros(0, dtype=np.int64))
+        rows = [self._rows[(int(road_id), kind)] for road_id in road_ids if (int(road_id), kind) in self._rows]
+        return np.sort(np.concatenate(rows)) if rows else np.zeros(0, dtype=np.int64)
+
+    def query(self, road_ids, location, forward, max_distance, kind='traffic_light'):
+        """
+        Rows of the triggers on some roads that are within a distance of a location, as
+        carla.Location.distance measures it, and that point in the same direction as a
+        forward vector
+
+            :param road_ids: road id, or sequence of road ids
+            :param location (carla.Location): reference location
+            :param forward (carla.Vector3D): forward vector of the reference
+            :param max_distance (float): maximum distance to the trigger waypoints
+            :param kind (str): 'traffic_light' or 'stop'
+        """
+        rows = self.rows(road_ids, kind)
+        if len(rows) == 0:
+            return rows
+        for row in rows.tolist():
+            if self._waypoints[row] is None:
+                self.waypoint(row)
+        offsets = (self.locations[rows] - (location.x, location.y, location.z)).astype(np.float32)
+        distances = np.sqrt(np.sum(np.square(offsets), axis=1))
+        directions = self.forwards[rows]
+        dots = directions[:, 0] * forward.x + directions[:, 1] * forward.y + directions[:, 2] * forward.z
+        return rows[(distances <= max_distance) & (dots >= 0)]
@@ -0,0 +1,168 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides the whole-route version of GlobalRoutePlanner._turn_decision.
+
+The vectors and flags of every graph edge are gathered into arrays once. The turn of
+every junction of a route is then computed with a few vectorized operations, and only
+the carry-over of decisions across consecutive junction edges is resolved in a loop
+of scalar comparisons.
+"""
+
+import math
+
+import numpy as np
+
+# Values of agents.navigation.local_planner.RoadOption, kept as integers so that this
+# module doesn't depend on carla
+VOID = -1
+LEFT = 1
+RIGHT = 2
+STRAIGHT = 3
+LANEFOLLOW = 4
+
+
+class TurnClassifier(object):
+    """
+    Computes the RoadOption of every index of a route, as successive calls to
+    GlobalRoutePlanner._turn_decision over the same route would.
+    """
+
+    def __init__(self, graph, threshold=math.radians(35)):
+        """
+        :param graph (networkx.DiGraph): graph of the route planner
+        :param threshold (float): maximum deviation of a straight crossing, in radians
+        """
+        self.threshold = threshold
+        nan = np.full(3, np.nan)
+        self._edge_index = {}
+        types, intersections, exit_vectors, net_vectors = [], [], [], []
+        successors = {}
+        for n1, n2, data in graph.edges(data=True):
+            e = len(types)
+            self._edge_index[(n1, n2)] = e
+            types.append(int(data['type']))
+            intersections.append(bool(data['intersection']))
+            exit_vector = data.get('exit_vector')
+            exit_vectors.append(nan if exit_vector is None else np.asarray(exit_vector, dtype=np.float64))
+            net_vector = data.get('net_vector')
+            net_vectors.append(nan if net_vector is None else np.asarray(net_vector, dtype=np.float64))
+            successors.setdefault(n1, []).append((n2, e))
+
+        self._types = np.array(types, dtype=np.int64)
+        self._intersections = np.array(intersections, dtype=bool)
+        self._exit_vectors = np.array(exit_vectors).reshape(-1, 3)
+        self._net_vectors = np.array(net_vectors).reshape(-1, 3)
+        # Lane follow successors of each node, the candidates of the other exits of a junction
+        self._lane_follow_successors = {
+            node: [(n2, e) for n2, e in edges if types[e] == LANEFOLLOW]
+            for node, edges in successors.items()}
+
+    def classify(self, route, previous_decision=VOID, intersection_end_node=-1):
+        """
+        Returns the decisions of every index of a route but the last one.
+
+            :param route (list): node ids of the route
+            :param previous_decision (int): decision of the last call to _turn_decision
+            :param intersection_end_node (int): intersection end node of the last call
+            :return: tuple of (list of RoadOption values, or None where _turn_decision
+                returns None, final previous decision, final intersection end node)
+        """
+        count = len(route) - 1
+        if count <= 0:
+            return [], previous_decision, intersection_end_node
+
+        edges = np.array([self._edge_index[(route[i], route[i + 1])] for i in range(count)], dtype=np.int64)
+        types = self._types[edges]
+        lane_follow = types == LANEFOLLOW
+        junction = lane_follow & self._intersections[edges]
+
+        # Indices where a turn is computed: lane follow edge into a lane follow junction edge
+        calculate = np.zeros(count, dtype=bool)
+        calculate[1:] = lane_follow[:-1] & ~self._intersections[edges[:-1]] & junction[1:]
+
+        # Last index of the run of junction edges starting at each index
+        following = np.where(junction, count, np.arange(count))
+        run_end = np.minimum.accumulate(following[::-1])[::-1] - 1
+
+        turns = self._turns(route, edges, np.nonzero(calculate)[0], run_end)
+
+        decisions = []
+        for i in range(count):
+            if i == 0:
+                decision = int(types[0])
+            elif previous_decision != VOID and intersection_end_node > 0 \
+                    and intersection_end_node != route[i - 1] and junction[i]:
+                decision = previous_decision
+            else:
+                intersection_end_node = -1
+                if calculate[i]:
+                    intersection_end_node = route[run_end[i] + 1]
+                    decision, missing_vector = turns[i]
+                    if missing_vector:
+                        # _turn_decision returns without storing the decision
+                        decisions.append(decision)
+                        continue
+                else:
+                    decision = int(types[i])
+            previous_decision = decision
+            decisions.append(decision)
+        return decisions, previous_decision, intersection_end_node
+
+    def _turns(self, route, edges, indices, run_end):
+        """
+        Turn decision of every junction entry of a route, in one vectorized pass.
+        Returns a dictionary from route index to (decision, missing vector flag).
+        """
+        if len(indices) == 0:
+            return {}
+        current = self._exit_vectors[edges[indices - 1]]
+        tail_edges = edges[run_end[indices]]
+        following = self._exit_vectors[tail_edges]
+        missing = np.isnan(current).any(axis=1) | np.isnan(following).any(axis=1)
+
+        next_cross = current[:, 0] * following[:, 1] - current[:, 1] * following[:, 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cosine = np.einsum('ij,ij->i', current, following) / (
+                np.linalg.norm(current, axis=1) * np.linalg.norm(following, axis=1))
+            deviation = np.arccos(np.clip(cosine, -1.0, 1.0))
+
+        # Cross products with the other lane follow exits of each junction entry node
+        groups, others = [], []
+        for k, i in enumerate(indices.tolist()):
+            for neighbor, e in self._lane_follow_successors.get(route[i], []):
+                if neighbor != route[i + 1]:
+                    groups.append(k)
+                    others.append(e)
+        cross_min = np.zeros(len(indices))
+        cross_max = np.zeros(len(indices))
+        if others:
+            groups = np.array(groups)
+            vectors = self._net_vectors[others]
+            cross = current[groups, 0] * vectors[:, 1] - current[groups, 1] * vectors[:, 0]
+            valid = ~np.isnan(cross)
+            cross_min_found = np.full(len(indices), np.inf)
+            cross_max_found = np.full(len(indices), -np.inf)
+            np.minimum.at(cross_min_found, groups[valid], cross[valid])
+            np.maximum.at(cross_max_found, groups[valid], cross[valid])
+            found = np.isfinite(cross_min_found)
+            cross_min[found] = cross_min_found[found]
+            cross_max[found] = cross_max_found[found]
+
+        decision = np.select(
+            [deviation < self.threshold, next_cross < cross_min, next_cross > cross_max,
+             next_cross < 0, next_cross > 0],
+            [STRAIGHT, LEFT, RIGHT, LEFT, RIGHT], default=0)
+
+        tail_types = self._types[tail_edges]
+        turns = {}
+        for k, i in enumerate(indices.tolist()):
+            if missing[k]:
+                turns[i] = (int(tail_types[k]), True)
+            else:
+                turns[i] = (int(decision[k]) or None, False)
+        return turns
@@ -0,0 +1,287 @@
+# Copyright (c) # Copyright (c) 2018-2020 CVC.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+"""
+This module provides WorldState, a per tick snapshot of the actors of the world
+shared by all the agents of a client.
+
+The transforms and velocities of every actor are read once per frame from
+world.get_snapshot() and stored in NumPy arrays, so that the agents select and
+filter by distance their candidate obstacles with array operations instead of
+one get_transform() call per actor and per agent. The type id, bounding box and
+carla.Actor handle of each actor don't change during its lifetime, so they are
+requested only once, when the actor first appears in a snapshot.
+
+A uniform grid over the actor positions is rebuilt with each frame, so the
+neighbors of an agent are found at a cost that depends on the local density of
+actors and not on their total number.
+"""
+
+import threading
+from fnmatch import fnmatchcase
+
+import numpy as np
+
+import carla
+from agents.tools.spatial_index import UniformGrid
+
+
+def _make_transform(location, rotation):
+    """Builds a carla.Transform from a (x, y, z) and a (pitch, yaw, roll) row"""
+    x, y, z = location.tolist()
+    pitch, yaw, roll = rotation.tolist()
+    return carla.Transform(carla.Location(x=x, y=y, z=z), carla.Rotation(pitch=pitch, yaw=yaw, roll=roll))
+
+
+class WorldState(object):
+    """
+    Actors of one frame of the world, as arrays whose rows are sorted by actor id:
+
+        - ids: (N,) int array with the actor ids
+        - type_ids: (N,) object array with the blueprint ids of the actors
+        - locations: (N, 3) float32 array with the (x, y, z) of each actor
+        - rotations: (N, 3) float32 array with the (pitch, yaw, roll) of each actor, in degrees
+        - velocities: (N, 3) float32 array with the velocity of each actor, in m/s
+        - extents: (N, 3) float32 array with the half sizes of the bounding boxes
+        - actors: list with the carla.Actor of each row
+        - grid: UniformGrid over the (x, y) of the rows
+
+    The owner of the world calls update() once after each world.tick(). Agents given the
+    state call it too before reading, which only costs a frame check when the state is
+    already up to date, so it can also be used without an explicit update.
+    """
+
+    def __init__(self, world, cell_size=10.0):
+        """
+        :param world (carla.World): world whose actors are tracked
+        :param cell_size (float): side of the cells of the spatial grid, in meters
+        """
+        self._world = world
+        self._cell_size = cell_size
+        self._lock = threading.Lock()
+        # Actor id -> (carla.Actor, type id, carla.BoundingBox)
+        self._static = {}
+        self._masks = {}
+        self._light_states = {}
+
+        self.frame = None
+        self.timestamp = None
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.type_ids = np.zeros(0, dtype=object)
+        self.locations = np.zeros((0, 3), dtype=np.float32)
+        self.rotations = np.zeros((0, 3), dtype=np.float32)
+        self.velocities = np.zeros((0, 3), dtype=np.float32)
+        self.extents = np.zeros((0, 3), dtype=np.float32)
+        self.actors = []
+        self.bounding_boxes = []
+        self.grid = UniformGrid(self.locations, cell_size)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def update(self, snapshot=None):
+        """
+        Reads the actors of a snapshot, unless it is the frame already stored.
+        Returns whether the state changed.
+
+            :param snapshot (carla.WorldSnapshot): snapshot to read. If None, the
+                current snapshot of the world is used
+        """
+        if snapshot is None:
+            snapshot = self._world.get_snapshot()
+        with self._lock:
+            if snapshot.frame == self.frame:
+                return False
+
+            ids, poses, velocities = [], [], []
+            for actor_snapshot in snapshot:
+                transform = actor_snapshot.get_transform()
+                velocity = actor_snapshot.get_velocity()
+                ids.append(actor_snapshot.id)
+                poses.append((transform.location.x, transform.location.y, transform.location.z,
+                              transform.rotation.pitch, transform.rotation.yaw, transform.rotation.roll))
+                velocities.append((velocity.x, velocity.y, velocity.z))
+
+            # Static information of the actors spawned since the last frame
+            new_ids = [actor_id for actor_id in ids if actor_id not in self._static]
+            if new_ids:
+                for actor in self._world.get_actors(new_ids):
+                    self._static[actor.id] = (actor, actor.type_id, actor.bounding_box)
+            alive = set(ids)
+            for actor_id in [actor_id for actor_id in self._static if actor_id not in alive]:
+                del self._static[actor_id]
+
+            # Actors destroyed before their handle was requested are left out
+            rows = sorted((k for k, actor_id in enumerate(ids) if actor_id in self._static),
+                          key=lambda k: ids[k])
+            poses = np.array(poses, dtype=np.float32).reshape(-1, 6)[rows]
+            static = [self._static[ids[k]] for k in rows]
+
+            self.ids = np.array([ids[k] for k in rows], dtype=np.int64)
+            self.type_ids = np.array([type_id for _, type_id, _ in static], dtype=object)
+            self.locations = poses[:, :3]
+            self.rotations = poses[:, 3:]
+            self.velocities = np.array(velocities, dtype=np.float32).reshape(-1, 3)[rows]
+            self.extents = np.array([(bb.extent.x, bb.extent.y, bb.extent.z) for _, _, bb in static],
+                                    dtype=np.float32).reshape(-1, 3)
+            self.actors = [actor for actor, _, _ in static]
+            self.bounding_boxes = [bb for _, _, bb in static]
+            self.grid = UniformGrid(self.locations, self._cell_size)
+            self._masks = {}
+            self._light_states = {}
+            self.frame = snapshot.frame
+            self.timestamp = snapshot.timestamp
+        return True
+
+    def filter(self, wildcard_pattern):
+        """
+        Returns the actors whose type id matches a pattern, as carla.ActorList.filter does
+
+            :param wildcard_pattern (str): pattern such as "*vehicle*"
+        """
+        with self._lock:
+            mask = self._masks.get(wildcard_pattern)
+            if mask is None:
+                mask = np.array([fnmatchcase(type_id, wildcard_pattern) for type_id in self.type_ids], dtype=bool)
+                self._masks[wildcard_pattern] = mask
+            return ActorSet(self, np.nonzero(mask)[0])
+
+    def row(self, actor_id):
+        """
+        Returns the row of an actor, or -1 if it isn't in the state
+
+            :param actor_id (int): id of the actor
+        """
+        row = int(np.searchsorted(self.ids, actor_id))
+        if row < len(self.ids) and self.ids[row] == actor_id:
+            return row
+        return -1
+
+    def transform(self, row):
+        """
+        Builds the carla.Transform of a row
+
+            :param row (int): row of the actor
+        """
+        return _make_transform(self.locations[row], self.rotations[row])
+
+    def traffic_light_state(self, traffic_light):
+        """
+        Returns the state of a traffic light, requested once per frame and shared by all agents
+
+            :param traffic_light (carla.TrafficLight): traffic light
+        """
+        light_states = self._light_states
+        state = light_states.get(traffic_light.id)
+        if state is None:
+            state = traffic_light.state
+            light_states[traffic_light.id] = state
+        return state
+
+
+class ActorSet(object):
+    """
+    Subset of the rows of a WorldState. It keeps the arrays of the frame it was created
+    from, so it stays consistent if the state is updated while it is in use.
+
+    Iterating and indexing yield carla.Actor objects, so an ActorSet can be used where
+    a carla.ActorList is expected.
+    """
+
+    def __init__(self, state, rows):
+        self._state = state
+        self._ids = state.ids
+        self._locations = state.locations
+        self._rotations = state.rotations
+        self._actors = state.actors
+        self._bounding_boxes = state.bounding_boxes
+        self._grid = state.grid
+        self.rows = np.asarray(rows, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        for row in self.rows.tolist():
+            yield self._actors[row]
+
+    def __getitem__(self, index):
+        return self._actors[int(self.rows[index])]
+
+    @property
+    def ids(self):
+        """Actor ids of the set"""
+        return self._ids[self.rows]
+
+    def distances(self, location):
+        """
+        Distances of the actors of the set to a location, as carla.Location.distance computes them
+
+            :param location (carla.Location): reference location
+        """
+        point = np.array([location.x, location.y, location.z], dtype=np.float32)
+        return np.sqrt(np.sum(np.square(self._locations[self.rows] - point), axis=1))
+
+    def within(self, location, max_distance, strict=False):
+        """
+        Returns the actors of the set at most max_distance away from a location, using the
+        spatial grid and then the exact distances of the candidates.
+
+            :param location (carla.Location): reference location
+            :param max_distance (float): maximum distance to the location
+            :param strict (bool): if True, actors exactly at max_distance are left out
+        """
+        # The planar distance never exceeds the 3D one, the margin covers the float32 rounding
+        rows = self._grid.query_radius((location.x, location.y), max_distance + 1e-3, sort=False)
+        candidates = self._from_rows(np.intersect1d(self.rows, rows, assume_unique=True))
+        distances = candidates.distances(location)
+        return candidates.subset(distances < max_distance if strict else distances <= max_distance)
+
+    def within_sector(self, location, max_distance, forward, angle_interval):
+        """
+        Returns the actors of the set within a planar distance of a location and inside an
+        interval of angles around a direction, as misc.is_within_distance checks them.
+
+            :param location (carla.Location): apex of the sector
+            :param max_distance (float): radius of the sector
+            :param forward (carla.Vector3D): direction of the sector
+            :param angle_interval (list): [min, max] angles to the direction, in degrees
+        """
+        rows = self._grid.query_sector((location.x, location.y), max_distance,
+                                       (forward.x, forward.y), angle_interval)
+        return self._from_rows(np.intersect1d(self.rows, rows, assume_unique=True))
+
+    def _from_rows(self, rows):
+        """ActorSet of the same frame with other rows"""
+        subset = ActorSet.__new__(ActorSet)
+        subset.__dict__.update(self.__dict__)
+        subset.rows = np.asarray(rows, dtype=np.int64)
+        return subset
+
+    def subset(self, mask):
+        """
+        Returns the actors of the set selected by a boolean mask
+
+            :param mask (numpy.ndarray): one flag per actor of the set
+        """
+        return self._from_rows(self.rows[np.asarray(mask, dtype=bool)])
+
+    def transform(self, index):
+        """
+        Builds the carla.Transform of an actor of the set
+
+            :param index (int): position of the actor in the set
+        """
+        row = int(self.rows[index])
+        return _make_transform(self._locations[row], self._rotations[row])
+
+    def bounding_box(self, index):
+        """
+        Returns the carla.BoundingBox of an actor of the set
+
+            :param index (int): position of the actor in the set
+        """
+        return self._bounding_boxes[int(self.rows[index])]
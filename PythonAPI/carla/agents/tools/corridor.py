@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Module with vectorized 2D intersection tests between oriented boxes and route corridors.
+
+A corridor is given by the right and left boundary points of consecutive route
+positions. It is split into a strip of triangles, two per pair of consecutive
+positions, which stay convex even where the boundaries fold on tight turns. Boxes
+are tested against every triangle at once with the separating axis theorem, after
+discarding the pairs whose axis aligned bounds don't overlap.
+"""
+
+import numpy as np
+
+
+def rotation_matrices(rotations):
+    """
+    Rotation matrices of (pitch, yaw, roll) angles, as carla.Rotation.rotate_vector applies them
+
+        :param rotations: (N, 3) array of (pitch, yaw, roll), in degrees
+        :return: (N, 3, 3) array, the columns being the forward, right and up vectors
+    """
+    pitch, yaw, roll = np.radians(np.asarray(rotations, dtype=np.float64).reshape(-1, 3)).T
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cr, sr = np.cos(roll), np.sin(roll)
+    return np.stack([
+        np.stack([cp * cy, cy * sp * sr - sy * cr, -cy * sp * cr - sy * sr], axis=-1),
+        np.stack([cp * sy, sy * sp * sr + cy * cr, -sy * sp * cr + cy * sr], axis=-1),
+        np.stack([sp, -cp * sr, cp * cr], axis=-1)], axis=1)
+
+
+# Corners of a unit box, in the order of carla.BoundingBox.get_local_vertices
+_UNIT_CORNERS = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64)
+
+
+def box_vertices(locations, rotations, extents, box_locations=None, box_rotations=None):
+    """
+    World vertices of bounding boxes, as carla.BoundingBox.get_world_vertices computes them
+
+        :param locations: (N, 3) array with the locations of the actors
+        :param rotations: (N, 3) array with the (pitch, yaw, roll) of the actors, in degrees
+        :param extents: (N, 3) array with the half sizes of the boxes
+        :param box_locations: (N, 3) array with the centers of the boxes relative to the actors
+        :param box_rotations: (N, 3) array with the rotations of the boxes relative to the actors
+        :return: (N, 8, 3) array
+    """
+    extents = np.asarray(extents, dtype=np.float64).reshape(-1, 3)
+    local = _UNIT_CORNERS * extents[:, np.newaxis, :]
+    if box_rotations is not None:
+        local = np.einsum('nij,nvj->nvi', rotation_matrices(box_rotations), local)
+    if box_locations is not None:
+        local = local + np.asarray(box_locations, dtype=np.float64).reshape(-1, 1, 3)
+    world = np.einsum('nij,nvj->nvi', rotation_matrices(rotations), local)
+    return world + np.asarray(locations, dtype=np.float64).reshape(-1, 1, 3)
+
+
+def corridor_triangles(right, left):
+    """
+    Triangle strip covering the quads between consecutive boundary points
+
+        :param right: (K, 2) or (K, 3) array with the right boundary points
+        :param left: (K, 2) or (K, 3) array with the left boundary points
+        :return: (2 * (K - 1), 3, 2) array
+    """
+    right = np.asarray(right, dtype=np.float64).reshape(-1, np.shape(right)[-1])[:, :2]
+    left = np.asarray(left, dtype=np.float64).reshape(-1, np.shape(left)[-1])[:, :2]
+    if len(right) < 2:
+        return np.zeros((0, 3, 2))
+    first = np.stack([right[:-1], left[:-1], left[1:]], axis=1)
+    second = np.stack([right[:-1], left[1:], right[1:]], axis=1)
+    return np.concatenate([first, second])
+
+
+def _separating_axes(polygons, solid=False):
+    """
+    Candidate separating axes of each polygon, (..., A, 2). The footprint of a 3D box
+    given by its 8 vertices ('solid') only has edges parallel to the projections of the
+    3 box edges, for any other polygon the segments between every pair of vertices are used.
+    """
+    count = polygons.shape[-2]
+    if solid:
+        first, second = np.array([0, 0, 0]), np.array([4, 2, 1])
+    else:
+        first, second = np.triu_indices(count, 1)
+    directions = polygons[..., second, :] - polygons[..., first, :]
+    return np.stack([-directions[..., 1], directions[..., 0]], axis=-1)
+
+
+def convex_intersections(boxes, polygons):
+    """
+    Checks which boxes touch or overlap any of a set of convex polygons, in 2D.
+
+    The vertices of the polygons don't need to be ordered. Boxes are either planar
+    convex polygons, or (M, 8, 3) arrays with the vertices of 3D boxes in the order of
+    box_vertices, whose planar footprint is their convex hull.
+
+        :param boxes: (M, V, 2) or (M, 8, 3) array with the vertices of each box
+        :param polygons: (T, P, 2) array with the vertices of each convex polygon
+        :return: (M,) boolean array
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    solid = boxes.shape[1:] == (8, 3)
+    boxes = boxes[..., :2]
+    polygons = np.asarray(polygons, dtype=np.float64)[..., :2]
+    hits = np.zeros(len(boxes), dtype=bool)
+    if len(boxes) == 0 or len(polygons) == 0:
+        return hits
+
+    # Broad phase with the axis aligned bounds
+    box_min, box_max = boxes.min(axis=1), boxes.max(axis=1)
+    polygon_min, polygon_max = polygons.min(axis=1), polygons.max(axis=1)
+    overlap = np.all((box_min[:, np.newaxis] <= polygon_max[np.newaxis]) &
+                     (polygon_min[np.newaxis] <= box_max[:, np.newaxis]), axis=-1)
+    box_ids, polygon_ids = np.nonzero(overlap)
+    if len(box_ids) == 0:
+        return hits
+
+    # Narrow phase, the pair is separated if their projections are disjoint on any axis
+    box_points, polygon_points = boxes[box_ids], polygons[polygon_ids]
+    axes = np.concatenate([_separating_axes(box_points, solid), _separating_axes(polygon_points)], axis=1)
+    box_projection = np.einsum('pad,pvd->pav', axes, box_points)
+    polygon_projection = np.einsum('pad,pvd->pav', axes, polygon_points)
+    separated = np.any((box_projection.max(axis=-1) < polygon_projection.min(axis=-1)) |
+                       (polygon_projection.max(axis=-1) < box_projection.min(axis=-1)), axis=-1)
+    hits[box_ids[~separated]] = True
+    return hits
+
+
+def boxes_intersect_corridor(boxes, right, left):
+    """
+    Checks which boxes touch or overlap the corridor between two boundaries
+
+        :param boxes: (M, V, 2) or (M, 8, 3) array with the vertices of each box
+        :param right: (K, 2) or (K, 3) array with the right boundary points
+        :param left: (K, 2) or (K, 3) array with the left boundary points
+        :return: (M,) boolean array
+    """
+    return convex_intersections(boxes, corridor_triangles(right, left))
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Module with a writer that saves sensor data to disk outside of the sensor callbacks.
+
+The callbacks only hand a buffer over to a bounded queue. A dispatcher thread feeds
+the queue to a pool of worker processes, which encode and write the files.
+"""
+
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from agents.tools.sensor_views import bgra_view, lidar_view, semantic_lidar_view
+
+# Formats the writer can encode, by file extension
+WRITER_FORMATS = {'.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg', '.npy': 'npy', '.ply': 'ply'}
+
+# What to do when the queue is full: wait for room, or drop the newest or the oldest item
+WRITER_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+# Type of each numpy kind and size in the PLY format
+_PLY_TYPES = {
+    ('f', 4): 'float', ('f', 8): 'double',
+    ('u', 1): 'uchar', ('u', 2): 'ushort', ('u', 4): 'uint',
+    ('i', 1): 'char', ('i', 2): 'short', ('i', 4): 'int'}
+
+_STOP = object()
+
+
+def _png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+
+def encode_png(array, compress_level=1):
+    """
+    Returns the bytes of a PNG image
+
+        :param array (numpy.ndarray): (height, width) gray, (height, width, 3) RGB or
+            (height, width, 4) RGBA image of uint8 or uint16
+        :param compress_level (int): zlib compression level, from 0 to 9
+    """
+    channels = array.shape[2] if array.ndim == 3 else (1 if array.ndim == 2 else None)
+    color_types = {1: 0, 3: 2, 4: 6}
+    if channels not in color_types or array.dtype not in (np.uint8, np.uint16):
+        raise ValueError("Can't encode a {} array of {} as PNG".format(array.shape, array.dtype))
+    height, width = array.shape[:2]
+    rows = np.ascontiguousarray(array, dtype='>u2' if array.dtype == np.uint16 else np.uint8)
+    rows = rows.reshape(height, -1).view(np.uint8)
+    # Each row starts with the byte of its filter, none
+    scanlines = np.zeros((height, rows.shape[1] + 1), dtype=np.uint8)
+    scanlines[:, 1:] = rows
+    header = struct.pack('>IIBBBBB', width, height, array.dtype.itemsize * 8, color_types[channels], 0, 0, 0)
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'IDAT', zlib.compress(scanlines.tobytes(), compress_level)),
+        _png_chunk(b'IEND', b'')])
+
+
+def encode_ply(points):
+    """
+    Returns the bytes of a binary PLY point cloud
+
+        :param points (numpy.ndarray): structured array with one field per property, such
+            as those of sensor_views.lidar_view, or an (N, 3) or (N, 4) array of x, y, z
+            and intensity
+    """
+    if points.dtype.names is None:
+        names = ('x', 'y', 'z', 'intensity')[:points.shape[1]]
+        points = np.ascontiguousarray(points, dtype=np.float32).view(
+            np.dtype([(name, np.float32) for name in names])).reshape(-1)
+    properties = []
+    for name in points.dtype.names:
+        field = points.dtype.fields[name][0]
+        if (field.kind, field.itemsize) not in _PLY_TYPES:
+            raise ValueError("Can't write the field '{}' of {} to PLY".format(name, field))
+        properties.append('property {} {}'.format(_PLY_TYPES[(field.kind, field.itemsize)], name))
+    header = '\n'.join(['ply', 'format binary_little_endian 1.0', 'element vertex {}'.format(len(points))] +
+                       properties + ['end_header', ''])
+    little_endian = np.dtype([(name, points.dtype.fields[name][0].newbyteorder('<'))
+                              for name in points.dtype.names])
+    return header.encode('ascii') + np.ascontiguousarray(points.astype(little_endian)).tobytes()
+
+
+def encode_jpeg(array, quality=90):
+    """
+    Returns the bytes of a JPEG image, with Pillow
+
+        :param array (numpy.ndarray): (height, width) gray or (height, width, 3) RGB image
+        :param quality (int): JPEG quality, from 1 to 95
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError('cannot import PIL, make sure "Pillow" package is installed')
+    import io
+    stream = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(array)).save(stream, format='JPEG', quality=quality)
+    return stream.getvalue()
+
+
+def write_file(path, fmt, array, options):
+    """
+    Encodes an array and writes it to a file, returning the number of bytes written. The
+    file is written under a temporary name first, so that readers never see it half done.
+
+        :param path (str): path of the file, its folders are created if needed
+        :param fmt (str): one of the values of WRITER_FORMATS
+        :param array (numpy.ndarray): data to write
+        :param options (dict): 'bgra' to convert a BGRA image to RGB, 'compress_level'
+            for PNG and 'quality' for JPEG
+    """
+    if options.get('bgra'):
+        array = array[:, :, 2::-1]
+    if fmt == 'png':
+        data = encode_png(array, options.get('compress_level', 1))
+    elif fmt == 'jpeg':
+        data = encode_jpeg(array, options.get('quality', 90))
+    elif fmt == 'ply':
+        data = encode_ply(array)
+    elif fmt == 'npy':
+        data = None
+    else:
+        raise ValueError("Unknown format '{}'".format(fmt))
+
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder, exist_ok=True)
+    temporary = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary, 'wb') as stream:
+        if data is None:
+            np.save(stream, np.ascontiguousarray(array))
+        else:
+            stream.write(data)
+        size = stream.tell()
+    os.replace(temporary, path)
+    return size
+
+
+class DatasetWriter(object):
+    """
+    Writes sensor data to disk from a pool of worker processes, so that the sensor
+    callbacks, and the ticks of a synchronous simulation, don't wait for the encoding and
+    the disk. Items wait in a bounded queue. When it is full the policy either blocks the
+    callback until there is room, or drops the newest or the oldest item.
+
+        with DatasetWriter(workers=4) as writer:
+            camera.listen(lambda image: writer.write_image('_out/%08d.png' % image.frame, image))
+            ...
+
+    Closing the writer, or leaving the context, writes everything still queued.
+    """
+
+    def __init__(self, workers=2, max_pending=64, policy='block', executor=None):
+        """
+        :param workers (int): number of worker processes
+        :param max_pending (int): size of the queue of items waiting for a worker
+        :param policy (str): one of WRITER_POLICIES
+        :param executor: concurrent.futures executor to use instead of a new process pool,
+            which is left running on close
+        """
+        if policy not in WRITER_POLICIES:
+            raise ValueError("Unknown policy '{}', expected one of {}".format(policy, WRITER_POLICIES))
+        if max_pending < 1:
+            raise ValueError("The writer needs room for at least one pending item")
+        self.policy = policy
+        self._owns_executor = executor is None
+        self._executor = ProcessPoolExecutor(max_workers=workers) if executor is None else executor
+        self._queue = queue.Queue(max_pending)
+        # Items submitted to the executor at once, enough to keep every worker busy
+        self._slots = threading.Semaphore(2 * workers)
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.last_error = None
+        self._in_flight = 0
+        self._started = None
+        self._finished = None
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name='DatasetWriter')
+        self._dispatcher.daemon = True
+        self._dispatcher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def write(self, path, array, fmt=None, **options):
+        """
+        Queues an array to be written, returning whether it was accepted
+
+            :param path (str): path of the file
+            :param array (numpy.ndarray): data to write, kept by reference until written
+            :param fmt (str): one of the values of WRITER_FORMATS, from the extension of
+                the path by default
+            :param options: options of write_file
+        """
+        if self._closed:
+            raise RuntimeError("The dataset writer is closed")
+        if fmt is None:
+            extension = os.path.splitext(path)[1].lower()
+            if extension not in WRITER_FORMATS:
+                raise ValueError("Unknown file extension '{}', expected one of {}".format(
+                    extension, sorted(WRITER_FORMATS)))
+            fmt = WRITER_FORMATS[extension]
+        item = (path, fmt, array, options)
+        with self._condition:
+            if self._started is None:
+                self._started = time.time()
+
+        if self.policy == 'block':
+            self._queue.put(item)
+        elif self.policy == 'drop_newest':
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._count_drop()
+                return False
+        else:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                    except queue.Empty:
+                        continue
+                    self._queue.task_done()
+                    self._count_drop()
+        with self._condition:
+            self.submitted += 1
+        return True
+
+    def write_image(self, path, image, fmt=None, **options):
+        """
+        Queues a carla.Image to be written in RGB, without copying its buffer here
+
+            :param path (str): path of the file
+            :param image (carla.Image): camera image, already converted if needed
+            :param fmt (str): format of the file, from the extension of the path by default
+        """
+        return self.write(path, bgra_view(image), fmt, bgra=True, **options)
+
+    def write_point_cloud(self, path, measurement, semantic=False, fmt=None):
+        """
+        Queues the points of a lidar measurement to be written, without copying its buffer
+        here
+
+            :param path (str): path of the file, usually .ply or .npy
+            :param measurement: carla.LidarMeasurement or carla.SemanticLidarMeasurement
+            :param semantic (bool): whether the measurement is of a semantic lidar
+            :param fmt (str): format of the file, from the extension of the path by default
+        """
+        points = semantic_lidar_view(measurement) if semantic else lidar_view(measurement)
+        return self.write(path, points, fmt)
+
+    def flush(self, timeout=None):
+        """
+        Waits until every accepted item is written, returning whether it finished in time
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        with self._condition:
+            while self._in_flight:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self):
+        """
+        Writes everything still queued and stops the dispatcher, and the pool if it owns it
+        """
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(_STOP)
+        self._dispatcher.join()
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def stats(self):
+        """
+        Returns a dictionary with the depth of the queue, the counters of the items and the
+        throughput of the writes
+        """
+        with self._condition:
+            elapsed = (self._finished - self._started) if self._finished is not None else 0.0
+            return {
+                'queued': self._queue.qsize(),
+                'in_flight': self._in_flight,
+                'submitted': self.submitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'bytes': self.bytes_written,
+                'files_per_second': self.written / elapsed if elapsed > 0 else 0.0,
+                'bytes_per_second': self.bytes_written / elapsed if elapsed > 0 else 0.0
+            }
+
+    def _count_drop(self):
+        with self._condition:
+            self.dropped += 1
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            self._slots.acquire()
+            with self._condition:
+                self._in_flight += 1
+            try:
+                future = self._executor.submit(write_file, *item)
+            except Exception as error:  # pylint: disable=broad-except
+                self._slots.release()
+                self._record(error=error)
+            else:
+                future.add_done_callback(self._done)
+            self._queue.task_done()
+
+    def _done(self, future):
+        self._slots.release()
+        try:
+            size = future.result()
+        except Exception as error:  # pylint: disable=broad-except
+            self._record(error=error)
+        else:
+            self._record(size=size)
+
+    def _record(self, size=0, error=None):
+        with self._condition:
+            self._in_flight -= 1
+            if error is None:
+                self.written += 1
+                self.bytes_written += size
+            else:
+                self.failed += 1
+                self.last_error = error
+            self._finished = time.time()
+            self._condition.notify_all()
@@ -51,7 +51,7 @@ else:
     else:
         # 定义命名元组 ObstacleDetectionResult，适用于 Python 3.6 及以上版本
         ObstacleDetectionResult = NamedTuple('ObstacleDetectionResult', [('obstacle_was_found', bool), ('obstacle', Union[Actor, None]), ('distance', float)])
-     # 定义命名元组 TrafficLightDetectionResult，表示交通灯检测结果
-     # - traffic_light_was_found: 布尔值，表示是否发现交通灯
-     # - traffic_light: 如果发现交通灯，则为 TrafficLight 对象，否则为 None
-     TrafficLightDetectionResult = NamedTuple('TrafficLightDetectionResult', [('traffic_light_was_found', bool), ('traffic_light', Union[TrafficLight, None])])
+    # 定义命名元组 TrafficLightDetectionResult，表示交通灯检测结果
+    # - traffic_light_was_found: 布尔值，表示是否发现交通灯
+    # - traffic_light: 如果发现交通灯，则为 TrafficLight 对象，否则为 None
+    TrafficLightDetectionResult = NamedTuple('TrafficLightDetectionResult', [('traffic_light_was_found', bool), ('traffic_light', Union[TrafficLight, None])])
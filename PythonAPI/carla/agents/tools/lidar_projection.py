@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Module with the projection of lidar points onto the image of a camera.
+
+The calibration is folded into a single 3x4 matrix, built once while the sensors stay
+rigidly attached, so that projecting a point cloud is one matrix product. The points are
+drawn into the image in place, keeping the nearest point of every pixel.
+"""
+
+import numpy as np
+
+# Axes of the camera from the axes of Unreal: x right, y down and z forward
+_UNREAL_TO_CAMERA = np.array([
+    [0.0, 1.0, 0.0, 0.0],
+    [0.0, 0.0, -1.0, 0.0],
+    [1.0, 0.0, 0.0, 0.0]])
+
+
+def build_intrinsics(width, height, fov):
+    """
+    Returns the 3x3 intrinsic matrix K of a CARLA camera
+
+        :param width (int): width of the image, in pixels
+        :param height (int): height of the image, in pixels
+        :param fov (float): horizontal field of view, in degrees
+    """
+    focal = width / (2.0 * np.tan(fov * np.pi / 360.0))
+    intrinsics = np.identity(3)
+    intrinsics[0, 0] = intrinsics[1, 1] = focal
+    intrinsics[0, 2] = width / 2.0
+    intrinsics[1, 2] = height / 2.0
+    return intrinsics
+
+
+def build_lut(colors, size=256):
+    """
+    Returns a (size, channels) uint8 lookup table that samples a color map evenly
+
+        :param colors (numpy.ndarray): (N, channels) colors of the map, with values
+            from 0 to 1, such as matplotlib.cm.get_cmap('viridis').colors
+        :param size (int): number of entries of the table
+    """
+    colors = np.asarray(colors, dtype=np.float64)
+    samples = np.linspace(0.0, 1.0, size)
+    steps = np.linspace(0.0, 1.0, len(colors))
+    lut = [np.interp(samples, steps, colors[:, channel]) for channel in range(colors.shape[1])]
+    return np.round(np.stack(lut, axis=1) * 255.0).astype(np.uint8)
+
+
+class Projector(object):
+    """
+    Projects the points of a lidar onto the image of a camera and draws them into it.
+    Build it once per pair of sensors. If they move relative to each other, update the
+    extrinsic matrix every frame with set_extrinsic.
+
+        projector = Projector(width, height, fov, np.dot(camera_transform.get_inverse_matrix(),
+                                                         lidar_transform.get_matrix()))
+        projector.draw_values(image, xyz_view(points), points['intensity'], lut)
+    """
+
+    def __init__(self, width, height, fov, lidar_to_camera=None, near=0.1):
+        """
+        :param width (int): width of the image, in pixels
+        :param height (int): height of the image, in pixels
+        :param fov (float): horizontal field of view of the camera, in degrees
+        :param lidar_to_camera (numpy.ndarray): 4x4 matrix from the lidar to the camera,
+            both in Unreal axes, the identity if None
+        :param near (float): points closer to the camera, in meters, are not drawn
+        """
+        self.width = width
+        self.height = height
+        self.near = near
+        self.intrinsics = build_intrinsics(width, height, fov)
+        # Nearest depth of every pixel, kept at infinity between frames
+        self._zbuffer = np.full(width * height, np.inf, dtype=np.float32)
+        self.set_extrinsic(np.identity(4) if lidar_to_camera is None else lidar_to_camera)
+
+    def set_extrinsic(self, lidar_to_camera):
+        """
+        Sets the 4x4 matrix from the lidar to the camera, for instance
+        np.dot(camera.get_transform().get_inverse_matrix(), lidar.get_transform().get_matrix())
+        """
+        self.extrinsic = np.array(lidar_to_camera, dtype=np.float64).reshape(4, 4)
+        # Rows of u * depth, v * depth and depth
+        self.matrix = np.dot(self.intrinsics, np.dot(_UNREAL_TO_CAMERA, self.extrinsic))
+        self._rotation = self.matrix[:, :3].astype(np.float32)
+        self._translation = self.matrix[:, 3:].astype(np.float32)
+
+    def project(self, xyz):
+        """
+        Returns the (N, 3) float32 array of the pixel coordinates u and v and the depth
+        of the points, in meters along the axis of the camera
+
+            :param xyz (numpy.ndarray): (N, 3) points in the coordinates of the lidar
+        """
+        rows = self._camera_rows(xyz)
+        rows[:2] /= rows[2]
+        return rows.T
+
+    def visible(self, xyz):
+        """
+        Returns the integer pixel coordinates u and v, the depth and the position in xyz
+        of the points in front of the camera and inside the image
+
+            :param xyz (numpy.ndarray): (N, 3) points in the coordinates of the lidar
+        """
+        u, v, depth = self._camera_rows(xyz)
+        # 0 <= u < width without dividing every point by its depth
+        mask = depth > self.near
+        mask &= u >= 0.0
+        mask &= v >= 0.0
+        limit = depth * self.width
+        mask &= u < limit
+        np.multiply(depth, self.height, out=limit)
+        mask &= v < limit
+        index = np.flatnonzero(mask)
+        depth = depth[index]
+        u = np.minimum((u[index] / depth).astype(np.int32), self.width - 1)
+        v = np.minimum((v[index] / depth).astype(np.int32), self.height - 1)
+        return u, v, depth, index
+
+    def draw(self, image, xyz, colors, extent=0):
+        """
+        Draws the points into the image in place, each pixel taking the color of its
+        nearest point. Returns the number of points drawn.
+
+            :param image (numpy.ndarray): (height, width, channels) image, any layout
+            :param xyz (numpy.ndarray): (N, 3) points in the coordinates of the lidar
+            :param colors (numpy.ndarray): (N, channels) colors of the points, or the
+                (channels,) color of all of them
+            :param extent (int): points are drawn as squares of 2 * extent pixels if
+                greater than 0, as single pixels otherwise
+        """
+        u, v, depth, index = self.visible(xyz)
+        self._splat(image, u, v, depth, np.asarray(colors), index, extent)
+        return len(index)
+
+    def draw_values(self, image, xyz, values, lut, low=0.0, high=1.0, extent=0):
+        """
+        Draws the points into the image in place, colored by a value such as their
+        intensity. Only the values of the visible points are looked up. Returns the
+        number of points drawn.
+
+            :param image (numpy.ndarray): (height, width, channels) image, any layout
+            :param xyz (numpy.ndarray): (N, 3) points in the coordinates of the lidar
+            :param values (numpy.ndarray): (N,) values of the points
+            :param lut (numpy.ndarray): (size, channels) lookup table, see build_lut
+            :param low (float): value of the first color of the table
+            :param high (float): value of the last color of the table
+            :param extent (int): size of the points, as in draw
+        """
+        u, v, depth, index = self.visible(xyz)
+        scaled = np.asarray(values)[index].astype(np.float32)
+        scaled -= low
+        scaled *= (len(lut) - 1) / float(high - low)
+        np.clip(scaled, 0, len(lut) - 1, out=scaled)
+        colors = np.take(lut, scaled.astype(np.intp), axis=0)
+        self._splat(image, u, v, depth, colors, None, extent)
+        return len(index)
+
+    def _camera_rows(self, xyz):
+        """Returns the (3, N) rows of u * depth, v * depth and depth of the points"""
+        # Row by row, the operations that follow run on contiguous memory
+        rows = np.matmul(self._rotation, np.asarray(xyz).T)
+        rows += self._translation
+        return rows
+
+    def _splat(self, image, u, v, depth, colors, rows, extent):
+        """Draws points at pixels u and v, with the given rows of colors, all of them if None"""
+        if extent > 0:
+            # Same squares as the slices [v - extent:v + extent, u - extent:u + extent]
+            offsets = np.arange(-extent, extent, dtype=np.int32)
+            du, dv = (grid.ravel() for grid in np.meshgrid(offsets, offsets))
+            u = (u[:, None] + du).ravel()
+            v = (v[:, None] + dv).ravel()
+            point = np.repeat(np.arange(len(depth)), len(du))
+            inside = np.flatnonzero((u >= 0) & (u < self.width) & (v >= 0) & (v < self.height))
+            u, v, point = u[inside], v[inside], point[inside]
+            depth = depth[point]
+            rows = point if rows is None else rows[point]
+        pixel = v.astype(np.intp) * self.width + u
+        np.minimum.at(self._zbuffer, pixel, depth)
+        front = np.flatnonzero(depth <= self._zbuffer[pixel])
+        self._zbuffer[pixel] = np.inf
+        rows = front if rows is None else rows[front]
+        channels = image.shape[2]
+        if image.flags.c_contiguous:
+            pixel = pixel[front]
+            pixel *= channels
+        else:
+            u, v = u[front], v[front]
+        # Channel by channel, fancy indexing moves single bytes much faster than rows of them
+        for channel in range(min(channels, colors.shape[-1])):
+            color = colors[rows, channel] if colors.ndim == 2 else colors[channel]
+            if image.flags.c_contiguous:
+                np.put(image.reshape(-1), pixel + channel, color)
+            else:
+                image[:, :, channel][v, u] = color
@@ -16,6 +16,15 @@ import carla
 _EPS = np.finfo(float).eps
 
 
+def _points(points, dimensions):
+    """
+    Returns the first coordinates of a point or an array of points as an (N, dimensions)
+    float array, N being 1 for a single point
+    """
+    points = np.asarray(points, dtype=np.float64)
+    return points.reshape(-1, points.shape[-1])[:, :dimensions]
+
+
 def draw_waypoints(world, waypoints, z=0.5):
     """
     Draw a list of waypoints at a certain height given in z.
@@ -46,8 +55,19 @@ def get_speed(vehicle):
     """
     # 获取车辆的速度向量
     vel = vehicle.get_velocity()
-    # 计算车辆的速度大小并转换为千米/小时
-    return 3.6 * math.sqrt(vel.x ** 2 + vel.y ** 2 + vel.z ** 2)
+    # 计算车辆的速度大小并转换为千米/小时，与get_speed_array的公式相同
+    return 3.6 * math.sqrt(vel.x * vel.x + vel.y * vel.y + vel.z * vel.z)
+
+
+def get_speed_array(velocities):
+    """
+    Compute the speeds of several vehicles in Km/h.
+
+        :param velocities: (N, 3) array with the velocity vectors, in m/s  # 速度向量数组
+        :return: (N,) array with the speeds in Km/h  # 以千米/小时为单位的速度数组
+    """
+    vel = _points(velocities, 3)
+    return 3.6 * np.sqrt(vel[:, 0] * vel[:, 0] + vel[:, 1] * vel[:, 1] + vel[:, 2] * vel[:, 2])
 
 
 def get_trafficlight_trigger_location(traffic_light):
@@ -93,13 +113,10 @@ def is_within_distance(target_transform, reference_transform, max_distance, angl
     :param angle_interval: only locations between [min, max] angles will be considered. This isn't checked by default.  # 可选的角度范围，默认为 None
     :return: boolean  # 是否在距离和角度范围内
     """
-    # 计算目标位置和参考位置的向量
-    target_vector = np.array([
-        target_transform.location.x - reference_transform.location.x,
-        target_transform.location.y - reference_transform.location.y
-    ])
-    # 计算目标向量的范数
-    norm_target = np.linalg.norm(target_vector)
+    # 计算目标位置和参考位置的向量及其范数，与is_within_distance_array的公式相同
+    x = target_transform.location.x - reference_transform.location.x
+    y = target_transform.location.y - reference_transform.location.y
+    norm_target = math.sqrt(x * x + y * y)
     # 如果向量长度太小，认为在范围内
     if norm_target < 0.001:
         return True
@@ -109,16 +126,42 @@ def is_within_distance(target_transform, reference_transform, max_distance, angl
     # 如果不考虑角度，只检查距离，认为在范围内
     if not angle_interval:
         return True
-    # 获取角度范围的上下限
-    min_angle = angle_interval[0]
-    max_angle = angle_interval[1]
-    # 获取参考对象的前向向量
+    # 获取参考对象的前向向量，计算目标向量和前向向量的夹角
     fwd = reference_transform.get_forward_vector()
-    forward_vector = np.array([fwd.x, fwd.y])
-    # 计算目标向量和前向向量的夹角
-    angle = math.degrees(math.acos(np.clip(np.dot(forward_vector, target_vector) / norm_target, -1., 1.)))
+    cosine = min(1., max(-1., (fwd.x * x + fwd.y * y) / norm_target))
+    angle = math.degrees(math.acos(cosine))
     # 判断夹角是否在指定范围内
-    return min_angle < angle < max_angle
+    return angle_interval[0] < angle < angle_interval[1]
+
+
+def is_within_distance_array(target_locations, reference_locations, reference_forwards, max_distance,
+                             angle_interval=None):
+    """
+    Check which locations are both within a certain distance from a reference object, as
+    is_within_distance does for each of them. There can be a single reference for all the
+    targets or one per target.
+
+    :param target_locations: (N, 2) or (N, 3) array with the locations of the targets  # 目标位置数组
+    :param reference_locations: (2,)/(3,) location of the reference, or (N, 2)/(N, 3) array  # 参考位置
+    :param reference_forwards: (2,)/(3,) forward vector of the reference, or (N, 2)/(N, 3) array  # 参考前向向量
+    :param max_distance: maximum allowed distance  # 允许的最大距离
+    :param angle_interval: only locations between [min, max] angles will be considered. This isn't checked by default.  # 可选的角度范围
+    :return: (N,) boolean array  # 每个目标是否在距离和角度范围内
+    """
+    # 计算目标位置和参考位置的向量及其范数
+    target_vector = _points(target_locations, 2) - _points(reference_locations, 2)
+    norm_target = np.sqrt(target_vector[:, 0] * target_vector[:, 0] + target_vector[:, 1] * target_vector[:, 1])
+    # 超出最大距离则不在范围内
+    inside = norm_target <= max_distance
+    if angle_interval:
+        # 计算目标向量和前向向量的夹角，只保留指定范围内的目标
+        forward_vector = _points(reference_forwards, 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cosine = (forward_vector[:, 0] * target_vector[:, 0] + forward_vector[:, 1] * target_vector[:, 1]) / norm_target
+        angle = np.degrees(np.arccos(np.clip(cosine, -1., 1.)))
+        inside &= (angle_interval[0] < angle) & (angle < angle_interval[1])
+    # 如果向量长度太小，认为在范围内
+    return inside | (norm_target < 0.001)
 
 
 def compute_magnitude_angle(target_location, current_location, orientation):
@@ -130,18 +173,43 @@ def compute_magnitude_angle(target_location, current_location, orientation):
         :param orientation: orientation of the reference object  # 参考对象的朝向
         :return: a tuple composed by the distance to the object and the angle between both objects  # 距离和角度的元组
     """
-    # 计算目标位置和参考位置的向量
-    target_vector = np.array([target_location.x - current_location.x, target_location.y - current_location.y])
-    # 计算目标向量的范数
-    norm_target = np.linalg.norm(target_vector)
-    # 计算参考对象的前向单位向量
-    forward_vector = np.array([math.cos(math.radians(orientation)), math.sin(math.radians(orientation))])
-    # 计算目标向量和前向向量的夹角
-    d_angle = math.degrees(math.acos(np.clip(np.dot(forward_vector, target_vector) / norm_target, -1., 1.)))
+    # 计算目标位置和参考位置的向量及其范数
+    x = target_location.x - current_location.x
+    y = target_location.y - current_location.y
+    norm_target = math.sqrt(x * x + y * y)
+    # 计算目标向量和参考对象的前向单位向量的夹角，重合的位置没有夹角，为nan
+    orientation = math.radians(orientation)
+    if norm_target == 0:
+        return (norm_target, float('nan'))
+    cosine = min(1., max(-1., (math.cos(orientation) * x + math.sin(orientation) * y) / norm_target))
+    d_angle = math.degrees(math.acos(cosine))
     # 返回距离和夹角
     return (norm_target, d_angle)
 
 
+def compute_magnitude_angle_array(target_locations, current_locations, orientations):
+    """
+    Compute the relative angles and distances between several target locations and a
+    current location, or one current location per target
+
+        :param target_locations: (N, 2) or (N, 3) array with the locations of the targets  # 目标位置数组
+        :param current_locations: (2,)/(3,) location of the reference, or (N, 2)/(N, 3) array  # 参考位置
+        :param orientations: yaw of the reference in degrees, or (N,) array  # 参考对象的朝向
+        :return: a tuple of two (N,) arrays, the distances and the angles in degrees  # 距离和角度数组的元组
+    """
+    # 计算目标位置和参考位置的向量及其范数
+    target_vector = _points(target_locations, 2) - _points(current_locations, 2)
+    norm_target = np.sqrt(target_vector[:, 0] * target_vector[:, 0] + target_vector[:, 1] * target_vector[:, 1])
+    # 计算参考对象的前向单位向量
+    orientations = np.radians(np.asarray(orientations, dtype=np.float64))
+    forward_x, forward_y = np.cos(orientations), np.sin(orientations)
+    # 计算目标向量和前向向量的夹角，重合的位置没有夹角，为nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cosine = (forward_x * target_vector[:, 0] + forward_y * target_vector[:, 1]) / norm_target
+    d_angle = np.degrees(np.arccos(np.clip(cosine, -1., 1.)))
+    return norm_target, d_angle
+
+
 def distance_vehicle(waypoint, vehicle_transform):
     """
     Returns the 2D distance from a waypoint to a vehicle
@@ -169,18 +237,29 @@ def vector(location_1, location_2):
         Alternatively you can use:
         `(location_2 - location_1).make_unit_vector()`  # 可使用另一种方式计算单位向量
     """
-    # 计算位置差在 x 轴上的分量
+    # 计算位置差的各个分量
     x = location_2.x - location_1.x
-    # 计算位置差在 y 轴上的分量
     y = location_2.y - location_1.y
-    # 计算位置差在 z 轴上的分量
     z = location_2.z - location_1.z
     # 计算位置差的范数并加上一个极小的增量以避免除零错误
-    norm = np.linalg.norm([x, y, z]) + _EPS
+    norm = math.sqrt(x * x + y * y + z * z) + _EPS
     # 计算单位向量
     return [x / norm, y / norm, z / norm]
 
 
+def vector_array(locations_1, locations_2):
+    """
+    Returns the unit vectors from locations_1 to locations_2. Either of them can be a single location.
+
+        :param locations_1, locations_2: (3,) or (N, 3) arrays of locations  # 位置数组
+        :return: (N, 3) array  # 单位向量数组
+    """
+    delta = _points(locations_2, 3) - _points(locations_1, 3)
+    # 计算位置差的范数并加上一个极小的增量以避免除零错误
+    norm = np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1] + delta[:, 2] * delta[:, 2]) + _EPS
+    return delta / norm[:, np.newaxis]
+
+
 def compute_distance(location_1, location_2):
     """
     Euclidean distance between 3D points
@@ -190,16 +269,24 @@ def compute_distance(location_1, location_2):
    .. deprecated:: 0.9.13
         Use `location_1.distance(location_2)` instead  # 已弃用，建议使用 `location_1.distance(location_2)` 替代
     """
-    # 计算位置差在 x 轴上的分量
+    # 计算位置差的各个分量
     x = location_2.x - location_1.x
-    # 计算位置差在 y 轴上的分量
     y = location_2.y - location_1.y
-    # 计算位置差在 z 轴上的分量
-    z = location_2.z - location_2.z
+    z = location_2.z - location_1.z
+    # 计算位置差的范数并加上一个极小的增量以避免除零错误
+    return math.sqrt(x * x + y * y + z * z) + _EPS
+
+
+def compute_distance_array(locations_1, locations_2):
+    """
+    Euclidean distances between 3D points. Either of them can be a single point.
+
+        :param locations_1, locations_2: (3,) or (N, 3) arrays of points  # 3D 点数组
+        :return: (N,) array  # 距离数组
+    """
+    delta = _points(locations_2, 3) - _points(locations_1, 3)
     # 计算位置差的范数并加上一个极小的增量以避免除零错误
-    norm = np.linalg.norm([x, y, z]) + _EPS
-    # 返回距离
-    return norm
+    return np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1] + delta[:, 2] * delta[:, 2]) + _EPS
 
 
 def positive(num):
@@ -0,0 +1,604 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Module with a single file format to record the measurements of many sensors.
+
+The measurements of each sensor are appended in chunks of consecutive frames, each chunk
+optionally compressed. An index at the end of the file maps every frame to its chunk, so
+that a reader finds a measurement without scanning the file. Uncompressed chunks are read
+straight from a memory map, without copies.
+
+    file    header | chunk | chunk | ... | index | trailer
+    chunk   CHUNK_MAGIC | meta size | payload size | meta | padding | payload | padding
+
+Every chunk describes itself, so the index of a recording that was not closed, for
+instance after a crash, is rebuilt from the headers of its chunks.
+"""
+
+import glob
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import warnings
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from agents.tools.sensor_views import (LIDAR_DTYPE, RADAR_DTYPE, bgra_view, lidar_view,
+                                       semantic_lidar_view)
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression of the chunks
+RECORDING_CODECS = ('none', 'zlib', 'lz4', 'zstd')
+
+# Points of a semantic lidar as saved by check_raycast_sensors_determinism
+SNAPSHOT_SEMANTIC_LIDAR_DTYPE = np.dtype([
+    ('x', np.float32), ('y', np.float32), ('z', np.float32), ('cos_angle', np.float32),
+    ('object_tag', np.uint32)])
+
+# Rows of the actor tables saved by check_raycast_sensors_determinism
+SNAPSHOT_ACTOR_DTYPE = np.dtype([(name, np.float64) for name in (
+    'frame', 'time', 'x', 'y', 'z', 'velocity_x', 'velocity_y', 'velocity_z',
+    'angular_velocity_x', 'angular_velocity_y', 'angular_velocity_z')])
+
+_SNAPSHOT_DTYPES = {
+    'LiDAR': LIDAR_DTYPE, 'SemLiDAR': SNAPSHOT_SEMANTIC_LIDAR_DTYPE, 'Radar': RADAR_DTYPE}
+
+_PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'}
+
+_FILE_MAGIC = b'CARLAREC'
+_CHUNK_MAGIC = b'CHNK'
+_TRAILER_MAGIC = b'CARLAIDX'
+_VERSION = 1
+_ALIGNMENT = 64
+_HEADER = struct.Struct('<8sI')
+_CHUNK_HEADER = struct.Struct('<4sIQ')
+_TRAILER = struct.Struct('<QQ8s')
+
+
+def _align(position):
+    return (position + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _dtype_to_json(dtype):
+    return np.lib.format.dtype_to_descr(dtype)
+
+
+def _dtype_from_json(descr):
+    if isinstance(descr, list):
+        # JSON turns the tuples of the fields, and of their shapes, into lists
+        return np.dtype([(field[0], _dtype_from_json(field[1])) + tuple(tuple(shape) for shape in field[2:])
+                         for field in descr])
+    return np.dtype(descr)
+
+
+def _compressor(codec, level):
+    """Returns the function that compresses a payload with a codec, None for 'none'"""
+    if codec not in RECORDING_CODECS:
+        raise ValueError("Unknown codec '{}', expected one of {}".format(codec, RECORDING_CODECS))
+    if codec == 'zlib':
+        return lambda data: zlib.compress(data, 1 if level is None else level)
+    if codec == 'lz4':
+        if lz4_frame is None:
+            raise RuntimeError('cannot import lz4, make sure "lz4" package is installed')
+        return lambda data: lz4_frame.compress(data, compression_level=0 if level is None else level)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('cannot import zstandard, make sure "zstandard" package is installed')
+        # The compressors of zstandard can't be shared between threads
+        return lambda data: zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+    return None
+
+
+def _decompress(codec, data):
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'lz4':
+        if lz4_frame is None:
+            raise RuntimeError('cannot import lz4, make sure "lz4" package is installed')
+        return lz4_frame.decompress(data)
+    if zstandard is None:
+        raise RuntimeError('cannot import zstandard, make sure "zstandard" package is installed')
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _load_index(stream):
+    """
+    Returns the chunks of a recording and the position where its chunks end. The index
+    is read from the end of the file, or rebuilt from the chunks if the file wasn't closed.
+    """
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    magic, version = _HEADER.unpack(stream.read(_HEADER.size).ljust(_HEADER.size, b'\0'))
+    if magic != _FILE_MAGIC:
+        raise ValueError("'{}' is not a sensor recording".format(stream.name))
+    if version > _VERSION:
+        raise ValueError("'{}' is a recording of version {}, newer than {}".format(stream.name, version, _VERSION))
+
+    if size >= _ALIGNMENT + _TRAILER.size:
+        stream.seek(size - _TRAILER.size)
+        offset, length, magic = _TRAILER.unpack(stream.read(_TRAILER.size))
+        if magic == _TRAILER_MAGIC:
+            stream.seek(offset)
+            return json.loads(zlib.decompress(stream.read(length)).decode('utf-8'))['chunks'], offset
+
+    chunks = []
+    position = _ALIGNMENT
+    while position + _CHUNK_HEADER.size <= size:
+        stream.seek(position)
+        magic, meta_size, payload_size = _CHUNK_HEADER.unpack(stream.read(_CHUNK_HEADER.size))
+        payload = _align(position + _CHUNK_HEADER.size + meta_size)
+        if magic != _CHUNK_MAGIC or payload + payload_size > size:
+            # The last chunk was cut while being written
+            break
+        meta = json.loads(stream.read(meta_size).decode('utf-8'))
+        meta['offset'] = payload
+        meta['size'] = payload_size
+        chunks.append(meta)
+        position = _align(payload + payload_size)
+    return chunks, min(position, max(size, _ALIGNMENT))
+
+
+class _ChunkBuffer(object):
+    """Frames of a sensor waiting to fill a chunk"""
+
+    def __init__(self):
+        self.frames = []
+        self.rows = []
+        self.data = bytearray()
+
+
+class SensorRecordingWriter(object):
+    """
+    Appends the measurements of several sensors to a recording. Each measurement is an
+    array whose first dimension may change from frame to frame, such as the points of a
+    lidar, while its type and other dimensions stay the same for a sensor. The frames of
+    each sensor must increase. The writer can be shared by the callbacks of all sensors,
+    and compresses the chunks of different sensors in parallel.
+
+        with SensorRecordingWriter('town03.rec', codec='lz4') as recording:
+            camera.listen(lambda image: recording.write_image('camera', image))
+            lidar.listen(lambda measurement: recording.write_point_cloud('lidar', measurement))
+            ...
+    """
+
+    def __init__(self, path, codec='none', level=None, chunk_size=8 << 20, append=False):
+        """
+        :param path (str): path of the recording
+        :param codec (str): one of RECORDING_CODECS
+        :param level (int): compression level of the codec, its default if None
+        :param chunk_size (int): bytes of measurements gathered before writing a chunk.
+            Reading a frame of a compressed chunk decompresses the whole chunk.
+        :param append (bool): whether to add to an existing recording instead of
+            replacing it
+        """
+        self.path = path
+        self.codec = codec
+        self.chunk_size = chunk_size
+        self._compress = _compressor(codec, level)
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._buffers = {}
+        self._layouts = {}
+        self._last_frames = {}
+        self._chunks = []
+        self._closed = False
+
+        if append and os.path.exists(path):
+            self._file = open(path, 'r+b')
+            self._chunks, self._end = _load_index(self._file)
+            self._file.truncate(self._end)
+            for meta in self._chunks:
+                name = meta['sensor']
+                self._layouts[name] = (_dtype_from_json(meta['dtype']), tuple(meta['item_shape']))
+                self._last_frames[name] = max(self._last_frames.get(name, meta['frames'][-1]), meta['frames'][-1])
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_HEADER.pack(_FILE_MAGIC, _VERSION).ljust(_ALIGNMENT, b'\0'))
+            self._end = _ALIGNMENT
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def write(self, name, frame, data):
+        """
+        Adds the measurement of a sensor at a frame
+
+            :param name (str): name of the sensor
+            :param frame (int): frame of the measurement, greater than the previous one of
+                the sensor
+            :param data (numpy.ndarray): measurement, copied before returning
+        """
+        data = np.asarray(data)
+        if data.ndim == 0:
+            raise ValueError("The measurements must have at least one dimension")
+        frame = int(frame)
+        full = None
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The recording is closed")
+            layout = (data.dtype, data.shape[1:])
+            if self._layouts.setdefault(name, layout) != layout:
+                raise ValueError("The measurements of '{}' are {} arrays of {}, not of {}".format(
+                    name, self._layouts[name][1], self._layouts[name][0], data.dtype))
+            if name in self._last_frames and frame <= self._last_frames[name]:
+                raise ValueError("The frames of '{}' must increase, got {} after {}".format(
+                    name, frame, self._last_frames[name]))
+            self._last_frames[name] = frame
+            buffer = self._buffers.setdefault(name, _ChunkBuffer())
+            buffer.frames.append(frame)
+            buffer.rows.append(len(data))
+            buffer.data += memoryview(np.ascontiguousarray(data).reshape(-1).view(np.uint8))
+            if len(buffer.data) >= self.chunk_size:
+                full = self._buffers.pop(name)
+        if full is not None:
+            self._write_chunk(name, full)
+
+    def write_image(self, name, image):
+        """
+        Adds a carla.Image as an (height, width, 4) uint8 array in BGRA order
+
+            :param name (str): name of the sensor
+            :param image (carla.Image): camera image, already converted if needed
+        """
+        self.write(name, image.frame, bgra_view(image))
+
+    def write_point_cloud(self, name, measurement, semantic=False):
+        """
+        Adds the points of a lidar measurement, as a structured array of LIDAR_DTYPE or
+        SEMANTIC_LIDAR_DTYPE
+
+            :param name (str): name of the sensor
+            :param measurement: carla.LidarMeasurement or carla.SemanticLidarMeasurement
+            :param semantic (bool): whether the measurement is of a semantic lidar
+        """
+        points = semantic_lidar_view(measurement) if semantic else lidar_view(measurement)
+        self.write(name, measurement.frame, points)
+
+    def flush(self):
+        """Writes the frames gathered so far as chunks, without waiting for them to fill"""
+        with self._lock:
+            buffers = self._buffers
+            self._buffers = {}
+        for name, buffer in buffers.items():
+            self._write_chunk(name, buffer)
+        with self._file_lock:
+            self._file.flush()
+
+    def close(self):
+        """Writes the remaining frames and the index"""
+        if self._closed:
+            return
+        self.flush()
+        with self._lock:
+            self._closed = True
+        with self._file_lock:
+            index = zlib.compress(json.dumps({'chunks': self._chunks}).encode('utf-8'))
+            self._file.seek(self._end)
+            self._file.write(index)
+            self._file.write(_TRAILER.pack(self._end, len(index), _TRAILER_MAGIC))
+            self._file.close()
+
+    def _write_chunk(self, name, buffer):
+        dtype, item_shape = self._layouts[name]
+        payload = buffer.data if self._compress is None else self._compress(buffer.data)
+        meta = {
+            'sensor': name,
+            'dtype': _dtype_to_json(dtype),
+            'item_shape': list(item_shape),
+            'codec': self.codec,
+            'raw_size': len(buffer.data),
+            'frames': buffer.frames,
+            'rows': buffer.rows}
+        encoded = json.dumps(meta).encode('utf-8')
+        with self._file_lock:
+            header = _CHUNK_HEADER.pack(_CHUNK_MAGIC, len(encoded), len(payload)) + encoded
+            offset = _align(self._end + len(header))
+            self._file.seek(self._end)
+            self._file.write(header.ljust(offset - self._end, b'\0'))
+            self._file.write(payload)
+            self._end = _align(offset + len(payload))
+            self._file.write(b'\0' * (self._end - offset - len(payload)))
+            meta['offset'] = offset
+            meta['size'] = len(payload)
+            self._chunks.append(meta)
+
+
+class _SensorIndex(object):
+    """Where each frame of a sensor is, sorted by frame"""
+
+    def __init__(self, dtype, item_shape):
+        self.dtype = dtype
+        self.item_shape = item_shape
+        self.items = int(np.prod(item_shape, dtype=np.int64))
+        self.frames = None
+        self.chunks = None
+        self.starts = None
+        self.rows = None
+
+
+class SensorRecordingReader(object):
+    """
+    Reads the measurements of a recording by frame. Reads are thread-safe, and a reader
+    can be pickled to open the same recording in worker processes, such as those of a
+    training data loader.
+
+        reader = SensorRecordingReader('town03.rec')
+        image = reader.read('camera', reader.frames('camera')[10])
+        for frame, points in reader.iter_frames('lidar', shard=worker, shards=workers):
+            ...
+
+    The arrays are read-only. Those of uncompressed chunks are views of the memory map.
+    """
+
+    def __init__(self, path, cache_chunks=4):
+        """
+        :param path (str): path of the recording
+        :param cache_chunks (int): decompressed chunks kept in memory, so that reading
+            consecutive frames decompresses each chunk once
+        """
+        self.path = path
+        self.cache_chunks = cache_chunks
+        self._file = open(path, 'rb')
+        self._chunks, _ = _load_index(self._file)
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        index = {}
+        parts = {}
+        for chunk_id, meta in enumerate(self._chunks):
+            name = meta['sensor']
+            if name not in index:
+                index[name] = _SensorIndex(_dtype_from_json(meta['dtype']), tuple(meta['item_shape']))
+                parts[name] = []
+            rows = np.array(meta['rows'], dtype=np.int64)
+            starts = np.cumsum(rows) - rows
+            parts[name].append((np.array(meta['frames'], dtype=np.int64), np.full(len(rows), chunk_id), starts, rows))
+        self._index = OrderedDict()
+        for name in sorted(index):
+            frames, chunks, starts, rows = (np.concatenate(column) for column in zip(*parts[name]))
+            order = np.argsort(frames, kind='stable')
+            index[name].frames, index[name].chunks, index[name].starts, index[name].rows = (
+                frames[order], chunks[order], starts[order], rows[order])
+            index[name].frames.flags.writeable = False
+            self._index[name] = index[name]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def __getstate__(self):
+        return {'path': self.path, 'cache_chunks': self.cache_chunks}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['cache_chunks'])
+
+    @property
+    def sensors(self):
+        """Sorted names of the sensors"""
+        return list(self._index)
+
+    def frames(self, name):
+        """
+        Returns the sorted frames of a sensor, as a read-only array
+
+            :param name (str): name of the sensor
+        """
+        return self._sensor(name).frames
+
+    def read(self, name, frame):
+        """
+        Returns the measurement of a sensor at a frame
+
+            :param name (str): name of the sensor
+            :param frame (int): frame of the measurement
+        """
+        index = self._sensor(name)
+        position = np.searchsorted(index.frames, frame)
+        if position == len(index.frames) or index.frames[position] != frame:
+            raise KeyError("'{}' has no measurement at frame {}".format(name, frame))
+        return self._measurement(index, position)
+
+    def read_frame(self, frame):
+        """
+        Returns a dictionary with the measurements of every sensor at a frame, without the
+        sensors that have none
+
+            :param frame (int): frame of the measurements
+        """
+        measurements = OrderedDict()
+        for name, index in self._index.items():
+            position = np.searchsorted(index.frames, frame)
+            if position < len(index.frames) and index.frames[position] == frame:
+                measurements[name] = self._measurement(index, position)
+        return measurements
+
+    def iter_frames(self, name, start=None, stop=None, shard=0, shards=1):
+        """
+        Yields the frames and measurements of a sensor in order, decompressing each chunk
+        once. The chunks can be split between several readers, each reading one shard.
+
+            :param name (str): name of the sensor
+            :param start (int): first frame, the first of the recording if None
+            :param stop (int): frame where to stop, excluded, after the last if None
+            :param shard (int): which part of the chunks to read, from 0 to shards - 1
+            :param shards (int): number of parts the chunks are split in
+        """
+        index = self._sensor(name)
+        begin = 0 if start is None else np.searchsorted(index.frames, start)
+        end = len(index.frames) if stop is None else np.searchsorted(index.frames, stop)
+        ordinal = -1
+        previous = None
+        for position in range(begin, end):
+            if index.chunks[position] != previous:
+                ordinal += 1
+                previous = index.chunks[position]
+            if ordinal % shards == shard:
+                yield int(index.frames[position]), self._measurement(index, position)
+
+    def close(self):
+        """Closes the file. The memory map stays open while arrays read from it are in use."""
+        with self._lock:
+            self._cache.clear()
+        self._mmap = None
+        self._file.close()
+
+    def _sensor(self, name):
+        if name not in self._index:
+            raise KeyError("There is no sensor '{}' in the recording, only {}".format(name, self.sensors))
+        return self._index[name]
+
+    def _measurement(self, index, position):
+        data = self._chunk(index.chunks[position], index.dtype)
+        start = index.starts[position] * index.items
+        rows = index.rows[position]
+        return data[start:start + rows * index.items].reshape((rows,) + index.item_shape)
+
+    def _chunk(self, chunk_id, dtype):
+        """Returns the measurements of a chunk as a flat read-only array"""
+        meta = self._chunks[chunk_id]
+        if meta['codec'] == 'none':
+            return np.frombuffer(self._mmap, dtype=dtype, count=meta['raw_size'] // dtype.itemsize,
+                                 offset=meta['offset'])
+        with self._lock:
+            if chunk_id in self._cache:
+                self._cache.move_to_end(chunk_id)
+                return self._cache[chunk_id]
+        raw = _decompress(meta['codec'], self._mmap[meta['offset']:meta['offset'] + meta['size']])
+        data = np.frombuffer(raw, dtype=dtype)
+        with self._lock:
+            self._cache[chunk_id] = data
+            while len(self._cache) > self.cache_chunks:
+                self._cache.popitem(last=False)
+        return data
+
+
+def _load_text(path, dtype):
+    """Reads an array saved with numpy.savetxt as a structured array"""
+    with warnings.catch_warnings():
+        # numpy warns about the files of the frames without points
+        warnings.simplefilter('ignore')
+        columns = np.loadtxt(path, ndmin=2)
+    if columns.size == 0:
+        return np.zeros(0, dtype=dtype)
+    if columns.shape[1] != len(dtype.names):
+        raise ValueError("'{}' has {} columns, expected {}".format(path, columns.shape[1], dtype.names))
+    array = np.empty(len(columns), dtype=dtype)
+    for i, field in enumerate(dtype.names):
+        array[field] = columns[:, i]
+    return array
+
+
+def convert_snapshots(prefix, writer):
+    """
+    Adds the files saved by a run of check_raycast_sensors_determinism to a recording, and
+    returns the names of the sensors added. Each sensor file of a frame becomes the
+    measurement of that frame. Each actor table becomes a sensor with a row per frame,
+    of SNAPSHOT_ACTOR_DTYPE.
+
+        :param prefix (str): prefix of the files of the run, such as
+            '_sensors/SpawnAllRaycastSensors_rep_000'
+        :param writer (SensorRecordingWriter): recording to add the files to
+    """
+    sensors = {}
+    actors = []
+    for path in glob.glob(glob.escape(prefix) + '_*.out'):
+        match = re.match(r'(.+?)(?:_(\d+))?\.out$', path[len(prefix) + 1:])
+        name, frame = match.groups()
+        if frame is None:
+            actors.append((name, path))
+        else:
+            sensors.setdefault(name, []).append((int(frame), path))
+
+    for name, files in sorted(sensors.items()):
+        kind = name.split('_')[-1]
+        if kind not in _SNAPSHOT_DTYPES:
+            raise ValueError("Unknown kind of sensor '{}' in the files of '{}'".format(kind, prefix))
+        for frame, path in sorted(files):
+            writer.write(name, frame, _load_text(path, _SNAPSHOT_DTYPES[kind]))
+    for name, path in sorted(actors):
+        for row in _load_text(path, SNAPSHOT_ACTOR_DTYPE):
+            writer.write(name, int(row['frame']), row.reshape(1))
+    return sorted(sensors) + sorted(name for name, _ in actors)
+
+
+def _read_ply(path):
+    """Reads the vertices of an ASCII or binary little endian PLY file"""
+    with open(path, 'rb') as stream:
+        fields = []
+        binary = False
+        line = stream.readline()
+        while line.strip() != b'end_header':
+            if not line:
+                raise ValueError("'{}' has no end of header".format(path))
+            words = line.decode('ascii').split()
+            if words[:1] == ['format']:
+                if words[1] not in ('ascii', 'binary_little_endian'):
+                    raise ValueError("Can't read the {} PLY format of '{}'".format(words[1], path))
+                binary = words[1] != 'ascii'
+            elif words[:1] == ['property']:
+                fields.append((words[2], '<' + _PLY_TYPES[words[1]]))
+            line = stream.readline()
+        dtype = np.dtype(fields)
+        if binary:
+            return np.frombuffer(stream.read(), dtype=dtype).copy()
+        return _load_text(stream, dtype)
+
+
+def _read_png(path):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError('cannot import PIL, make sure "Pillow" package is installed')
+    return np.asarray(Image.open(path))
+
+
+def convert_frames(folder, name, writer):
+    """
+    Adds a folder of files named by frame, such as those of image.save_to_disk or of the
+    DatasetWriter, to a recording as one sensor. Reads .npy, .ply and, with Pillow, .png
+    files. Returns the number of frames added.
+
+        :param folder (str): folder of the files, such as '_out'
+        :param name (str): name of the sensor in the recording
+        :param writer (SensorRecordingWriter): recording to add the files to
+    """
+    readers = {'.npy': np.load, '.ply': _read_ply, '.png': _read_png}
+    files = []
+    for filename in os.listdir(folder):
+        match = re.search(r'(\d+)(\.\w+)$', filename)
+        if match is not None and match.group(2).lower() in readers:
+            files.append((int(match.group(1)), os.path.join(folder, filename), readers[match.group(2).lower()]))
+    for frame, path, read in sorted(files):
+        writer.write(name, frame, read(path))
+    return len(files)
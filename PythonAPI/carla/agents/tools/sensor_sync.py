@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+""" Module with a synchronizer that pairs the measurements of several sensors by frame. """
+
+import asyncio
+import queue
+import threading
+import time
+
+import carla
+
+# What to do with the sensors that are missing when the timeout of a frame expires
+SYNC_POLICIES = ('wait', 'skip', 'interpolate')
+
+
+class FrameBundle(object):
+    """
+    Measurements of all the sensors for a frame, in the order of the sensor names. It can
+    be unpacked like a list or indexed by position or by name.
+    """
+
+    def __init__(self, frame, names, data, missing=()):
+        """
+        :param frame (int): frame of the measurements
+        :param names (tuple): names of the sensors
+        :param data (tuple): measurement of each sensor
+        :param missing (tuple): names of the sensors whose measurement didn't arrive, filled
+            by the 'interpolate' policy
+        """
+        self.frame = frame
+        self.names = names
+        self.data = data
+        self.missing = missing
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.data[self.names.index(key)]
+        return self.data[key]
+
+    @property
+    def complete(self):
+        """Whether every sensor delivered its own measurement"""
+        return not self.missing
+
+
+def _set_result(future, bundle):
+    if not future.done():
+        future.set_result(bundle)
+
+
+def _set_exception(future, exception):
+    if not future.done():
+        future.set_exception(exception)
+
+
+class SensorSynchronizer(object):
+    """
+    Pairs the measurements of several sensors by frame. The measurements are stored in a
+    ring of 'capacity' frames, preallocated with a slot per sensor, and a frame is found
+    at the position 'frame % capacity' without searching. The callbacks of the sensors
+    can push from any thread.
+
+    When the timeout of a frame expires, the policy decides what happens to the sensors
+    that haven't delivered:
+        - 'wait' raises queue.Empty, as the queues the examples used to poll
+        - 'skip' drops the frame and returns None
+        - 'interpolate' fills the missing measurements with those of the closest frames
+          of the same sensor still in the ring, blended by the interpolator if given
+    """
+
+    def __init__(self, names, capacity=8, policy='wait', interpolator=None, clock=time.time):
+        """
+        :param names (list): names of the sensors
+        :param capacity (int): number of frames kept in the ring
+        :param policy (str): one of SYNC_POLICIES
+        :param interpolator: function of (previous, next, weight) returning the measurement
+            of a missing sensor from those of the frames around it, the weight being the
+            relative position of the frame between them. Without it the closest
+            measurement is used as is.
+        :param clock: function returning the current time, in seconds, to measure latencies
+        """
+        if policy not in SYNC_POLICIES:
+            raise ValueError("Unknown policy '{}', expected one of {}".format(policy, SYNC_POLICIES))
+        if capacity < 1:
+            raise ValueError("The synchronizer needs room for at least one frame")
+        self.names = tuple(names)
+        self.capacity = capacity
+        self.policy = policy
+        self._interpolator = interpolator
+        self._clock = clock
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+        sensors = len(self.names)
+        self._frames = [None] * capacity
+        self._data = [[None] * sensors for _ in range(capacity)]
+        self._filled = [[False] * sensors for _ in range(capacity)]
+        self._arrivals = [[0.0] * sensors for _ in range(capacity)]
+        self._counts = [0] * capacity
+        self._expected = [None] * capacity
+        self._bundles = [None] * capacity
+        self._condition = threading.Condition()
+        self._waiters = {}
+
+        self.completed = 0
+        self.skipped = 0
+        self.interpolated = 0
+        self.overruns = 0
+        self._received = [0] * sensors
+        self._missing = [0] * sensors
+        self._stale = [0] * sensors
+        self._latency_total = [0.0] * sensors
+        self._latency_max = [0.0] * sensors
+        self._latency_last = [0.0] * sensors
+
+    def callback(self, name):
+        """
+        Returns the function to pass to 'listen' for a sensor, or to 'on_tick' for the world
+        """
+        return lambda data: self.push(name, data)
+
+    def expect(self, frame, since=None):
+        """
+        Marks the time from which the latencies of a frame are measured. Without it they are
+        measured from the first measurement of the frame.
+
+            :param frame (int): frame, usually the one returned by carla.World.tick
+            :param since (float): time the frame was requested, now by default
+        """
+        with self._condition:
+            slot = self._slot(frame)
+            if slot is not None:
+                self._expected[slot] = self._clock() if since is None else since
+
+    def push(self, name, data, frame=None):
+        """
+        Stores the measurement of a sensor
+
+            :param name (str): name of the sensor
+            :param data: the measurement
+            :param frame (int): frame of the measurement, 'data.frame' by default
+        """
+        sensor = self._index[name]
+        if frame is None:
+            frame = data.frame
+        now = self._clock()
+        waiters = ()
+        with self._condition:
+            slot = self._slot(frame)
+            if slot is None:
+                # The ring already moved past this frame
+                self._stale[sensor] += 1
+                return
+            self._data[slot][sensor] = data
+            self._arrivals[slot][sensor] = now
+            if self._filled[slot][sensor]:
+                return
+            self._filled[slot][sensor] = True
+            self._counts[slot] += 1
+            if self._counts[slot] == len(self.names):
+                self.completed += 1
+                self._condition.notify_all()
+                if frame in self._waiters:
+                    waiters = self._waiters.pop(frame)
+                    bundle = self._bundle(slot)
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_set_result, future, bundle)
+
+    def get(self, frame, timeout=None):
+        """
+        Returns the FrameBundle of a frame, waiting up to 'timeout' seconds for its
+        measurements and then applying the policy
+
+            :param frame (int): frame to return
+            :param timeout (float): seconds to wait, or None to wait forever
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while True:
+                slot = frame % self.capacity
+                if self._frames[slot] == frame and self._counts[slot] == len(self.names):
+                    return self._bundle(slot)
+                if self._frames[slot] is not None and self._frames[slot] > frame:
+                    break
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._resolve(frame)
+
+    def future(self, frame, timeout=None, loop=None):
+        """
+        Returns an asyncio future of the FrameBundle of a frame, so that coroutines can
+        await it without blocking their event loop. The policy is applied when the timeout
+        expires.
+
+            :param frame (int): frame to return
+            :param timeout (float): seconds to wait, or None to wait forever
+            :param loop: event loop of the future, the current one by default
+        """
+        loop = loop if loop is not None else asyncio.get_event_loop()
+        future = loop.create_future()
+        with self._condition:
+            slot = frame % self.capacity
+            if self._frames[slot] == frame and self._counts[slot] == len(self.names):
+                future.set_result(self._bundle(slot))
+                return future
+            self._waiters.setdefault(frame, []).append((loop, future))
+        if timeout is not None:
+            loop.call_later(timeout, self._expire, frame, loop, future)
+        return future
+
+    def stats(self):
+        """
+        Returns a dictionary with the counters of the frames and, for each sensor, the
+        latencies of its measurements in seconds
+        """
+        with self._condition:
+            sensors = {}
+            for sensor, name in enumerate(self.names):
+                received = self._received[sensor]
+                sensors[name] = {
+                    'received': received,
+                    'missing': self._missing[sensor],
+                    'stale': self._stale[sensor],
+                    'latency_mean': self._latency_total[sensor] / received if received else 0.0,
+                    'latency_max': self._latency_max[sensor],
+                    'latency_last': self._latency_last[sensor]
+                }
+            return {
+                'completed': self.completed,
+                'skipped': self.skipped,
+                'interpolated': self.interpolated,
+                'overruns': self.overruns,
+                'sensors': sensors
+            }
+
+    def _slot(self, frame):
+        """Returns the slot of a frame, reusing it if it holds an older one (lock held)"""
+        slot = frame % self.capacity
+        current = self._frames[slot]
+        if current == frame:
+            return slot
+        if current is not None and current > frame:
+            return None
+        if current is not None and self._bundles[slot] is None:
+            self.overruns += 1
+        self._frames[slot] = frame
+        self._counts[slot] = 0
+        self._expected[slot] = None
+        self._bundles[slot] = None
+        for sensor in range(len(self.names)):
+            self._filled[slot][sensor] = False
+            self._data[slot][sensor] = None
+        return slot
+
+    def _bundle(self, slot, data=None, missing=()):
+        """Returns the bundle of a slot, recording its latencies the first time (lock held)"""
+        if self._bundles[slot]:
+            return self._bundles[slot]
+        filled = [s for s in range(len(self.names)) if self._filled[slot][s]]
+        if filled:
+            arrivals = self._arrivals[slot]
+            start = self._expected[slot]
+            if start is None:
+                start = min(arrivals[s] for s in filled)
+            for sensor in filled:
+                latency = max(arrivals[sensor] - start, 0.0)
+                self._received[sensor] += 1
+                self._latency_total[sensor] += latency
+                self._latency_max[sensor] = max(self._latency_max[sensor], latency)
+                self._latency_last[sensor] = latency
+        if data is None:
+            data = tuple(self._data[slot])
+        self._bundles[slot] = FrameBundle(self._frames[slot], self.names, data, missing)
+        return self._bundles[slot]
+
+    def _resolve(self, frame):
+        """Applies the policy to a frame that isn't complete (lock held)"""
+        slot = frame % self.capacity
+        own = self._frames[slot] == frame
+        if own and self._bundles[slot] is not None:
+            # Already handed out, or skipped
+            return self._bundles[slot] or None
+        if self.policy == 'wait':
+            raise queue.Empty("The sensors didn't deliver frame {}".format(frame))
+
+        missing = [s for s in range(len(self.names)) if not (own and self._filled[slot][s])]
+        for sensor in missing:
+            self._missing[sensor] += 1
+        if self.policy == 'skip':
+            self.skipped += 1
+            if own:
+                # Marks the frame as handed out, without a bundle
+                self._bundles[slot] = False
+            return None
+
+        self.interpolated += 1
+        data = list(self._data[slot]) if own else [None] * len(self.names)
+        for sensor in missing:
+            data[sensor] = self._interpolate(sensor, frame)
+        names = tuple(self.names[s] for s in missing)
+        if not own:
+            return FrameBundle(frame, self.names, tuple(data), names)
+        return self._bundle(slot, tuple(data), names)
+
+    def _interpolate(self, sensor, frame):
+        """Measurement of a sensor for a frame from the closest frames of the ring (lock held)"""
+        previous = following = None
+        for slot, other in enumerate(self._frames):
+            if other is None or other == frame or not self._filled[slot][sensor]:
+                continue
+            if other < frame and (previous is None or other > self._frames[previous]):
+                previous = slot
+            elif other > frame and (following is None or other < self._frames[following]):
+                following = slot
+        if previous is None and following is None:
+            return None
+        if previous is None:
+            return self._data[following][sensor]
+        if following is None:
+            return self._data[previous][sensor]
+        before, after = self._frames[previous], self._frames[following]
+        weight = float(frame - before) / (after - before)
+        if self._interpolator is not None:
+            return self._interpolator(self._data[previous][sensor], self._data[following][sensor], weight)
+        return self._data[previous if weight <= 0.5 else following][sensor]
+
+    def _expire(self, frame, loop, future):
+        """Applies the policy to the future of a frame whose timeout expired"""
+        if future.done():
+            return
+        with self._condition:
+            waiters = self._waiters.get(frame, [])
+            if (loop, future) in waiters:
+                waiters.remove((loop, future))
+                if not waiters:
+                    del self._waiters[frame]
+            try:
+                bundle = self._resolve(frame)
+            except queue.Empty as exception:
+                _set_exception(future, exception)
+                return
+        _set_result(future, bundle)
+
+
+class CarlaSyncMode(object):
+    """
+    Context manager to synchronize output from different sensors. Synchronous
+    mode is enabled as long as we are inside this context
+
+        with CarlaSyncMode(world, sensors) as sync_mode:
+            while True:
+                data = sync_mode.tick(timeout=1.0)
+
+    The first element of the data is the world snapshot, followed by the measurement of
+    each sensor in the order they were given.
+    """
+
+    def __init__(self, world, *sensors, **kwargs):
+        """
+        :param world (carla.World): world to tick
+        :param sensors: sensors to listen to
+        :param kwargs: 'fps' of the simulation (default: 20), and the 'policy' and
+            'capacity' of the SensorSynchronizer
+        """
+        self.world = world
+        self.sensors = sensors
+        self.frame = None
+        self.delta_seconds = 1.0 / kwargs.get('fps', 20)
+        self.synchronizer = SensorSynchronizer(
+            ['world'] + ['sensor{}'.format(i) for i in range(len(sensors))],
+            capacity=kwargs.get('capacity', 8), policy=kwargs.get('policy', 'wait'))
+        self._settings = None
+
+    def __enter__(self):
+        self._settings = self.world.get_settings()
+        self.frame = self.world.apply_settings(carla.WorldSettings(
+            no_rendering_mode=False,
+            synchronous_mode=True,
+            fixed_delta_seconds=self.delta_seconds))
+
+        self.world.on_tick(self.synchronizer.callback('world'))
+        for name, sensor in zip(self.synchronizer.names[1:], self.sensors):
+            sensor.listen(self.synchronizer.callback(name))
+        return self
+
+    def tick(self, timeout):
+        """
+        Advances the simulation and returns the FrameBundle of the new frame
+        """
+        start = time.time()
+        self.frame = self.world.tick()
+        self.synchronizer.expect(self.frame, start)
+        return self.synchronizer.get(self.frame, timeout)
+
+    def __exit__(self, *args, **kwargs):
+        self.world.apply_settings(self._settings)
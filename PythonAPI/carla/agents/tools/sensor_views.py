@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Module with NumPy views over the raw buffers of the sensor measurements.
+
+Every view wraps the 'raw_data' of the measurement without copying it and is read-only,
+so that callbacks can't modify a buffer shared with the simulator by mistake. Pass
+copy=True to get a writable array that owns its data.
+"""
+
+import numpy as np
+
+# Layout of one point of a carla.LidarMeasurement
+LIDAR_DTYPE = np.dtype([
+    ('x', np.float32), ('y', np.float32), ('z', np.float32), ('intensity', np.float32)])
+
+# Layout of one point of a carla.SemanticLidarMeasurement
+SEMANTIC_LIDAR_DTYPE = np.dtype([
+    ('x', np.float32), ('y', np.float32), ('z', np.float32), ('cos_angle', np.float32),
+    ('object_idx', np.uint32), ('object_tag', np.uint32)])
+
+# Layout of one detection of a carla.RadarMeasurement
+RADAR_DTYPE = np.dtype([
+    ('velocity', np.float32), ('azimuth', np.float32), ('altitude', np.float32), ('depth', np.float32)])
+
+
+def _finish(array, copy):
+    """Returns a writable copy of the array, or the array itself made read-only"""
+    if copy:
+        # Copying the bytes is much faster than copying the fields of a structured array
+        return array.view(np.uint8).copy().view(array.dtype).reshape(array.shape)
+    array.flags.writeable = False
+    return array
+
+
+def buffer_view(measurement, dtype, copy=False):
+    """
+    Returns the raw data of a measurement as a 1D array of a given dtype
+
+        :param measurement: any sensor measurement with 'raw_data'
+        :param dtype (numpy.dtype): type of the elements of the buffer
+        :param copy (bool): whether to return a writable copy instead of a view
+    """
+    return _finish(np.frombuffer(measurement.raw_data, dtype=dtype), copy)
+
+
+def bgra_view(image, copy=False):
+    """
+    Returns a carla.Image as an (height, width, 4) uint8 array in BGRA order
+
+        :param image (carla.Image): camera image
+        :param copy (bool): whether to return a writable copy instead of a view
+    """
+    array = np.frombuffer(image.raw_data, dtype=np.uint8).reshape(image.height, image.width, 4)
+    return _finish(array, copy)
+
+
+def rgb_view(image, copy=False):
+    """
+    Returns a carla.Image as an (height, width, 3) uint8 array in RGB order. The view
+    reverses the first three channels through its strides, without allocating. Its copy
+    is contiguous.
+
+        :param image (carla.Image): camera image
+        :param copy (bool): whether to return a writable copy instead of a view
+    """
+    bgra = bgra_view(image)
+    if not copy:
+        return bgra[:, :, 2::-1]
+    # Copying channel by channel is several times faster than copying the reversed view
+    array = np.empty((image.height, image.width, 3), dtype=np.uint8)
+    for channel in range(3):
+        array[:, :, channel] = bgra[:, :, 2 - channel]
+    return array
+
+
+def alpha_view(image, copy=False):
+    """
+    Returns the (height, width) alpha channel of a carla.Image
+
+        :param image (carla.Image): camera image
+        :param copy (bool): whether to return a writable copy instead of a view
+    """
+    array = bgra_view(image)[:, :, 3]
+    return np.ascontiguousarray(array) if copy else array
+
+
+def lidar_view(measurement, copy=False):
+    """
+    Returns the points of a carla.LidarMeasurement as a structured array of LIDAR_DTYPE
+
+        :param measurement (carla.LidarMeasurement): lidar measurement
+        :param copy (bool): whether to return a writable copy instead of a view
+    """
+    return buffer_view(measurement, LIDAR_DTYPE, copy)
+
+
+def semantic_lidar_view(measurement, copy=False):
+    """
+    Returns the points of a carla.SemanticLidarMeasurement as a structured array of
+    SEMANTIC_LIDAR_DTYPE
+
+        :param measurement (carla.SemanticLidarMeasurement): semantic lidar measurement
+        :param copy (bool): whether to return a writable copy instead of a view
+    """
+    return buffer_view(measurement, SEMANTIC_LIDAR_DTYPE, copy)
+
+
+def radar_view(measurement, copy=False):
+    """
+    Returns the detections of a carla.RadarMeasurement as a structured array of RADAR_DTYPE
+
+        :param measurement (carla.RadarMeasurement): radar measurement
+        :param copy (bool): whether to return a writable copy instead of a view
+    """
+    return buffer_view(measurement, RADAR_DTYPE, copy)
+
+
+def xyz_view(points, copy=False):
+    """
+    Returns the x, y and z fields of a structured array of points as an (N, 3) float32
+    array, a view with the stride of the points unless a copy is requested
+
+        :param points (numpy.ndarray): structured array with consecutive float32 fields
+            'x', 'y' and 'z', such as those of lidar_view and semantic_lidar_view
+        :param copy (bool): whether to return a writable contiguous copy instead of a view
+    """
+    offset = points.dtype.fields['x'][1]
+    array = np.ndarray((len(points), 3), dtype=np.float32, buffer=points, offset=offset,
+                       strides=(points.dtype.itemsize, 4))
+    if copy:
+        return np.ascontiguousarray(array)
+    array.flags.writeable = False
+    return array
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+""" Module with a uniform grid spatial index over 2D points. """
+
+import numpy as np
+
+# Offset that keeps the cell coordinates positive when packing them into a single key
+_CELL_OFFSET = 1 << 20
+
+
+def _cell_keys(cells):
+    """Packs (N, 2) integer cell coordinates into (N,) int64 keys"""
+    return (cells[:, 0] + _CELL_OFFSET) * (1 << 22) + (cells[:, 1] + _CELL_OFFSET)
+
+
+def _concatenate_ranges(starts, counts):
+    """Concatenation of range(start, start + count) for each pair, without a python loop"""
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(total, dtype=np.int64)
+
+
+class UniformGrid(object):
+    """
+    Spatial hash of 2D points over square cells. Points are sorted by cell so that the
+    content of any cell is a contiguous slice, and lookups of many query points at once
+    are answered with a few vectorized searchsorted calls.
+    """
+
+    def __init__(self, points, cell_size):
+        """
+        :param points: (N, 2) or (N, 3) array, only x and y are indexed
+        :param cell_size: side of the cells, in meters
+        """
+        points = np.asarray(points, dtype=np.float64)
+        points = points.reshape(len(points), -1) if points.size else np.zeros((0, 2))
+        self.cell_size = float(cell_size)
+        self.points = points[:, :2]
+        keys = _cell_keys(np.floor(self.points / self.cell_size).astype(np.int64))
+        self._order = np.argsort(keys, kind='stable')
+        self._keys, self._starts, self._counts = np.unique(
+            keys[self._order], return_index=True, return_counts=True)
+
+    def __len__(self):
+        return len(self.points)
+
+    def candidates(self, queries, rings=1):
+        """
+        Returns every (query, point) pair whose cells are at most 'rings' cells apart.
+
+            :param queries: (Q, 2) or (Q, 3) array of query positions
+            :param rings: number of neighboring cells to look at in each direction
+            :return: tuple of (query indices, point indices), both int arrays of the same length
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, np.shape(queries)[-1])
+        if len(queries) == 0 or len(self._keys) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        cells = np.floor(queries[:, :2] / self.cell_size).astype(np.int64)
+        # Every neighboring cell of every query in a single search, grouped by cell offset
+        steps = np.arange(-rings, rings + 1)
+        offsets = np.stack(np.meshgrid(steps, steps, indexing='ij'), axis=-1).reshape(-1, 1, 2)
+        keys = _cell_keys((offsets + cells).reshape(-1, 2))
+        position = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        found = np.nonzero(self._keys[position] == keys)[0]
+
+        query_ids = found % len(queries)
+        counts = self._counts[position[found]]
+        items = self._order[_concatenate_ranges(self._starts[position[found]], counts)]
+        return np.repeat(query_ids, counts), items
+
+    def query_radius(self, center, radius, sort=True):
+        """
+        Indices of the points within a radius of a position
+
+            :param center: (x, y) or (x, y, z) position
+            :param radius: search radius, in meters
+            :param sort: if True the indices are sorted by distance, otherwise by index
+        """
+        center = np.asarray(center, dtype=np.float64)[:2]
+        rings = int(np.ceil(radius / self.cell_size))
+        _, items = self.candidates(center.reshape(1, 2), rings)
+        distances = np.hypot(*(self.points[items] - center).T)
+        inside = distances <= radius
+        items, distances = items[inside], distances[inside]
+        if not sort:
+            return np.sort(items)
+        return items[np.argsort(distances, kind='stable')]
+
+    def query_sector(self, center, radius, forward, angle_interval):
+        """
+        Indices of the points within a radius of a position and inside an interval of
+        angles around a direction, sorted by index. The angles follow misc.is_within_distance:
+        0 is a point straight ahead and 180 one right behind, the bounds are excluded, and
+        points closer than 1 mm to the center are always part of the sector.
+
+            :param center: (x, y) or (x, y, z) position
+            :param radius: search radius, in meters
+            :param forward: (x, y) unit vector of the direction of the sector
+            :param angle_interval: [min, max] angles to the direction, in degrees
+        """
+        center = np.asarray(center, dtype=np.float64)[:2]
+        items = self.query_radius(center, radius, sort=False)
+        offsets = self.points[items] - center
+        norms = np.hypot(offsets[:, 0], offsets[:, 1])
+        forward = np.asarray(forward, dtype=np.float64)[:2]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cosine = np.clip(offsets.dot(forward) / norms, -1.0, 1.0)
+        angles = np.degrees(np.arccos(cosine))
+        inside = (norms < 0.001) | ((angle_interval[0] < angles) & (angles < angle_interval[1]))
+        return items[inside]
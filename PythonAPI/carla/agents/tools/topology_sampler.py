@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Module with a bulk sampler of the lanes of a map.
+
+Walking a lane with Waypoint.next() costs one call to the simulator and one new
+waypoint per step. The sampler asks the map for the waypoints of every lane with a
+single Map.generate_waypoints call instead, groups them by lane and sorts them in the
+driving direction, so that the ordered waypoints between any two points of a lane are
+a slice of those lists.
+"""
+
+from bisect import bisect_left
+
+
+def lane_key(waypoint):
+    """Returns the (road_id, section_id, lane_id) of a waypoint"""
+    return waypoint.road_id, waypoint.section_id, waypoint.lane_id
+
+
+def walk_segment_path(entry, exit_waypoint, resolution):
+    """
+    Waypoints between the entry and exit of a topology segment, separated by the
+    resolution, walked step by step with Waypoint.next(). Returns None if nothing
+    follows the entry waypoint.
+
+        :param entry: carla.Waypoint at the start of the segment
+        :param exit_waypoint: carla.Waypoint at the end of the segment
+        :param resolution: distance between the waypoints
+    """
+    path = []
+    endloc = exit_waypoint.transform.location
+    if entry.transform.location.distance(endloc) > resolution:
+        w = entry.next(resolution)[0]
+        while w.transform.location.distance(endloc) > resolution:
+            path.append(w)
+            next_ws = w.next(resolution)
+            if len(next_ws) == 0:
+                break
+            w = next_ws[0]
+    else:
+        next_wps = entry.next(resolution)
+        if len(next_wps) == 0:
+            return None
+        path.append(next_wps[0])
+    return path
+
+
+class TopologySampler(object):
+    """
+    Waypoints of every lane of a map, sampled once at a given resolution.
+    """
+
+    def __init__(self, carla_map, resolution):
+        """
+        :param carla_map: carla.Map to sample
+        :param resolution: distance between the waypoints, in meters
+        """
+        self._map = carla_map
+        self.resolution = resolution
+        # Lane key to the waypoints of the lane, sorted in the driving direction
+        self._lanes = {}
+        # Lane key to the sorted distances along the driving direction of those waypoints
+        self._distances = {}
+
+        for waypoint in carla_map.generate_waypoints(resolution):
+            self._lanes.setdefault(lane_key(waypoint), []).append(waypoint)
+        for key, waypoints in self._lanes.items():
+            # Lanes with a positive id are driven against the direction of the road
+            direction = 1.0 if key[2] < 0 else -1.0
+            waypoints.sort(key=lambda w: direction * w.s)
+            self._distances[key] = [direction * w.s for w in waypoints]
+
+    def lane(self, waypoint):
+        """
+        Returns the sampled waypoints of the lane of a waypoint, in the driving direction
+        """
+        return self._lanes.get(lane_key(waypoint), [])
+
+    def _after(self, waypoint, gap):
+        """Sampled waypoints of the lane at least 'gap' meters ahead of a waypoint"""
+        key = lane_key(waypoint)
+        distances = self._distances.get(key)
+        if not distances:
+            return []
+        direction = 1.0 if key[2] < 0 else -1.0
+        start = bisect_left(distances, direction * waypoint.s + gap)
+        return self._lanes[key][start:]
+
+    def segment_path(self, entry, exit_waypoint):
+        """
+        Waypoints between the entry and exit of a topology segment, as walk_segment_path.
+        The first one is at least half the resolution ahead of the entry, and they stop
+        once within the resolution of the exit. Segments without sampled waypoints, such
+        as the ones shorter than the resolution, are walked with Waypoint.next().
+
+            :param entry: carla.Waypoint at the start of the segment
+            :param exit_waypoint: carla.Waypoint at the end of the segment
+        """
+        endloc = exit_waypoint.transform.location
+        path = []
+        for waypoint in self._after(entry, 0.5 * self.resolution):
+            if waypoint.transform.location.distance(endloc) <= self.resolution:
+                break
+            path.append(waypoint)
+        if not path:
+            return walk_segment_path(entry, exit_waypoint, self.resolution)
+        return path
+
+    def segments(self):
+        """
+        Returns the topology of the map as a list of (entry, exit, path) tuples, path
+        being the list of waypoints between entry and exit. Segments that nothing
+        follows are left out.
+        """
+        segments = []
+        for entry, exit_waypoint in self._map.get_topology():
+            path = self.segment_path(entry, exit_waypoint)
+            if path is not None:
+                segments.append((entry, exit_waypoint, path))
+        return segments
+
+    def road_walk(self, entry):
+        """
+        Waypoints from a waypoint to the end of its road, following its lane through
+        the sections of the road. Only one Waypoint.next() call is done per section.
+
+            :param entry: carla.Waypoint to start from
+        """
+        waypoints = [entry]
+        visited = {lane_key(entry)}
+        current = entry
+        while True:
+            waypoints.extend(self._after(current, 1e-3))
+            following = waypoints[-1].next(self.resolution)
+            if not following or following[0].road_id != entry.road_id:
+                break
+            current = following[0]
+            # Stop at loops through the sections of the road
+            if lane_key(current) in visited and lane_key(current) != lane_key(waypoints[-1]):
+                break
+            visited.add(lane_key(current))
+            waypoints.append(current)
+        return waypoints
@@ -22,6 +22,8 @@ except IndexError:
  
 import carla  # 导入CARLA模块
 import random  # 导入random模块，尽管在这段代码中未直接使用
+
+from agents.tools.topology_sampler import TopologySampler
  
 def get_scene_layout(carla_map):
     """
@@ -44,13 +46,13 @@ def get_scene_layout(carla_map):
     map_dict = dict()
     precision = 0.05  # 设置精度
     
+    # 一次性采样所有车道的路径点，避免逐步调用waypoint.next()
+    sampler = TopologySampler(carla_map, precision)
+
     # 遍历拓扑结构中的每个waypoint（路径点）
     for waypoint in topology:
-        waypoints = [waypoint]
-        nxt = waypoint.next(precision)  # 获取下一个路径点
-        while nxt and nxt[0].road_id == waypoint.road_id:  # 如果下一个路径点在同一道路上
-            waypoints.append(nxt[0])  # 添加到当前路径点的列表中
-            nxt = nxt[0].next(precision)  # 继续获取下一个路径点
+        # 沿当前车道获取到道路末端为止的路径点
+        waypoints = sampler.road_walk(waypoint)
         
         # 计算左右车道线的位置
         left_marking = [_lateral_shift(w.transform, -w.lane_width * 0.5) for w in waypoints]# 使用_lateral_shift函数，将每个路径点的transform（位置和朝向）沿横向移动半个车道宽度的距离
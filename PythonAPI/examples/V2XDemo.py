@@ -81,6 +81,8 @@ try:# 尝试添加CARLA的Python API路径到系统路径中
 except IndexError:
     pass# 如果找不到匹配的文件，忽略异常
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')# 添加agents包所在的路径
+
 
 # ==============================================================================
 # -- imports -------------------------------------------------------------------
@@ -90,6 +92,7 @@ except IndexError:
 import carla# 导入carla模块，CARLA模拟器的Python API
 
 from carla import ColorConverter as cc
+from agents.tools.dataset_writer import DatasetWriter  # pylint: disable=import-error
 
 import argparse  # 处理命令行参数的模块，能够解析命令行输入并提供简单的接口。
 import collections  # 提供了一些额外的数据类型，如deque、Counter、OrderedDict等，提供更强大的 collection 操作能力。
@@ -142,8 +145,6 @@ try:
     from pygame.locals import K_z
     from pygame.locals import K_MINUS
     from pygame.locals import K_EQUALS
-try:
-    import pygame
 except ImportError:
     # 如果无法导入pygame模块，则引发RuntimeError
     raise RuntimeError('cannot import pygame, make sure pygame package is installed')
@@ -396,6 +397,7 @@ class World(object):
             if sensor is not None:
                 sensor.stop()
                 sensor.destroy()
+        self.camera_manager.close()
         if self.player is not None:
             self.player.destroy()
 
@@ -1155,6 +1157,8 @@ class CameraManager(object):
         self._parent = parent_actor
         self.hud = hud
         self.recording = False
+        # 录制时在后台进程中编码并保存图像和点云，创建于第一次开始录制时
+        self.writer = None
         bound_x = 0.5 + self._parent.bounding_box.extent.x
         bound_y = 0.5 + self._parent.bounding_box.extent.y
         bound_z = 0.5 + self._parent.bounding_box.extent.z
@@ -1246,9 +1250,18 @@ class CameraManager(object):
         self.set_sensor(self.index + 1)
 
     def toggle_recording(self):
+        if self.writer is None:
+            self.writer = DatasetWriter(workers=2, max_pending=32)
         self.recording = not self.recording
         self.hud.notification('Recording %s' % ('On' if self.recording else 'Off'))
 
+    def close(self):
+        """Stops recording and waits until every recorded frame is on disk"""
+        self.recording = False
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
     def render(self, display):
         if self.surface is not None:
             display.blit(self.surface, (0, 0))
@@ -1295,7 +1308,13 @@ class CameraManager(object):
             array = array[:, :, ::-1]
             self.surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
         if self.recording:
-            image.save_to_disk('_out/%08d' % image.frame)
+            # 回调只把数据放入写入队列，编码和写盘不会拖慢传感器线程
+            if self.sensors[self.index][0].startswith('sensor.lidar'):
+                self.writer.write_point_cloud('_out/%08d.ply' % image.frame, image)
+            elif self.sensors[self.index][0].startswith('sensor.camera.dvs'):
+                image.save_to_disk('_out/%08d' % image.frame)
+            else:
+                self.writer.write_image('_out/%08d.png' % image.frame, image)
 
 
 # ==============================================================================
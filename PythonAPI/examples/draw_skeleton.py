@@ -25,7 +25,11 @@ try:
 except IndexError:
     pass # 如果找不到CARLA的egg文件，则忽略
 
+# 将PythonAPI/carla添加到系统路径中，以便导入agents模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla  # 导入CARLA模块，用于与CARLA仿真环境交互
+from agents.tools.sensor_sync import CarlaSyncMode  # pylint: disable=import-error
 import random  # 用于生成随机数
 
 # 尝试导入pygame模块，如果失败则抛出运行时错误
@@ -40,70 +44,6 @@ try:
 except ImportError:
     raise RuntimeError('cannot import numpy, make sure numpy package is installed')
 
-# 尝试导入queue模块，如果失败则尝试导入Python 2的Queue模块
-try:
-    import queue
-except ImportError:
-    import Queue as queue
-
-# 定义一个类，用于同步来自不同传感器的输出
-class CarlaSyncMode(object):
-    """
-    Context manager to synchronize output from different sensors. Synchronous
-    mode is enabled as long as we are inside this context
-
-        with CarlaSyncMode(world, sensors) as sync_mode:
-            while True:
-                data = sync_mode.tick(timeout=1.0)
-
-    """
-
-    # 初始化方法，设置世界对象、传感器列表、帧率等
-    def __init__(self, world, *sensors, **kwargs):
-        self.world = world
-        self.sensors = sensors
-        self.frame = None
-        self.delta_seconds = 1.0 / kwargs.get('fps', 20)
-        self._queues = []
-        self._settings = None
-
-    # 进入上下文管理器时执行的方法
-    def __enter__(self):
-        self._settings = self.world.get_settings()
-        self.frame = self.world.apply_settings(carla.WorldSettings(
-            no_rendering_mode=False,
-            synchronous_mode=True,
-            fixed_delta_seconds=self.delta_seconds))
-
-        def make_queue(register_event):
-            q = queue.Queue()
-            register_event(q.put)
-            self._queues.append(q)
-
-        make_queue(self.world.on_tick)
-        for sensor in self.sensors:
-            make_queue(sensor.listen)
-        return self
-        
-    # 同步获取传感器数据的方法
-    def tick(self, timeout):
-        self.frame = self.world.tick()
-        data = [self._retrieve_data(q, timeout) for q in self._queues]
-        assert all(x.frame == self.frame for x in data)
-        return data
-
-    # 退出上下文管理器时执行的方法
-    def __exit__(self, *args, **kwargs):
-        self.world.apply_settings(self._settings)
-    
-    # 辅助方法，用于从队列中检索数据
-    def _retrieve_data(self, sensor_queue, timeout):
-        while True:
-            data = sensor_queue.get(timeout=timeout)
-            if data.frame == self.frame:
-                return data
-    # ---------------
-
 # 构建投影矩阵的函数，用于将3D点投影到2D图像上
 def build_projection_matrix(w, h, fov):
     focal = w / (2.0 * np.tan(fov * np.pi / 360.0))
@@ -233,34 +173,34 @@ def draw_line_on_buffer(buffer, image_w, image_h, points_2d, color, size=4):
 
        返回值：无（直接在传入的缓冲区上修改绘制线段对应的像素值）
        """
-  x0 = int(points_2d[0][0])
-  y0 = int(points_2d[0][1])
-  x1 = int(points_2d[1][0])
-  y1 = int(points_2d[1][1])
-  dx = abs(x1 - x0)
-# 根据线段起点和终点横坐标的大小关系确定横坐标的步进方向（1表示正向，-1表示反向）
-  if x0 < x1:
-    sx = 1
-  else:
-    sx = -1
-  dy = -abs(y1 - y0)
-# 根据线段起点和终点纵坐标的大小关系确定纵坐标的步进方向（1表示正向，-1表示反向）
-  if y0 < y1:
-    sy = 1
-  else:
-    sy = -1
-  err = dx + dy
-  while True:
-    draw_points_on_buffer(buffer, image_w, image_h, ((x0,y0),), color, size)
-    if (x0 == x1 and y0 == y1):
-      break
-    e2 = 2 * err
-    if (e2 >= dy):
-      err += dy
-      x0 += sx
-    if (e2 <= dx):
-      err += dx
-      y0 += sy
+    x0 = int(points_2d[0][0])
+    y0 = int(points_2d[0][1])
+    x1 = int(points_2d[1][0])
+    y1 = int(points_2d[1][1])
+    dx = abs(x1 - x0)
+    # 根据线段起点和终点横坐标的大小关系确定横坐标的步进方向（1表示正向，-1表示反向）
+    if x0 < x1:
+        sx = 1
+    else:
+        sx = -1
+    dy = -abs(y1 - y0)
+    # 根据线段起点和终点纵坐标的大小关系确定纵坐标的步进方向（1表示正向，-1表示反向）
+    if y0 < y1:
+        sy = 1
+    else:
+        sy = -1
+    err = dx + dy
+    while True:
+        draw_points_on_buffer(buffer, image_w, image_h, ((x0,y0),), color, size)
+        if (x0 == x1 and y0 == y1):
+            break
+        e2 = 2 * err
+        if (e2 >= dy):
+            err += dy
+            x0 += sx
+        if (e2 <= dx):
+            err += dx
+            y0 += sy
 
 def draw_skeleton(buffer, image_w, image_h, boneIndex, points2d, color, size=4):
     try:
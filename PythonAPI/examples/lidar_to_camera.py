@@ -35,10 +35,16 @@ except IndexError:
     # 则使用 `pass` 语句跳过异常处理，也就是什么都不做。这意味着在找不到对应文件路径的情况下，代码不会因为异常而中断，只是不会成功添加路径到 `sys.path` 而已。
     pass
 
+# 将PythonAPI/carla添加到sys.path，以便导入agents模块。
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
 
+from agents.tools.lidar_projection import Projector, build_lut  # pylint: disable=import-error
+from agents.tools.sensor_sync import SensorSynchronizer  # pylint: disable=import-error
+from agents.tools.sensor_views import lidar_view, rgb_view, xyz_view  # pylint: disable=import-error
+
 import argparse
-from queue import Queue
 from queue import Empty
 from matplotlib import cm
 
@@ -60,15 +66,7 @@ except ImportError:
     raise RuntimeError('cannot import PIL, make sure "Pillow" package is installed')
 
 # 用于lidar强度可视化的颜色映射
-VIRIDIS = np.array(cm.get_cmap('viridis').colors)
-VID_RANGE = np.linspace(0.0, 1.0, VIRIDIS.shape[0])
-
-def sensor_callback(data, queue):
-    """
-   传感器数据的回调函数。它将数据放入线程安全的队列中。
-    """
-    queue.put(data)
-
+VIRIDIS = build_lut(cm.get_cmap('viridis').colors)
 
 def tutorial(args):
     """
@@ -123,65 +121,61 @@ def tutorial(args):
             blueprint=vehicle_bp,
             transform=world.get_map().get_spawn_points()[0])
         vehicle.set_autopilot(True)
+        # 传感器相对于车辆的位置
+        camera_transform = carla.Transform(carla.Location(x=1.6, z=1.6))
+        lidar_transform = carla.Transform(carla.Location(x=1.0, z=1.8))
         camera = world.spawn_actor(
             blueprint=camera_bp,
-            transform=carla.Transform(carla.Location(x=1.6, z=1.6)),
+            transform=camera_transform,
             attach_to=vehicle)
         lidar = world.spawn_actor(
             blueprint=lidar_bp,
-            transform=carla.Transform(carla.Location(x=1.0, z=1.8)),
+            transform=lidar_transform,
             attach_to=vehicle)
 
         # 构建K投影矩阵：
         # 这里定义了一个内参矩阵 K 的形式（虽然只是以注释形式展示了结构，实际可能后续需要根据变量值构建矩阵），内参矩阵在计算机视觉中用于将相机坐标系下的点投影到图像平面上，
-# 它包含了相机的焦距等信息，通常是一个 3x3 的矩阵。
-# 其中 Fx 和 Fy 一般表示相机在 x 和 y 方向上的焦距（这里暂时以变量形式表示，后续应该会被赋予具体的值），
-# image_w/2 和 image_h/2 分别对应图像中心点在 x 和 y 方向上的坐标，以像素为单位，用于将相机坐标系原点与图像平面中心对齐。
-# 第三行 [ 0,  0,         1] 是内参矩阵的固定形式部分，用于齐次坐标的计算等相关操作，保证投影计算的正确性。
-# K = [[Fx,  0, image_w/2],
-#      [ 0, Fy, image_h/2],
-#      [ 0,  0,         1]]
-
-# 获取相机蓝图（camera_bp）中图像宽度属性（"image_size_x"）的值，并将其转换为整数类型，赋值给 image_w 变量，
-# 这个值表示相机拍摄的图像在水平方向上包含的像素数量，后续可用于与相机参数相关的计算等操作。
-image_w = camera_bp.get_attribute("image_size_x").as_int()
-
-# 与获取图像宽度类似，获取相机蓝图中图像高度属性（"image_size_y"）的值，转换为整数类型后赋值给 image_h 变量，
-# 它代表相机拍摄图像在垂直方向上的像素数量，同样在相机相关参数计算等场景中会被用到。
-image_h = camera_bp.get_attribute("image_size_y").as_int()
-
-# 获取相机蓝图中视场角（"fov"）属性的值，并转换为浮点数类型，赋值给 fov 变量，
-# 视场角表示相机能够拍摄到的范围角度，是相机的一个重要参数，通常单位是度（°），在后续计算焦距等相关操作中会作为输入参数。
-fov = camera_bp.get_attribute("fov").as_float()
-
-# 根据相机的视场角（fov）以及已经获取到的图像宽度（image_w）来计算相机在水平方向上的焦距（focal）。
-# 计算公式基于三角函数关系推导而来，首先将视场角从度转换为弧度（乘以 np.pi / 360.0），然后利用正切函数关系，
-# 由于水平方向上焦距与图像宽度及视场角有这样的数学关系：focal * 2 * tan(fov/2) = image_w（这里的 fov 需为弧度制），
-# 经过变形就得到了此处的计算式，计算得到的 focal 值将用于相机内参相关的计算或者其他涉及相机投影等操作中，它表示相机镜头的焦距特性。
-focal = image_w / (2.0 * np.tan(fov * np.pi / 360.0))
-
-        # 在这种情况下，Fx和Fy是相同的，因为像素宽高比是1
-
-        K = np.identity(3)
-        K[0, 0] = K[1, 1] = focal
-        K[0, 2] = image_w / 2.0
-        K[1, 2] = image_h / 2.0
-
-        # 传感器数据将被保存在线程安全的队列中
-        image_queue = Queue()
-        lidar_queue = Queue()
-
-        camera.listen(lambda data: sensor_callback(data, image_queue))
-        lidar.listen(lambda data: sensor_callback(data, lidar_queue))
+        # 它包含了相机的焦距等信息，通常是一个 3x3 的矩阵。
+        # 其中 Fx 和 Fy 一般表示相机在 x 和 y 方向上的焦距（这里暂时以变量形式表示，后续应该会被赋予具体的值），
+        # image_w/2 和 image_h/2 分别对应图像中心点在 x 和 y 方向上的坐标，以像素为单位，用于将相机坐标系原点与图像平面中心对齐。
+        # 第三行 [ 0,  0,         1] 是内参矩阵的固定形式部分，用于齐次坐标的计算等相关操作，保证投影计算的正确性。
+        # K = [[Fx,  0, image_w/2],
+        #      [ 0, Fy, image_h/2],
+        #      [ 0,  0,         1]]
+
+        # 获取相机蓝图（camera_bp）中图像宽度属性（"image_size_x"）的值，并将其转换为整数类型，赋值给 image_w 变量，
+        # 这个值表示相机拍摄的图像在水平方向上包含的像素数量，后续可用于与相机参数相关的计算等操作。
+        image_w = camera_bp.get_attribute("image_size_x").as_int()
+
+        # 与获取图像宽度类似，获取相机蓝图中图像高度属性（"image_size_y"）的值，转换为整数类型后赋值给 image_h 变量，
+        # 它代表相机拍摄图像在垂直方向上的像素数量，同样在相机相关参数计算等场景中会被用到。
+        image_h = camera_bp.get_attribute("image_size_y").as_int()
+
+        # 获取相机蓝图中视场角（"fov"）属性的值，并转换为浮点数类型，赋值给 fov 变量，
+        # 视场角表示相机能够拍摄到的范围角度，通常单位是度（°），用于计算内参矩阵K的焦距。
+        fov = camera_bp.get_attribute("fov").as_float()
+
+        # 相机和lidar都刚性地附着在车辆上，lidar到相机的变换矩阵在整个模拟过程中不变，
+        # 因此内参矩阵K、外参矩阵以及从UE4坐标系到标准相机坐标系（与OpenCV相同）的转换只需计算一次：
+        # (x, y ,z) -> (y, -z, x)
+        lidar_2_camera = np.dot(
+            np.array(camera_transform.get_inverse_matrix()),
+            np.array(lidar_transform.get_matrix()))
+        projector = Projector(image_w, image_h, fov, lidar_2_camera)
+
+        # 传感器数据将按帧保存在线程安全的同步器中
+        synchronizer = SensorSynchronizer(['camera', 'lidar'])
+
+        camera.listen(synchronizer.callback('camera'))
+        lidar.listen(synchronizer.callback('lidar'))
 
         for frame in range(args.frames):#frame从0到arg.frames-1执行循环
             world.tick()
             world_frame = world.get_snapshot().frame
 
             try:
-                # 一旦接收到数据就获取它。
-                image_data = image_queue.get(True, 1.0)
-                lidar_data = lidar_queue.get(True, 1.0)
+                # 一旦接收到这一帧的全部数据就获取它。
+                image_data, lidar_data = synchronizer.get(world_frame, timeout=1.0)
             except Empty:
                 print("[Warning] Some sensor data has been missed")
                 continue
@@ -193,104 +187,18 @@ focal = image_w / (2.0 * np.tan(fov * np.pi / 360.0))
             sys.stdout.flush()
 
             # 获取原始BGRA缓冲区并将其转换为RGB数组，形状为（image_data.height，image_data.width，3）。
-            im_array = np.copy(np.frombuffer(image_data.raw_data, dtype=np.dtype("uint8")))
-            im_array = np.reshape(im_array, (image_data.height, image_data.width, 4))
-            im_array = im_array[:, :, :3][:, :, ::-1]
-
-            # 获取lidar数据并将其转换为numpy数组。
-            p_cloud_size = len(lidar_data)
-            p_cloud = np.copy(np.frombuffer(lidar_data.raw_data, dtype=np.dtype('f4')))
-            p_cloud = np.reshape(p_cloud, (p_cloud_size, 4))
-
-            # Lidar强度数组形状为（p_cloud_size，），但目前，我们关注3D点。
-            intensity = np.array(p_cloud[:, 3])
-
-            # 点云在lidar传感器空间数组形状为（3，p_cloud_size）。
-            local_lidar_points = np.array(p_cloud[:, :3]).T
-
-            # 为每个3D点添加额外的1.0，使其成为形状（4，p_cloud_size）的数组，以便它可以乘以（4，4）矩阵。
-            local_lidar_points = np.r_[
-                local_lidar_points, [np.ones(local_lidar_points.shape[1])]]
-
-            # 这个（4，4）矩阵将点从lidar空间转换到世界空间。
-            lidar_2_world = lidar.get_transform().get_matrix()
-
-            # 将点从lidar空间转换到世界空间。
-            world_points = np.dot(lidar_2_world, local_lidar_points)
-
-            # 这个（4，4）矩阵将点从世界坐标转换到相机坐标。
-            world_2_camera = np.array(camera.get_transform().get_inverse_matrix())
-
-            # 将点从世界空间转换到相机空间。
-            sensor_points = np.dot(world_2_camera, world_points)
-
-            #现在我们必须从UE4的坐标系更改为“标准”
-            # 相机坐标系（与OpenCV使用的相同）：
-
-            # ^ z                       . z
-            # |                        /
-            # |              转换为： +-------> x
-            # | . x                   |
-            # |/                      |
-            # +-------> y             v y
-
-            # 这可以通过乘以以下矩阵实现：
-            # [[ 0,  1,  0 ],
-            #  [ 0,  0, -1 ],
-            #  [ 1,  0,  0 ]]
-
-            # 或者，在这种情况下，等同于交换：
-            # (x, y ,z) -> (y, -z, x)
-            point_in_camera_coords = np.array([
-                sensor_points[1],
-                sensor_points[2] * -1,
-                sensor_points[0]])
-
-            #最后，我们可以使用我们的K矩阵进行实际的3D -> 2D转换。
-            points_2d = np.dot(K, point_in_camera_coords)
-
-            # 记得通过第三值归一化x，y值。
-            points_2d = np.array([
-                points_2d[0, :] / points_2d[2, :],
-                points_2d[1, :] / points_2d[2, :],
-                points_2d[2, :]])
-
-            # 此时，points_2d[0, :] 包含所有点的 x 坐标，points_2d[1, :] 包含所有点的 y 坐标。
-            # 为了在屏幕上正确地可视化所有内容，必须丢弃屏幕外的点，以及相机投影平面后的点。
-            points_2d = points_2d.T
-            intensity = intensity.T
-           # 创建一个掩码，用于筛选出在画布内的点
-            points_in_canvas_mask = \
-                (points_2d[:, 0] > 0.0) & (points_2d[:, 0] < image_w) & \
-                (points_2d[:, 1] > 0.0) & (points_2d[:, 1] < image_h) & \
-                (points_2d[:, 2] > 0.0)
-             # 应用掩码，筛选出画布内的点
-            points_2d = points_2d[points_in_canvas_mask]
-            intensity = intensity[points_in_canvas_mask]
-
-           # 提取屏幕坐标（uv）作为整数。
-            u_coord = points_2d[:, 0].astype(np.int)
-            v_coord = points_2d[:, 1].astype(np.int)
-
-            # 由于在创建此脚本时，强度函数返回的值较高，需要调整以便更好地进行可视化。
-            intensity = 4 * intensity - 3
-            # 根据强度值，使用viridis颜色映射来为每个点着色
-            color_map = np.array([
-                np.interp(intensity, VID_RANGE, VIRIDIS[:, 0]) * 255.0,
-                np.interp(intensity, VID_RANGE, VIRIDIS[:, 1]) * 255.0,
-                np.interp(intensity, VID_RANGE, VIRIDIS[:, 2]) * 255.0]).astype(np.int).T
-
-            if args.dot_extent <= 0:
-              # 使用numpy将2D点绘制为单个像素。
-                im_array[v_coord, u_coord] = color_map
-            else:
-                # 将2D点绘制为边长为args.dot_extent的正方形。
-                for i in range(len(points_2d)):
-                    # 我不是NumPy专家，不知道如何在不使用这个循环的情况下设置更大的点，
-                    # 所以如果有人有更好的解决方案，请务必更新这个脚本。与此同时，它足够快 :)
-                    im_array[
-                        v_coord[i]-args.dot_extent : v_coord[i]+args.dot_extent,
-                        u_coord[i]-args.dot_extent : u_coord[i]+args.dot_extent] = color_map[i]
+            # 之后要在图像上绘制点，所以这里请求一份可写的副本。
+            im_array = rgb_view(image_data, copy=True)
+
+            # 获取lidar数据的只读视图，不复制缓冲区。
+            p_cloud = lidar_view(lidar_data)
+
+            # 一次矩阵乘法把lidar空间的点投影为像素坐标和深度，丢弃屏幕外和相机后方的点，
+            # 每个像素只保留最近的点，并按强度用viridis颜色直接写入图像。
+            # 由于在创建此脚本时，强度函数返回的值较高，颜色映射只覆盖0.75到1之间的强度，以便更好地进行可视化。
+            projector.draw_values(
+                im_array, xyz_view(p_cloud), p_cloud['intensity'], VIRIDIS,
+                low=0.75, high=1.0, extent=args.dot_extent)
 
             # 使用Pillow模块保存图像。
             image = Image.fromarray(im_array)
@@ -310,7 +218,7 @@ focal = image_w / (2.0 * np.tan(fov * np.pi / 360.0))
 
 
 def main():
-        """
+    """
     主函数，用于解析命令行参数并启动相关教程（tutorial）操作。
     它通过argparse模块来定义和解析一系列的命令行参数，然后调用tutorial函数执行具体任务，
     同时对可能出现的用户中断操作（通过键盘中断）进行了异常处理。
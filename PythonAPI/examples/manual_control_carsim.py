@@ -71,6 +71,8 @@ try:
 except IndexError:
     pass
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 
 # ==============================================================================
 # -- imports -------------------------------------------------------------------
@@ -80,6 +82,7 @@ except IndexError:
 import carla
 
 from carla import ColorConverter as cc
+from agents.tools.dataset_writer import DatasetWriter  # pylint: disable=import-error
 
 import argparse
 import collections
@@ -332,6 +335,7 @@ class World(object):
             if sensor is not None:
                 sensor.stop()
                 sensor.destroy()
+        self.camera_manager.close()
         if self.player is not None:
             self.player.destroy()
 
@@ -1005,6 +1009,8 @@ class CameraManager(object):
         self._parent = parent_actor
         self.hud = hud
         self.recording = False
+        # 录制时在后台进程中编码并保存图像和点云，创建于第一次开始录制时
+        self.writer = None
         bound_y = 0.5 + self._parent.bounding_box.extent.y
         Attachment = carla.AttachmentType
         self._camera_transforms = [
@@ -1080,9 +1086,18 @@ class CameraManager(object):
         self.set_sensor(self.index + 1)
 
     def toggle_recording(self):
+        if self.writer is None:
+            self.writer = DatasetWriter(workers=2, max_pending=32)
         self.recording = not self.recording
         self.hud.notification('Recording %s' % ('On' if self.recording else 'Off'))
 
+    def close(self):
+        """Stops recording and waits until every recorded frame is on disk"""
+        self.recording = False
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
     def render(self, display):
         if self.surface is not None:
             display.blit(self.surface, (0, 0))
@@ -1122,7 +1137,13 @@ class CameraManager(object):
             array = array[:, :, ::-1]
             self.surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
         if self.recording:
-            image.save_to_disk('_out/%08d' % image.frame)
+            # 回调只把数据放入写入队列，编码和写盘不会拖慢传感器线程
+            if self.sensors[self.index][0].startswith('sensor.lidar'):
+                self.writer.write_point_cloud('_out/%08d.ply' % image.frame, image)
+            elif self.sensors[self.index][0].startswith('sensor.camera.dvs'):
+                image.save_to_disk('_out/%08d' % image.frame)
+            else:
+                self.writer.write_image('_out/%08d.png' % image.frame, image)
 
 
 # ==============================================================================
@@ -27,7 +27,12 @@ try:
 except IndexError:
     pass
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
+
+from agents.tools.sensor_views import lidar_view, semantic_lidar_view  # pylint: disable=import-error
+
 # 获取名为'plasma'的颜色映射表中的颜色数组，用于后续根据强度值映射颜色
 VIRIDIS = np.array(cm.get_cmap('plasma').colors)
 # 在[0.0, 1.0]区间均匀生成与VIRIDIS颜色数组长度相同数量的数值，用于颜色映射的范围界定
@@ -74,13 +79,11 @@ def lidar_callback(point_cloud, point_list):
     2. 根据强度值计算对应的颜色。
     3. 对坐标进行必要的变换以适配Open3D的坐标系，最终将处理好的点坐标和颜色赋值给point_list对象，使其可被Open3D用于可视化等后续操作。
     """
-    # 将点云的原始数据（字节流形式）复制并转换为numpy数组，数据类型为单精度浮点数（'f4'）
-    data = np.copy(np.frombuffer(point_cloud.raw_data, dtype=np.dtype('f4')))
-    # 按照每4个元素一组进行重塑，因为每个点的数据可能包含坐标（3个值）和强度（1个值）等信息，共4个值一组
-    data = np.reshape(data, (int(data.shape[0] / 4), 4))
+    # 不复制地获取点云原始数据的只读结构化视图，每个点包含坐标x、y、z和强度intensity
+    data = lidar_view(point_cloud)
 
     # 提取每个点的强度信息，存储在intensity数组中
-    intensity = data[:, -1]
+    intensity = data['intensity']
     # 根据强度值计算强度对应的颜色值，这里通过对数变换等方式将强度映射到[0, 1]区间，以便后续映射到颜色范围
     intensity_col = 1.0 - np.log(intensity) / np.log(np.exp(-0.004 * 100))
     # 通过线性插值的方式，根据强度对应的颜色值（intensity_col），在预定义的颜色范围（VID_RANGE和VIRIDIS）内获取对应的RGB颜色值
@@ -88,10 +91,9 @@ def lidar_callback(point_cloud, point_list):
         np.interp(intensity_col, VID_RANGE, VIRIDIS[:, 0]),
         np.interp(intensity_col, VID_RANGE, VIRIDIS[:, 1]),
         np.interp(intensity_col, VID_RANGE, VIRIDIS[:, 2])]
-    # 提取每个点的3D坐标信息，去掉最后一列的强度信息
-    points = data[:, :-1]
-    # 由于Open3D使用右手坐标系，而可能原始数据所在的坐标系（比如Unreal中的）与之不同，这里将y坐标取反来正确可视化，使其与Unreal中的世界视图相匹配
-    points[:, :1] = -points[:, :1]
+    # 提取每个点的3D坐标信息。由于Open3D使用右手坐标系，而可能原始数据所在的坐标系（比如Unreal中的）与之不同，
+    # 这里将y坐标取反来正确可视化，使其与Unreal中的世界视图相匹配
+    points = np.array([data['x'], -data['y'], data['z']]).T
 
     # # 以下是一段示例代码，如果有一个名为"tran"的carla.Transform变量，可以通过它将点从传感器坐标系转换到车辆坐标系
     # # 先给点云数据添加一列全1的值，用于矩阵乘法进行坐标变换
@@ -110,9 +112,7 @@ def lidar_callback(point_cloud, point_list):
 def semantic_lidar_callback(point_cloud, point_list):
     """Prepares a point cloud with semantic segmentation
     colors ready to be consumed by Open3D"""
-    data = np.frombuffer(point_cloud.raw_data, dtype=np.dtype([
-        ('x', np.float32), ('y', np.float32), ('z', np.float32),
-        ('CosAngle', np.float32), ('ObjIdx', np.uint32), ('ObjTag', np.uint32)]))
+    data = semantic_lidar_view(point_cloud)
 
     # We're negating the y to correclty visualize a world that matches
     # what we see in Unreal since Open3D uses a right-handed coordinate system
@@ -122,12 +122,12 @@ def semantic_lidar_callback(point_cloud, point_list):
     # points += np.random.uniform(-0.05, 0.05, size=points.shape)
 
     # Colorize the pointcloud based on the CityScapes color palette
-    labels = np.array(data['ObjTag'])
+    labels = np.array(data['object_tag'])
     int_color = LABEL_COLORS[labels]
 
     # # In case you want to make the color intensity depending
     # # of the incident ray angle, you can use:
-    # int_color *= np.array(data['CosAngle'])[:, None]
+    # int_color *= np.array(data['cos_angle'])[:, None]
 
     point_list.points = o3d.utility.Vector3dVector(points)
     point_list.colors = o3d.utility.Vector3dVector(int_color)
@@ -13,9 +13,9 @@ The communication model for the syncronous mode in CARLA sends the snapshot
 of the world and the sensors streams in parallel.
 We provide this script as an example of how to syncrononize the sensor
 data gathering in the client.
-To to this, we create a queue that is being filled by every sensor when the
-client receives its data and the main loop is blocked until all the sensors
-have received its data.
+To to this, we create a synchronizer that is being filled by every sensor when
+the client receives its data, in the slot of the frame of the data, and the main
+loop is blocked until all the sensors have delivered the current frame.
 This suppose that all the sensors gather information at every tick. It this is
 not the case, the clients needs to take in account at each frame how many
 sensors are going to tick at each frame.
@@ -24,8 +24,8 @@ sensors are going to tick at each frame.
 import glob
 import os
 import sys
-from queue import Queue
-from queue import Empty
+import time
+
 # 尝试将Carla库的路径添加到系统路径中，根据Python版本和操作系统类型来确定具体的库文件（.egg文件）
 try:
     sys.path.append(glob.glob('../carla/dist/carla-*%d.%d-%s.egg' % (
@@ -35,19 +35,23 @@ try:
 except IndexError:
     pass
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
 
+from agents.tools.sensor_sync import SensorSynchronizer  # pylint: disable=import-error
+
 # Sensor callback.
 # 这是传感器的回调函数，用于接收传感器数据并进行处理。
-# 重要的是，最后要将包含相关信息的元素放入传感器队列中。
+# 重要的是，最后要将数据交给同步器，同步器按帧编号把它放入对应的槽位中。
 # 参数说明：
 # - sensor_data：传感器采集到的数据。
-# - sensor_queue：传感器数据要放入的队列，用于后续处理和同步。
+# - synchronizer：按帧对齐各传感器数据的同步器。
 # - sensor_name：传感器的名称，用于标识不同的传感器。
-def sensor_callback(sensor_data, sensor_queue, sensor_name):
+def sensor_callback(sensor_data, synchronizer, sensor_name):
     # 在这里可以对sensor_data进行各种操作，比如将其保存到磁盘等。
-    # 然后只需将相关信息添加到队列中即可。
-    sensor_queue.put((sensor_data.frame, sensor_name))
+    # 然后只需将数据交给同步器即可。
+    synchronizer.push(sensor_name, sensor_data)
 
 
 def main():
@@ -69,9 +73,11 @@ def main():
         settings.synchronous_mode = True
         world.apply_settings(settings)
 
-        # 创建一个队列，用于存储传感器接收到的数据。
-        # 这个队列是线程安全的，多个传感器的回调函数可以并发地向其添加数据而不会出现问题。
-        sensor_queue = Queue()
+        # 创建一个同步器，按帧存储传感器接收到的数据。
+        # 它是线程安全的，多个传感器的回调函数可以并发地向其添加数据而不会出现问题。
+        # 'skip'策略表示某个传感器在超时前没有送达数据时，跳过这一帧。
+        sensor_names = ["camera01", "lidar01", "lidar02", "radar01", "radar02"]
+        synchronizer = SensorSynchronizer(sensor_names, policy='skip')
 
         # 获取世界中的蓝图库，蓝图用于创建各种对象，比如传感器等。
         blueprint_library = world.get_blueprint_library()
@@ -87,7 +93,7 @@ def main():
         # 在世界中生成一个相机传感器实例，位置使用默认的变换（原点位置等默认设置）。
         cam01 = world.spawn_actor(cam_bp, carla.Transform())
         # 为相机传感器设置监听函数，当有数据时会调用sensor_callback进行处理，传入对应的数据、队列和传感器名称。
-        cam01.listen(lambda data: sensor_callback(data, sensor_queue, "camera01"))
+        cam01.listen(lambda data: sensor_callback(data, synchronizer, "camera01"))
         # 将创建的相机传感器添加到传感器列表中。
         sensor_list.append(cam01)
         # 设置激光雷达传感器的属性，这里设置每秒的点数为100000。
@@ -95,44 +101,49 @@ def main():
         # 在世界中生成一个激光雷达传感器实例，位置同样使用默认变换。
         lidar01 = world.spawn_actor(lidar_bp, carla.Transform())
         # 为该激光雷达传感器设置监听函数，传入相应参数用于处理数据。
-        lidar01.listen(lambda data: sensor_callback(data, sensor_queue, "lidar01"))
+        lidar01.listen(lambda data: sensor_callback(data, synchronizer, "lidar01"))
         # 将其添加到传感器列表。
         sensor_list.append(lidar01)
         # 再次设置激光雷达传感器属性，这里设置每秒点数为1000000，用于创建另一个不同配置的激光雷达传感器。
         lidar_bp.set_attribute('points_per_second', '1000000')
         lidar02 = world.spawn_actor(lidar_bp, carla.Transform())
-        lidar02.listen(lambda data: sensor_callback(data, sensor_queue, "lidar02"))
+        lidar02.listen(lambda data: sensor_callback(data, synchronizer, "lidar02"))
         sensor_list.append(lidar02)
         # 在世界中生成一个雷达传感器实例，位置为默认变换。
         radar01 = world.spawn_actor(radar_bp, carla.Transform())
         # 为雷达传感器设置监听函数，传入对应参数用于处理数据。
-        radar01.listen(lambda data: sensor_callback(data, sensor_queue, "radar01"))
+        radar01.listen(lambda data: sensor_callback(data, synchronizer, "radar01"))
         # 将其添加到传感器列表。
         sensor_list.append(radar01)
         radar02 = world.spawn_actor(radar_bp, carla.Transform())
-        radar02.listen(lambda data: sensor_callback(data, sensor_queue, "radar02"))
+        radar02.listen(lambda data: sensor_callback(data, synchronizer, "radar02"))
         sensor_list.append(radar02)
 
         # 主循环，用于不断推进模拟并处理传感器数据。
         while True:
             # 推进Carla世界的模拟，按照设置的固定时间步长前进一帧。
+            tick_time = time.time()
             world.tick()
             # 获取当前世界的帧编号，并打印出来，用于展示模拟的进度等信息。
             w_frame = world.get_snapshot().frame
+            synchronizer.expect(w_frame, tick_time)
             print("\nWorld's frame: %d" % w_frame)
 
             # 现在等待传感器数据被接收。
-            # 由于队列是阻塞式的，会在queue.get()方法处等待，直到所有信息被处理完，然后继续下一帧。
-            # 这里设置了1秒的超时时间，如果在这个时间内没有接收到某些信息，就会继续执行后续代码。
-            try:
-                for _ in range(len(sensor_list)):
-                    s_frame = sensor_queue.get(True, 1.0)
-                    print("    Frame: %d   Sensor: %s" % (s_frame[0], s_frame[1]))
-
-            except Empty:
+            # synchronizer.get()会阻塞，直到所有传感器都送达了这一帧的数据，然后继续下一帧。
+            # 这里设置了1秒的超时时间，如果在这个时间内没有接收到某些信息，就会跳过这一帧。
+            frame_data = synchronizer.get(w_frame, timeout=1.0)
+            if frame_data is None:
                 print("    Some of the sensor information is missed")
+                continue
+            for name, data in zip(frame_data.names, frame_data):
+                print("    Frame: %d   Sensor: %s" % (data.frame, name))
 
     finally:
+        # 打印每个传感器的平均延迟，即从推进模拟到收到数据的时间。
+        for name, sensor_stats in synchronizer.stats()['sensors'].items():
+            print("%s: %d frames, mean latency %.1f ms" % (
+                name, sensor_stats['received'], sensor_stats['latency_mean'] * 1000.0))
         # 在脚本结束时，无论是否出现异常，都将世界的设置恢复到原始状态。
         world.apply_settings(original_settings)
         # 遍历传感器列表，销毁所有创建的传感器实例，释放资源。
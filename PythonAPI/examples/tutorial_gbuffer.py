@@ -22,13 +22,20 @@ try:
 except IndexError:
     pass
 
+# 将PythonAPI/carla目录加入模块搜索路径，以便导入agents包中的数据集写入工具
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
 import random
 import time
 
+from agents.tools.dataset_writer import DatasetWriter  # pylint: disable=import-error
+
 def main():
     # 创建一个列表，用于存储在模拟过程中创建的所有演员（actors，在Carla中可以是车辆、传感器等各种实体），方便后续统一销毁它们。
     actor_list = []
+    # 图像的PNG编码和写盘在多个工作进程中完成，回调函数只把图像缓冲区放入有界队列，不会阻塞传感器线程
+    writer = DatasetWriter(workers=4, max_pending=64)
 
     # 以下是这段脚本功能的描述，即在这个教程脚本中，我们要向模拟环境中添加一辆车，让它自动驾驶，同时创建一个附着在车辆上的相机，
     # 并将相机生成的所有图像保存到磁盘，此外，还会保存每一帧的GBuffer纹理信息。
@@ -85,26 +92,26 @@ def main():
 
         # 为相机注册一个回调函数，当有新的图像帧可用时，这个回调函数就会被触发。目前，这一步对于正确接收GBuffer纹理是必需的，
         # 因为它用于确定传感器是否处于活动状态（可能内部机制通过这种回调来判断何时可以获取相关纹理数据等情况）。
-        # 这里的回调函数将每一帧图像保存到磁盘，文件名格式为'_out/FinalColor-%06d.png'，其中%06d会根据图像的帧编号进行格式化，保证文件名的唯一性和顺序性，便于后续查看和处理图像。
-        camera.listen(lambda image: image.save_to_disk('_out/FinalColor-%06d.png' % image.frame))
+        # 这里的回调函数将每一帧图像交给写入器异步保存到磁盘，文件名格式为'_out/FinalColor-%06d.png'，其中%06d会根据图像的帧编号进行格式化，保证文件名的唯一性和顺序性，便于后续查看和处理图像。
+        camera.listen(lambda image: writer.write_image('_out/FinalColor-%06d.png' % image.frame, image))
 
         # 在这里为每个GBuffer纹理注册相应的回调函数。函数“listen_to_gbuffer”的行为类似于常规的“listen”函数，
         # 但需要先传入想要获取的GBuffer纹理的ID，然后指定对应的回调函数，用于将相应的GBuffer纹理图像保存到磁盘，每个纹理都有其对应的文件名格式，同样包含帧编号用于区分不同帧的纹理图像。
 
-        camera.listen_to_gbuffer(carla.GBufferTextureID.SceneColor, lambda image: image.save_to_disk('_out/GBuffer-SceneColor-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.SceneDepth, lambda image: image.save_to_disk('_out/GBuffer-SceneDepth-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.SceneStencil, lambda image: image.save_to_disk('_out/GBuffer-SceneStencil-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferA, lambda image: image.save_to_disk('_out/GBuffer-A-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferB, lambda image: image.save_to_disk('_out/GBuffer-B-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferC, lambda image: image.save_to_disk('_out/GBuffer-C-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferD, lambda image: image.save_to_disk('_out/GBuffer-D-%06d.png' % image.frame))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.SceneColor, lambda image: writer.write_image('_out/GBuffer-SceneColor-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.SceneDepth, lambda image: writer.write_image('_out/GBuffer-SceneDepth-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.SceneStencil, lambda image: writer.write_image('_out/GBuffer-SceneStencil-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferA, lambda image: writer.write_image('_out/GBuffer-A-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferB, lambda image: writer.write_image('_out/GBuffer-B-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferC, lambda image: writer.write_image('_out/GBuffer-C-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferD, lambda image: writer.write_image('_out/GBuffer-D-%06d.png' % image.frame, image))
         # 注意，某些GBuffer纹理可能在特定场景中不可用。例如，在这个示例中，纹理E和F可能不可用，这将导致它们被保存为黑色图像（因为没有实际有效的数据）。
-        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferE, lambda image: image.save_to_disk('_out/GBuffer-E-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferF, lambda image: image.save_to_disk('_out/GBuffer-F-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.Velocity, lambda image: image.save_to_disk('_out/GBuffer-Velocity-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.SSAO, lambda image: image.save_to_disk('_out/GBuffer-SSAO-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.CustomDepth, lambda image: image.save_to_disk('_out/GBuffer-CustomDepth-%06d.png' % image.frame))
-        camera.listen_to_gbuffer(carla.GBufferTextureID.CustomStencil, lambda image: image.save_to_disk('_out/GBuffer-CustomStencil-%06d.png' % image.frame))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferE, lambda image: writer.write_image('_out/GBuffer-E-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.GBufferF, lambda image: writer.write_image('_out/GBuffer-F-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.Velocity, lambda image: writer.write_image('_out/GBuffer-Velocity-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.SSAO, lambda image: writer.write_image('_out/GBuffer-SSAO-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.CustomDepth, lambda image: writer.write_image('_out/GBuffer-CustomDepth-%06d.png' % image.frame, image))
+        camera.listen_to_gbuffer(carla.GBufferTextureID.CustomStencil, lambda image: writer.write_image('_out/GBuffer-CustomStencil-%06d.png' % image.frame, image))
 
         # 让程序休眠10秒，在这10秒内，车辆会自动驾驶，相机会不断捕获图像并触发回调函数保存图像及相关GBuffer纹理数据到磁盘，模拟场景会持续运行一段时间。
         time.sleep(10)
@@ -113,6 +120,9 @@ def main():
         print('destroying actors')
         # 首先销毁相机实例，释放相关资源。
         camera.destroy()
+        # 等待队列中剩余的图像全部写完，再关闭写入进程
+        writer.close()
+        print('saved %d images' % writer.stats()['written'])
         # 使用客户端对象批量销毁存储在actor_list列表中的所有演员（包括车辆等），通过创建一个包含销毁每个演员命令的列表来实现批量操作，确保模拟环境清理干净，避免资源泄漏等问题。
         client.apply_batch([carla.command.DestroyActor(x) for x in actor_list])
         print('done.')
@@ -26,12 +26,15 @@ try:
 except IndexError:
     pass
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
 import argparse
 import random
 import time
 import numpy as np
 
+from agents.tools.sensor_views import lidar_view, rgb_view, semantic_lidar_view, xyz_view  # pylint: disable=import-error
 
 try:
     import pygame
@@ -186,14 +189,8 @@ class SensorManager:#定义了一个名为  SensorManager  的类。
 
         # 将图像数据从CARLA特定的格式转换为原始数据格式
         image.convert(carla.ColorConverter.Raw)
-        # 从图像的原始数据缓冲区创建一个numpy数组，数据类型为无符号8位整数
-        array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
-        # 将数组重塑为图像的高度、宽度和4个颜色通道（RGBA）的形状
-        array = np.reshape(array, (image.height, image.width, 4))
-        # 由于我们只需要RGB格式，所以移除Alpha通道（透明度）
-        array = array[:, :, :3]
-        # 将BGR格式转换为RGB格式，因为从CARLA得到的图像通常是BGR格式的
-        array = array[:, :, ::-1]
+        # 不复制地获取图像的RGB视图：CARLA的图像是BGRA格式的，视图去掉Alpha通道并反转颜色通道
+        array = rgb_view(image)
 
         # 如果显示管理器启用了渲染功能
         if self.display_man.render_enabled():
@@ -214,8 +211,7 @@ class SensorManager:#定义了一个名为  SensorManager  的类。
         disp_size = self.display_man.get_display_size()
         lidar_range = 2.0*float(self.sensor_options['range'])
 
-        points = np.frombuffer(image.raw_data, dtype=np.dtype('f4'))
-        points = np.reshape(points, (int(points.shape[0] / 4), 4))
+        points = xyz_view(lidar_view(image))
         lidar_data = np.array(points[:, :2])
         lidar_data *= min(disp_size) / lidar_range
         lidar_data += (0.5 * disp_size[0], 0.5 * disp_size[1])
@@ -240,8 +236,7 @@ class SensorManager:#定义了一个名为  SensorManager  的类。
         disp_size = self.display_man.get_display_size()
         lidar_range = 2.0*float(self.sensor_options['range'])
 
-        points = np.frombuffer(image.raw_data, dtype=np.dtype('f4'))
-        points = np.reshape(points, (int(points.shape[0] / 6), 6))
+        points = xyz_view(semantic_lidar_view(image))
         lidar_data = np.array(points[:, :2])
         lidar_data *= min(disp_size) / lidar_range
         lidar_data += (0.5 * disp_size[0], 0.5 * disp_size[1])
@@ -262,8 +257,6 @@ class SensorManager:#定义了一个名为  SensorManager  的类。
 
     def save_radar_image(self, radar_data):
         t_start = self.timer.time()
-        points = np.frombuffer(radar_data.raw_data, dtype=np.dtype('f4'))
-        points = np.reshape(points, (len(radar_data), 4))
 
         t_end = self.timer.time()
         self.time_processing += (t_end-t_start)
@@ -0,0 +1,146 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Stand-ins for the carla objects the agents read, shared by the unit tests so that
+they run without a server.
+"""
+
+import fnmatch
+import math
+
+import numpy as np
+
+import carla
+
+
+class FakeTransform(object):
+    """carla.Transform turned by a yaw, with its location in single precision as carla stores it"""
+
+    def __init__(self, x=0.0, y=0.0, z=0.0, yaw=0.0):
+        self.location = carla.Location(x=float(np.float32(x)), y=float(np.float32(y)), z=float(np.float32(z)))
+        self.rotation = carla.Rotation(yaw=yaw)
+
+    def get_forward_vector(self):
+        yaw = math.radians(self.rotation.yaw)
+        return carla.Vector3D(math.cos(yaw), math.sin(yaw), 0.0)
+
+    def get_right_vector(self):
+        yaw = math.radians(self.rotation.yaw)
+        return carla.Vector3D(-math.sin(yaw), math.cos(yaw), 0.0)
+
+    def transform(self, location):
+        yaw = math.radians(self.rotation.yaw)
+        return carla.Location(x=self.location.x + math.cos(yaw) * location.x - math.sin(yaw) * location.y,
+                              y=self.location.y + math.sin(yaw) * location.x + math.cos(yaw) * location.y,
+                              z=self.location.z + location.z)
+
+
+class FakeWaypoint(object):
+    def __init__(self, transform=None, road_id=0, section_id=0, lane_id=-1, s=0.0):
+        self.transform = transform if transform is not None else FakeTransform()
+        self.road_id = road_id
+        self.section_id = section_id
+        self.lane_id = lane_id
+        self.s = s
+
+
+class FakeActor(object):
+    def __init__(self, actor_id, type_id='vehicle.audi.tt', transform=None, velocity=(0.0, 0.0, 0.0)):
+        self.id = actor_id
+        self.type_id = type_id
+        self.bounding_box = carla.BoundingBox(carla.Location(), carla.Vector3D(2.0, 1.0, 0.75))
+        self.transform = transform if transform is not None else FakeTransform()
+        self.velocity = carla.Vector3D(*velocity)
+        self.state = carla.TrafficLightState.Red
+
+    def get_transform(self):
+        return self.transform
+
+    def get_location(self):
+        return self.transform.location
+
+    def get_velocity(self):
+        return self.velocity
+
+
+class FakeActorList(list):
+    def filter(self, pattern):
+        return FakeActorList(actor for actor in self if fnmatch.fnmatch(actor.type_id, pattern))
+
+
+class FakeSnapshot(list):
+    def __init__(self, frame, actors):
+        super(FakeSnapshot, self).__init__(actors)
+        self.frame = frame
+        self.timestamp = frame * 0.05
+
+
+class FakeWorld(object):
+    """
+    World holding a fixed set of actors. It counts the snapshots taken, the actors
+    requested by id and the requests of the whole actor list.
+    """
+
+    def __init__(self, actors, world_id=1):
+        self.id = world_id
+        self.actors = {actor.id: actor for actor in actors}
+        self.frame = 0
+        self.snapshots = 0
+        self.actor_requests = 0
+        self.actor_list_requests = 0
+
+    def get_snapshot(self):
+        self.snapshots += 1
+        return FakeSnapshot(self.frame, list(self.actors.values()))
+
+    def get_actors(self, actor_ids=None):
+        if actor_ids is None:
+            self.actor_list_requests += 1
+            return FakeActorList(self.actors.values())
+        self.actor_requests += len(actor_ids)
+        return FakeActorList(self.actors[actor_id] for actor_id in actor_ids)
+
+
+class FakeResponse(object):
+    def __init__(self, error=''):
+        self.error = error
+
+
+class FakeClient(object):
+    """Client recording the batches of commands, which fail for the destroyed actor ids"""
+
+    def __init__(self, world=None, destroyed=()):
+        self.world = world
+        self.destroyed = set(destroyed)
+        self.batches = []
+
+    def apply_batch(self, commands):
+        self.batches.append(commands)
+
+    def apply_batch_sync(self, commands, do_tick=False):
+        self.batches.append(commands)
+        if do_tick:
+            self.world.frame += 1
+        return [FakeResponse('destroyed' if command.actor_id in self.destroyed else '') for command in commands]
+
+
+class FakeMeasurement(object):
+    def __init__(self, raw_data=b'', frame=0):
+        self.raw_data = raw_data
+        self.frame = frame
+
+
+class FakeImage(FakeMeasurement):
+    def __init__(self, width, height, raw_data, frame=0):
+        super(FakeImage, self).__init__(raw_data, frame)
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_array(cls, array, frame=0):
+        """Image with the pixels of a (height, width, 4) BGRA array"""
+        return cls(array.shape[1], array.shape[0], array.tobytes(), frame)
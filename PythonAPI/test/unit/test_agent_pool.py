@@ -0,0 +1,110 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import random
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import carla
+
+from agents.navigation.agent_pool import AgentPool
+
+from .fakes import FakeActor, FakeClient, FakeTransform, FakeWorld
+
+
+class NeighborAgent(object):
+    """Brakes when another vehicle of the shared WorldState is closer than 20 meters"""
+
+    def __init__(self, vehicle):
+        self._vehicle = vehicle
+        self._world_state = None
+
+    def set_world_state(self, world_state):
+        self._world_state = world_state
+
+    def run_step(self):
+        self._world_state.update()
+        location = self._vehicle.get_location()
+        nearby = [actor for actor in self._world_state.filter('*vehicle*').within(location, 20.0)
+                  if actor.id != self._vehicle.id]
+        return carla.VehicleControl(throttle=0.0 if nearby else 0.5, brake=1.0 if nearby else 0.0)
+
+
+class CountingAgent(object):
+    """Agent whose state only lives in the agent"""
+
+    def __init__(self, vehicle_id):
+        self.vehicle_id = vehicle_id
+        self.steps = 0
+
+    def run_step(self):
+        self.steps += 1
+        return carla.VehicleControl(throttle=self.steps / 10.0)
+
+
+def make_pool(count, executor=None, seed=0):
+    rng = random.Random(seed)
+    vehicles = [FakeActor(i, transform=FakeTransform(rng.uniform(-200, 200), rng.uniform(-200, 200)))
+                for i in range(count)]
+    world = FakeWorld(vehicles)
+    client = FakeClient(world, destroyed=[0])
+    pool = AgentPool(client, world, executor=executor)
+    for vehicle in vehicles:
+        pool.add(NeighborAgent(vehicle))
+    return pool, client, world
+
+
+class TestAgentPool(unittest.TestCase):
+    def test_single_batch_per_tick(self):
+        pool, client, world = make_pool(50)
+        for frame in range(3):
+            controls = pool.tick(do_tick=True)
+            self.assertEqual(len(client.batches), frame + 1)
+            self.assertEqual([command.actor_id for command in client.batches[-1]], list(range(50)))
+            self.assertEqual([command.control for command in client.batches[-1]], controls)
+        # The pool and every agent read the snapshot, but it is only parsed once per frame
+        self.assertEqual(pool.world_state.frame, world.frame - 1)
+        self.assertEqual(pool.errors, [(0, 'destroyed')])
+
+        stats = pool.stats()
+        self.assertEqual(stats['ticks'], 3)
+        self.assertEqual(stats['agents'], 50)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(sorted(stats['last']), ['apply', 'decide', 'snapshot'])
+        self.assertGreater(stats['mean']['decide'], 0.0)
+        self.assertLessEqual(stats['agent_mean'], stats['agent_max'])
+
+    def test_executors_give_the_same_controls(self):
+        pool, _, _ = make_pool(80)
+        expected = [(control.throttle, control.brake) for control in pool.tick()]
+        self.assertTrue(any(brake for _, brake in expected))
+        self.assertTrue(any(throttle for throttle, _ in expected))
+        with ThreadPoolExecutor(4) as executor:
+            pool, _, _ = make_pool(80, executor)
+            self.assertEqual([(control.throttle, control.brake) for control in pool.tick()], expected)
+
+    def test_threads_keep_the_agent_state(self):
+        world = FakeWorld([])
+        client = FakeClient(world)
+        agents = [CountingAgent(i) for i in range(6)]
+        with ThreadPoolExecutor(2) as executor:
+            pool = AgentPool(client, world, executor=executor)
+            for agent in agents:
+                pool.add(agent, FakeActor(agent.vehicle_id))
+            for _ in range(3):
+                controls = pool.tick(do_tick=True)
+        self.assertEqual(pool.agents, agents)
+        self.assertEqual([agent.steps for agent in agents], [3] * 6)
+        self.assertAlmostEqual(controls[0].throttle, 0.3, places=6)
+
+        with ProcessPoolExecutor(1) as executor:
+            self.assertRaises(ValueError, AgentPool, client, world, executor=executor)
+
+    def test_remove(self):
+        pool, client, _ = make_pool(5)
+        pool.remove(pool.agents[2])
+        pool.tick()
+        self.assertEqual([command.actor_id for command in client.batches[-1]], [0, 1, 3, 4])
@@ -0,0 +1,89 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import unittest
+
+import numpy as np
+
+import carla
+
+from agents.navigation.controller import BatchVehicleController, VehiclePIDController
+
+from .fakes import FakeActor, FakeClient, FakeTransform, FakeWaypoint
+
+
+class SteeringVehicle(FakeActor):
+    """Vehicle jumping to a random pose at every step, with the steer of its last control"""
+
+    def __init__(self, actor_id, rng):
+        super(SteeringVehicle, self).__init__(actor_id)
+        self.steer = rng.uniform(-0.5, 0.5)
+        self.move(rng)
+
+    def move(self, rng):
+        self.transform = FakeTransform(rng.uniform(-50, 50), rng.uniform(-50, 50), yaw=rng.uniform(-180, 180))
+        self.velocity = carla.Vector3D(rng.uniform(-10, 10), rng.uniform(-10, 10), rng.uniform(-1, 1))
+
+    def get_world(self):
+        return None
+
+    def get_control(self):
+        return carla.VehicleControl(steer=self.steer)
+
+
+def target(x, y, yaw):
+    """Waypoint to steer to"""
+    return FakeWaypoint(FakeTransform(x, y, yaw=yaw))
+
+
+class TestBatchVehicleController(unittest.TestCase):
+    def test_matches_the_scalar_controllers(self):
+        rng = np.random.RandomState(0)
+        count = 40
+        vehicles = [SteeringVehicle(i, rng) for i in range(count)]
+        args_lateral = {'K_P': rng.uniform(0.5, 2.0, count), 'K_I': rng.uniform(0.0, 0.1, count),
+                        'K_D': rng.uniform(0.0, 0.1, count), 'dt': 0.05}
+        args_longitudinal = {'K_P': rng.uniform(0.5, 2.0, count), 'K_I': rng.uniform(0.0, 0.1, count),
+                             'K_D': rng.uniform(0.0, 0.1, count), 'dt': rng.choice([0.03, 0.05], count)}
+        offsets = np.where(rng.rand(count) < 0.3, rng.uniform(-1.0, 1.0, count), 0.0)
+        max_steering = rng.uniform(0.5, 1.0, count)
+
+        scalar = [VehiclePIDController(vehicle, {k: v if np.isscalar(v) else v[i] for k, v in args_lateral.items()},
+                                       {k: v if np.isscalar(v) else v[i] for k, v in args_longitudinal.items()},
+                                       offset=offsets[i], max_steering=max_steering[i])
+                  for i, vehicle in enumerate(vehicles)]
+        batch = BatchVehicleController(vehicles, args_lateral, args_longitudinal, offset=offsets,
+                                       max_steering=max_steering)
+
+        for step in range(30):
+            for vehicle in vehicles:
+                vehicle.move(rng)
+            target_speeds = rng.uniform(0, 60, count)
+            waypoints = [None if rng.rand() < 0.1 else target(rng.uniform(-50, 50), rng.uniform(-50, 50),
+                                                              rng.uniform(-180, 180)) for _ in vehicles]
+            if step == 5:
+                # The target on top of the vehicle, the angle is undefined
+                location = vehicles[0].transform.location
+                waypoints[0] = target(location.x, location.y, 0.0)
+            controls = batch.run_step(target_speeds, waypoints)
+            for i, (controller, waypoint) in enumerate(zip(scalar, waypoints)):
+                if waypoint is None:
+                    self.assertIsNone(controls[i])
+                    continue
+                expected = controller.run_step(target_speeds[i], waypoint)
+                self.assertAlmostEqual(controls[i].throttle, expected.throttle, places=6)
+                self.assertAlmostEqual(controls[i].brake, expected.brake, places=6)
+                self.assertAlmostEqual(controls[i].steer, expected.steer, places=6)
+
+    def test_single_batch_of_commands(self):
+        rng = np.random.RandomState(1)
+        vehicles = [SteeringVehicle(i, rng) for i in range(5)]
+        batch = BatchVehicleController(vehicles, {'K_P': 1.0}, {'K_P': 1.0})
+        controls = batch.run_step(30.0, [target(0.0, 0.0, 0.0)] * 4 + [None])
+        client = FakeClient()
+        batch.apply(client, controls)
+        self.assertEqual(len(client.batches), 1)
+        self.assertEqual([command.actor_id for command in client.batches[0]], [0, 1, 2, 3])
@@ -0,0 +1,89 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import unittest
+
+import numpy as np
+from shapely.geometry import MultiPoint, Polygon
+
+from agents.tools.corridor import (box_vertices, boxes_intersect_corridor, corridor_triangles,
+                                   rotation_matrices)
+
+
+def make_route(rng, length, max_curvature, step=2.0):
+    """Boundaries of a route with random curvature, as BasicAgent builds them"""
+    headings = np.cumsum(rng.uniform(-max_curvature, max_curvature, length) * step)
+    centers = np.cumsum(np.stack([np.cos(headings), np.sin(headings)], axis=1) * step, axis=0)
+    rights = np.stack([-np.sin(headings), np.cos(headings)], axis=1)
+    half_width, offset = rng.uniform(0.8, 2.0), rng.uniform(-0.5, 0.5)
+    right = centers + (half_width + offset) * rights
+    left = centers + (-half_width + offset) * rights
+    return right, left
+
+
+def make_boxes(rng, count, right, left):
+    """Vehicles and walkers around a route, slightly pitched and rolled"""
+    points = np.concatenate([right, left])
+    centers = points[rng.randint(len(points), size=count)] + rng.normal(0, 3.0, (count, 2))
+    locations = np.column_stack([centers, rng.uniform(0, 1, count)])
+    rotations = np.column_stack([rng.uniform(-5, 5, count), rng.uniform(-180, 180, count),
+                                 rng.uniform(-5, 5, count)])
+    walker = rng.rand(count) < 0.3
+    extents = np.where(walker[:, np.newaxis], [0.3, 0.3, 0.9], [2.3, 1.0, 0.8])
+    return box_vertices(locations, rotations, extents, box_locations=np.tile([0.1, 0.0, 0.7], (count, 1)))
+
+
+def shapely_hits(boxes, triangles):
+    polygons = [Polygon(triangle) for triangle in triangles]
+    return np.array([any(p.intersects(MultiPoint(box[:, :2].tolist()).convex_hull) for p in polygons)
+                     for box in boxes])
+
+
+class TestCorridor(unittest.TestCase):
+    def test_rotation_matrices(self):
+        matrix = rotation_matrices([[0.0, 90.0, 0.0]])[0]
+        # Forward and right vectors of a yaw of 90 degrees
+        np.testing.assert_allclose(matrix[:, 0], [0, 1, 0], atol=1e-12)
+        np.testing.assert_allclose(matrix[:, 1], [-1, 0, 0], atol=1e-12)
+        for rotation in np.random.RandomState(0).uniform(-180, 180, (20, 3)):
+            matrix = rotation_matrices([rotation])[0]
+            np.testing.assert_allclose(matrix.dot(matrix.T), np.eye(3), atol=1e-12)
+
+    def test_box_vertices(self):
+        vertices = box_vertices([[10, 0, 0]], [[0, 90, 0]], [[2, 1, 0.5]])[0]
+        self.assertEqual(vertices.shape, (8, 3))
+        np.testing.assert_allclose(vertices[0], [11, -2, -0.5], atol=1e-12)
+        np.testing.assert_allclose(vertices[-1], [9, 2, 0.5], atol=1e-12)
+
+    def test_parity_with_shapely(self):
+        rng = np.random.RandomState(1)
+        checked, found = 0, 0
+        for _ in range(40):
+            # Tight curves fold the inner boundary, the strip must still match
+            right, left = make_route(rng, rng.randint(2, 25), rng.choice([0.02, 0.3, 1.0]))
+            boxes = make_boxes(rng, 30, right, left)
+            expected = shapely_hits(boxes, corridor_triangles(right, left))
+            np.testing.assert_array_equal(boxes_intersect_corridor(boxes, right, left), expected)
+            checked += len(boxes)
+            found += int(expected.sum())
+        self.assertGreater(found, checked // 5)
+        self.assertLess(found, checked - checked // 5)
+
+    def test_strip_covers_the_corridor(self):
+        rng = np.random.RandomState(2)
+        for _ in range(20):
+            right, left = make_route(rng, 20, 0.02)
+            corridor = Polygon(np.concatenate([right, left[::-1]]).tolist())
+            self.assertTrue(corridor.is_valid)
+            boxes = make_boxes(rng, 30, right, left)
+            expected = [corridor.intersects(MultiPoint(box[:, :2].tolist()).convex_hull) for box in boxes]
+            np.testing.assert_array_equal(boxes_intersect_corridor(boxes, right, left), expected)
+
+    def test_degenerate_inputs(self):
+        boxes = box_vertices([[0, 0, 0]], [[0, 0, 0]], [[1, 1, 1]])
+        self.assertEqual(boxes_intersect_corridor(boxes, [[0, 1]], [[0, -1]]).tolist(), [False])
+        empty = boxes_intersect_corridor(np.zeros((0, 8, 3)), [[0, 1], [1, 1]], [[0, -1], [1, -1]])
+        self.assertEqual(empty.shape, (0,))
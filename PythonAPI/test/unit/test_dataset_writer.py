@@ -0,0 +1,122 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import unittest
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from agents.tools.dataset_writer import DatasetWriter, encode_png, encode_ply
+from agents.tools.sensor_views import LIDAR_DTYPE
+
+from .fakes import FakeImage, FakeMeasurement
+
+
+def decode_png(data):
+    """Decodes the unfiltered PNG images of encode_png"""
+    position = 8
+    chunks = {}
+    while position < len(data):
+        length, = struct.unpack('>I', data[position:position + 4])
+        tag = data[position + 4:position + 8]
+        chunks[tag] = chunks.get(tag, b'') + data[position + 8:position + 8 + length]
+        position += length + 12
+    width, height, _, color_type, _, _, _ = struct.unpack('>IIBBBBB', chunks[b'IHDR'])
+    channels = {0: 1, 2: 3, 6: 4}[color_type]
+    rows = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(height, -1)
+    return rows[:, 1:].reshape(height, width, channels)
+
+
+class SlowExecutor(ThreadPoolExecutor):
+    """Executor whose workers wait for a signal, to fill the queue of the writer"""
+
+    def __init__(self, release):
+        super(SlowExecutor, self).__init__(max_workers=1)
+        self.release = release
+
+    def submit(self, function, *args, **kwargs):
+        def wait_and_call():
+            self.release.wait()
+            return function(*args, **kwargs)
+        return super(SlowExecutor, self).submit(wait_and_call)
+
+
+class TestDatasetWriter(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_formats(self):
+        rng = np.random.RandomState(0)
+        bgra = rng.randint(0, 256, (6, 8, 4)).astype(np.uint8)
+        points = np.zeros(5, dtype=LIDAR_DTYPE)
+        for name in LIDAR_DTYPE.names:
+            points[name] = rng.uniform(-10, 10, 5)
+
+        with DatasetWriter(workers=2) as writer:
+            writer.write_image(os.path.join(self.folder, 'rgb', '000001.png'), FakeImage.from_array(bgra))
+            writer.write_image(os.path.join(self.folder, 'rgb', '000001.npy'), FakeImage.from_array(bgra))
+            writer.write_point_cloud(os.path.join(self.folder, 'lidar', '000001.ply'),
+                                     FakeMeasurement(points.tobytes()))
+            writer.write(os.path.join(self.folder, 'depth.png'), np.arange(12, dtype=np.uint16).reshape(3, 4))
+        stats = writer.stats()
+        self.assertEqual((stats['written'], stats['failed'], stats['queued'], stats['in_flight']), (4, 0, 0, 0))
+        self.assertGreater(stats['bytes_per_second'], 0.0)
+
+        with open(os.path.join(self.folder, 'rgb', '000001.png'), 'rb') as stream:
+            np.testing.assert_array_equal(decode_png(stream.read()), bgra[:, :, 2::-1])
+        np.testing.assert_array_equal(np.load(os.path.join(self.folder, 'rgb', '000001.npy')), bgra[:, :, 2::-1])
+        with open(os.path.join(self.folder, 'lidar', '000001.ply'), 'rb') as stream:
+            data = stream.read()
+        self.assertEqual(data, encode_ply(points))
+        header, body = data.split(b'end_header\n')
+        self.assertIn(b'element vertex 5\nproperty float x\n', header)
+        np.testing.assert_array_equal(np.frombuffer(body, dtype=LIDAR_DTYPE), points)
+        with open(os.path.join(self.folder, 'depth.png'), 'rb') as stream:
+            self.assertEqual(stream.read(), encode_png(np.arange(12, dtype=np.uint16).reshape(3, 4)))
+        self.assertEqual(sorted(os.listdir(self.folder)), ['depth.png', 'lidar', 'rgb'])
+
+        self.assertRaises(RuntimeError, writer.write, os.path.join(self.folder, 'late.npy'), points)
+        self.assertRaises(ValueError, DatasetWriter, policy='wait')
+
+    def test_drop_policies(self):
+        for policy, kept in (('drop_newest', [0, 1, 2, 3, 4]), ('drop_oldest', [0, 1, 2, 8, 9])):
+            release = threading.Event()
+            executor = SlowExecutor(release)
+            writer = DatasetWriter(workers=1, max_pending=2, policy=policy, executor=executor)
+            # Two items wait in the executor, one in the dispatcher for a free slot and two fill the queue
+            for frame in range(10):
+                writer.write(os.path.join(self.folder, policy, '{}.npy'.format(frame)), np.array([frame]))
+                while frame < 3 and writer.stats()['queued']:
+                    pass
+            self.assertEqual(writer.stats()['dropped'], 5)
+            release.set()
+            writer.close()
+            executor.shutdown()
+            self.assertEqual(sorted(int(name[:-4]) for name in os.listdir(os.path.join(self.folder, policy))), kept)
+
+    def test_failures(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        writer = DatasetWriter(workers=2, executor=executor)
+        writer.write(os.path.join(self.folder, 'text.png'), np.array(['not an image']))
+        writer.write(os.path.join(self.folder, 'ok.npy'), np.zeros(3))
+        self.assertTrue(writer.flush(timeout=5.0))
+        stats = writer.stats()
+        self.assertEqual((stats['written'], stats['failed']), (1, 1))
+        self.assertIsInstance(writer.last_error, ValueError)
+        self.assertRaises(ValueError, writer.write, os.path.join(self.folder, 'points.xyz'), np.zeros(3))
+        writer.close()
+        # The executor belongs to the caller and keeps running
+        self.assertEqual(executor.submit(sum, [1, 2]).result(), 3)
+        executor.shutdown()
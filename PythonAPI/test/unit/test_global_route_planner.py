@@ -0,0 +1,236 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import random
+import unittest
+import weakref
+
+import networkx as nx
+
+import carla
+
+from agents.navigation.global_route_planner import GlobalRoutePlanner
+from agents.navigation.local_planner import RoadOption
+from agents.navigation.route_cache import RouteCache
+
+from .fakes import FakeTransform, FakeWaypoint
+from .test_route_graph import make_road_grid
+
+BLOCK_LENGTH = 100.0
+RESOLUTION = 2.0
+# Length of the lane edges of the grid, in waypoints
+ROAD_LENGTH = int(BLOCK_LENGTH / RESOLUTION) + 1
+
+
+def midpoint(graph, edge):
+    (x1, y1, z1), (x2, y2, z2) = graph.nodes[edge[0]]['vertex'], graph.nodes[edge[1]]['vertex']
+    return (round((x1 + x2) / 2.0, 1), round((y1 + y2) / 2.0, 1), round((z1 + z2) / 2.0, 1))
+
+
+class FakeMap(object):
+    """Map of a road grid, every lane edge of the grid being the single lane of a road"""
+
+    name = 'Carla/Maps/Grid'
+
+    def __init__(self, roads):
+        self.roads = roads
+
+    def get_waypoint(self, location):
+        xyz = (round(location.x, 1), round(location.y, 1), round(location.z, 1))
+        return FakeWaypoint(FakeTransform(*xyz), road_id=self.roads.get(xyz, -1))
+
+
+class NodePlanner(GlobalRoutePlanner):
+    """Planner whose traces are the node paths of the routes, with LANEFOLLOW options"""
+
+    def _route_to_trace(self, route, origin, destination):
+        return [(node, RoadOption.LANEFOLLOW) for node in route]
+
+
+def make_planner(blocks=4, backend='networkx', route_cache=None, lanes=2):
+    """Planner over a road grid, built without a map as the graph cache would load it"""
+    graph = make_road_grid(blocks, BLOCK_LENGTH, RESOLUTION, lanes)
+    planner = NodePlanner.__new__(NodePlanner)
+    planner._graph = graph
+    planner._sampling_resolution = RESOLUTION
+    planner._backend = backend
+    planner._localization = 'map'
+    planner._localization_index = None
+    planner._csr_graph = None
+    planner._contraction_hierarchy = None
+    planner._cache_dir = None
+    planner._route_cache = route_cache
+    planner._base_lengths = None
+    planner._cost_version = 0
+    planner._searches = weakref.WeakSet()
+
+    roads = [(n1, n2) for n1, n2, data in graph.edges(data=True) if data['length'] == ROAD_LENGTH]
+    for road_id, (n1, n2) in enumerate(roads):
+        data = graph.edges[n1, n2]
+        data['entry_waypoint'] = FakeWaypoint(FakeTransform(*graph.nodes[n1]['vertex']), road_id)
+        data['exit_waypoint'] = FakeWaypoint(FakeTransform(*graph.nodes[n2]['vertex']), road_id)
+        data['path'] = [FakeWaypoint(FakeTransform(*midpoint(graph, (n1, n2))), road_id)]
+    planner._road_id_to_edge = {road_id: {0: {-1: edge}} for road_id, edge in enumerate(roads)}
+    planner._wmap = FakeMap({midpoint(graph, edge): road_id for road_id, edge in enumerate(roads)})
+    return planner, roads
+
+
+def location(planner, edge):
+    return carla.Location(*midpoint(planner._graph, edge))
+
+
+def far_apart(planner, roads):
+    """Lanes at opposite corners of the grid"""
+    def corner_distance(edge):
+        x, y, _ = midpoint(planner._graph, edge)
+        return x + y
+    return min(roads, key=corner_distance), max(roads, key=corner_distance)
+
+
+def expected_length(graph, start, end):
+    """Length of the shortest route from the entry of an edge to the exit of another one"""
+    try:
+        return nx.dijkstra_path_length(graph, start[0], end[0], weight='length') + graph.edges[end]['length']
+    except nx.NetworkXNoPath:
+        return float('inf')
+
+
+class TestRouteBatch(unittest.TestCase):
+    def test_distance_matrix(self):
+        planner, roads = make_planner()
+        rng = random.Random(0)
+        starts, ends = rng.sample(roads, 6), rng.sample(roads, 8)
+        origins = [location(planner, edge) for edge in starts] + [carla.Location(-500.0, -500.0, 0.0)]
+        destinations = [location(planner, edge) for edge in ends]
+
+        batch = planner.trace_routes(origins, destinations)
+        self.assertEqual(batch.lengths.tolist(), planner.distance_matrix(origins, destinations).tolist())
+        for i, start in enumerate(starts):
+            for j, end in enumerate(ends):
+                self.assertEqual(batch.lengths[i, j], expected_length(planner._graph, start, end))
+                route = batch.route(i, j)
+                self.assertEqual((route[0], route[-2], route[-1]), (start[0], end[0], end[1]))
+                self.assertEqual(nx.path_weight(planner._graph, route, 'length'), batch.lengths[i, j])
+                self.assertEqual(batch.trace(i, j), [(node, RoadOption.LANEFOLLOW) for node in route])
+
+        # A location outside of the graph has no route
+        self.assertTrue(all(length == float('inf') for length in batch.lengths[-1]))
+        self.assertIsNone(batch.route(len(starts), 0))
+        self.assertRaises(nx.NetworkXNoPath, batch.trace, len(starts), 0)
+
+
+def without_blocked_edges(graph):
+    reduced = graph.copy()
+    reduced.remove_edges_from([(n1, n2) for n1, n2, length in graph.edges(data='length') if length == float('inf')])
+    return reduced
+
+
+def uses_blocked_edges(graph, route):
+    return any(graph.edges[n1, n2]['length'] == float('inf') for n1, n2 in zip(route[:-2], route[1:-1]))
+
+
+class TestLaneCosts(unittest.TestCase):
+    # With a single lane per direction, as the free lane changes of the grid bypass the lanes
+    def test_blocked_lanes(self):
+        rng = random.Random(1)
+        for backend in ('networkx', 'csr', 'ch'):
+            planner, roads = make_planner(backend=backend, lanes=1)
+            blocked = rng.sample(roads, 30)
+            for road_id, edge in enumerate(roads):
+                if edge in blocked:
+                    self.assertEqual(planner.block_lane(road_id), [edge])
+            reduced = without_blocked_edges(planner._graph)
+            self.assertEqual(reduced.number_of_edges(), planner._graph.number_of_edges() - 30)
+
+            open_roads = [edge for edge in roads if edge not in blocked]
+            reachable = 0
+            for _ in range(20):
+                start, end = rng.sample(open_roads, 2)
+                origin, destination = location(planner, start), location(planner, end)
+                length = expected_length(reduced, start, end)
+                self.assertEqual(planner.distance_matrix([origin], [destination])[0, 0], length)
+                if length == float('inf'):
+                    self.assertRaises(nx.NetworkXNoPath, planner._path_search, origin, destination)
+                    continue
+                route = planner._path_search(origin, destination)
+                self.assertFalse(uses_blocked_edges(planner._graph, route))
+                self.assertTrue(nx.is_path(reduced, route))
+                reachable += 1
+            self.assertGreater(reachable, 10)
+            # The hierarchy is built for the original lengths, the CSR search is used instead
+            self.assertIsNone(planner._contraction_hierarchy)
+
+            planner.reset_lane_costs()
+            self.assertEqual(without_blocked_edges(planner._graph).number_of_edges(),
+                             planner._graph.number_of_edges())
+            planner._path_search(location(planner, start), location(planner, end))
+            self.assertEqual(planner._contraction_hierarchy is not None, backend == 'ch')
+
+    def test_blocked_destination(self):
+        planner, roads = make_planner(lanes=1)
+        start, end = far_apart(planner, roads)
+        planner.block_lane(roads.index(end))
+        origin, destination = location(planner, start), location(planner, end)
+        batch = planner.trace_routes([origin], [destination])
+        self.assertEqual(batch.lengths[0, 0], float('inf'))
+        self.assertIsNone(batch.route(0, 0))
+        self.assertRaises(nx.NetworkXNoPath, planner.plan_route, origin, destination)
+
+    def test_dynamic_route(self):
+        planner, roads = make_planner(blocks=6, lanes=1)
+        start, end = far_apart(planner, roads)
+        origin, destination = location(planner, start), location(planner, end)
+        route = planner.plan_route(origin, destination)
+        self.assertEqual(route.distance(origin), expected_length(planner._graph, start, end))
+        self.assertEqual(route.distance(origin), planner.distance_matrix([origin], [destination])[0, 0])
+        self.assertEqual(route.route(origin)[-1], end[1])
+        original = route.distance(origin)
+
+        # Block a lane in the middle of the current route, five times
+        road_ids = {edge: road_id for road_id, edge in enumerate(roads)}
+        for _ in range(5):
+            path = route.route(origin)
+            lanes = [edge for edge in zip(path[:-1], path[1:]) if edge in road_ids]
+            planner.block_lane(road_ids[lanes[len(lanes) // 2]])
+            expansions = route.expansions
+            self.assertFalse(uses_blocked_edges(planner._graph, route.route(origin)))
+            self.assertEqual(route.distance(origin), expected_length(without_blocked_edges(planner._graph), start, end))
+            # The search is repaired, not run again
+            self.assertLess(route.expansions - expansions, len(planner._graph))
+
+        planner.reset_lane_costs()
+        self.assertEqual(route.distance(origin), original)
+
+        planner.block_lane(road_ids[end])
+        self.assertEqual(route.distance(origin), float('inf'))
+        self.assertRaises(nx.NetworkXNoPath, route.route, origin)
+
+    def test_shared_route_cache(self):
+        cache = RouteCache()
+        blocking, _ = make_planner(route_cache=cache, lanes=1)
+        other, roads = make_planner(route_cache=cache, lanes=1)
+        hierarchy, _ = make_planner(backend='ch', route_cache=cache, lanes=1)
+        start, end = far_apart(other, roads)
+        origin, destination = location(other, start), location(other, end)
+
+        # The planner blocks a lane of the route the other planner stores in the cache
+        route = [node for node, _ in other.trace_route(origin, destination)]
+        lane = [edge for edge in zip(route[1:-2], route[2:-1]) if edge in roads][0]
+        blocking.block_lane(roads.index(lane))
+        blocked_route = [node for node, _ in blocking.trace_route(origin, destination)]
+        self.assertFalse(uses_blocked_edges(blocking._graph, blocked_route))
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual([node for node, _ in other.trace_route(origin, destination)], route)
+        self.assertEqual(cache.hits, 1)
+
+        # Routes aren't shared between backends either
+        self.assertNotEqual(hierarchy._route_cache_key(origin, destination),
+                            other._route_cache_key(origin, destination))
+
+        # Once its costs are restored, the planner reads the routes of the other one
+        blocking.reset_lane_costs()
+        self.assertEqual([node for node, _ in blocking.trace_route(origin, destination)], route)
+        self.assertEqual(cache.hits, 2)
@@ -0,0 +1,127 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import networkx as nx
+
+from agents.navigation import graph_cache
+
+from .fakes import FakeTransform, FakeWaypoint
+
+# Road 1 has a lane section from s = 0 to s = 50 and another one from s = 50 to s = 100
+SECTION_BOUNDARY = 50.0
+
+
+def road_waypoint(road_id, section_id, lane_id, s):
+    """Waypoint of the roads along x of FakeMap, 20 meters apart"""
+    return FakeWaypoint(FakeTransform(s, road_id * 20.0), road_id, section_id, lane_id, s)
+
+
+class FakeMap(object):
+    """
+    Straight roads along x. As CARLA does, get_waypoint_xodr at the boundary of two lane
+    sections returns the waypoint of the following one.
+    """
+
+    name = 'Carla/Maps/Sections'
+
+    def __init__(self, junction_at_boundary=False):
+        self.requests = 0
+        self.junction_at_boundary = junction_at_boundary
+
+    def to_opendrive(self):
+        return '<OpenDRIVE sections/>'
+
+    def get_waypoint_xodr(self, road_id, lane_id, s):
+        self.requests += 1
+        return road_waypoint(road_id, 0 if s < SECTION_BOUNDARY else 1, lane_id, s)
+
+    def get_waypoint(self, location):
+        self.requests += 1
+        road_id = int(round(location.y / 20.0))
+        if location.x == SECTION_BOUNDARY and self.junction_at_boundary:
+            # A junction overlapping the end of the road
+            return road_waypoint(100 + road_id, 0, -1, 0.0)
+        # The location of the last waypoint of a section still belongs to it
+        return road_waypoint(road_id, 0 if location.x <= SECTION_BOUNDARY else 1, -1, location.x)
+
+
+def make_graph():
+    """Graph of the route planner over road 1, the exit of its first edge on the section boundary"""
+    graph = nx.DiGraph()
+    graph.add_node(0, vertex=(0.0, 20.0, 0.0))
+    graph.add_node(1, vertex=(SECTION_BOUNDARY, 20.0, 0.0))
+    graph.add_node(2, vertex=(100.0, 20.0, 0.0))
+    path = [road_waypoint(1, 0, -1, s) for s in (10.0, 20.0, 30.0, 40.0)]
+    boundary = road_waypoint(1, 0, -1, SECTION_BOUNDARY)
+    graph.add_edge(0, 1, length=len(path) + 1, type=4, intersection=False, net_vector=[1.0, 0.0, 0.0],
+                   entry_waypoint=road_waypoint(1, 0, -1, 0.0), exit_waypoint=boundary, path=path)
+    graph.add_edge(1, 2, length=1, type=4, intersection=False, net_vector=[1.0, 0.0, 0.0],
+                   entry_waypoint=road_waypoint(1, 1, -1, SECTION_BOUNDARY + 0.5),
+                   exit_waypoint=road_waypoint(1, 1, -1, 100.0), path=[])
+    id_map = {graph.nodes[node]['vertex']: node for node in graph.nodes}
+    road_id_to_edge = {1: {0: {-1: (0, 1)}, 1: {-1: (1, 2)}}}
+    return graph, id_map, road_id_to_edge
+
+
+class TestGraphCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def save_and_load(self, wmap):
+        graph, id_map, road_id_to_edge = make_graph()
+        path = graph_cache.graph_cache_path(self.folder, wmap, 2.0)
+        graph_cache.save_graph(path, graph, id_map, road_id_to_edge, 2.0)
+        self.assertIsNone(graph_cache.load_graph(path, wmap, 1.0))
+        return graph, graph_cache.load_graph(path, wmap, 2.0)
+
+    def test_round_trip(self):
+        wmap = FakeMap()
+        graph, (loaded, id_map, road_id_to_edge) = self.save_and_load(wmap)
+        self.assertEqual(sorted(os.listdir(self.folder)), [os.path.basename(
+            graph_cache.graph_cache_path(self.folder, wmap, 2.0))])
+        self.assertEqual(id_map, {(0.0, 20.0, 0.0): 0, (SECTION_BOUNDARY, 20.0, 0.0): 1, (100.0, 20.0, 0.0): 2})
+        self.assertEqual(road_id_to_edge, {1: {0: {-1: (0, 1)}, 1: {-1: (1, 2)}}})
+        self.assertEqual(list(loaded.edges), list(graph.edges))
+        self.assertEqual(loaded.edges[0, 1]['length'], 5)
+
+        # Nothing is asked to the map until the waypoints are read
+        self.assertEqual(graph_cache.edge_polyline(loaded.edges[0, 1]), graph_cache.edge_polyline(graph.edges[0, 1]))
+        self.assertEqual(wmap.requests, 0)
+        self.assertTrue('path' in loaded.edges[0, 1])
+        self.assertIsNone(loaded.edges[0, 1].get('change_waypoint'))
+
+        path = loaded.edges[0, 1]['path']
+        self.assertEqual([w.s for w in path], [10.0, 20.0, 30.0, 40.0])
+        self.assertEqual(wmap.requests, 4)
+        self.assertEqual(loaded.edges[1, 2]['path'], [])
+        self.assertEqual(wmap.requests, 4)
+
+    def test_section_boundary(self):
+        for junction_at_boundary in (False, True):
+            wmap = FakeMap(junction_at_boundary)
+            _, (loaded, _, road_id_to_edge) = self.save_and_load(wmap)
+            # The exit of the first edge keeps its section, although its s belongs to the next one
+            exit_waypoint = loaded.edges[0, 1]['exit_waypoint']
+            self.assertEqual((exit_waypoint.road_id, exit_waypoint.section_id, exit_waypoint.lane_id), (1, 0, -1))
+            self.assertEqual(road_id_to_edge[exit_waypoint.road_id][exit_waypoint.section_id][exit_waypoint.lane_id],
+                             (0, 1))
+            entry_waypoint = loaded.edges[1, 2]['entry_waypoint']
+            self.assertEqual((entry_waypoint.section_id, entry_waypoint.s), (1, SECTION_BOUNDARY + 0.5))
+
+            # Waypoints are only requested once, whichever edge reads them
+            resolver = graph_cache.WaypointResolver(wmap)
+            key = graph_cache.waypoint_key(road_waypoint(1, 0, -1, SECTION_BOUNDARY))
+            requests = wmap.requests
+            self.assertIs(resolver(key), resolver(key))
+            self.assertEqual(wmap.requests - requests, 3 if junction_at_boundary else 2)
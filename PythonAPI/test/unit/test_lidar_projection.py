@@ -0,0 +1,94 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import unittest
+
+import numpy as np
+
+from agents.tools.lidar_projection import Projector, build_intrinsics, build_lut
+
+
+def rotation_matrix(yaw, pitch, roll):
+    """Rotation of a carla.Transform, in degrees"""
+    cy, sy = np.cos(np.radians(yaw)), np.sin(np.radians(yaw))
+    cp, sp = np.cos(np.radians(pitch)), np.sin(np.radians(pitch))
+    cr, sr = np.cos(np.radians(roll)), np.sin(np.radians(roll))
+    return np.array([
+        [cp * cy, cy * sp * sr - sy * cr, -cy * sp * cr - sy * sr],
+        [cp * sy, sy * sp * sr + cy * cr, -sy * sp * cr + cy * sr],
+        [sp, -cp * sr, cp * cr]])
+
+
+def reference_projection(points, lidar_to_world, world_to_camera, intrinsics):
+    """The projection lidar_to_camera.py used to do"""
+    local_lidar_points = np.r_[points.T, [np.ones(points.shape[0])]]
+    sensor_points = np.dot(world_to_camera, np.dot(lidar_to_world, local_lidar_points))
+    point_in_camera_coords = np.array([sensor_points[1], sensor_points[2] * -1, sensor_points[0]])
+    points_2d = np.dot(intrinsics, point_in_camera_coords)
+    return np.array([points_2d[0, :] / points_2d[2, :], points_2d[1, :] / points_2d[2, :], points_2d[2, :]]).T
+
+
+class TestProjector(unittest.TestCase):
+    def test_projection(self):
+        projector = Projector(800, 600, 90.0)
+        np.testing.assert_allclose(projector.project(np.array([[10.0, 0.0, 0.0], [10.0, 1.0, -2.0]])),
+                                   [[400.0, 300.0, 10.0], [440.0, 380.0, 10.0]], rtol=1e-6)
+
+        rng = np.random.RandomState(0)
+        lidar_to_world = np.identity(4)
+        lidar_to_world[:3, :3] = rotation_matrix(30.0, 5.0, -2.0)
+        lidar_to_world[:3, 3] = (100.0, -20.0, 2.0)
+        camera_to_world = np.identity(4)
+        camera_to_world[:3, :3] = rotation_matrix(40.0, -3.0, 1.0)
+        camera_to_world[:3, 3] = (101.0, -19.0, 1.7)
+        world_to_camera = np.linalg.inv(camera_to_world)
+        points = rng.uniform(-50.0, 50.0, (20000, 3)).astype(np.float32)
+
+        projector = Projector(1280, 720, 100.0, np.dot(world_to_camera, lidar_to_world))
+        expected = reference_projection(points, lidar_to_world, world_to_camera, build_intrinsics(1280, 720, 100.0))
+        np.testing.assert_allclose(projector.project(points), expected, rtol=1e-3, atol=1e-2)
+
+        u, v, depth, index = projector.visible(points)
+        inside = (expected[:, 0] >= 0) & (expected[:, 0] < 1280) & (expected[:, 1] >= 0) & (expected[:, 1] < 720) & \
+            (expected[:, 2] > 0.1)
+        # Points on the border of the image may fall on either side after rounding
+        self.assertLess(np.sum(inside != np.isin(np.arange(len(points)), index)), 5)
+        self.assertTrue((u >= 0).all() and (u < 1280).all() and (v >= 0).all() and (v < 720).all())
+        np.testing.assert_allclose(depth, expected[index, 2], rtol=1e-4)
+
+    def test_zbuffer(self):
+        projector = Projector(8, 6, 90.0)
+        # Two points on the central pixel, the far one last, and one behind the camera
+        points = np.array([[2.0, 0.0, 0.0], [5.0, 0.0, 0.0], [-2.0, 0.0, 0.0]], dtype=np.float32)
+        colors = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+        for order in ([0, 1, 2], [1, 0, 2], [2, 1, 0]):
+            bgra = np.zeros((6, 8, 4), dtype=np.uint8)
+            # Drawing into a view with reversed channels, as the one of sensor_views.rgb_view
+            image = bgra[:, :, 2::-1]
+            self.assertEqual(projector.draw(image, points[order], colors[order]), 2)
+            self.assertEqual(tuple(image[3, 4]), (255, 0, 0))
+            self.assertEqual(tuple(bgra[3, 4]), (0, 0, 255, 0))
+            self.assertEqual(np.count_nonzero(image.any(axis=2)), 1)
+
+        # Squares of 2 * extent pixels, cut at the border of the image
+        image = np.zeros((6, 8, 3), dtype=np.uint8)
+        corner = np.array([[1.0, -0.99, 0.74], [5.0, 0.0, 0.0]], dtype=np.float32)
+        self.assertEqual(projector.draw(image, corner, (9, 9, 9), extent=2), 2)
+        self.assertEqual(np.count_nonzero(image[:, :, 0]), 4 + 16)
+        self.assertTrue(image[:2, :2].all())
+
+    def test_values(self):
+        lut = build_lut(np.array([[0.0, 0.0, 0.0], [1.0, 0.5, 0.0]]), size=3)
+        np.testing.assert_array_equal(lut, [[0, 0, 0], [128, 64, 0], [255, 128, 0]])
+
+        projector = Projector(8, 6, 90.0)
+        points = np.array([[2.0, 0.0, 0.0], [2.0, -1.5, 0.0], [2.0, 1.5, 0.0], [-2.0, 0.0, 0.0]], dtype=np.float32)
+        image = np.full((6, 8, 3), 7, dtype=np.uint8)
+        # As the example colors the intensity, from 0.75 to 1
+        projector.draw_values(image, points, np.array([0.875, 0.1, 2.0, 1.0]), lut, low=0.75, high=1.0)
+        self.assertEqual(tuple(image[3, 4]), (128, 64, 0))
+        self.assertEqual(tuple(image[3, 1]), (0, 0, 0))
+        self.assertEqual(tuple(image[3, 7]), (255, 128, 0))
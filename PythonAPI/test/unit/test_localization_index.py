@@ -0,0 +1,101 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import unittest
+
+import numpy as np
+
+from agents.navigation.localization_index import LocalizationIndex
+from agents.tools.spatial_index import UniformGrid
+
+
+def make_lanes(count, seed):
+    """Random smooth polylines sampled every ~2 m, as the edges of the route planner"""
+    rng = np.random.RandomState(seed)
+    polylines = []
+    for _ in range(count):
+        start = rng.uniform(-300.0, 300.0, 3) * np.array([1.0, 1.0, 0.02])
+        heading = rng.uniform(-np.pi, np.pi)
+        points = [start]
+        for _ in range(rng.randint(1, 40)):
+            heading += rng.normal(0.0, 0.05)
+            points.append(points[-1] + 2.0 * np.array([np.cos(heading), np.sin(heading), 0.0]))
+        polylines.append(np.array(points))
+    edges = [(2 * i, 2 * i + 1) for i in range(count)]
+    lane_keys = [(i, 0, -1) for i in range(count)]
+    return edges, lane_keys, polylines
+
+
+def brute_force_distance(polylines, location, z_weight):
+    """Distance from a location to the closest polyline segment"""
+    scale = np.array([1.0, 1.0, z_weight])
+    best = np.inf
+    for polyline in polylines:
+        for a, b in zip(polyline[:-1] * scale, polyline[1:] * scale):
+            ab = b - a
+            t = np.clip(np.dot(location * scale - a, ab) / max(np.dot(ab, ab), 1e-12), 0.0, 1.0)
+            best = min(best, np.linalg.norm(location * scale - (a + t * ab)))
+    return best
+
+
+class TestUniformGrid(unittest.TestCase):
+    def test_query_radius(self):
+        rng = np.random.RandomState(0)
+        points = rng.uniform(-100.0, 100.0, (2000, 2))
+        grid = UniformGrid(points, 7.0)
+        for center in rng.uniform(-120.0, 120.0, (20, 2)):
+            distances = np.hypot(*(points - center).T)
+            expected = np.nonzero(distances <= 15.0)[0]
+            result = grid.query_radius(center, 15.0)
+            self.assertEqual(sorted(result.tolist()), sorted(expected.tolist()))
+            self.assertTrue(np.all(np.diff(distances[result]) >= 0.0))
+
+    def test_candidates(self):
+        grid = UniformGrid(np.array([[0.5, 0.5], [1.5, 0.5], [5.5, 5.5]]), 1.0)
+        query_ids, items = grid.candidates(np.array([[0.2, 0.2], [9.0, 9.0]]))
+        self.assertEqual(sorted(items.tolist()), [0, 1])
+        self.assertEqual(query_ids.tolist(), [0, 0])
+
+
+class TestLocalizationIndex(unittest.TestCase):
+    def test_parity_with_brute_force(self):
+        edges, lane_keys, polylines = make_lanes(60, seed=1)
+        index = LocalizationIndex(edges, lane_keys, polylines, cell_size=5.0)
+        rng = np.random.RandomState(2)
+        # Locations close to the lanes and far from any of them, to exercise the fallback
+        near = np.concatenate(polylines)[rng.randint(0, len(index.points), 200)]
+        locations = np.concatenate([near + rng.normal(0.0, 2.0, near.shape),
+                                    rng.uniform(-400.0, 400.0, (20, 3))])
+
+        matched, vertices, distances = index.query(locations)
+        for location, edge, vertex, distance in zip(locations, matched, vertices, distances):
+            self.assertAlmostEqual(distance, brute_force_distance(polylines, location, 2.0), places=6)
+            self.assertLess(vertex, len(polylines[edge]))
+            self.assertEqual(index.lane_keys[edge], lane_keys[edge])
+
+    def test_vertex_is_closest_point_of_the_edge(self):
+        polyline = np.array([[0.0, 0.0, 0.0], [2.0, 0.0, 0.0], [4.0, 0.0, 0.0], [6.0, 0.0, 0.0]])
+        index = LocalizationIndex([(0, 1)], [(1, 0, -1)], [polyline])
+        _, vertices, _ = index.query([[2.9, 1.0, 0.0], [3.1, -1.0, 0.0], [10.0, 0.0, 0.0]])
+        self.assertEqual(vertices.tolist(), [1, 2, 3])
+        self.assertEqual(index.closest_vertex(index.edge_coordinates((0, 1)), (3.0, 0.0, 0.0)), 1)
+        self.assertIsNone(index.edge_coordinates((1, 0)))
+
+    def test_overpass(self):
+        # A road along x at the ground and one along y crossing over it, 6 m above
+        ground = np.array([[x, 0.0, 0.0] for x in np.arange(-20.0, 21.0, 2.0)])
+        bridge = np.array([[1.0, y, 6.0] for y in np.arange(-20.0, 21.0, 2.0)])
+        index = LocalizationIndex([(0, 1), (2, 3)], [(1, 0, -1), (2, 0, -1)], [ground, bridge])
+        edges, _, _ = index.query([[1.0, 0.5, 0.3], [1.0, 0.5, 6.3], [1.0, 3.0, 0.3]])
+        self.assertEqual(edges.tolist(), [0, 1, 0])
+
+    def test_empty_query(self):
+        edges, lane_keys, polylines = make_lanes(3, seed=3)
+        index = LocalizationIndex(edges, lane_keys, polylines)
+        matched, vertices, distances = index.query(np.zeros((0, 3)))
+        self.assertEqual(len(matched), 0)
+        self.assertEqual(len(vertices), 0)
+        self.assertEqual(len(distances), 0)
@@ -0,0 +1,108 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import math
+import unittest
+
+import numpy as np
+
+import carla
+
+from agents.tools.misc import (compute_distance, compute_distance_array, compute_magnitude_angle,
+                               compute_magnitude_angle_array, get_speed, get_speed_array, is_within_distance,
+                               is_within_distance_array, vector, vector_array)
+
+from .fakes import FakeActor
+
+
+def reference_is_within_distance(target, reference, forward, max_distance, angle_interval):
+    """The per target computation of is_within_distance"""
+    target_vector = np.array([target[0] - reference[0], target[1] - reference[1]])
+    norm_target = np.linalg.norm(target_vector)
+    if norm_target < 0.001:
+        return True
+    if norm_target > max_distance:
+        return False
+    if not angle_interval:
+        return True
+    angle = math.degrees(math.acos(np.clip(np.dot(np.array(forward[:2]), target_vector) / norm_target, -1., 1.)))
+    return angle_interval[0] < angle < angle_interval[1]
+
+
+class TestMisc(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.RandomState(0)
+
+    def uniform(self, low, high, size):
+        """Random values that carla.Location and carla.Vector3D, which are float32, keep exactly"""
+        return self.rng.uniform(low, high, size).astype(np.float32).astype(np.float64)
+
+    def test_is_within_distance(self):
+        targets = self.uniform(-30, 30, (500, 3))
+        targets[:5] = 0.0
+        for reference, yaw in zip(self.rng.uniform(-5, 5, (10, 3)), self.rng.uniform(-180, 180, 10)):
+            forward = (math.cos(math.radians(yaw)), math.sin(math.radians(yaw)))
+            for angle_interval in (None, [0, 90], [45, 180], [0, 30]):
+                expected = [reference_is_within_distance(t, reference, forward, 20.0, angle_interval) for t in targets]
+                mask = is_within_distance_array(targets, reference, forward, 20.0, angle_interval)
+                self.assertEqual(mask.tolist(), expected)
+
+        # One reference pose per target
+        references = self.rng.uniform(-5, 5, (500, 2))
+        yaws = np.radians(self.rng.uniform(-180, 180, 500))
+        forwards = np.stack([np.cos(yaws), np.sin(yaws)], axis=1)
+        expected = [reference_is_within_distance(t, r, f, 25.0, [0, 60])
+                    for t, r, f in zip(targets, references, forwards)]
+        self.assertEqual(is_within_distance_array(targets, references, forwards, 25.0, [0, 60]).tolist(), expected)
+
+        # The scalar function agrees with the array variant
+        reference = carla.Transform(carla.Location(x=1.0, y=-2.0), carla.Rotation(yaw=30.0))
+        forward = reference.get_forward_vector()
+        for angle_interval in (None, [0, 90], [45, 180]):
+            mask = is_within_distance_array(targets, (1.0, -2.0), (forward.x, forward.y), 20.0, angle_interval)
+            self.assertEqual([is_within_distance(carla.Transform(carla.Location(*t)), reference, 20.0, angle_interval)
+                              for t in targets.tolist()], mask.tolist())
+
+    def test_compute_magnitude_angle(self):
+        targets = self.uniform(-30, 30, (200, 2))
+        norms, angles = compute_magnitude_angle_array(targets, (1.0, -2.0), 30.0)
+        for target, norm, angle in zip(targets, norms, angles):
+            vector_2d = target - (1.0, -2.0)
+            self.assertAlmostEqual(norm, np.linalg.norm(vector_2d), places=12)
+            forward = (math.cos(math.radians(30.0)), math.sin(math.radians(30.0)))
+            expected = math.degrees(math.acos(np.clip(np.dot(forward, vector_2d) / np.linalg.norm(vector_2d), -1, 1)))
+            self.assertAlmostEqual(angle, expected, places=9)
+            scalar_norm, scalar_angle = compute_magnitude_angle(
+                carla.Location(*target), carla.Location(1.0, -2.0), 30.0)
+            # The scalar function may round in float32 along the way
+            self.assertAlmostEqual(scalar_norm, norm, places=4)
+            self.assertAlmostEqual(scalar_angle, angle, places=3)
+        norm, angle = compute_magnitude_angle(carla.Location(x=0.0, y=5.0), carla.Location(), 0.0)
+        self.assertAlmostEqual(norm, 5.0)
+        self.assertAlmostEqual(angle, 90.0)
+
+    def test_distances_and_vectors(self):
+        first, second = self.uniform(-30, 30, (100, 3)), self.uniform(-30, 30, (100, 3))
+        distances = compute_distance_array(first, second)
+        np.testing.assert_allclose(distances, np.linalg.norm(second - first, axis=1), rtol=1e-12)
+        units = vector_array(first, second)
+        np.testing.assert_allclose(units * distances[:, np.newaxis], second - first, rtol=1e-9)
+        np.testing.assert_allclose(vector_array(first[0], second), vector_array(np.tile(first[0], (100, 1)), second))
+
+        for a, b, distance, unit in zip(first.tolist(), second.tolist(), distances, units):
+            self.assertAlmostEqual(compute_distance(carla.Location(*a), carla.Location(*b)), distance, places=4)
+            np.testing.assert_allclose(vector(carla.Location(*a), carla.Location(*b)), unit, atol=1e-6)
+        self.assertAlmostEqual(compute_distance(carla.Location(0, 0, 0), carla.Location(3, 0, 4)), 5.0)
+        np.testing.assert_allclose(vector(carla.Location(0, 0, 0), carla.Location(3, 0, 4)), [0.6, 0.0, 0.8])
+        self.assertEqual(vector(carla.Location(1, 1, 1), carla.Location(1, 1, 1)), [0.0, 0.0, 0.0])
+
+    def test_speeds(self):
+        velocities = self.uniform(-20, 20, (100, 3))
+        speeds = get_speed_array(velocities)
+        for velocity, speed in zip(velocities, speeds):
+            self.assertAlmostEqual(speed, 3.6 * math.sqrt(velocity[0] ** 2 + velocity[1] ** 2 + velocity[2] ** 2),
+                                   places=12)
+            self.assertAlmostEqual(get_speed(FakeActor(0, velocity=velocity.tolist())), speed, places=4)
@@ -0,0 +1,65 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import unittest
+
+from agents.navigation.route_cache import RouteCache, trace_size
+
+
+def make_trace(length, tag=0):
+    return [('waypoint-{}-{}'.format(tag, i), 4) for i in range(length)]
+
+
+class TestRouteCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = RouteCache(max_entries=4)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', make_trace(3))
+        self.assertEqual(cache.get('a'), make_trace(3))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 0.5)
+
+    def test_least_recently_used_eviction(self):
+        cache = RouteCache(max_entries=2)
+        cache.put('a', make_trace(2, 0))
+        cache.put('b', make_trace(2, 1))
+        cache.get('a')
+        cache.put('c', make_trace(2, 2))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_memory_eviction(self):
+        size = trace_size(tuple(make_trace(50)))
+        cache = RouteCache(max_entries=100, max_bytes=int(2.5 * size))
+        for i in range(5):
+            cache.put(i, make_trace(50, i))
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.memory, cache.max_bytes)
+        # Traces larger than the whole budget aren't stored
+        cache.put('huge', make_trace(500))
+        self.assertIsNone(cache.get('huge'))
+        self.assertEqual(len(cache), 2)
+
+    def test_returned_traces_are_independent(self):
+        cache = RouteCache()
+        trace = make_trace(3)
+        cache.put('a', trace)
+        trace.append(('extra', 4))
+        first, second = cache.get('a'), cache.get('a')
+        first.pop(0)
+        self.assertEqual(second, make_trace(3))
+        self.assertEqual(cache.get('a'), make_trace(3))
+
+    def test_clear(self):
+        cache = RouteCache()
+        cache.put('a', make_trace(3))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.memory, 0)
+        self.assertIsNone(cache.get('a'))
@@ -0,0 +1,147 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import math
+import random
+import unittest
+from collections import deque
+
+import numpy as np
+
+import carla
+
+from agents.navigation.route_corridor import RouteCorridor, WaypointQueue
+
+from .fakes import FakeTransform, FakeWaypoint
+
+
+def float32_distance(a, b):
+    """carla.Location.distance, computed in single precision"""
+    d = np.float32(a) - np.float32(b)
+    return float(np.sqrt(np.sum(d * d, dtype=np.float32)))
+
+
+def walk(rng, count, start=(0.0, 0.0), heading=0.0):
+    """Points of a winding route, with the right vector of each one"""
+    x, y = start
+    points = []
+    for _ in range(count):
+        heading += rng.uniform(-0.4, 0.4)
+        x, y = x + 2.0 * math.cos(heading), y + 2.0 * math.sin(heading)
+        points.append(((float(np.float32(x)), float(np.float32(y)), 0.0), (-math.sin(heading), math.cos(heading))))
+    return points
+
+
+def waypoint(center, right):
+    """Waypoint of walk, turned so that its right vector is the given one"""
+    return FakeWaypoint(FakeTransform(*center, yaw=math.degrees(math.atan2(-right[0], right[1]))))
+
+
+def reference_purge(queue, location, min_distance):
+    """The per waypoint purge loop of the LocalPlanner"""
+    removed = 0
+    for waypoint, _ in queue:
+        threshold = 1 if len(queue) - removed == 1 else min_distance
+        center = waypoint.transform.location
+        if float32_distance(location, (center.x, center.y, center.z)) < threshold:
+            removed += 1
+        else:
+            break
+    for _ in range(removed):
+        queue.popleft()
+    return removed
+
+
+class TestRouteCorridor(unittest.TestCase):
+    def test_follows_the_queue(self):
+        rng = random.Random(0)
+        corridor, model = RouteCorridor(capacity=4), []
+        for _ in range(2000):
+            action = rng.random()
+            if action < 0.5:
+                for center, right in walk(rng, rng.randint(1, 20), model[-1][0][:2] if model else (0.0, 0.0)):
+                    corridor.append(center, right)
+                    model.append((center, right))
+            elif action < 0.95:
+                count = rng.randint(0, 5)
+                corridor.popleft(count)
+                del model[:count]
+            else:
+                corridor.clear()
+                model = []
+            self.assertEqual(len(corridor), len(model))
+            if model:
+                np.testing.assert_allclose(corridor.centers, [c for c, _ in model])
+                np.testing.assert_allclose(corridor.rights, [r for _, r in model])
+                steps = np.linalg.norm(np.diff([c for c, _ in model], axis=0), axis=1)
+                np.testing.assert_allclose(corridor.arc_lengths, np.concatenate([[0.0], np.cumsum(steps)]),
+                                           atol=1e-9)
+
+    def test_reach_matches_the_plan_walk(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            points = walk(rng, rng.randint(1, 150))
+            corridor = RouteCorridor()
+            for center, right in points:
+                corridor.append(center, right)
+            origin = (rng.uniform(-5, 5), rng.uniform(-5, 5), rng.uniform(-1, 1))
+            max_distance = rng.uniform(0, 60)
+            expected = 0
+            for center, _ in points:
+                if float32_distance(origin, center) > max_distance:
+                    break
+                expected += 1
+            self.assertEqual(corridor.reach(origin, max_distance), expected)
+
+    def test_boundaries(self):
+        corridor = RouteCorridor()
+        corridor.append((1.0, 2.0, 0.5), (0.0, 1.0))
+        corridor.append((3.0, 2.0, 0.5), (0.0, 1.0))
+        right, left = corridor.boundaries(1, 1.5, -0.5)
+        np.testing.assert_allclose(right, [[1.0, 3.5, 0.5]])
+        np.testing.assert_allclose(left, [[1.0, 1.5, 0.5]])
+        self.assertEqual(RouteCorridor().reach((0.0, 0.0, 0.0), 10.0), 0)
+
+    def test_waypoint_queue_matches_a_deque(self):
+        rng = random.Random(2)
+        queue, model = WaypointQueue(maxlen=50), deque(maxlen=50)
+        position, purged = (0.0, 0.0), 0
+        for step in range(3000):
+            action = rng.random()
+            if action < 0.3:
+                start = model[-1][0].transform.location if model else carla.Location(*position)
+                for center, right in walk(rng, rng.randint(1, 30), (start.x, start.y)):
+                    elem = (waypoint(center, right), step)
+                    queue.append(elem)
+                    model.append(elem)
+            elif action < 0.95 and model:
+                # A vehicle near the first waypoints, sometimes right on the last one
+                target = model[min(len(model) - 1, rng.randint(0, 6))][0].transform.location
+                location = (target.x + rng.uniform(-3, 3), target.y + rng.uniform(-3, 3), rng.uniform(-0.5, 0.5))
+                if rng.random() < 0.1:
+                    target = model[-1][0].transform.location
+                    location = (target.x + rng.uniform(-1.2, 1.2), target.y, 0.0)
+                location = tuple(float(np.float32(v)) for v in location)
+                min_distance = rng.uniform(0.5, 6.0)
+                expected = reference_purge(model, location, min_distance)
+                self.assertEqual(queue.purge(location, min_distance), expected)
+                purged += expected
+            elif action < 0.97:
+                queue.clear()
+                model.clear()
+            else:
+                queue.maxlen = model.maxlen + 20
+                model = deque(model, maxlen=model.maxlen + 20)
+            self.assertEqual(len(queue), len(model))
+            self.assertEqual(list(queue), list(model))
+            self.assertEqual(len(queue.corridor), len(model))
+            if model:
+                self.assertIs(queue[-1], model[-1])
+                self.assertIs(queue[0], model[0])
+                center = model[0][0].transform.location
+                np.testing.assert_allclose(queue.corridor.centers[0], (center.x, center.y, center.z))
+        self.assertGreater(purged, 1000)
+        self.assertRaises(IndexError, lambda: WaypointQueue()[0])
@@ -0,0 +1,245 @@
+# Copyright (c) 2019 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import os
+import random
+import tempfile
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from agents.navigation.route_graph import CSRGraph, ContractionHierarchy, IncrementalSearch
+
+
+def make_synthetic_graph(num_nodes, num_edges, seed, integer_lengths=False):
+    """Random directed graph with (x, y, z) vertices, similar to the route planner graph"""
+    rng = random.Random(seed)
+    graph = nx.DiGraph()
+    for node in range(num_nodes):
+        # Loose ends of the route planner graph use negative node ids
+        node_id = node if node % 7 else -node - 1
+        graph.add_node(node_id, vertex=(rng.uniform(0, 500), rng.uniform(0, 500), rng.uniform(0, 10)))
+    nodes = list(graph.nodes)
+    while graph.number_of_edges() < num_edges:
+        n1, n2 = rng.sample(nodes, 2)
+        p1, p2 = np.array(graph.nodes[n1]['vertex']), np.array(graph.nodes[n2]['vertex'])
+        length = np.linalg.norm(p1 - p2) * rng.uniform(1.0, 1.5)
+        if integer_lengths:
+            length = int(length)
+        graph.add_edge(n1, n2, length=length, type=4 if rng.random() > 0.1 else 5)
+    return graph
+
+
+def make_road_grid(blocks, block_length, resolution, lanes=2):
+    """
+    Grid of roads shaped like the route planner graph of a town: each road has several
+    lanes per direction, the edge lengths are waypoint counts and the lane changes between
+    neighbouring lanes cost nothing.
+    """
+    graph = nx.DiGraph()
+    nodes = {}
+
+    def node(key, vertex):
+        if key not in nodes:
+            nodes[key] = len(nodes)
+            graph.add_node(nodes[key], vertex=vertex)
+        return nodes[key]
+
+    for i in range(blocks + 1):
+        for j in range(blocks + 1):
+            for di, dj in ((1, 0), (0, 1)):
+                if i + di > blocks or j + dj > blocks:
+                    continue
+                for direction in (1, -1):
+                    previous = []
+                    for lane in range(1, lanes + 1):
+                        start, end = (i, j), (i + di, j + dj)
+                        if direction < 0:
+                            start, end = end, start
+                        offset = 3.5 * lane * direction
+                        p1 = (start[0] * block_length + offset * dj, start[1] * block_length + offset * di, 0.0)
+                        p2 = (end[0] * block_length + offset * dj, end[1] * block_length + offset * di, 0.0)
+                        n1 = node((start, end, lane, 'entry'), p1)
+                        n2 = node((start, end, lane, 'exit'), p2)
+                        graph.add_edge(n1, n2, length=int(block_length / resolution) + 1, type=4)
+                        # Junctions join every exit lane with the entry lanes of the next roads
+                        graph.add_edge(node(('junction', start), (start[0] * block_length, start[1] * block_length,
+                                                                  0.0)), n1, length=2, type=4)
+                        graph.add_edge(n2, node(('junction', end), (end[0] * block_length, end[1] * block_length,
+                                                                    0.0)), length=2, type=4)
+                        for other in previous:
+                            graph.add_edge(n1, other[1], length=0, type=5)
+                            graph.add_edge(other[0], n2, length=0, type=6)
+                        previous.append((n1, n2))
+    return graph
+
+
+def distance_heuristic(graph):
+    def heuristic(n1, n2):
+        l1 = np.array(graph.nodes[n1]['vertex'])
+        l2 = np.array(graph.nodes[n2]['vertex'])
+        return np.linalg.norm(l1 - l2)
+    return heuristic
+
+
+class TestCSRGraph(unittest.TestCase):
+    def test_compiled_arrays(self):
+        graph = make_synthetic_graph(50, 200, seed=0)
+        csr = CSRGraph.from_networkx(graph)
+        self.assertEqual(csr.num_nodes, 50)
+        self.assertEqual(csr.num_edges, 200)
+        self.assertEqual(csr.coordinates.shape, (50, 3))
+        for n1, n2, data in graph.edges(data=True):
+            e = csr.edge_index(n1, n2)
+            self.assertGreaterEqual(e, 0)
+            self.assertEqual(csr.lengths[e], data['length'])
+            self.assertEqual(csr.edge_types[e], data['type'])
+        self.assertEqual(csr.edge_index(*self._missing_edge(graph)), -1)
+
+    def test_astar_parity(self):
+        for seed, integer_lengths in [(1, False), (2, False), (3, True), (4, True)]:
+            graph = make_synthetic_graph(300, 1200, seed, integer_lengths)
+            csr = CSRGraph.from_networkx(graph)
+            heuristic = distance_heuristic(graph)
+            rng = random.Random(seed)
+            nodes = list(graph.nodes)
+            for _ in range(100):
+                source, target = rng.choice(nodes), rng.choice(nodes)
+                try:
+                    expected = nx.astar_path(graph, source, target, heuristic=heuristic, weight='length')
+                except nx.NetworkXNoPath:
+                    self.assertRaises(nx.NetworkXNoPath, csr.astar, source, target)
+                    continue
+                path = csr.astar(source, target)
+                self.assertEqual(path, expected)
+                self.assertAlmostEqual(
+                    csr.path_length(path), nx.path_weight(graph, expected, weight='length'))
+
+    def test_unknown_node(self):
+        csr = CSRGraph.from_networkx(make_synthetic_graph(10, 20, seed=5))
+        self.assertRaises(nx.NodeNotFound, csr.astar, 12345, 1)
+
+    def test_many_to_many(self):
+        graph = make_synthetic_graph(200, 600, seed=8)
+        csr = CSRGraph.from_networkx(graph)
+        rng = random.Random(8)
+        nodes = list(graph.nodes)
+        sources = [rng.choice(nodes) for _ in range(10)] * 2
+        targets = [rng.choice(nodes) for _ in range(15)]
+        lengths, paths = csr.many_to_many(sources, targets)
+        self.assertEqual(lengths.shape, (20, 15))
+        for i, source in enumerate(sources):
+            for j, target in enumerate(targets):
+                try:
+                    expected = nx.dijkstra_path_length(graph, source, target, weight='length')
+                except nx.NetworkXNoPath:
+                    self.assertEqual(lengths[i, j], float('inf'))
+                    self.assertIsNone(paths[i][j])
+                    continue
+                self.assertAlmostEqual(lengths[i, j], expected)
+                self.assertEqual(paths[i][j][0], source)
+                self.assertEqual(paths[i][j][-1], target)
+                self.assertAlmostEqual(nx.path_weight(graph, paths[i][j], weight='length'), expected)
+
+        pool_lengths, pool_paths = csr.many_to_many(sources, targets, processes=2)
+        np.testing.assert_array_equal(pool_lengths, lengths)
+        self.assertEqual(pool_paths, paths)
+
+    def test_contraction_hierarchy_parity(self):
+        graph = make_synthetic_graph(200, 600, seed=6)
+        csr = CSRGraph.from_networkx(graph)
+        hierarchy = ContractionHierarchy.build(csr)
+        heuristic = distance_heuristic(graph)
+        rng = random.Random(6)
+        nodes = list(graph.nodes)
+        for _ in range(200):
+            source, target = rng.choice(nodes), rng.choice(nodes)
+            try:
+                expected = nx.astar_path(graph, source, target, heuristic=heuristic, weight='length')
+            except nx.NetworkXNoPath:
+                self.assertRaises(nx.NetworkXNoPath, hierarchy.query, source, target)
+                continue
+            path = hierarchy.query(source, target)
+            self.assertEqual(path, expected)
+            # Shortcuts are unpacked into edges of the original graph, keeping their type
+            for n1, n2 in zip(path[:-1], path[1:]):
+                self.assertTrue(graph.has_edge(n1, n2))
+
+    def test_contraction_hierarchy_on_a_road_grid(self):
+        # The A* of the planner isn't exact on such graphs, so the hierarchy can't return the
+        # same routes. It returns exact shortest paths, never longer than the A* ones.
+        graph = make_road_grid(6, 60.0, 2.0)
+        hierarchy = ContractionHierarchy.build(CSRGraph.from_networkx(graph))
+        heuristic = distance_heuristic(graph)
+        rng = random.Random(10)
+        nodes = list(graph.nodes)
+        for _ in range(200):
+            source, target = rng.choice(nodes), rng.choice(nodes)
+            path = hierarchy.query(source, target)
+            self.assertEqual((path[0], path[-1]), (source, target))
+            length = nx.path_weight(graph, path, weight='length')
+            self.assertEqual(length, nx.dijkstra_path_length(graph, source, target, weight='length'))
+            astar = nx.astar_path(graph, source, target, heuristic=heuristic, weight='length')
+            self.assertLessEqual(length, nx.path_weight(graph, astar, weight='length'))
+
+    def test_contraction_hierarchy_storage(self):
+        csr = CSRGraph.from_networkx(make_synthetic_graph(50, 150, seed=7))
+        hierarchy = ContractionHierarchy.build(csr)
+        with tempfile.NamedTemporaryFile(suffix='.npz', delete=False) as ch_file:
+            path = ch_file.name
+        try:
+            hierarchy.save(path)
+            loaded = ContractionHierarchy.load(path)
+        finally:
+            os.remove(path)
+        self.assertTrue(loaded.matches(csr))
+        self.assertEqual(loaded.num_shortcuts, hierarchy.num_shortcuts)
+        nodes = list(csr.node_ids)
+        for source, target in zip(nodes[:20], nodes[20:40]):
+            try:
+                expected = hierarchy.query(int(source), int(target))
+            except nx.NetworkXNoPath:
+                continue
+            self.assertEqual(loaded.query(int(source), int(target)), expected)
+
+    def test_incremental_search_repair(self):
+        graph = make_synthetic_graph(150, 600, seed=8, integer_lengths=True)
+        # Zero length edges, as the lane change links of the route planner
+        for n1, n2 in list(graph.edges)[::25]:
+            graph.edges[n1, n2]['length'] = 0
+        csr = CSRGraph.from_networkx(graph)
+        rng = random.Random(9)
+        target = 0
+        search = IncrementalSearch(csr, target)
+        sources = [rng.randrange(csr.num_nodes) for _ in range(10)]
+
+        for _ in range(6):
+            changed = rng.sample(range(csr.num_edges), 15)
+            for e in changed:
+                csr.lengths[e] = float('inf') if rng.random() < 0.5 else csr.lengths[e] * rng.uniform(0.5, 3.0)
+            csr.invalidate()
+            search.update_edges(changed)
+
+            for source in sources:
+                lengths, _ = csr.shortest_paths_indices(source, [target])
+                self.assertAlmostEqual(search.distance(source), lengths[0])
+                if lengths[0] == float('inf'):
+                    self.assertRaises(nx.NetworkXNoPath, search.path_indices, source)
+                    continue
+                path = search.path_indices(source)
+                self.assertEqual((path[0], path[-1]), (source, target))
+                self.assertAlmostEqual(
+                    sum(csr.lengths[csr.edge_index(*csr.node_ids[[a, b]])] for a, b in zip(path[:-1], path[1:])),
+                    lengths[0])
+
+    @staticmethod
+    def _missing_edge(graph):
+        for n1 in graph.nodes:
+            for n2 in graph.nodes:
+                if n1 != n2 and not graph.has_edge(n1, n2):
+                    return n1, n2
+        return None
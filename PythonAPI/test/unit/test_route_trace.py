@@ -0,0 +1,84 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import pickle
+import unittest
+
+from agents.navigation.local_planner import RoadOption
+from agents.navigation.route_trace import RouteTrace
+
+from .fakes import FakeTransform, FakeWaypoint
+
+
+class XodrMap(object):
+    """
+    Map double that builds the waypoints from their OpenDRIVE coordinates. Roads have a
+    lane section every 4 meters and, as in CARLA, get_waypoint_xodr at the boundary of
+    two sections returns the waypoint of the following one.
+    """
+
+    def __init__(self):
+        self.requests = 0
+
+    def get_waypoint_xodr(self, road_id, lane_id, s):
+        self.requests += 1
+        return FakeWaypoint(FakeTransform(road_id * 4.0 + s), road_id, int(s // 4), lane_id, s)
+
+    def get_waypoint(self, location):
+        self.requests += 1
+        road_id, s = int(location.x // 4), location.x % 4
+        if s == 0.0 and road_id > 0:
+            # The last waypoint of a road
+            road_id, s = road_id - 1, 4.0
+        return FakeWaypoint(FakeTransform(location.x), road_id, int(s // 4) if s < 4.0 else 0, -1, s)
+
+
+def describe(pair):
+    waypoint, road_option = pair
+    return (waypoint.road_id, waypoint.section_id, waypoint.lane_id, waypoint.s), road_option
+
+
+def make_trace(length):
+    positions = [(float(i), 0.0, 0.0) for i in range(length)]
+    options = [int(RoadOption.LANEFOLLOW)] * (length - 1) + [int(RoadOption.LEFT)]
+    lane_keys = [(i // 4, 0, -1) for i in range(length)]
+    return RouteTrace(positions, [0.0] * length, lane_keys, [float(i % 4) for i in range(length)], options)
+
+
+class TestRouteTrace(unittest.TestCase):
+    def test_lazy_waypoints(self):
+        wmap = XodrMap()
+        trace = make_trace(10).bind(wmap)
+        self.assertEqual(len(trace), 10)
+        self.assertEqual(wmap.requests, 0)
+        self.assertEqual(describe(trace[5]), ((1, 0, -1, 1.0), RoadOption.LANEFOLLOW))
+        self.assertEqual(describe(trace[-1]), ((2, 0, -1, 1.0), RoadOption.LEFT))
+        self.assertEqual(wmap.requests, 2)
+        self.assertRaises(IndexError, trace.__getitem__, 10)
+
+    def test_slicing_and_iteration(self):
+        trace = make_trace(10).bind(XodrMap())
+        tail = trace[6:]
+        self.assertIsInstance(tail, RouteTrace)
+        self.assertEqual(len(tail), 4)
+        self.assertEqual([describe(pair) for pair in tail], [describe(pair) for pair in trace.to_list()[6:]])
+        self.assertEqual(tail.road_options()[-1], RoadOption.LEFT)
+
+    def test_pickle(self):
+        trace = make_trace(1000).bind(XodrMap())
+        restored = pickle.loads(pickle.dumps(trace))
+        self.assertRaises(RuntimeError, restored.waypoint, 0)
+        restored.bind(XodrMap())
+        self.assertEqual([describe(pair) for pair in restored], [describe(pair) for pair in trace])
+        self.assertLess(len(pickle.dumps(trace)), 2 * trace.nbytes)
+
+    def test_section_boundary(self):
+        wmap = XodrMap()
+        # The exit of a lane, stored with the section it ends
+        exit_waypoint = FakeWaypoint(FakeTransform(4.0), 0, 0, -1, 4.0)
+        trace = RouteTrace.from_list([(exit_waypoint, RoadOption.LANEFOLLOW)], wmap)
+        self.assertEqual(describe(trace[0]), ((0, 0, -1, 4.0), RoadOption.LANEFOLLOW))
+        self.assertEqual(wmap.requests, 2)
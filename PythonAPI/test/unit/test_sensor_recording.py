@@ -0,0 +1,140 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from agents.tools import sensor_recording
+from agents.tools.sensor_recording import (SNAPSHOT_ACTOR_DTYPE, SensorRecordingReader,
+                                           SensorRecordingWriter, convert_snapshots)
+from agents.tools.sensor_views import LIDAR_DTYPE, RADAR_DTYPE
+
+from .fakes import FakeImage
+
+
+def random_points(rng, count, dtype=LIDAR_DTYPE):
+    points = np.zeros(count, dtype=dtype)
+    for name in dtype.names:
+        points[name] = rng.uniform(-50, 50, count)
+    return points
+
+
+class TestSensorRecording(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'test.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def record(self, codec, frames):
+        rng = np.random.RandomState(0)
+        expected = {'camera': {}, 'lidar': {}}
+        with SensorRecordingWriter(self.path, codec=codec, chunk_size=20000) as writer:
+            for frame in frames:
+                image = rng.randint(0, 256, (12, 16, 4)).astype(np.uint8)
+                writer.write_image('camera', FakeImage.from_array(image, frame))
+                expected['camera'][frame] = image
+                if frame % 3:
+                    # Frames of the lidar are missing, and some have no points
+                    points = random_points(rng, rng.randint(0, 500))
+                    writer.write('lidar', frame, points)
+                    expected['lidar'][frame] = points
+        return expected
+
+    def test_round_trip(self):
+        codecs = ['none', 'zlib']
+        codecs += [codec for codec, module in (('lz4', sensor_recording.lz4_frame),
+                                               ('zstd', sensor_recording.zstandard)) if module is not None]
+        frames = list(range(1000, 1060))
+        for codec in codecs:
+            expected = self.record(codec, frames)
+            with SensorRecordingReader(self.path) as reader:
+                self.assertEqual(reader.sensors, ['camera', 'lidar'])
+                np.testing.assert_array_equal(reader.frames('lidar'), sorted(expected['lidar']))
+                for name in ('camera', 'lidar'):
+                    for frame in reversed(frames):
+                        if frame in expected[name]:
+                            data = reader.read(name, frame)
+                            self.assertFalse(data.flags.writeable)
+                            np.testing.assert_array_equal(data, expected[name][frame])
+                        else:
+                            self.assertRaises(KeyError, reader.read, name, frame)
+                self.assertEqual(list(reader.read_frame(1001)), ['camera', 'lidar'])
+                self.assertEqual(list(reader.read_frame(1002)), ['camera'])
+
+                # The shards read every frame once, each decompressing its own chunks
+                shards = [list(reader.iter_frames('lidar', start=1010, stop=1050, shard=i, shards=3))
+                          for i in range(3)]
+                read = sorted(frame for shard in shards for frame, _ in shard)
+                self.assertEqual(read, [frame for frame in sorted(expected['lidar']) if 1010 <= frame < 1050])
+                self.assertTrue(all(shards))
+                for frame, points in shards[1]:
+                    np.testing.assert_array_equal(points, expected['lidar'][frame])
+
+                copy = pickle.loads(pickle.dumps(reader))
+                np.testing.assert_array_equal(copy.read('camera', 1001), expected['camera'][1001])
+                copy.close()
+
+        self.assertRaises(ValueError, SensorRecordingWriter, self.path, codec='gzip')
+
+    def test_recovery_and_append(self):
+        rng = np.random.RandomState(1)
+        writer = SensorRecordingWriter(self.path, chunk_size=4000)
+        expected = {}
+        for frame in range(40):
+            expected[frame] = random_points(rng, 100, RADAR_DTYPE)
+            writer.write('radar', frame, expected[frame])
+        writer.flush()
+        # Copies the recording as if the process had died before closing it, in the middle of a chunk
+        crashed = os.path.join(self.folder, 'crashed.rec')
+        with open(self.path, 'rb') as source, open(crashed, 'wb') as target:
+            target.write(source.read())
+            target.write(b'CHNK' + b'\0' * 10)
+        writer.close()
+
+        with SensorRecordingReader(crashed) as reader:
+            np.testing.assert_array_equal(reader.frames('radar'), np.arange(40))
+            np.testing.assert_array_equal(reader.read('radar', 39), expected[39])
+
+        with SensorRecordingWriter(crashed, codec='zlib', append=True) as writer:
+            self.assertRaises(ValueError, writer.write, 'radar', 39, expected[39])
+            self.assertRaises(ValueError, writer.write, 'radar', 40, np.zeros((3, 4), np.float32))
+            writer.write('radar', 40, expected[0])
+        with SensorRecordingReader(crashed) as reader:
+            np.testing.assert_array_equal(reader.frames('radar'), np.arange(41))
+            np.testing.assert_array_equal(reader.read('radar', 40), expected[0])
+            np.testing.assert_array_equal(reader.read('radar', 5), expected[5])
+
+    def test_convert_snapshots(self):
+        rng = np.random.RandomState(2)
+        prefix = os.path.join(self.folder, 'SpawnAllRaycastSensors_rep_000')
+        lidar = {frame: random_points(rng, 50) for frame in range(1, 12)}
+        for frame, points in lidar.items():
+            # As check_raycast_sensors_determinism saves them
+            np.savetxt('%s_1_LiDAR_%04d.out' % (prefix, frame), points.view(np.float32).reshape(-1, 4))
+            np.savetxt('%s_0_Radar_%04d.out' % (prefix, frame), np.zeros((0, 4)))
+        table = rng.uniform(-10, 10, (11, 11))
+        table[:, 0] = np.arange(11)
+        np.savetxt('%s_0_Car.out' % prefix, table)
+
+        with SensorRecordingWriter(self.path) as writer:
+            names = convert_snapshots(prefix, writer)
+        self.assertEqual(names, ['0_Radar', '1_LiDAR', '0_Car'])
+        with SensorRecordingReader(self.path) as reader:
+            self.assertEqual(reader.sensors, ['0_Car', '0_Radar', '1_LiDAR'])
+            for frame, points in lidar.items():
+                np.testing.assert_array_equal(reader.read('1_LiDAR', frame), points)
+            self.assertEqual(reader.read('0_Radar', 7).shape, (0,))
+            self.assertEqual(reader.read('0_Radar', 7).dtype, RADAR_DTYPE)
+            row = reader.read('0_Car', 4)
+            self.assertEqual(row.dtype, SNAPSHOT_ACTOR_DTYPE)
+            np.testing.assert_array_equal(row.view(np.float64), table[4])
@@ -0,0 +1,140 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import asyncio
+import queue
+import random
+import threading
+import time
+import unittest
+
+from agents.tools.sensor_sync import SensorSynchronizer
+
+from .fakes import FakeMeasurement
+
+
+def sensor_thread(synchronizer, name, frames, ticks, seed):
+    """Delivers the measurements of a sensor with random delays, some out of order"""
+    rng = random.Random(seed)
+    callback = synchronizer.callback(name)
+    pending = []
+    for frame in frames:
+        if not ticks.acquire(False):
+            # Nothing is left to hold back while the simulation waits for the reader
+            while pending:
+                callback(pending.pop())
+            ticks.acquire()
+        pending.append(FakeMeasurement(name, frame))
+        rng.shuffle(pending)
+        while len(pending) > rng.randint(0, 2):
+            time.sleep(rng.uniform(0, 0.001))
+            callback(pending.pop())
+    for measurement in pending:
+        callback(measurement)
+
+
+class TestSensorSynchronizer(unittest.TestCase):
+    def test_threaded_sensors(self):
+        names = ['world', 'camera', 'lidar', 'radar']
+        synchronizer = SensorSynchronizer(names, capacity=16)
+        frames = range(100, 400)
+        ticks = [threading.Semaphore(0) for _ in names]
+        threads = [threading.Thread(target=sensor_thread, args=(synchronizer, name, frames, ticks[i], i))
+                   for i, name in enumerate(names)]
+        for thread in threads:
+            thread.start()
+        for frame in frames:
+            # The simulation runs a few frames ahead of the reader, as with an asynchronous client
+            for tick in ticks:
+                tick.release(3 if frame == frames[0] else 1)
+            bundle = synchronizer.get(frame, timeout=5.0)
+            self.assertEqual(bundle.frame, frame)
+            self.assertTrue(bundle.complete)
+            self.assertEqual([(data.frame, data.raw_data) for data in bundle], [(frame, name) for name in names])
+            self.assertIs(bundle['lidar'], bundle[2])
+        for thread in threads:
+            thread.join()
+
+        stats = synchronizer.stats()
+        self.assertEqual(stats['completed'], len(frames))
+        self.assertEqual(stats['overruns'], 0)
+        for name in names:
+            self.assertEqual(stats['sensors'][name]['received'], len(frames))
+            self.assertGreaterEqual(stats['sensors'][name]['latency_mean'], 0.0)
+            self.assertLessEqual(stats['sensors'][name]['latency_mean'], stats['sensors'][name]['latency_max'])
+
+    def test_policies(self):
+        def make(policy, interpolator=None):
+            synchronizer = SensorSynchronizer(['camera', 'lidar'], capacity=4, policy=policy,
+                                              interpolator=interpolator)
+            for frame in (1, 2, 3):
+                synchronizer.push('camera', 'camera-{}'.format(frame), frame)
+                if frame != 2:
+                    synchronizer.push('lidar', frame * 10.0, frame)
+            return synchronizer
+
+        self.assertRaises(queue.Empty, make('wait').get, 2, 0.01)
+
+        synchronizer = make('skip')
+        self.assertIsNone(synchronizer.get(2, timeout=0.01))
+        self.assertEqual(list(synchronizer.get(3, timeout=0.01)), ['camera-3', 30.0])
+        self.assertEqual(synchronizer.stats()['sensors']['lidar']['missing'], 1)
+        self.assertEqual(synchronizer.stats()['skipped'], 1)
+
+        bundle = make('interpolate').get(2, timeout=0.01)
+        self.assertEqual(bundle.missing, ('lidar',))
+        self.assertEqual(list(bundle), ['camera-2', 10.0])
+        bundle = make('interpolate', lambda a, b, weight: a + (b - a) * weight).get(2, timeout=0.01)
+        self.assertEqual(list(bundle), ['camera-2', 20.0])
+
+        self.assertRaises(ValueError, SensorSynchronizer, ['camera'], policy='drop')
+
+    def test_ring(self):
+        synchronizer = SensorSynchronizer(['camera', 'lidar'], capacity=2, policy='skip')
+        synchronizer.push('camera', 'a', 1)
+        synchronizer.push('camera', 'b', 3)
+        # Frame 1 was overwritten by frame 3 before being read
+        self.assertEqual(synchronizer.overruns, 1)
+        synchronizer.push('lidar', 'c', 1)
+        self.assertEqual(synchronizer.stats()['sensors']['lidar']['stale'], 1)
+        self.assertIsNone(synchronizer.get(1, timeout=1.0))
+        synchronizer.push('lidar', 'd', 3)
+        self.assertEqual(list(synchronizer.get(3)), ['b', 'd'])
+
+    def test_latencies(self):
+        now = [0.0]
+        synchronizer = SensorSynchronizer(['camera', 'lidar'], clock=lambda: now[0])
+        synchronizer.expect(5)
+        now[0] = 0.25
+        synchronizer.push('camera', None, 5)
+        now[0] = 0.5
+        synchronizer.push('lidar', None, 5)
+        synchronizer.get(5)
+        sensors = synchronizer.stats()['sensors']
+        self.assertEqual((sensors['camera']['latency_last'], sensors['lidar']['latency_last']), (0.25, 0.5))
+
+    def test_asyncio(self):
+        synchronizer = SensorSynchronizer(['camera', 'lidar'], policy='skip')
+
+        def deliver():
+            for frame in range(10):
+                time.sleep(0.001)
+                synchronizer.push('camera', frame, frame)
+                synchronizer.push('lidar', -frame, frame)
+
+        async def read():
+            futures = [synchronizer.future(frame, timeout=5.0) for frame in range(10)]
+            thread = threading.Thread(target=deliver)
+            thread.start()
+            bundles = await asyncio.gather(*futures)
+            # Nobody delivers frame 10, the skip policy resolves it when the timeout expires
+            late = await synchronizer.future(10, timeout=0.01)
+            thread.join()
+            return bundles, late
+
+        bundles, late = asyncio.run(read())
+        self.assertEqual([list(bundle) for bundle in bundles], [[frame, -frame] for frame in range(10)])
+        self.assertIsNone(late)
@@ -0,0 +1,74 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import struct
+import unittest
+
+import numpy as np
+
+from agents.tools.sensor_views import (RADAR_DTYPE, alpha_view, bgra_view, lidar_view, radar_view, rgb_view,
+                                       semantic_lidar_view, xyz_view)
+
+from .fakes import FakeImage, FakeMeasurement
+
+
+class TestSensorViews(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.RandomState(0)
+
+    def test_images(self):
+        pixels = self.rng.randint(0, 256, (6, 8, 4)).astype(np.uint8)
+        raw_data = bytearray(pixels.tobytes())
+        image = FakeImage(8, 6, raw_data)
+
+        rgb = rgb_view(image)
+        np.testing.assert_array_equal(rgb, pixels[:, :, :3][:, :, ::-1])
+        np.testing.assert_array_equal(bgra_view(image), pixels)
+        np.testing.assert_array_equal(alpha_view(image), pixels[:, :, 3])
+        self.assertFalse(rgb.flags.writeable)
+        self.assertRaises(ValueError, rgb.__setitem__, (0, 0, 0), 1)
+
+        # The views follow the buffer of the image, the copies don't
+        copy = rgb_view(image, copy=True)
+        self.assertTrue(copy.flags.writeable and copy.flags.c_contiguous)
+        raw_data[0] = (raw_data[0] + 1) % 256
+        self.assertEqual(rgb[0, 0, 2], raw_data[0])
+        self.assertNotEqual(copy[0, 0, 2], raw_data[0])
+        copy[:] = 0
+        self.assertEqual(bgra_view(image)[0, 0, 0], raw_data[0])
+
+    def test_lidars(self):
+        points = self.rng.uniform(-50, 50, (100, 4)).astype(np.float32)
+        lidar = lidar_view(FakeMeasurement(points.tobytes()))
+        self.assertEqual(len(lidar), 100)
+        np.testing.assert_array_equal(lidar['intensity'], points[:, 3])
+        xyz = xyz_view(lidar)
+        np.testing.assert_array_equal(xyz, points[:, :3])
+        self.assertTrue(np.shares_memory(xyz, lidar))
+        self.assertFalse(xyz.flags.writeable)
+        self.assertTrue(xyz_view(lidar, copy=True).flags.c_contiguous)
+
+        # Object indices and tags are integers, not floats
+        raw_data = b''.join(struct.pack('<4f2I', x, y, z, a, i, i % 23)
+                            for i, (x, y, z, a) in enumerate(points.tolist()))
+        semantic = semantic_lidar_view(FakeMeasurement(raw_data))
+        self.assertEqual(semantic['object_idx'].tolist(), list(range(100)))
+        self.assertEqual(semantic['object_tag'].tolist(), [i % 23 for i in range(100)])
+        np.testing.assert_array_equal(semantic['cos_angle'], points[:, 3])
+        np.testing.assert_array_equal(xyz_view(semantic), points[:, :3])
+
+        copy = semantic_lidar_view(FakeMeasurement(raw_data), copy=True)
+        copy['object_tag'] = 0
+        self.assertEqual(semantic['object_tag'][1], 1)
+
+        self.assertEqual(xyz_view(lidar_view(FakeMeasurement(b''))).shape, (0, 3))
+
+    def test_radar(self):
+        detections = self.rng.uniform(-1, 1, (10, 4)).astype(np.float32)
+        radar = radar_view(FakeMeasurement(detections.tobytes()))
+        self.assertEqual(radar.dtype, RADAR_DTYPE)
+        for column, name in enumerate(('velocity', 'azimuth', 'altitude', 'depth')):
+            np.testing.assert_array_equal(radar[name], detections[:, column])
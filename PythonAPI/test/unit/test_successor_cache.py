@@ -0,0 +1,109 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import random
+import unittest
+
+from agents.navigation.local_planner import LocalPlanner, RoadOption
+from agents.navigation.route_corridor import WaypointQueue
+from agents.navigation.successor_cache import SuccessorCache
+
+from .fakes import FakeTransform, FakeWaypoint
+
+
+class FakeNetwork(object):
+    """
+    Roads of 100 meters along x. At the end of every road there is a junction
+    to two roads, one straight ahead and one turning.
+    """
+
+    def __init__(self):
+        self.next_requests = 0
+
+    def waypoint(self, road_id, s):
+        return NetworkWaypoint(self, road_id, s)
+
+
+class NetworkWaypoint(FakeWaypoint):
+    def __init__(self, network, road_id, s):
+        yaw = 90.0 if road_id % 3 == 2 else 0.0
+        super(NetworkWaypoint, self).__init__(FakeTransform(road_id * 100.0 + s, 0.0, yaw=yaw), road_id, s=s)
+        self.network = network
+
+    def next(self, distance):
+        self.network.next_requests += 1
+        if self.s + distance <= 100.0:
+            return [self.network.waypoint(self.road_id, self.s + distance)]
+        remaining = self.s + distance - 100.0
+        return [self.network.waypoint(self.road_id + 1, remaining),
+                self.network.waypoint(self.road_id + 2, remaining)]
+
+
+def make_planner(start, cache):
+    planner = LocalPlanner.__new__(LocalPlanner)
+    planner._waypoints_queue = WaypointQueue(maxlen=10000)
+    planner._sampling_radius = 2.0
+    planner._successor_cache = cache
+    planner._waypoints_queue.append((start, RoadOption.LANEFOLLOW))
+    return planner
+
+
+def route(planner):
+    return [(w.road_id, round(w.s, 6), option) for w, option in planner._waypoints_queue]
+
+
+class TestSuccessorCache(unittest.TestCase):
+    def test_hits_misses_and_eviction(self):
+        network = FakeNetwork()
+        cache = SuccessorCache(max_entries=2, quantization=1.0)
+
+        def compute(waypoint, distance):
+            return [(waypoint.next(distance)[0], RoadOption.LANEFOLLOW)]
+
+        first = cache.successors(network.waypoint(0, 10.2), 2.0, compute)
+        # Same bucket of the same lane, the stored successors are returned
+        self.assertIs(cache.successors(network.waypoint(0, 10.7), 2.0, compute), first)
+        cache.successors(network.waypoint(0, 11.2), 2.0, compute)
+        cache.successors(network.waypoint(0, 10.2), 2.0, compute)
+        cache.successors(network.waypoint(0, 12.2), 2.0, compute)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(cache.key(network.waypoint(0, 11.2), 2.0)))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (2, 4, 1))
+        self.assertEqual(network.next_requests, 3)
+        self.assertRaises(ValueError, SuccessorCache, 0)
+
+    def test_same_routes_as_the_map(self):
+        network = FakeNetwork()
+        cache = SuccessorCache(quantization=0.01)
+        for seed in range(5):
+            random.seed(seed)
+            planner = make_planner(network.waypoint(0, 0.0), None)
+            planner._compute_next_waypoints(k=300)
+            random.seed(seed)
+            cached = make_planner(network.waypoint(0, 0.0), cache)
+            cached._compute_next_waypoints(k=300)
+            self.assertEqual(route(cached), route(planner))
+            self.assertIn(RoadOption.STRAIGHT, [option for _, _, option in route(planner)])
+
+    def test_roaming_planners_share_the_cache(self):
+        network = FakeNetwork()
+        cache = SuccessorCache()
+        rng = random.Random(0)
+        planners = [make_planner(network.waypoint(rng.randint(0, 20), rng.uniform(0, 100)), cache)
+                    for _ in range(50)]
+        for planner in planners:
+            planner._compute_next_waypoints(k=200)
+        self.assertEqual(cache.hits + cache.misses, 50 * 200)
+        self.assertGreater(cache.stats()['hit_rate'], 0.7)
+        # The options of the junctions query the map too
+        self.assertLess(network.next_requests, 0.4 * 50 * 200)
+        for planner in planners:
+            waypoints = [w for w, _ in planner._waypoints_queue]
+            for previous, current in zip(waypoints, waypoints[1:]):
+                # Consecutive waypoints stay within a bucket of the sampling radius
+                if previous.road_id == current.road_id:
+                    self.assertLessEqual(abs(current.s - previous.s - 2.0), cache.quantization)
@@ -0,0 +1,185 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import gc
+import random
+import shutil
+import tempfile
+import unittest
+
+import carla
+
+from agents.navigation.basic_agent import BasicAgent
+from agents.navigation.local_planner import LocalPlanner, RoadOption
+from agents.navigation.route_corridor import WaypointQueue
+from agents.navigation.trigger_index import TriggerIndex, trigger_cache_path
+from agents.tools.misc import get_trafficlight_trigger_location, is_within_distance
+
+from .fakes import FakeActor, FakeTransform, FakeWaypoint, FakeWorld
+
+
+class FakeMap(object):
+    """Straight roads along x every 20 meters, with a lane in each direction"""
+
+    name = 'Carla/Maps/Straight'
+
+    def __init__(self):
+        self.waypoint_requests = 0
+
+    def to_opendrive(self):
+        return '<OpenDRIVE straight/>'
+
+    def get_waypoint(self, location):
+        self.waypoint_requests += 1
+        road_id = int(round(location.y / 20.0))
+        lane_id = -1 if location.y >= road_id * 20.0 else 1
+        return self.get_waypoint_xodr(road_id, lane_id, round(location.x, 1))
+
+    def get_waypoint_xodr(self, road_id, lane_id, s):
+        offset, yaw = (2.0, 0.0) if lane_id < 0 else (-2.0, 180.0)
+        return FakeWaypoint(FakeTransform(s, road_id * 20.0 + offset, yaw=yaw), road_id, lane_id=lane_id, s=s)
+
+
+class FakeTriggerActor(FakeActor):
+    def __init__(self, actor_id, type_id, transform, rng):
+        super(FakeTriggerActor, self).__init__(actor_id, type_id, transform)
+        self.trigger_volume = carla.BoundingBox(carla.Location(x=rng.uniform(-3, 3), y=rng.uniform(-3, 3)),
+                                                carla.Vector3D(1.0, 1.0, 1.0))
+
+
+def make_world(seed, world_id):
+    rng = random.Random(seed)
+    actors = []
+    for i in range(60):
+        type_id = 'traffic.traffic_light' if i % 4 else 'traffic.stop'
+        transform = FakeTransform(rng.uniform(0, 500), rng.randint(0, 10) * 20.0 + rng.uniform(-6, 6),
+                                  yaw=rng.uniform(-180, 180))
+        actors.append(FakeTriggerActor(100 + i, type_id, transform, rng))
+    return FakeWorld(actors, world_id)
+
+
+def reference_light(agent, lights_list, max_distance):
+    """The per light loop the agents used before the index"""
+    ego_vehicle_location = agent._vehicle.get_location()
+    ego_vehicle_waypoint = agent._map.get_waypoint(ego_vehicle_location)
+    for traffic_light in lights_list:
+        trigger_wp = agent._map.get_waypoint(get_trafficlight_trigger_location(traffic_light))
+        if trigger_wp.transform.location.distance(ego_vehicle_location) > max_distance:
+            continue
+        if trigger_wp.road_id != ego_vehicle_waypoint.road_id:
+            continue
+        ve_dir = ego_vehicle_waypoint.transform.get_forward_vector()
+        wp_dir = trigger_wp.transform.get_forward_vector()
+        if ve_dir.x * wp_dir.x + ve_dir.y * wp_dir.y + ve_dir.z * wp_dir.z < 0:
+            continue
+        if traffic_light.state != carla.TrafficLightState.Red:
+            continue
+        if is_within_distance(trigger_wp.transform, agent._vehicle.get_transform(), max_distance, [0, 90]):
+            return traffic_light
+    return None
+
+
+def make_agent(world, wmap, vehicle, trigger_index, plan=()):
+    planner = LocalPlanner.__new__(LocalPlanner)
+    planner._waypoints_queue = WaypointQueue(maxlen=10000)
+    planner._corridor = planner._waypoints_queue.corridor
+    for waypoint in plan:
+        planner._waypoints_queue.append((waypoint, RoadOption.LANEFOLLOW))
+    agent = BasicAgent.__new__(BasicAgent)
+    agent._local_planner = planner
+    agent._world, agent._map, agent._vehicle = world, wmap, vehicle
+    agent._ignore_traffic_lights = False
+    agent._last_traffic_light = None
+    agent._world_state = None
+    agent._base_tlight_threshold = 5.0
+    agent._trigger_index = trigger_index
+    agent._trigger_cache_dir = None
+    return agent
+
+
+class TestTriggerIndex(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_agents_detect_the_same_lights(self):
+        rng = random.Random(0)
+        world, wmap = make_world(0, 1), FakeMap()
+        index = TriggerIndex.build(world, wmap)
+        lights = world.get_actors().filter('*traffic_light*')
+        found = 0
+        for _ in range(2000):
+            for light in lights:
+                light.state = rng.choice([carla.TrafficLightState.Red, carla.TrafficLightState.Green])
+            transform = FakeTransform(rng.uniform(0, 500), rng.randint(0, 10) * 20.0 + rng.uniform(-4, 4),
+                                      yaw=rng.choice([0.0, 180.0]) + rng.uniform(-20, 20))
+            vehicle = FakeActor(0, transform=transform)
+            agent = make_agent(world, wmap, vehicle, index)
+            max_distance = rng.uniform(5, 60)
+            expected = reference_light(agent, lights, max_distance)
+            # The light reported is the first one of the index, checked in the order of the list above
+            affected, light = agent._affected_by_traffic_light(lights, max_distance)
+            self.assertEqual(affected, expected is not None)
+            self.assertIs(light, expected)
+            found += affected
+        self.assertGreater(found, 50)
+
+    def test_lights_on_the_roads_ahead(self):
+        wmap = FakeMap()
+        light = FakeTriggerActor(100, 'traffic.traffic_light', FakeTransform(30.0, 22.0), random.Random(0))
+        light.trigger_volume = carla.BoundingBox(carla.Location(), carla.Vector3D(1.0, 1.0, 1.0))
+        world = FakeWorld([light])
+        index = TriggerIndex.build(world, wmap)
+        lights = world.get_actors().filter('*traffic_light*')
+        vehicle = FakeActor(0, transform=FakeTransform(10.0, 2.0))
+
+        # The light is on the road that follows the one of the vehicle
+        agent = make_agent(world, wmap, vehicle, index)
+        self.assertEqual(agent._affected_by_traffic_light(lights, 40.0), (False, None))
+        plan = [wmap.get_waypoint_xodr(0, -1, float(s)) for s in range(10, 20, 2)]
+        plan += [wmap.get_waypoint_xodr(1, -1, float(s)) for s in range(20, 60, 2)]
+        agent = make_agent(world, wmap, vehicle, index, plan)
+        self.assertEqual(agent._affected_by_traffic_light(lights, 40.0), (True, light))
+        agent = make_agent(world, wmap, vehicle, index, plan)
+        self.assertEqual(agent._affected_by_traffic_light(lights, 20.0), (False, None))
+
+    def test_roads_and_kinds(self):
+        world, wmap = make_world(1, 1), FakeMap()
+        index = TriggerIndex.build(world, wmap)
+        self.assertEqual(len(index), 60)
+        for road_id in range(11):
+            for kind in ('traffic_light', 'stop'):
+                rows = index.rows(road_id, kind)
+                self.assertTrue(all(index.road_ids[row] == road_id and index.kinds[row] == kind for row in rows))
+        self.assertEqual(sorted(index.rows(range(11), 'stop').tolist()),
+                         [row for row, kind in enumerate(index.kinds) if kind == 'stop'])
+
+    def test_shared_and_cached(self):
+        world, wmap = make_world(2, 7), FakeMap()
+        index = TriggerIndex.for_world(world, wmap, self.cache_dir)
+        self.assertIs(TriggerIndex.for_world(world, wmap, self.cache_dir), index)
+        self.assertEqual(world.actor_list_requests, 1)
+        # Once no agent holds it, the index is built again
+        del index
+        gc.collect()
+        index = TriggerIndex.for_world(world, wmap)
+        self.assertEqual(world.actor_list_requests, 2)
+
+        # A new episode of the same map reads the triggers from the cache
+        restarted, wmap = make_world(2, 8), FakeMap()
+        cached = TriggerIndex.for_world(restarted, wmap, self.cache_dir)
+        self.assertIsNot(cached, index)
+        self.assertEqual(wmap.waypoint_requests, 0)
+        self.assertEqual([actor.id for actor in cached.actors], [actor.id for actor in index.actors])
+        self.assertEqual(cached.road_ids.tolist(), index.road_ids.tolist())
+        for row in range(len(index)):
+            self.assertEqual(cached.waypoint(row).s, index.waypoint(row).s)
+        self.assertEqual(cached.forwards.tolist(), index.forwards.tolist())
+
+        # The cache doesn't match a world with other lights
+        self.assertIsNone(TriggerIndex.load(trigger_cache_path(self.cache_dir, wmap), make_world(3, 9), wmap))
@@ -0,0 +1,81 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import random
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from agents.navigation.global_route_planner import GlobalRoutePlanner
+from agents.navigation.local_planner import RoadOption
+from agents.navigation.turn_classifier import TurnClassifier
+
+
+def unit_vector(rng):
+    angle = rng.uniform(-np.pi, np.pi)
+    return np.array([np.cos(angle), np.sin(angle), 0.0])
+
+
+def make_junction_graph(num_nodes, num_edges, seed):
+    """Random graph with the edge attributes of the route planner, many of them in junctions"""
+    rng = random.Random(seed)
+    graph = nx.DiGraph()
+    graph.add_nodes_from(range(num_nodes))
+    while graph.number_of_edges() < num_edges:
+        n1, n2 = rng.sample(range(num_nodes), 2)
+        if rng.random() < 0.1:
+            # Lane change link
+            graph.add_edge(n1, n2, type=rng.choice([RoadOption.CHANGELANELEFT, RoadOption.CHANGELANERIGHT]),
+                           intersection=False, exit_vector=None)
+        else:
+            loose_end = rng.random() < 0.03
+            graph.add_edge(n1, n2, type=RoadOption.LANEFOLLOW, intersection=rng.random() < 0.4,
+                           exit_vector=None if loose_end else unit_vector(rng),
+                           net_vector=None if loose_end else list(unit_vector(rng)))
+    return graph
+
+
+def random_route(graph, rng, length):
+    route = [rng.choice(list(graph.nodes))]
+    while len(route) < length:
+        candidates = [n for n in graph.successors(route[-1]) if n not in route]
+        if not candidates:
+            break
+        route.append(rng.choice(candidates))
+    return route
+
+
+class TestTurnClassifier(unittest.TestCase):
+    def test_parity_with_turn_decision(self):
+        for seed in range(4):
+            graph = make_junction_graph(60, 400, seed)
+            # Loose ends can't be crossed by _turn_decision, as their net vector is None
+            for n1, n2, data in graph.edges(data=True):
+                if data['type'] == RoadOption.LANEFOLLOW and data['net_vector'] is None:
+                    data['net_vector'] = list(unit_vector(random.Random(n1 * 1000 + n2)))
+
+            planner = GlobalRoutePlanner.__new__(GlobalRoutePlanner)
+            planner._graph = graph
+            planner._previous_decision = RoadOption.VOID
+            planner._intersection_end_node = -1
+            classifier = TurnClassifier(graph)
+            previous_decision, intersection_end_node = RoadOption.VOID, -1
+
+            rng = random.Random(seed)
+            for _ in range(30):
+                route = random_route(graph, rng, 25)
+                expected = [planner._turn_decision(i, route) for i in range(len(route) - 1)]
+                decisions, previous_decision, intersection_end_node = classifier.classify(
+                    route, previous_decision, intersection_end_node)
+                self.assertEqual(decisions, expected)
+                # The state carried over to the next route matches too
+                self.assertEqual(previous_decision, planner._previous_decision)
+                self.assertEqual(intersection_end_node, planner._intersection_end_node)
+
+    def test_empty_route(self):
+        classifier = TurnClassifier(make_junction_graph(5, 10, 0))
+        self.assertEqual(classifier.classify([3]), ([], -1, -1))
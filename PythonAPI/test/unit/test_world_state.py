@@ -0,0 +1,140 @@
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import math
+import random
+import unittest
+
+import carla
+
+from agents.navigation.world_state import WorldState
+
+from .fakes import FakeActor, FakeTransform, FakeWorld
+
+
+class CountingLight(FakeActor):
+    """Traffic light counting the requests of its state"""
+
+    state_requests = 0
+
+    @property
+    def state(self):
+        self.state_requests += 1
+        return 'Red'
+
+    @state.setter
+    def state(self, value):
+        pass
+
+
+def make_crowd(count, seed):
+    rng = random.Random(seed)
+    return FakeWorld([
+        FakeActor(i, rng.choice(['vehicle.audi.tt', 'walker.pedestrian.0001']),
+                  FakeTransform(rng.uniform(-300, 300), rng.uniform(-300, 300), rng.uniform(0, 5)))
+        for i in range(count)])
+
+
+def make_world():
+    return FakeWorld([
+        FakeActor(7, 'vehicle.audi.tt', FakeTransform(10.0, 0.0, 0.0, yaw=90.0)),
+        FakeActor(3, 'vehicle.tesla.model3', FakeTransform(0.0, 3.0, 4.0)),
+        FakeActor(5, 'walker.pedestrian.0001', FakeTransform(-2.0, 0.0, 0.0)),
+        CountingLight(9, 'traffic.traffic_light', FakeTransform(30.0, 0.0, 0.0)),
+    ])
+
+
+class TestWorldState(unittest.TestCase):
+    def test_update_once_per_frame(self):
+        world = make_world()
+        state = WorldState(world)
+        self.assertTrue(state.update())
+        self.assertFalse(state.update())
+        self.assertEqual(state.ids.tolist(), [3, 5, 7, 9])
+        self.assertEqual(state.rotations[2].tolist(), [0.0, 90.0, 0.0])
+        self.assertEqual(state.extents[0].tolist(), [2.0, 1.0, 0.75])
+
+        world.frame = 1
+        world.actors[7].transform = carla.Transform(carla.Location(12.0, 0.0, 0.0))
+        self.assertTrue(state.update())
+        self.assertEqual(state.locations[state.row(7)].tolist(), [12.0, 0.0, 0.0])
+        # The actor handles were only requested when the actors appeared
+        self.assertEqual(world.actor_requests, 4)
+
+    def test_spawned_and_destroyed_actors(self):
+        world = make_world()
+        state = WorldState(world)
+        state.update()
+        vehicles = state.filter('*vehicle*')
+
+        world.frame = 1
+        del world.actors[3]
+        world.actors[11] = FakeActor(11, 'vehicle.mini.cooper')
+        state.update()
+        self.assertEqual(state.filter('*vehicle*').ids.tolist(), [7, 11])
+        self.assertEqual(state.row(3), -1)
+        self.assertEqual(world.actor_requests, 5)
+        # Sets of a previous frame keep their own rows
+        self.assertEqual([actor.id for actor in vehicles], [3, 7])
+
+    def test_filter_and_distances(self):
+        state = WorldState(make_world())
+        state.update()
+        vehicles = state.filter('*vehicle*')
+        self.assertEqual(len(vehicles), 2)
+        self.assertEqual(vehicles[1].id, 7)
+        self.assertEqual(vehicles.distances(carla.Location()).tolist(), [5.0, 10.0])
+        near = vehicles.subset(vehicles.distances(carla.Location()) < 6)
+        self.assertEqual([actor.id for actor in near], [3])
+        transform = near.transform(0)
+        self.assertEqual((transform.location.y, transform.location.z), (3.0, 4.0))
+        self.assertEqual(near.bounding_box(0).extent.x, 2.0)
+        self.assertEqual(len(state.filter('*walker.pedestrian*')), 1)
+
+    def test_traffic_light_state_once_per_frame(self):
+        world = make_world()
+        state = WorldState(world)
+        state.update()
+        light = state.filter('*traffic_light*')[0]
+        for _ in range(3):
+            self.assertEqual(state.traffic_light_state(light), 'Red')
+        self.assertEqual(light.state_requests, 1)
+        world.frame = 1
+        state.update()
+        state.traffic_light_state(light)
+        self.assertEqual(light.state_requests, 2)
+
+    def test_within_matches_brute_force(self):
+        world = make_crowd(2000, 0)
+        state = WorldState(world, cell_size=7.0)
+        state.update()
+        vehicles = state.filter('*vehicle*')
+        rng = random.Random(1)
+        for _ in range(50):
+            center = carla.Location(rng.uniform(-300, 300), rng.uniform(-300, 300), 0.0)
+            radius = rng.choice([10, 45])
+            expected = [actor.id for actor in vehicles
+                        if actor.get_transform().location.distance(center) < radius]
+            self.assertEqual([actor.id for actor in vehicles.within(center, radius, strict=True)], expected)
+
+    def test_within_sector(self):
+        state = WorldState(make_crowd(1000, 2))
+        state.update()
+        actors = state.filter('*')
+        center, forward = carla.Location(10.0, -20.0, 0.0), carla.Vector3D(0.6, 0.8, 0.0)
+        expected = []
+        for actor in actors:
+            location = actor.get_transform().location
+            dx, dy = location.x - center.x, location.y - center.y
+            norm = math.hypot(dx, dy)
+            if norm > 80:
+                continue
+            angle = math.degrees(math.acos(max(-1.0, min(1.0, (dx * forward.x + dy * forward.y) / norm))))
+            if 0 < angle < 60:
+                expected.append(actor.id)
+        found = [actor.id for actor in actors.within_sector(center, 80, forward, [0, 60])]
+        self.assertEqual(found, expected)
+        self.assertGreater(len(found), 0)
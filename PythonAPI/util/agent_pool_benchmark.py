@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Scaling of an AgentPool over a synthetic world, against the usual loop that calls
+vehicle.apply_control after the run_step of every agent. The round trip of every
+call to the server is simulated with a sleep. Needs the carla module, but not a server.
+
+The synthetic agents do the obstacle detection of BasicAgent: the vehicles of the
+shared WorldState within reach, whose boxes are tested against the lane ahead.
+
+    python agent_pool_benchmark.py --agents 50 200 500 --threads 4 --latency 0.2
+"""
+
+import argparse
+import glob
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    sys.path.append(glob.glob('../carla/dist/carla-*%d.%d-%s.egg' % (
+        sys.version_info.major,
+        sys.version_info.minor,
+        'win-amd64' if os.name == 'nt' else 'linux-x86_64'))[0])
+except IndexError:
+    pass
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+import carla
+import numpy as np
+
+from agents.navigation.agent_pool import AgentPool
+from agents.tools.corridor import box_vertices, boxes_intersect_corridor
+
+
+class SyntheticVehicle(object):
+    """Stand-in for a carla.Vehicle, whose apply_control waits for a simulated round trip"""
+
+    def __init__(self, actor_id, location, yaw, latency):
+        self.id = actor_id
+        self.type_id = 'vehicle.synthetic'
+        self.bounding_box = carla.BoundingBox(carla.Location(), carla.Vector3D(2.3, 1.0, 0.8))
+        self.transform = carla.Transform(location, carla.Rotation(yaw=yaw))
+        self.velocity = carla.Vector3D(0.0, 0.0, 0.0)
+        self.latency = latency
+
+    def get_transform(self):
+        return self.transform
+
+    def get_velocity(self):
+        return self.velocity
+
+    def get_location(self):
+        return self.transform.location
+
+    def apply_control(self, control):
+        time.sleep(self.latency)
+
+
+class SyntheticSnapshot(list):
+    def __init__(self, frame, actors):
+        super(SyntheticSnapshot, self).__init__(actors)
+        self.frame = frame
+        self.timestamp = frame * 0.05
+
+
+class SyntheticWorld(object):
+    """Stand-in for a carla.World with the vehicles on parallel lanes"""
+
+    def __init__(self, count, density, latency, rng):
+        side = math.sqrt(count / density) * 1000.0
+        self.vehicles = [
+            SyntheticVehicle(i, carla.Location(x=rng.uniform(0, side), y=3.5 * rng.randint(0, side / 3.5)),
+                             rng.choice([0.0, 180.0]), latency)
+            for i in range(count)]
+        self.frame = 0
+
+    def get_snapshot(self):
+        return SyntheticSnapshot(self.frame, self.vehicles)
+
+    def get_actors(self, actor_ids):
+        return [self.vehicles[actor_id] for actor_id in actor_ids]
+
+
+class SyntheticResponse(object):
+    error = ''
+
+
+class SyntheticClient(object):
+    """Stand-in for a carla.Client, with a single round trip per batch"""
+
+    def __init__(self, world, latency):
+        self.world = world
+        self.latency = latency
+
+    def apply_batch_sync(self, commands, do_tick=False):
+        time.sleep(self.latency)
+        if do_tick:
+            self.world.frame += 1
+        return [SyntheticResponse() for _ in commands]
+
+
+class SyntheticAgent(object):
+    """Obstacle detection of BasicAgent over the shared WorldState"""
+
+    def __init__(self, vehicle, world):
+        self._vehicle = vehicle
+        self._world = world
+        self._world_state = None
+
+    def set_world_state(self, world_state):
+        self._world_state = world_state
+
+    def run_step(self):
+        self._world_state.update()
+        transform = self._vehicle.get_transform()
+        location = transform.location
+        heading = math.radians(transform.rotation.yaw)
+        forward = np.array([math.cos(heading), math.sin(heading)])
+        centers = np.array([location.x, location.y]) + np.arange(0.0, 30.0, 2.0)[:, np.newaxis] * forward
+        right = np.array([-forward[1], forward[0]])
+        nearby = self._world_state.filter('*vehicle*').within(location, 30.0, strict=True)
+        rows = nearby.rows[nearby.ids != self._vehicle.id]
+        hazard = False
+        if len(rows):
+            state = self._world_state
+            vertices = box_vertices(state.locations[rows], state.rotations[rows], state.extents[rows])
+            hazard = bool(np.any(boxes_intersect_corridor(vertices, centers + 1.75 * right, centers - 1.75 * right)))
+        return carla.VehicleControl(throttle=0.0 if hazard else 0.7, brake=1.0 if hazard else 0.0)
+
+
+def loop_tick(world, agents):
+    """The usual loop, one call to the server per vehicle"""
+    for agent in agents:
+        agent._vehicle.apply_control(agent.run_step())
+    world.frame += 1
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--agents', default=[50, 200, 500], type=int, nargs='+',
+        help='numbers of agents to test (default: 50 200 500)')
+    argparser.add_argument(
+        '--ticks', default=10, type=int,
+        help='ticks per test (default: 10)')
+    argparser.add_argument(
+        '--threads', default=4, type=int,
+        help='worker threads of the threaded pool (default: 4)')
+    argparser.add_argument(
+        '--latency', default=0.2, type=float,
+        help='simulated round trip of a call to the server, in milliseconds (default: 0.2)')
+    argparser.add_argument(
+        '--density', default=2000.0, type=float,
+        help='vehicles per square kilometer (default: 2000)')
+    argparser.add_argument(
+        '--seed', default=0, type=int,
+        help='random seed (default: 0)')
+    args = argparser.parse_args()
+
+    latency = args.latency / 1000.0
+    rng = np.random.RandomState(args.seed)
+    for count in args.agents:
+        world = SyntheticWorld(count, args.density, latency, rng)
+        client = SyntheticClient(world, latency)
+        line = "{:5d} agents:".format(count)
+
+        pool = AgentPool(client, world)
+        agents = [SyntheticAgent(vehicle, world) for vehicle in world.vehicles]
+        for agent in agents:
+            agent.set_world_state(pool.world_state)
+        start = time.time()
+        for _ in range(args.ticks):
+            loop_tick(world, agents)
+        line += "  loop {:8.2f} ms".format((time.time() - start) * 1000 / args.ticks)
+
+        for name, executor in (('pool', None), ('threads', ThreadPoolExecutor(args.threads))):
+            pool = AgentPool(client, world, executor=executor)
+            for vehicle in world.vehicles:
+                pool.add(SyntheticAgent(vehicle, world))
+            for _ in range(args.ticks):
+                pool.tick(do_tick=True)
+            stats = pool.stats()
+            line += "  {} {:8.2f} ms (snapshot {:.2f}, decide {:.2f}, apply {:.2f}, agent max {:.3f})".format(
+                name, sum(stats['mean'].values()) * 1000, stats['mean']['snapshot'] * 1000,
+                stats['mean']['decide'] * 1000, stats['mean']['apply'] * 1000, stats['agent_max'] * 1000)
+            if executor is not None:
+                executor.shutdown()
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Timing of one control step for many vehicles: a VehiclePIDController per vehicle
+against a single BatchVehicleController, over synthetic vehicles and waypoints.
+Needs the carla module, but not a server.
+
+    python batch_controller_benchmark.py --vehicles 100 300 1000 --steps 50
+"""
+
+import argparse
+import glob
+import math
+import os
+import sys
+import time
+
+try:
+    sys.path.append(glob.glob('../carla/dist/carla-*%d.%d-%s.egg' % (
+        sys.version_info.major,
+        sys.version_info.minor,
+        'win-amd64' if os.name == 'nt' else 'linux-x86_64'))[0])
+except IndexError:
+    pass
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+import carla
+import numpy as np
+
+from agents.navigation.controller import BatchVehicleController, VehiclePIDController
+
+
+class SyntheticVehicle(object):
+    """Stand-in for a carla.Vehicle, with a transform and a velocity"""
+
+    def __init__(self, actor_id, rng):
+        self.id = actor_id
+        self.transform = carla.Transform(
+            carla.Location(x=rng.uniform(-500, 500), y=rng.uniform(-500, 500)),
+            carla.Rotation(yaw=rng.uniform(-180, 180)))
+        self.velocity = carla.Vector3D(rng.uniform(-10, 10), rng.uniform(-10, 10), 0.0)
+
+    def get_world(self):
+        return None
+
+    def get_control(self):
+        return carla.VehicleControl()
+
+    def get_transform(self):
+        return self.transform
+
+    def get_velocity(self):
+        return self.velocity
+
+
+class SyntheticWaypoint(object):
+    """Stand-in for a carla.Waypoint a few meters ahead of a vehicle"""
+
+    def __init__(self, vehicle, rng):
+        yaw = vehicle.transform.rotation.yaw + rng.uniform(-30, 30)
+        location = vehicle.transform.location + carla.Location(x=5.0 * math.cos(math.radians(yaw)),
+                                                               y=5.0 * math.sin(math.radians(yaw)))
+        self.transform = carla.Transform(location, carla.Rotation(yaw=yaw))
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--vehicles', default=[100, 300, 1000], type=int, nargs='+',
+        help='numbers of vehicles to test (default: 100 300 1000)')
+    argparser.add_argument(
+        '--steps', default=50, type=int,
+        help='control steps per test (default: 50)')
+    argparser.add_argument(
+        '--offset', default=0.0, type=float,
+        help='lateral offset of the vehicles (default: 0)')
+    argparser.add_argument(
+        '--seed', default=0, type=int,
+        help='random seed (default: 0)')
+    args = argparser.parse_args()
+
+    args_lateral = {'K_P': 1.95, 'K_I': 0.05, 'K_D': 0.2, 'dt': 0.05}
+    args_longitudinal = {'K_P': 1.0, 'K_I': 0.05, 'K_D': 0.0, 'dt': 0.05}
+    rng = np.random.RandomState(args.seed)
+    for count in args.vehicles:
+        vehicles = [SyntheticVehicle(i, rng) for i in range(count)]
+        waypoints = [SyntheticWaypoint(vehicle, rng) for vehicle in vehicles]
+        target_speeds = rng.uniform(20, 60, count)
+
+        scalar = [VehiclePIDController(vehicle, args_lateral, args_longitudinal, offset=args.offset)
+                  for vehicle in vehicles]
+        start = time.time()
+        for _ in range(args.steps):
+            expected = [controller.run_step(speed, waypoint)
+                        for controller, speed, waypoint in zip(scalar, target_speeds, waypoints)]
+        scalar_time = (time.time() - start) / args.steps
+
+        batch = BatchVehicleController(vehicles, args_lateral, args_longitudinal, offset=args.offset)
+        start = time.time()
+        for _ in range(args.steps):
+            controls = batch.run_step(target_speeds, waypoints)
+        batch_time = (time.time() - start) / args.steps
+
+        start = time.time()
+        speeds, locations, forwards = batch._vehicle_arrays()
+        targets = np.array([(w.transform.location.x, w.transform.location.y) for w in waypoints])
+        rights = np.array([(w.transform.get_right_vector().x, w.transform.get_right_vector().y) for w in waypoints])
+        read_time = time.time() - start
+        start = time.time()
+        for _ in range(args.steps):
+            batch.compute(target_speeds, speeds, locations, forwards, targets, rights)
+        compute_time = (time.time() - start) / args.steps
+
+        error = max(max(abs(a.throttle - b.throttle), abs(a.brake - b.brake), abs(a.steer - b.steer))
+                    for a, b in zip(controls, expected))
+        print("{:5d} vehicles: scalar {:8.2f} ms  batch {:8.2f} ms  (arrays {:6.2f} ms + compute {:6.2f} ms)"
+              "  max difference {:.1e}".format(count, scalar_time * 1000, batch_time * 1000, read_time * 1000,
+                                               compute_time * 1000, error))
+
+
+if __name__ == '__main__':
+    main()
@@ -15,9 +15,9 @@ corresponding actor.
 This is done in a predefined route in Town03 with a high speed and several agressive 
 turns.
 
-In a nutshell, the script have a queue that is filled in each frame with a lidar point 
+In a nutshell, the script have a synchronizer that is filled in each frame with a lidar point 
 cloud and an structure for storing the Bounding Boxes. This last one is emulated as a 
-sensor filling the queue in the on_tick callback of the carla.world. In this way, we make
+sensor filling the synchronizer in the on_tick callback of the carla.world. In this way, we make
 sure that we are correctly syncronizing the lidar point cloud and BB/actor transformations.
 Then, we select the points corresponding to each actor (car) in the scene and check they
 are inside the bounding boxes of that actor, all in each vehicle frame of reference.
@@ -50,7 +50,6 @@ import glob
 import os
 import sys
 import numpy as np
-from queue import Queue
 from queue import Empty
 
 try:
@@ -63,8 +62,12 @@ try:
 except IndexError:
     pass
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
 import carla
 
+from agents.tools.sensor_sync import SensorSynchronizer
+
 
 class ActorTrace(object):
     """Class that store and process information about an actor at certain moment."""
@@ -184,16 +187,16 @@ def wait(world, frames=100, queue = None, slist = None):
 # Sensor callback.
 # This is where you receive the sensor data and 
 # process it as you liked and the important part is that,
-# at the end, it should include an element into the sensor queue.
-def lidar_callback(sensor_data, sensor_queue, sensor_name):
+# at the end, it should push an element into the synchronizer.
+def lidar_callback(sensor_data, synchronizer, sensor_name):
     sensor_pc_local = np.frombuffer(sensor_data.raw_data, dtype=np.dtype([
         ('x', np.float32), ('y', np.float32), ('z', np.float32),
         ('CosAngle', np.float32), ('ObjIdx', np.uint32), ('ObjTag', np.uint32)]))
     sensor_transf = sensor_data.transform
-    sensor_queue.put((sensor_data.frame, sensor_name, sensor_pc_local, sensor_transf))
+    synchronizer.push(sensor_name, (sensor_data.frame, sensor_name, sensor_pc_local, sensor_transf), sensor_data.frame)
 
 # 定义一个回调函数，用于处理车辆的边界框（bounding box）数据
-def bb_callback(snapshot, world, sensor_queue, sensor_name):
+def bb_callback(snapshot, world, synchronizer, sensor_name):
     data_array = []
 
   # 获取所有车辆
@@ -202,8 +205,8 @@ def bb_callback(snapshot, world, sensor_queue, sensor_name):
       # 将车辆的id、类型、变换和边界框信息添加到数组中
         data_array.append((actor.id, actor.type_id, actor.get_transform(), actor.bounding_box))
 
-  # 将数据放入传感器队列中
-    sensor_queue.put((snapshot.frame, sensor_name, data_array))
+  # 将数据放入同步器中这一帧的槽位
+    synchronizer.push(sensor_name, (snapshot.frame, sensor_name, data_array), snapshot.frame)
 
 # 定义一个函数，用于移动观察者的位置
 def move_spectator(world, actor):
@@ -216,39 +219,21 @@ def move_spectator(world, actor):
     spectator.set_transform(spectator_transform)
 
 # 定义一个回调函数，用于处理世界信息和边界框数据
-def world_callback(snapshot, world, sensor_queue, sensor_name, actor):
+def world_callback(snapshot, world, synchronizer, sensor_name, actor):
   # 移动观察者的位置
     move_spectator(world, actor)
-    bb_callback(snapshot, world, sensor_queue, sensor_name)
+    bb_callback(snapshot, world, synchronizer, sensor_name)
 
 # 定义一个函数，用于处理传感器数据
-def process_sensors(w_frame, sensor_queue, sensor_number):
-    if sensor_number != 2:
-        print("Error!!! Sensor number should be two")
-
-    sl_data = None
-    bb_data = None
-
+def process_sensors(w_frame, synchronizer):
+    # The synchronizer only returns the data of the world frame, the data of
+    # previous steps is kept in their own slots
     try:
-        for i in range (0, sensor_number):
-            s_frame = sensor_queue.get(True, 1.0)
-            while s_frame[0] != w_frame:
-                print("Warning! Missmatch for sensor %s in the frame timestamp (w: %d, s: %d)" % (s_frame[1], w_frame, s_frame[0]))
-                print("This could be due to accumulated data for previous steps")
-                s_frame = sensor_queue.get(True, 1.0)
-
-            if s_frame[1] == "semlidar":
-                sl_data = s_frame
-            elif s_frame[1] == "bb":
-                bb_data = s_frame
-            #print("    Frame: %d   Sensor: %s Len: %d " % (s_frame[0], s_frame[1], len(s_frame[2])))
+        sl_data, bb_data = synchronizer.get(w_frame, timeout=1.0)
     except Empty:
         print("Error!!! The needeinformation is not here!!!")
         return
 
-    if sl_data == None or bb_data == None:
-        print("Error!!! Missmatch for sensor %s in the frame timestamp (w: %d, s: %d)" % (s_frame[1], w_frame, s_frame[0]))
-
   # 处理边界框数据和激光雷达数据
     for actor_data in bb_data[2]:
         trace_vehicle = ActorTrace(actor_data, sl_data)
@@ -342,10 +327,10 @@ def main():
         traffic_manager = client.get_trafficmanager(8000)
         traffic_manager.set_synchronous_mode(True)
 
-        # We create the sensor queue in which we keep track of the information
-        # already received. This structure is thread safe and can be
+        # We create the synchronizer in which we keep track of the information
+        # already received, by frame. This structure is thread safe and can be
         # accessed by all the sensors callback concurrently without problem.
-        sensor_queue = Queue()
+        synchronizer = SensorSynchronizer(["semlidar", "bb"])
 
         # Spawning ego vehicle
         actor_BP = world.get_blueprint_library().filter("vehicle.lincoln.mkz_2017")[0]
@@ -370,8 +355,8 @@ def main():
         lidar_bp.set_attribute('lower_fov', '-90.0')
         lidar_tr = carla.Transform(carla.Location(z=3), carla.Rotation(yaw=0))
         lidar = world.spawn_actor(lidar_bp, lidar_tr, attach_to=actor)
-        lidar.listen(lambda data: lidar_callback(data, sensor_queue, "semlidar"))
-        world.on_tick(lambda snapshot: world_callback(snapshot, world, sensor_queue, "bb", actor))
+        lidar.listen(lambda data: lidar_callback(data, synchronizer, "semlidar"))
+        world.on_tick(lambda snapshot: world_callback(snapshot, world, synchronizer, "bb", actor))
         sensor_list.append(lidar)
         sensor_list.append(actor) # actor acts as a 'sensor' to simplify bb-lidar data comparison 
         
@@ -382,7 +367,7 @@ def main():
             # Tick the server
             world.tick()
             w_frame = world.get_snapshot().frame
-            process_sensors(w_frame, sensor_queue, len(sensor_list))
+            process_sensors(w_frame, synchronizer)
 
         actor.disable_constant_velocity()
 
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Convert sensor outputs saved as one file per frame into a single sensor recording of
+agents.tools.sensor_recording: the text files of check_raycast_sensors_determinism, and
+folders of .npy, .ply or .png files such as those of the examples. Doesn't need a server.
+
+    python convert_to_recording.py -o run.rec --snapshots _sensors/SpawnRadar_rep_000
+    python convert_to_recording.py -o drive.rec --frames camera=_out/rgb --frames lidar=_out/lidar --codec zlib
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+from agents.tools.sensor_recording import (RECORDING_CODECS, SensorRecordingReader, SensorRecordingWriter,
+                                           convert_frames, convert_snapshots)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument(
+        '-o', '--output', required=True,
+        help='path of the recording')
+    argparser.add_argument(
+        '--snapshots', metavar='PREFIX', action='append', default=[],
+        help='prefix of the files of a run of check_raycast_sensors_determinism, can be repeated')
+    argparser.add_argument(
+        '--frames', metavar='NAME=FOLDER', action='append', default=[],
+        help='sensor name and folder of its frame files, can be repeated')
+    argparser.add_argument(
+        '--codec', default='none', choices=RECORDING_CODECS,
+        help='compression of the chunks (default: none)')
+    argparser.add_argument(
+        '--append', action='store_true',
+        help='add to an existing recording instead of replacing it')
+    args = argparser.parse_args()
+
+    if not args.snapshots and not args.frames:
+        argparser.error('nothing to convert, use --snapshots or --frames')
+
+    with SensorRecordingWriter(args.output, codec=args.codec, append=args.append) as writer:
+        for prefix in args.snapshots:
+            names = convert_snapshots(prefix, writer)
+            print('%s: %s' % (prefix, ', '.join(names)))
+        for item in args.frames:
+            name, _, folder = item.partition('=')
+            print('%s: %d frames of %s' % (folder, convert_frames(folder, name, writer), name))
+
+    with SensorRecordingReader(args.output) as reader:
+        for name in reader.sensors:
+            print('  %-24s %d frames' % (name, len(reader.frames(name))))
+    print('wrote %s, %.1f MB' % (args.output, os.path.getsize(args.output) / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Time the sensor callbacks spend saving camera frames: encoding and writing each PNG in
+the callback, as image.save_to_disk does, against handing it to the DatasetWriter of
+agents.tools.dataset_writer. The frames are synthetic and arrive at a fixed rate, as
+from a camera in a synchronous simulation. Doesn't need a server.
+
+    python dataset_writer_benchmark.py --frames 100 --fps 20 --workers 4
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+import numpy as np
+
+from agents.tools.dataset_writer import WRITER_POLICIES, DatasetWriter, write_file
+from agents.tools.sensor_views import bgra_view
+
+
+class SyntheticImage(object):
+    """Stand-in for a carla.Image, with its raw buffer"""
+
+    def __init__(self, raw_data, width, height, frame):
+        self.raw_data = raw_data
+        self.width = width
+        self.height = height
+        self.frame = frame
+
+
+def run(callback, images, fps):
+    """Delivers the images at the given rate, returning the time spent in each callback"""
+    durations = []
+    start = time.time()
+    for i, image in enumerate(images):
+        delay = start + i / float(fps) - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        begin = time.time()
+        callback(image)
+        durations.append(time.time() - begin)
+    return np.array(durations)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--width', default=1920, type=int,
+        help='camera width (default: 1920)')
+    argparser.add_argument(
+        '--height', default=1080, type=int,
+        help='camera height (default: 1080)')
+    argparser.add_argument(
+        '--frames', default=100, type=int,
+        help='frames saved per test (default: 100)')
+    argparser.add_argument(
+        '--fps', default=20.0, type=float,
+        help='rate of the frames (default: 20)')
+    argparser.add_argument(
+        '--workers', default=4, type=int,
+        help='writer processes (default: 4)')
+    argparser.add_argument(
+        '--policy', default='block', choices=WRITER_POLICIES,
+        help='policy of the writer when its queue is full (default: block)')
+    args = argparser.parse_args()
+
+    rng = np.random.RandomState(0)
+    # Smooth images, which compress like camera frames, unlike uniform noise
+    rows = np.linspace(0, 255, args.height, dtype=np.uint8)[:, None, None]
+    base = np.broadcast_to(rows, (args.height, args.width, 4)).copy()
+    images = []
+    for frame in range(args.frames):
+        noise = rng.randint(0, 8, (args.height, args.width, 4)).astype(np.uint8)
+        images.append(SyntheticImage((base + noise).tobytes(), args.width, args.height, frame))
+
+    folder = tempfile.mkdtemp()
+    try:
+        start = time.time()
+        inline = run(lambda image: write_file(
+            os.path.join(folder, 'inline', '%08d.png' % image.frame), 'png', bgra_view(image), {'bgra': True}),
+            images, args.fps)
+        inline_total = time.time() - start
+
+        writer = DatasetWriter(workers=args.workers, policy=args.policy)
+        # Starts the worker processes before timing
+        writer.write(os.path.join(folder, 'warmup.npy'), np.zeros(1))
+        writer.flush()
+        start = time.time()
+        queued = run(lambda image: writer.write_image(
+            os.path.join(folder, 'writer', '%08d.png' % image.frame), image), images, args.fps)
+        writer.close()
+        queued_total = time.time() - start
+        stats = writer.stats()
+    finally:
+        shutil.rmtree(folder)
+
+    print("{} frames of {}x{} at {} fps, callback time in milliseconds".format(
+        args.frames, args.width, args.height, args.fps))
+    for name, durations, total in (('in the callback', inline, inline_total), ('writer', queued, queued_total)):
+        print("{:16s} mean {:8.3f}  max {:8.3f}  total {:6.2f} s".format(
+            name, durations.mean() * 1e3, durations.max() * 1e3, total))
+    print("writer: {written} written, {dropped} dropped, {failed} failed, {files_per_second:.1f} files/s, "
+          "{megabytes:.1f} MB/s".format(megabytes=stats['bytes_per_second'] / 1e6, **stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Per frame cost of projecting a lidar point cloud onto a camera image and coloring it by
+intensity: the pipeline lidar_to_camera.py used to run, against the Projector of
+agents.tools.lidar_projection. The point cloud is synthetic, spread around the sensor
+like a spinning lidar. Doesn't need a server.
+
+    python lidar_projection_benchmark.py --points 1200000 --width 1920 --height 1080
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+import numpy as np
+
+from agents.tools.lidar_projection import Projector, build_intrinsics, build_lut
+from agents.tools.sensor_views import LIDAR_DTYPE, xyz_view
+
+# A few colors of viridis, enough for timing
+VIRIDIS = np.array([
+    [0.267, 0.005, 0.329], [0.229, 0.322, 0.546], [0.128, 0.567, 0.551],
+    [0.369, 0.789, 0.383], [0.993, 0.906, 0.144]])
+VID_RANGE = np.linspace(0.0, 1.0, VIRIDIS.shape[0])
+
+
+def example_projection(im_array, p_cloud, lidar_2_world, world_2_camera, K, image_w, image_h):
+    """How lidar_to_camera.py drew the points as single pixels, with int for np.int"""
+    intensity = np.array(p_cloud['intensity'])
+    local_lidar_points = xyz_view(p_cloud).T
+    local_lidar_points = np.r_[local_lidar_points, [np.ones(local_lidar_points.shape[1])]]
+    world_points = np.dot(lidar_2_world, local_lidar_points)
+    sensor_points = np.dot(world_2_camera, world_points)
+    point_in_camera_coords = np.array([sensor_points[1], sensor_points[2] * -1, sensor_points[0]])
+    points_2d = np.dot(K, point_in_camera_coords)
+    points_2d = np.array([
+        points_2d[0, :] / points_2d[2, :],
+        points_2d[1, :] / points_2d[2, :],
+        points_2d[2, :]])
+    points_2d = points_2d.T
+    points_in_canvas_mask = \
+        (points_2d[:, 0] > 0.0) & (points_2d[:, 0] < image_w) & \
+        (points_2d[:, 1] > 0.0) & (points_2d[:, 1] < image_h) & \
+        (points_2d[:, 2] > 0.0)
+    points_2d = points_2d[points_in_canvas_mask]
+    intensity = intensity[points_in_canvas_mask]
+    u_coord = points_2d[:, 0].astype(int)
+    v_coord = points_2d[:, 1].astype(int)
+    intensity = 4 * intensity - 3
+    color_map = np.array([
+        np.interp(intensity, VID_RANGE, VIRIDIS[:, 0]) * 255.0,
+        np.interp(intensity, VID_RANGE, VIRIDIS[:, 1]) * 255.0,
+        np.interp(intensity, VID_RANGE, VIRIDIS[:, 2]) * 255.0]).astype(int).T
+    im_array[v_coord, u_coord] = color_map
+
+
+def per_frame(function, repetitions):
+    function()
+    start = time.time()
+    for _ in range(repetitions):
+        function()
+    return (time.time() - start) / repetitions
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--points', default=1200000, type=int,
+        help='points per frame (default: 1200000)')
+    argparser.add_argument(
+        '--width', default=1920, type=int,
+        help='camera width (default: 1920)')
+    argparser.add_argument(
+        '--height', default=1080, type=int,
+        help='camera height (default: 1080)')
+    argparser.add_argument(
+        '--fov', default=90.0, type=float,
+        help='camera horizontal field of view (default: 90)')
+    argparser.add_argument(
+        '--fps', default=20.0, type=float,
+        help='frame rate the projection has to keep up with (default: 20)')
+    argparser.add_argument(
+        '--repetitions', default=10, type=int,
+        help='frames projected per test (default: 10)')
+    args = argparser.parse_args()
+
+    rng = np.random.RandomState(0)
+    azimuth = rng.uniform(-np.pi, np.pi, args.points)
+    elevation = rng.uniform(np.radians(-25.0), np.radians(15.0), args.points)
+    distance = rng.uniform(2.0, 100.0, args.points)
+    p_cloud = np.zeros(args.points, dtype=LIDAR_DTYPE)
+    p_cloud['x'] = distance * np.cos(elevation) * np.cos(azimuth)
+    p_cloud['y'] = distance * np.cos(elevation) * np.sin(azimuth)
+    p_cloud['z'] = distance * np.sin(elevation)
+    p_cloud['intensity'] = rng.uniform(0.7, 1.0, args.points)
+
+    # Sensors on the roof of a car driving somewhere in the map
+    lidar_2_world = np.identity(4)
+    lidar_2_world[:3, 3] = (120.0, -40.0, 1.8)
+    camera_2_world = np.identity(4)
+    camera_2_world[:3, 3] = (120.6, -40.0, 1.6)
+    world_2_camera = np.linalg.inv(camera_2_world)
+    K = build_intrinsics(args.width, args.height, args.fov)
+    projector = Projector(args.width, args.height, args.fov, np.dot(world_2_camera, lidar_2_world))
+    lut = build_lut(VIRIDIS)
+    image = np.zeros((args.height, args.width, 3), dtype=np.uint8)
+    xyz = xyz_view(p_cloud)
+
+    cases = [
+        ('example', lambda: example_projection(
+            image, p_cloud, lidar_2_world, world_2_camera, K, args.width, args.height)),
+        ('projector', lambda: projector.draw_values(image, xyz, p_cloud['intensity'], lut, 0.75, 1.0)),
+        ('projector 2x2 dots', lambda: projector.draw_values(
+            image, xyz, p_cloud['intensity'], lut, 0.75, 1.0, extent=1)),
+    ]
+    visible = len(projector.visible(xyz)[3])
+    print("{} points, {} in the {}x{} image, frame period {:.1f} ms".format(
+        args.points, visible, args.width, args.height, 1e3 / args.fps))
+    for name, function in cases:
+        print("{:20s} {:8.2f} ms".format(name, per_frame(function, args.repetitions) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Per target cost of the geometry helpers of agents.tools.misc: the scalar functions
+called in a loop over carla objects, against their array variants called once for
+all the targets. Needs the carla module, but not a server.
+
+    python misc_benchmark.py --targets 10 100 1000 10000
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+try:
+    sys.path.append(glob.glob('../carla/dist/carla-*%d.%d-%s.egg' % (
+        sys.version_info.major,
+        sys.version_info.minor,
+        'win-amd64' if os.name == 'nt' else 'linux-x86_64'))[0])
+except IndexError:
+    pass
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+import carla
+import numpy as np
+
+from agents.tools import misc
+
+
+class SyntheticVehicle(object):
+    """Stand-in for a carla.Vehicle with a velocity"""
+
+    def __init__(self, velocity):
+        self.velocity = carla.Vector3D(*velocity)
+
+    def get_velocity(self):
+        return self.velocity
+
+
+def cases(points, velocities, reference, yaw):
+    """(name, scalar loop, array call) of every helper"""
+    locations = [carla.Location(*p) for p in points.tolist()]
+    transforms = [carla.Transform(location) for location in locations]
+    vehicles = [SyntheticVehicle(v) for v in velocities.tolist()]
+    reference_transform = carla.Transform(carla.Location(*reference), carla.Rotation(yaw=yaw))
+    reference_location = reference_transform.location
+    forward = reference_transform.get_forward_vector()
+    forward = (forward.x, forward.y)
+    return [
+        ('is_within_distance',
+         lambda: [misc.is_within_distance(t, reference_transform, 30.0, [0, 90]) for t in transforms],
+         lambda: misc.is_within_distance_array(points, reference, forward, 30.0, [0, 90])),
+        ('compute_magnitude_angle',
+         lambda: [misc.compute_magnitude_angle(l, reference_location, yaw) for l in locations],
+         lambda: misc.compute_magnitude_angle_array(points, reference, yaw)),
+        ('compute_distance',
+         lambda: [misc.compute_distance(l, reference_location) for l in locations],
+         lambda: misc.compute_distance_array(points, reference)),
+        ('vector',
+         lambda: [misc.vector(reference_location, l) for l in locations],
+         lambda: misc.vector_array(reference, points)),
+        ('get_speed',
+         lambda: [misc.get_speed(v) for v in vehicles],
+         lambda: misc.get_speed_array(velocities)),
+    ]
+
+
+def per_call(function, repetitions):
+    start = time.time()
+    for _ in range(repetitions):
+        function()
+    return (time.time() - start) / repetitions
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--targets', default=[10, 100, 1000, 10000], type=int, nargs='+',
+        help='numbers of targets to test (default: 10 100 1000 10000)')
+    argparser.add_argument(
+        '--repetitions', default=20, type=int,
+        help='calls timed per test (default: 20)')
+    argparser.add_argument(
+        '--seed', default=0, type=int,
+        help='random seed (default: 0)')
+    args = argparser.parse_args()
+
+    rng = np.random.RandomState(args.seed)
+    reference = (1.0, -2.0, 0.5)
+    print("per target cost, in microseconds")
+    for count in args.targets:
+        points = rng.uniform(-50, 50, (count, 3)).astype(np.float32).astype(np.float64)
+        velocities = rng.uniform(-20, 20, (count, 3)).astype(np.float32).astype(np.float64)
+        for name, scalar, array in cases(points, velocities, reference, 30.0):
+            scalar_time = per_call(scalar, args.repetitions) / count
+            array_time = per_call(array, args.repetitions) / count
+            print("{:6d} targets  {:24s} scalar {:8.3f}  array {:8.3f}  ({:.1f}x)".format(
+                count, name, scalar_time * 1e6, array_time * 1e6, scalar_time / array_time))
+
+
+if __name__ == '__main__':
+    main()
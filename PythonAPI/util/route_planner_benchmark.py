@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Benchmark of the path search engines of the GlobalRoutePlanner.
+
+By default it runs over a synthetic road grid, so no server is needed. Use --town
+to benchmark the graph of a CARLA map instead (requires a running server), which
+also compares the map and index localization of the planner.
+
+    python route_planner_benchmark.py --grid 40 --queries 500
+    python route_planner_benchmark.py --town Town10HD_Opt --resolution 2.0
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+try:
+    sys.path.append(glob.glob('../carla/dist/carla-*%d.%d-%s.egg' % (
+        sys.version_info.major,
+        sys.version_info.minor,
+        'win-amd64' if os.name == 'nt' else 'linux-x86_64'))[0])
+except IndexError:
+    pass
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+import networkx as nx
+import numpy as np
+
+from agents.navigation.route_graph import CSRGraph, ContractionHierarchy
+
+
+def synthetic_road_graph(size, seed=0):
+    """
+    Road-like grid: every block side is a two-way road made of one edge per direction,
+    with a few missing roads and zero cost lane change edges between parallel lanes.
+    """
+    rng = random.Random(seed)
+    block = 100.0
+    graph = nx.DiGraph()
+
+    def node(i, j):
+        return i * size + j
+
+    for i in range(size):
+        for j in range(size):
+            graph.add_node(node(i, j), vertex=(i * block, j * block, 0.0))
+
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0)):
+                a, b = i + di, j + dj
+                if a >= size or b >= size or rng.random() < 0.1:
+                    continue
+                length = int(block * rng.uniform(1.0, 1.3))
+                graph.add_edge(node(i, j), node(a, b), length=length, type=4)
+                graph.add_edge(node(a, b), node(i, j), length=length, type=4)
+
+    # Lane change links, as added by GlobalRoutePlanner._lane_change_link
+    for n1 in list(graph.nodes):
+        if rng.random() < 0.05:
+            neighbors = list(graph.successors(n1))
+            if len(neighbors) >= 2:
+                graph.add_edge(n1, neighbors[0], length=0, type=rng.choice((5, 6)))
+    return graph
+
+
+def map_planner(args):
+    """GlobalRoutePlanner of a CARLA map"""
+    import carla
+    from agents.navigation.global_route_planner import GlobalRoutePlanner
+
+    client = carla.Client(args.host, args.port)
+    client.set_timeout(60.0)
+    world = client.get_world()
+    if args.town and not world.get_map().name.endswith(args.town):
+        world = client.load_world(args.town)
+    start = time.time()
+    planner = GlobalRoutePlanner(
+        world.get_map(), args.resolution, cache_dir=args.cache_dir, localization='index')
+    print("GlobalRoutePlanner built in {:.2f} s".format(time.time() - start))
+    return planner
+
+
+def percentiles(latencies):
+    """Formats the latency percentiles in milliseconds"""
+    p50, p90, p99 = np.percentile(np.array(latencies) * 1000.0, [50, 90, 99])
+    return "p50 {:8.3f} ms   p90 {:8.3f} ms   p99 {:8.3f} ms".format(p50, p90, p99)
+
+
+def benchmark_localization(planner, queries, seed):
+    """Compares the map queries of carla.Map.get_waypoint with the localization index"""
+    import carla
+
+    start = time.time()
+    index = planner.get_localization_index()
+    print("Localization index:     {:8.3f} s ({} lanes, {} points)".format(
+        time.time() - start, len(index), len(index.points)))
+
+    # Locations around the lanes, as the positions of vehicles would be
+    rng = np.random.RandomState(seed)
+    points = index.points[rng.randint(0, len(index.points), queries)]
+    points = points + rng.normal(0.0, 1.0, points.shape) * np.array([1.0, 1.0, 0.1])
+    locations = [carla.Location(x=float(x), y=float(y), z=float(z)) for x, y, z in points]
+
+    latencies = {'get_waypoint': [], 'index': []}
+    agreement = 0
+    for location in locations:
+        start = time.time()
+        waypoint = planner._wmap.get_waypoint(location)
+        latencies['get_waypoint'].append(time.time() - start)
+
+        start = time.time()
+        edges, _, _ = index.query([[location.x, location.y, location.z]])
+        latencies['index'].append(time.time() - start)
+
+        agreement += index.lane_keys[edges[0]] == (waypoint.road_id, waypoint.section_id, waypoint.lane_id)
+
+    start = time.time()
+    index.query(points)
+    batch = time.time() - start
+
+    for name, values in latencies.items():
+        print("{:12s} {}".format(name, percentiles(values)))
+    print("Batched index query: {:.3f} ms for {} locations".format(batch * 1000.0, len(points)))
+    print("Same lane as get_waypoint: {}/{}".format(agreement, len(locations)))
+
+
+def benchmark_search(graph, queries, seed):
+    """Compares networkx A*, CSR A* and contraction hierarchy queries"""
+    def heuristic(n1, n2):
+        l1 = np.array(graph.nodes[n1]['vertex'])
+        l2 = np.array(graph.nodes[n2]['vertex'])
+        return np.linalg.norm(l1 - l2)
+
+    print("Graph: {} nodes, {} edges".format(graph.number_of_nodes(), graph.number_of_edges()))
+
+    start = time.time()
+    csr_graph = CSRGraph.from_networkx(graph)
+    print("CSR compilation:        {:8.3f} s".format(time.time() - start))
+
+    start = time.time()
+    hierarchy = ContractionHierarchy.build(csr_graph)
+    print("Hierarchy preprocessing: {:8.3f} s ({} shortcuts)".format(
+        time.time() - start, hierarchy.num_shortcuts))
+
+    rng = random.Random(seed)
+    nodes = list(graph.nodes)
+    pairs = []
+    while len(pairs) < queries:
+        source, target = rng.choice(nodes), rng.choice(nodes)
+        if nx.has_path(graph, source, target):
+            pairs.append((source, target))
+
+    latencies = {'networkx A*': [], 'CSR A*': [], 'hierarchy': []}
+    identical, equal_cost = 0, 0
+    for source, target in pairs:
+        start = time.time()
+        reference = nx.astar_path(graph, source, target, heuristic=heuristic, weight='length')
+        latencies['networkx A*'].append(time.time() - start)
+
+        start = time.time()
+        csr_graph.astar(source, target)
+        latencies['CSR A*'].append(time.time() - start)
+
+        start = time.time()
+        path = hierarchy.query(source, target)
+        latencies['hierarchy'].append(time.time() - start)
+
+        identical += path == reference
+        equal_cost += abs(nx.path_weight(graph, path, 'length') -
+                          nx.path_weight(graph, reference, 'length')) < 1e-6
+
+    for name, values in latencies.items():
+        print("{:12s} {}".format(name, percentiles(values)))
+    print("Hierarchy paths identical to A*: {}/{}, same length: {}/{}".format(
+        identical, len(pairs), equal_cost, len(pairs)))
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--grid', default=40, type=int,
+        help='size of the synthetic road grid (default: 40)')
+    argparser.add_argument(
+        '--queries', default=500, type=int,
+        help='number of origin/destination queries (default: 500)')
+    argparser.add_argument(
+        '--seed', default=0, type=int,
+        help='random seed (default: 0)')
+    argparser.add_argument(
+        '--town', default=None,
+        help='benchmark the graph of a CARLA map instead of the synthetic grid')
+    argparser.add_argument(
+        '--host', default='127.0.0.1',
+        help='IP of the host server (default: 127.0.0.1)')
+    argparser.add_argument(
+        '-p', '--port', default=2000, type=int,
+        help='TCP port to listen to (default: 2000)')
+    argparser.add_argument(
+        '--resolution', default=2.0, type=float,
+        help='sampling resolution of the route planner (default: 2.0)')
+    argparser.add_argument(
+        '--cache-dir', default=None,
+        help='graph cache folder of the route planner')
+    args = argparser.parse_args()
+
+    if args.town:
+        planner = map_planner(args)
+        benchmark_localization(planner, args.queries, args.seed)
+        graph = planner._graph
+    else:
+        graph = synthetic_road_graph(args.grid, args.seed)
+
+    benchmark_search(graph, args.queries, args.seed)
+
+
+if __name__ == '__main__':
+    main()
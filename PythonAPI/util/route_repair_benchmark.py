@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Benchmark of the incremental re-routing of the GlobalRoutePlanner.
+
+A fleet of vehicles is routed over a synthetic road grid. Roads on the current routes
+are then closed or congested, and the routes are updated both by repairing the
+incremental search of each vehicle and by searching them again from scratch.
+
+    python route_repair_benchmark.py --grid 40 --vehicles 200 --events 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+from agents.navigation.route_graph import CSRGraph, IncrementalSearch
+
+from route_planner_benchmark import synthetic_road_graph
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--grid', default=40, type=int,
+        help='size of the synthetic road grid (default: 40)')
+    argparser.add_argument(
+        '--vehicles', default=200, type=int,
+        help='number of routed vehicles (default: 200)')
+    argparser.add_argument(
+        '--events', default=20, type=int,
+        help='number of closure or congestion events (default: 20)')
+    argparser.add_argument(
+        '--edges-per-event', default=3, type=int,
+        help='edges affected by each event (default: 3)')
+    argparser.add_argument(
+        '--seed', default=0, type=int,
+        help='random seed (default: 0)')
+    args = argparser.parse_args()
+
+    rng = random.Random(args.seed)
+    graph = CSRGraph.from_networkx(synthetic_road_graph(args.grid, args.seed))
+    print("Graph: {} nodes, {} edges".format(graph.num_nodes, graph.num_edges))
+
+    vehicles = []
+    while len(vehicles) < args.vehicles:
+        source, target = rng.randrange(graph.num_nodes), rng.randrange(graph.num_nodes)
+        if graph.shortest_paths_indices(source, [target])[0][0] != float('inf'):
+            vehicles.append((source, target))
+
+    start = time.time()
+    searches = [IncrementalSearch(graph, target) for _, target in vehicles]
+    routes = [search.path_indices(source) for search, (source, _) in zip(searches, vehicles)]
+    print("Initial searches:  {:8.3f} s".format(time.time() - start))
+
+    repair_time, scratch_time, astar_time = 0.0, 0.0, 0.0
+    repair_expansions, scratch_expansions = 0, 0
+    mismatches = 0
+    for _ in range(args.events):
+        # Close or congest edges of a random current route, as an accident on it would
+        route = rng.choice(routes)
+        changed = []
+        for a, b in rng.sample(list(zip(route[:-1], route[1:])), min(args.edges_per_event, len(route) - 1)):
+            e = graph.edge_index(int(graph.node_ids[a]), int(graph.node_ids[b]))
+            graph.lengths[e] = float('inf') if rng.random() < 0.5 else graph.lengths[e] * 5.0
+            changed.append(e)
+        graph.invalidate()
+
+        before = sum(search.expansions for search in searches)
+        start = time.time()
+        distances = []
+        for search, (source, _) in zip(searches, vehicles):
+            search.update_edges(changed)
+            distances.append(search.distance(source))
+        routes = [search.path_indices(source) if distance != float('inf') else routes[i]
+                  for i, (search, (source, _), distance) in enumerate(zip(searches, vehicles, distances))]
+        repair_time += time.time() - start
+        repair_expansions += sum(search.expansions for search in searches) - before
+
+        start = time.time()
+        for (source, target), distance in zip(vehicles, distances):
+            scratch = IncrementalSearch(graph, target)
+            mismatches += abs(scratch.distance(source) - distance) > 1e-6
+            scratch_expansions += scratch.expansions
+        scratch_time += time.time() - start
+
+        start = time.time()
+        for (source, target), distance in zip(vehicles, distances):
+            if distance != float('inf'):
+                graph.astar_indices(source, target)
+        astar_time += time.time() - start
+
+    print("Repair:            {:8.3f} s ({} expansions)".format(repair_time, repair_expansions))
+    print("From scratch:      {:8.3f} s ({} expansions)".format(scratch_time, scratch_expansions))
+    print("CSR A* recompute:  {:8.3f} s".format(astar_time))
+    print("Distance mismatches between repair and from scratch: {}".format(mismatches))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Cost of saving and loading lidar frames: one numpy.savetxt file per frame, as
+check_raycast_sensors_determinism does, against a sensor recording of
+agents.tools.sensor_recording with each available codec. The point clouds are
+synthetic. Doesn't need a server.
+
+    python sensor_recording_benchmark.py --frames 100 --points 100000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+import numpy as np
+
+from agents.tools import sensor_recording
+from agents.tools.sensor_recording import SensorRecordingReader, SensorRecordingWriter
+from agents.tools.sensor_views import LIDAR_DTYPE
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--frames', default=100, type=int,
+        help='lidar frames saved (default: 100)')
+    argparser.add_argument(
+        '--points', default=100000, type=int,
+        help='points per frame (default: 100000)')
+    argparser.add_argument(
+        '--text-frames', default=5, type=int,
+        help='frames saved as text, which is slow (default: 5)')
+    argparser.add_argument(
+        '--reads', default=200, type=int,
+        help='random frames read (default: 200)')
+    args = argparser.parse_args()
+
+    rng = np.random.RandomState(0)
+    # Quantized like the points of a lidar, which compress somewhat
+    frames = []
+    for _ in range(args.frames):
+        points = np.zeros(args.points, dtype=LIDAR_DTYPE)
+        for name in ('x', 'y', 'z'):
+            points[name] = np.round(rng.uniform(-50, 50, args.points), 2)
+        points['intensity'] = np.round(rng.uniform(0, 1, args.points), 1)
+        frames.append(points)
+    megabytes = sum(points.nbytes for points in frames) / 1e6
+
+    folder = tempfile.mkdtemp()
+    try:
+        print("{} frames of {} points, {:.0f} MB, milliseconds per frame".format(
+            args.frames, args.points, megabytes))
+
+        start = time.time()
+        for i in range(args.text_frames):
+            np.savetxt(os.path.join(folder, 'lidar_%04d.out' % i), frames[i].view(np.float32).reshape(-1, 4))
+        write_time = (time.time() - start) / args.text_frames
+        start = time.time()
+        for i in range(args.text_frames):
+            np.loadtxt(os.path.join(folder, 'lidar_%04d.out' % i))
+        read_time = (time.time() - start) / args.text_frames
+        print("{:10s} write {:8.3f}  random read {:8.3f}  sequential read {:8.3f}".format(
+            'savetxt', write_time * 1e3, read_time * 1e3, read_time * 1e3))
+
+        codecs = ['none', 'zlib'] + [codec for codec, module in (
+            ('lz4', sensor_recording.lz4_frame), ('zstd', sensor_recording.zstandard)) if module is not None]
+        for codec in codecs:
+            path = os.path.join(folder, codec + '.rec')
+            start = time.time()
+            with SensorRecordingWriter(path, codec=codec) as writer:
+                for frame, points in enumerate(frames):
+                    writer.write('lidar', frame, points)
+            write_time = (time.time() - start) / args.frames
+
+            with SensorRecordingReader(path, cache_chunks=1) as reader:
+                picks = rng.randint(0, args.frames, args.reads)
+                start = time.time()
+                for frame in picks:
+                    # Sums the points so that the views of the memory map are really read
+                    reader.read('lidar', frame)['x'].sum()
+                random_time = (time.time() - start) / args.reads
+                start = time.time()
+                for _, points in reader.iter_frames('lidar'):
+                    points['x'].sum()
+                sequential_time = (time.time() - start) / args.frames
+            print("{:10s} write {:8.3f}  random read {:8.3f}  sequential read {:8.3f}  size {:6.1f} MB".format(
+                codec, write_time * 1e3, random_time * 1e3, sequential_time * 1e3, os.path.getsize(path) / 1e6))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
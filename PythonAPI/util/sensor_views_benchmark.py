@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Per frame cost of decoding the raw buffers of the sensors: the copy and reshape the
+examples used to do, against the views of agents.tools.sensor_views. The measurements
+are synthetic, with the size of a 4K camera and of a 128 channel lidar. Doesn't need a
+server.
+
+    python sensor_views_benchmark.py --width 3840 --height 2160 --channels 128
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+import numpy as np
+
+from agents.tools.sensor_views import lidar_view, rgb_view, semantic_lidar_view, xyz_view
+
+
+class SyntheticMeasurement(object):
+    """Stand-in for a sensor measurement, with its raw buffer"""
+
+    def __init__(self, raw_data, width=0, height=0):
+        self.raw_data = raw_data
+        self.width = width
+        self.height = height
+
+
+def copied_image(image):
+    """How synchronous_mode and lidar_to_camera decoded the images"""
+    array = np.copy(np.frombuffer(image.raw_data, dtype=np.dtype("uint8")))
+    array = np.reshape(array, (image.height, image.width, 4))
+    return array[:, :, :3][:, :, ::-1]
+
+
+def copied_lidar(measurement):
+    """How lidar_to_camera decoded the point clouds"""
+    p_cloud = np.copy(np.frombuffer(measurement.raw_data, dtype=np.dtype('f4')))
+    p_cloud = np.reshape(p_cloud, (int(p_cloud.shape[0] / 4), 4))
+    return np.array(p_cloud[:, :3]), np.array(p_cloud[:, 3])
+
+
+def viewed_lidar(measurement):
+    points = lidar_view(measurement)
+    return xyz_view(points), points['intensity']
+
+
+def copied_semantic_lidar(measurement):
+    """How open3d_lidar decoded the semantic point clouds"""
+    data = np.frombuffer(measurement.raw_data, dtype=np.dtype([
+        ('x', np.float32), ('y', np.float32), ('z', np.float32),
+        ('CosAngle', np.float32), ('ObjIdx', np.uint32), ('ObjTag', np.uint32)]))
+    return np.array([data['x'], data['y'], data['z']]).T, np.array(data['ObjTag'])
+
+
+def viewed_semantic_lidar(measurement):
+    points = semantic_lidar_view(measurement)
+    return xyz_view(points), points['object_tag']
+
+
+def per_call(function, argument, repetitions):
+    start = time.time()
+    for _ in range(repetitions):
+        function(argument)
+    return (time.time() - start) / repetitions
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--width', default=3840, type=int,
+        help='camera width (default: 3840)')
+    argparser.add_argument(
+        '--height', default=2160, type=int,
+        help='camera height (default: 2160)')
+    argparser.add_argument(
+        '--channels', default=128, type=int,
+        help='lidar channels (default: 128)')
+    argparser.add_argument(
+        '--points-per-channel', default=2048, type=int,
+        help='lidar points per channel and frame (default: 2048)')
+    argparser.add_argument(
+        '--repetitions', default=20, type=int,
+        help='frames decoded per test (default: 20)')
+    args = argparser.parse_args()
+
+    rng = np.random.RandomState(0)
+    image = SyntheticMeasurement(
+        rng.randint(0, 256, args.width * args.height * 4).astype(np.uint8).tobytes(), args.width, args.height)
+    count = args.channels * args.points_per_channel
+    lidar = SyntheticMeasurement(rng.uniform(-100, 100, count * 4).astype(np.float32).tobytes())
+    semantic = SyntheticMeasurement(rng.randint(0, 1 << 20, count * 6).astype(np.uint32).tobytes())
+
+    cases = [
+        ('{}x{} rgb'.format(args.width, args.height), image, copied_image, rgb_view,
+         lambda i: rgb_view(i, copy=True)),
+        ('{} point lidar'.format(count), lidar, copied_lidar, viewed_lidar,
+         lambda m: lidar_view(m, copy=True)),
+        ('{} point semantic lidar'.format(count), semantic, copied_semantic_lidar, viewed_semantic_lidar,
+         lambda m: semantic_lidar_view(m, copy=True)),
+    ]
+    print("per frame cost, in milliseconds")
+    for name, measurement, copied, viewed, explicit_copy in cases:
+        copied_time = per_call(copied, measurement, args.repetitions)
+        viewed_time = per_call(viewed, measurement, args.repetitions)
+        copy_time = per_call(explicit_copy, measurement, args.repetitions)
+        print("{:28s} examples {:8.3f}  view {:8.3f}  view with copy {:8.3f}".format(
+            name, copied_time * 1e3, viewed_time * 1e3, copy_time * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Timing of the neighbor queries of the agents over synthetic actors: the per actor
+distance loop of BehaviorAgent, a NumPy brute force over all the actors, and the
+uniform grid of the WorldState, rebuilt once per tick. Doesn't need a server.
+
+    python spatial_index_benchmark.py --actors 1000 5000 10000 --agents 200
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+from agents.tools.spatial_index import UniformGrid
+
+
+def synthetic_actors(count, density, rng):
+    """Actor positions spread over a square whose side keeps 'density' actors per km2"""
+    side = math.sqrt(count / density) * 1000.0
+    positions = rng.uniform(-side / 2, side / 2, size=(count, 3))
+    positions[:, 2] = rng.uniform(0.0, 2.0, size=count)
+    return positions.astype(np.float32)
+
+
+def loop_queries(positions, agents, radius):
+    """Distance to every actor in python, as the agents do with the live actors"""
+    points = [tuple(p) for p in positions.tolist()]
+    found = 0
+    for ax, ay, az in agents.tolist():
+        found += len([p for p in points
+                      if math.sqrt((p[0] - ax) ** 2 + (p[1] - ay) ** 2 + (p[2] - az) ** 2) < radius])
+    return found
+
+
+def brute_force_queries(positions, agents, radius):
+    """Distance to every actor with one array operation per agent"""
+    found = 0
+    for agent in agents:
+        distances = np.sqrt(np.sum(np.square(positions - agent), axis=1))
+        found += int(np.count_nonzero(distances < radius))
+    return found
+
+
+def grid_queries(positions, agents, radius, cell_size):
+    """Grid rebuilt for the tick, then candidates of the nearby cells only"""
+    grid = UniformGrid(positions, cell_size)
+    found = 0
+    for agent in agents:
+        rows = grid.query_radius(agent, radius + 1e-3, sort=False)
+        distances = np.sqrt(np.sum(np.square(positions[rows] - agent), axis=1))
+        found += int(np.count_nonzero(distances < radius))
+    return found
+
+
+def timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return time.time() - start, result
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--actors', default=[1000, 2000, 5000, 10000], type=int, nargs='+',
+        help='numbers of actors to test (default: 1000 2000 5000 10000)')
+    argparser.add_argument(
+        '--agents', default=200, type=int,
+        help='number of agents querying their neighbors each tick (default: 200)')
+    argparser.add_argument(
+        '--density', default=2000.0, type=float,
+        help='actors per square kilometer (default: 2000)')
+    argparser.add_argument(
+        '--cell-size', default=10.0, type=float,
+        help='side of the grid cells, in meters (default: 10)')
+    argparser.add_argument(
+        '--seed', default=0, type=int,
+        help='random seed (default: 0)')
+    argparser.add_argument(
+        '--skip-loop', action='store_true',
+        help='skip the python loop, which is slow for many actors')
+    args = argparser.parse_args()
+
+    rng = np.random.RandomState(args.seed)
+    print("{} agents per tick, {:.0f} actors/km2, {} m cells".format(args.agents, args.density, args.cell_size))
+    for count in args.actors:
+        positions = synthetic_actors(count, args.density, rng)
+        agents = positions[rng.choice(count, min(args.agents, count), replace=False)]
+        for radius in (45.0, 10.0):
+            line = "{:6d} actors, radius {:4.0f} m:".format(count, radius)
+            results = []
+            if not args.skip_loop:
+                elapsed, found = timed(loop_queries, positions, agents, radius)
+                line += "  loop {:8.2f} ms".format(elapsed * 1000)
+                results.append(found)
+            elapsed, found = timed(brute_force_queries, positions, agents, radius)
+            line += "  brute force {:8.2f} ms".format(elapsed * 1000)
+            results.append(found)
+            elapsed, found = timed(grid_queries, positions, agents, radius, args.cell_size)
+            line += "  grid {:8.2f} ms".format(elapsed * 1000)
+            results.append(found)
+            line += "  ({} neighbors{})".format(found, "" if len(set(results)) == 1 else ", MISMATCH")
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Timing comparison of the step by step Waypoint.next() walks and the bulk
+TopologySampler, for the topology of the route planner and for the lanes of the
+scene layout exporter. Requires a running server.
+
+    python topology_sampling_benchmark.py --town Town10HD_Opt --resolution 1.0
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+try:
+    sys.path.append(glob.glob('../carla/dist/carla-*%d.%d-%s.egg' % (
+        sys.version_info.major,
+        sys.version_info.minor,
+        'win-amd64' if os.name == 'nt' else 'linux-x86_64'))[0])
+except IndexError:
+    pass
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'carla'))
+
+import carla
+
+from agents.tools.topology_sampler import TopologySampler, walk_segment_path
+
+
+def walk_road(waypoint, precision):
+    """Walk of the scene layout exporter before the bulk sampler"""
+    waypoints = [waypoint]
+    nxt = waypoint.next(precision)
+    while nxt and nxt[0].road_id == waypoint.road_id:
+        waypoints.append(nxt[0])
+        nxt = nxt[0].next(precision)
+    return waypoints
+
+
+def compare_topology(carla_map, resolution):
+    """Paths of the topology segments of the route planner"""
+    start = time.time()
+    walked = [walk_segment_path(entry, exit_waypoint, resolution)
+              for entry, exit_waypoint in carla_map.get_topology()]
+    walked = [path for path in walked if path is not None]
+    walk_time = time.time() - start
+
+    start = time.time()
+    sampled = [path for _, _, path in TopologySampler(carla_map, resolution).segments()]
+    bulk_time = time.time() - start
+
+    print("Route planner topology at {} m ({} segments)".format(resolution, len(sampled)))
+    print("  Waypoint.next() walk: {:8.3f} s, {} waypoints".format(walk_time, sum(len(p) for p in walked)))
+    print("  bulk sampler:         {:8.3f} s, {} waypoints".format(bulk_time, sum(len(p) for p in sampled)))
+    differences = [abs(len(a) - len(b)) for a, b in zip(walked, sampled)]
+    print("  segments with a different waypoint count: {} (max difference {})".format(
+        sum(1 for d in differences if d), max(differences) if differences else 0))
+
+
+def compare_scene_layout(carla_map, precision):
+    """Lanes walked by scene_layout.get_scene_layout"""
+    topology = [x[0] for x in carla_map.get_topology()]
+
+    start = time.time()
+    walked = sum(len(walk_road(waypoint, precision)) for waypoint in topology)
+    walk_time = time.time() - start
+
+    start = time.time()
+    sampler = TopologySampler(carla_map, precision)
+    sampled = sum(len(sampler.road_walk(waypoint)) for waypoint in topology)
+    bulk_time = time.time() - start
+
+    print("Scene layout lanes at {} m ({} lanes)".format(precision, len(topology)))
+    print("  Waypoint.next() walk: {:8.3f} s, {} waypoints".format(walk_time, walked))
+    print("  bulk sampler:         {:8.3f} s, {} waypoints".format(bulk_time, sampled))
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--host', default='127.0.0.1',
+        help='IP of the host server (default: 127.0.0.1)')
+    argparser.add_argument(
+        '-p', '--port', default=2000, type=int,
+        help='TCP port to listen to (default: 2000)')
+    argparser.add_argument(
+        '--town', default=None,
+        help='map to load (default: current one)')
+    argparser.add_argument(
+        '--resolution', default=1.0, type=float,
+        help='sampling resolution of the route planner topology (default: 1.0)')
+    argparser.add_argument(
+        '--precision', default=0.05, type=float,
+        help='precision of the scene layout lanes (default: 0.05)')
+    args = argparser.parse_args()
+
+    client = carla.Client(args.host, args.port)
+    client.set_timeout(60.0)
+    world = client.get_world()
+    if args.town and not world.get_map().name.endswith(args.town):
+        world = client.load_world(args.town)
+    carla_map = world.get_map()
+
+    compare_topology(carla_map, args.resolution)
+    compare_scene_layout(carla_map, args.precision)
+
+
+if __name__ == '__main__':
+    main()